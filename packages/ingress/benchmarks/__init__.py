@@ -0,0 +1,3 @@
+"""
+Benchmark scripts (run from packages/ingress, e.g. python -m benchmarks.bench_chat_list)
+"""
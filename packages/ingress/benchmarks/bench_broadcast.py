@@ -0,0 +1,130 @@
+"""
+Broadcast benchmark: per-socket awaited sends vs per-socket send queues
+
+Drives ConnectionManager.broadcast_to_chat against in-process Starlette
+WebSockets (the ASGI send is a counter, optionally slowed down for a few
+sockets) and reports delivered messages per second. The awaited baseline
+sends to each socket in turn, as rooms did before every socket got a queue.
+
+Usage (from packages/ingress):
+    python -m benchmarks.bench_broadcast --subscribers 10000
+    python -m benchmarks.bench_broadcast --subscribers 10000 --slow 10
+"""
+
+import argparse
+import asyncio
+import time
+
+from starlette.websockets import WebSocket, WebSocketState
+
+from services.websocket.encoding import JSON, OutboundFrame
+from services.websocket.websocket_manager import ConnectionManager
+
+CHAT_ID = 1
+
+
+class FakeTransport:
+    """ASGI send callable that counts delivered text frames"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.delivered = 0
+
+    async def send(self, message: dict):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.delivered += 1
+
+
+async def _never_receive():
+    await asyncio.Event().wait()
+
+
+def open_room(manager: ConnectionManager, subscribers: int, slow: int, delay: float):
+    """Register `subscribers` connected sockets in one chat room"""
+    transports = []
+    for i in range(subscribers):
+        transport = FakeTransport(delay if i < slow else 0.0)
+        websocket = WebSocket(
+            {"type": "websocket", "path": "/ws", "headers": []},
+            _never_receive,
+            transport.send,
+        )
+        websocket.client_state = WebSocketState.CONNECTED
+        websocket.application_state = WebSocketState.CONNECTED
+        manager.websocket_users[websocket] = i + 1
+        manager.user_connections.setdefault(i + 1, set()).add(websocket)
+        manager.active_connections.setdefault(CHAT_ID, set()).add(websocket)
+        transports.append(transport)
+    return transports
+
+
+async def awaited_broadcast(manager: ConnectionManager, message: dict, chat_id: int):
+    """Baseline: encode once, then await each socket's send in turn"""
+    frame = OutboundFrame(message)
+    for connection in manager.active_connections[chat_id]:
+        await connection.send(frame.asgi(JSON))
+
+
+async def run(subscribers: int, messages: int, slow: int, delay: float, queued: bool):
+    manager = ConnectionManager()
+    transports = open_room(manager, subscribers, slow, delay)
+    fast = transports[slow:]
+
+    message = {
+        "type": "new_message",
+        "message": {"id": 1, "chat_id": CHAT_ID, "content": "x" * 200},
+    }
+    started = time.perf_counter()
+    for i in range(messages):
+        message["message"]["id"] = i
+        if queued:
+            await manager.broadcast_to_chat(message, CHAT_ID)
+        else:
+            await awaited_broadcast(manager, message, CHAT_ID)
+    broadcast_done = time.perf_counter()
+
+    # Wait until every fast socket has received everything
+    while any(t.delivered < messages for t in fast):
+        await asyncio.sleep(0)
+    delivered_at = time.perf_counter()
+
+    for writer in list(manager.writers.values()):
+        writer.close()
+    return broadcast_done - started, delivered_at - started, len(fast) * messages
+
+
+def report(name, broadcast_seconds, delivered_seconds, fast_deliveries, messages):
+    print(
+        f"   {name:<22} broadcast loop {broadcast_seconds * 1000:9.1f} ms"
+        f" ({messages / broadcast_seconds:8.1f} msg/s)"
+        f"   delivered {fast_deliveries / delivered_seconds:12,.0f} frames/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--subscribers", type=int, default=10_000)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--slow", type=int, default=0, help="number of slow sockets")
+    parser.add_argument("--delay-ms", type=float, default=20.0, help="slow send delay")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(
+        f"Broadcast benchmark: {args.subscribers:,} subscribers, "
+        f"{args.messages} messages, {args.slow} slow sockets"
+    )
+    print("=" * 60)
+
+    for name, queued in (("awaited per socket", False), ("send queues", True)):
+        result = asyncio.run(
+            run(
+                args.subscribers, args.messages, args.slow, args.delay_ms / 1000, queued
+            )
+        )
+        report(name, *result, args.messages)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Chat list benchmark: global GROUP BY vs denormalized last-message pointer
+
+Usage (from packages/ingress):
+    python -m benchmarks.bench_chat_list --messages 10000000
+    python -m benchmarks.bench_chat_list --url postgresql://... --messages 10000000
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.fixtures import build_fixture
+from services.chat.chat_service import get_user_chats
+from services.database.models import Chat, ChatParticipant, Message
+
+
+def legacy_get_user_chats(db, user_id: int):
+    """The previous implementation, kept here for comparison"""
+    latest_message_subquery = (
+        select(Message.chat_id, func.max(Message.created_at).label("last_message_at"))
+        .group_by(Message.chat_id)
+        .subquery()
+    )
+    stmt = (
+        select(Chat)
+        .join(ChatParticipant)
+        .outerjoin(
+            latest_message_subquery, Chat.id == latest_message_subquery.c.chat_id
+        )
+        .where(ChatParticipant.user_id == user_id)
+        .order_by(
+            func.coalesce(
+                latest_message_subquery.c.last_message_at, Chat.created_at
+            ).desc()
+        )
+    )
+    return db.execute(stmt).scalars().all()
+
+
+def time_calls(fn, db, user_ids, repeat):
+    timings = []
+    for _ in range(repeat):
+        for user_id in user_ids:
+            db.expunge_all()
+            started = time.perf_counter()
+            fn(db, user_id)
+            timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(name, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+    print(
+        f"   {name:<28} p50 {statistics.median(timings):9.2f} ms"
+        f"   p95 {p95:9.2f} ms   max {timings[-1]:9.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="Database URL (default: temp SQLite file)")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--chats", type=int, default=100_000)
+    parser.add_argument("--messages", type=int, default=10_000_000)
+    parser.add_argument("--sample-users", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite:///{tempfile.mkdtemp()}/bench_chat_list.db"
+    print("=" * 60)
+    print(f"Chat list benchmark: {args.messages:,} messages ({url.split(':')[0]})")
+    print("=" * 60)
+
+    print("\nBuilding fixture...")
+    engine = build_fixture(
+        url, users=args.users, chats=args.chats, messages=args.messages
+    )
+    user_ids = list(range(1, args.users + 1, max(1, args.users // args.sample_users)))
+
+    with sessionmaker(bind=engine)() as db:
+        # Same chats, same order among chats that have messages (ties between
+        # empty chats are unordered in the legacy query)
+        for user_id in user_ids[:3]:
+            legacy = legacy_get_user_chats(db, user_id)
+            current = get_user_chats(db, user_id)
+            assert {c.id for c in legacy} == {c.id for c in current}, user_id
+            active = [c.id for c in current if c.last_message_id is not None]
+            assert [c.id for c in legacy][: len(active)] == active, user_id
+
+        print(f"\nTiming {len(user_ids)} users x {args.repeat} runs...")
+        report("legacy GROUP BY", time_calls(legacy_get_user_chats, db, user_ids, 1))
+        report(
+            "last_message pointer",
+            time_calls(get_user_chats, db, user_ids, args.repeat),
+        )
+
+        if engine.dialect.name == "sqlite":
+            print("\nQuery plan (last_message pointer):")
+            stmt = (
+                select(Chat)
+                .join(ChatParticipant)
+                .where(ChatParticipant.user_id == user_ids[0])
+                .order_by(Chat.last_message_at.desc(), Chat.id.desc())
+            )
+            compiled = stmt.compile(engine, compile_kwargs={"literal_binds": True})
+            for row in db.execute(text(f"EXPLAIN QUERY PLAN {compiled}")):
+                print(f"   {row[-1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+"""
+Chat service benchmark: how chat_service reads and writes scale with data
+
+Times get_user_chats, get_unread_count, get_chat_messages,
+get_chat_read_receipts, mark_messages_as_read and
+get_chat_history_for_gemini over busy and quiet chats of a seeded fixture
+(users, chats, messages and matching read receipts), recording queries per
+call and the plan of each query. Results go to a JSON file; with
+--baseline, timings, query counts and plans are compared with an earlier
+run (e.g. from another commit) on the same fixture.
+
+Usage (from packages/ingress):
+    python -m benchmarks.bench_chat_service --messages 10000000
+    python -m benchmarks.bench_chat_service --url postgresql://... --messages 10000000
+    python -m benchmarks.bench_chat_service --url sqlite:///big.db --reuse \\
+        --baseline benchmarks/results/chat-service-abc1234.json
+
+Building 10M messages takes a while; build once into a file or database
+with --url and pass --reuse on later runs. mark_messages_as_read's receipts
+are deleted again after each call, so a reused fixture stays unchanged.
+"""
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import create_engine, delete, event, func, select
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.fixtures import build_fixture
+from benchmarks.reports import git_commit, read_results, write_results
+from services.chat.chat_service import (
+    get_chat_history_for_gemini,
+    get_chat_messages,
+    get_chat_read_receipts,
+    get_unread_count,
+    get_user_chats,
+    mark_messages_as_read,
+)
+from services.database.models import (
+    ChatParticipant,
+    Message,
+    MessageReadReceipt,
+    User,
+)
+
+# Benchmarked functions and how to call them for a (chat id, user id) pair;
+# mark_messages_as_read writes, so its receipts are removed after each call
+FUNCTIONS: Tuple[Tuple[str, Callable, bool], ...] = (
+    ("get_user_chats", lambda db, chat_id, user_id: get_user_chats(db, user_id), False),
+    ("get_unread_count", get_unread_count, False),
+    (
+        "get_chat_messages",
+        lambda db, chat_id, user_id: get_chat_messages(db, chat_id),
+        False,
+    ),
+    (
+        "get_chat_history_for_gemini",
+        lambda db, chat_id, user_id: get_chat_history_for_gemini(db, chat_id),
+        False,
+    ),
+    (
+        "get_chat_read_receipts",
+        lambda db, chat_id, user_id: get_chat_read_receipts(db, chat_id),
+        False,
+    ),
+    ("mark_messages_as_read", mark_messages_as_read, True),
+)
+
+
+class QueryLog:
+    """Statements an engine executes while recording is on"""
+
+    def __init__(self, engine):
+        self.recording = False
+        self.statements: List[Tuple[str, object]] = []
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.recording:
+            self.statements.append((statement, None if executemany else parameters))
+
+    def start(self):
+        self.statements = []
+        self.recording = True
+
+    def stop(self) -> List[Tuple[str, object]]:
+        self.recording = False
+        return self.statements
+
+
+def explain(engine, statement: str, parameters) -> List[str]:
+    """The plan the database picks for a statement, one line per step"""
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            return [row[-1] for row in rows]
+        if engine.dialect.name == "postgresql":
+            rows = conn.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+            return [row[0] for row in rows]
+    return []
+
+
+def pick_pairs(db, count: int, rng: random.Random) -> List[Dict]:
+    """
+    (chat, member) pairs to call the functions for
+
+    Half come from the busiest chats (the fixture sends most traffic to low
+    chat ids), half from chats picked at random, each with the member who
+    has the most unread messages.
+    """
+    chats = db.execute(select(func.max(ChatParticipant.chat_id))).scalar() or 0
+    busy = list(range(1, min(chats, count // 2) + 1))
+    quiet = rng.sample(range(1, chats + 1), min(chats, count - len(busy)))
+    pairs = []
+    for kind, chat_ids in (("busy", busy), ("quiet", quiet)):
+        for chat_id in chat_ids:
+            user_id = db.execute(
+                select(ChatParticipant.user_id)
+                .where(ChatParticipant.chat_id == chat_id)
+                .order_by(ChatParticipant.unread_count.desc(), ChatParticipant.user_id)
+                .limit(1)
+            ).scalar()
+            if user_id is not None:
+                pairs.append({"chat_id": chat_id, "user_id": user_id, "kind": kind})
+    return pairs
+
+
+def fixture_summary(db) -> Dict[str, int]:
+    """Row counts, so reports note what data they were measured on"""
+    return {
+        table: db.execute(select(func.count()).select_from(model)).scalar()
+        for table, model in (
+            ("users", User),
+            ("chat_participants", ChatParticipant),
+            ("messages", Message),
+            ("message_read_receipts", MessageReadReceipt),
+        )
+    }
+
+
+def summarize(timings: List[float]) -> Dict:
+    if not timings:
+        return {"calls": 0}
+    ordered = sorted(timings)
+    return {
+        "calls": len(ordered),
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 3),
+        "max_ms": round(ordered[-1], 3),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+    }
+
+
+def bench_function(
+    engine,
+    session_factory,
+    log: QueryLog,
+    fn,
+    writes: bool,
+    pairs: List[Dict],
+    repeat: int,
+    max_seconds: float,
+) -> Dict:
+    """
+    Time one function over the pairs; its plans come from the first call
+
+    Stops early (marked truncated) once the calls have taken `max_seconds`,
+    so one pathological function does not hold up the whole suite.
+    """
+    timings = {"busy": [], "quiet": []}
+    queries: List[int] = []
+    plans: List[Dict] = []
+    errors: Dict[str, int] = {}
+    budget_ends = time.perf_counter() + max_seconds
+    truncated = False
+    # A written call changes the data, so it is measured once per pair
+    for run in range(1 if writes else repeat):
+        for pair in pairs:
+            if time.perf_counter() > budget_ends:
+                truncated = True
+                break
+            with session_factory() as db:
+                last_receipt = (
+                    db.execute(select(func.max(MessageReadReceipt.id))).scalar() or 0
+                    if writes
+                    else None
+                )
+                log.start()
+                started = time.perf_counter()
+                try:
+                    fn(db, pair["chat_id"], pair["user_id"])
+                except Exception as e:
+                    log.stop()
+                    db.rollback()
+                    key = f"{type(e).__name__}: {str(e).splitlines()[0][:120]}"
+                    errors[key] = errors.get(key, 0) + 1
+                    continue
+                elapsed = (time.perf_counter() - started) * 1000
+                statements = log.stop()
+                timings[pair["kind"]].append(elapsed)
+                queries.append(len(statements))
+                if writes:
+                    db.execute(
+                        delete(MessageReadReceipt).where(
+                            MessageReadReceipt.id > last_receipt
+                        )
+                    )
+                    db.commit()
+
+            if not plans:
+                plans = [
+                    {"statement": " ".join(statement.split()), "plan": plan}
+                    for statement, parameters in statements
+                    if statement.lstrip()[:6].lower() == "select"
+                    and parameters is not None
+                    for plan in [explain(engine, statement, parameters)]
+                ]
+
+    all_timings = timings["busy"] + timings["quiet"]
+    return {
+        **summarize(all_timings),
+        "busy": summarize(timings["busy"]),
+        "quiet": summarize(timings["quiet"]),
+        "queries_per_call": round(statistics.fmean(queries), 2) if queries else None,
+        "max_queries": max(queries, default=None),
+        "plans": plans,
+        "errors": errors,
+        "truncated": truncated,
+    }
+
+
+def run(args) -> Dict:
+    """Build (or reuse) the fixture and benchmark every function"""
+    if args.reuse and not args.url:
+        raise SystemExit("--reuse needs the fixture's --url")
+    url = args.url or f"sqlite:///{tempfile.mkdtemp()}/bench_chat_service.db"
+    if args.reuse:
+        engine = create_engine(url)
+    else:
+        print("\nBuilding fixture...")
+        engine = build_fixture(
+            url,
+            users=args.users,
+            chats=args.chats,
+            members_per_chat=args.members,
+            messages=args.messages,
+            seed=args.seed,
+            receipts=True,
+        )
+    log = QueryLog(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    with session_factory() as db:
+        fixture = fixture_summary(db)
+        pairs = pick_pairs(db, args.sample, random.Random(args.seed))
+
+    names = set(args.only or [name for name, _, _ in FUNCTIONS])
+    functions = {}
+    for name, fn, writes in FUNCTIONS:
+        if name in names:
+            print(f"   {name}...")
+            functions[name] = bench_function(
+                engine,
+                session_factory,
+                log,
+                fn,
+                writes,
+                pairs,
+                args.repeat,
+                args.max_seconds,
+            )
+    engine.dispose()
+
+    return {
+        "benchmark": "chat_service",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "dialect": engine.dialect.name,
+        "fixture": {**fixture, "seed": args.seed},
+        "pairs": pairs,
+        "repeat": args.repeat,
+        "functions": functions,
+    }
+
+
+def report(results: Dict, baseline: Optional[Dict] = None):
+    for name, result in results["functions"].items():
+        if not result.get("calls"):
+            print(f"   {name:<28} failed: {result['errors']}")
+            continue
+        print(
+            f"   {name:<28} p50 {result['p50_ms']:9.2f} ms   p95 {result['p95_ms']:9.2f}"
+            f" ms   busy p95 {result['busy'].get('p95_ms', 0):9.2f} ms"
+            f"   {result['queries_per_call']:5.1f} queries"
+        )
+        if result["truncated"]:
+            print(f"      stopped after {result['calls']} calls (--max-seconds)")
+        if result["errors"]:
+            print(f"      errors: {result['errors']}")
+
+    if baseline is None:
+        return
+    print(f"\nCompared with {baseline.get('commit')} ({baseline.get('created_at')}):")
+    if baseline.get("fixture") != results["fixture"] or baseline.get(
+        "pairs"
+    ) != results.get("pairs"):
+        print("   (different fixture or sample: timings are not comparable)")
+    for name, result in results["functions"].items():
+        before = baseline.get("functions", {}).get(name)
+        if not before or not before.get("calls") or not result.get("calls"):
+            continue
+        changes = []
+        for key in ("p50_ms", "p95_ms", "queries_per_call"):
+            then, now = before[key], result[key]
+            change = (now - then) / then * 100 if then else 0.0
+            changes.append(f"{key} {then} -> {now} ({change:+.1f}%)")
+        plans = [p["plan"] for p in result["plans"]]
+        if plans != [p["plan"] for p in before["plans"]]:
+            changes.append("plan changed")
+        print(f"   {name:<28} " + ", ".join(changes))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="Database URL (default: temp SQLite file)")
+    parser.add_argument(
+        "--reuse", action="store_true", help="Use the fixture already at --url"
+    )
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--chats", type=int, default=100_000)
+    parser.add_argument("--members", type=int, default=4, help="members per chat")
+    parser.add_argument("--messages", type=int, default=10_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sample", type=int, default=20, help="(chat, user) pairs")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=120,
+        help="Time budget per function; later calls are skipped",
+    )
+    parser.add_argument(
+        "--only", action="append", choices=[name for name, _, _ in FUNCTIONS]
+    )
+    parser.add_argument("--plans", action="store_true", help="Print query plans")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/)")
+    parser.add_argument("--baseline", help="Earlier results file to compare with")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    print("=" * 60)
+    print(
+        f"Chat service benchmark: {args.messages:,} messages "
+        f"({(args.url or 'sqlite').split(':')[0]})"
+    )
+    print("=" * 60)
+
+    results = run(args)
+    print(f"\n{results['fixture']}")
+    baseline = None
+    if args.baseline:
+        baseline = read_results(args.baseline)
+    report(results, baseline)
+
+    if args.plans:
+        for name, result in results["functions"].items():
+            print(f"\nQuery plans ({name}):")
+            for query in result["plans"]:
+                print(f"   {query['statement'][:100]}")
+                for line in query["plan"]:
+                    print(f"      {line}")
+
+    output = write_results(results, "chat-service", args.output)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
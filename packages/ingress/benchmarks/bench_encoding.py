@@ -0,0 +1,209 @@
+"""
+WebSocket encoding benchmark: bytes on the wire and CPU per frame
+
+Encodes and decodes a realistic mix of the events server/main.py emits with
+every wire encoding, plus two permessage-deflate reference points (per
+message, and with context takeover, which needs a compressor per socket).
+
+Usage (from packages/ingress):
+    python -m benchmarks.bench_encoding
+    python -m benchmarks.bench_encoding --frames 20000
+"""
+
+import argparse
+import json
+import random
+import time
+import zlib
+
+from services.websocket import encoding
+
+CREATED_AT = "2025-10-19T12:34:56.789012+00:00"
+WORDS = (
+    "the build is green again after the migration but the chat list still "
+    "feels slow on mobile could you check the websocket reconnect logic"
+).split()
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def chat(rng: random.Random) -> dict:
+    return {
+        "id": rng.randint(1, 100_000),
+        "name": "Release planning",
+        "owner_id": rng.randint(1, 10_000),
+        "created_at": CREATED_AT,
+        "is_group": True,
+    }
+
+
+def sample_events(rng: random.Random) -> dict:
+    """One example of each event type, keyed by type"""
+    chat_id = rng.randint(1, 100_000)
+    message_id = rng.randint(1, 10_000_000)
+    username = rng.choice(["alice", "bob", "carol", "dave"])
+    return {
+        "message": {
+            "type": "message",
+            "message": {
+                "id": message_id,
+                "chat_id": chat_id,
+                "user_id": rng.randint(1, 10_000),
+                "username": username,
+                "content": sentence(rng, rng.randint(3, 30)),
+                "is_bot": False,
+                "created_at": CREATED_AT,
+            },
+        },
+        "bot_stream": {
+            "type": "bot_stream",
+            "message": {
+                "id": message_id,
+                "chat_id": chat_id,
+                "user_id": None,
+                "username": "AI Assistant",
+                "content": sentence(rng, rng.randint(20, 200)),
+                "is_bot": True,
+                "created_at": CREATED_AT,
+            },
+        },
+        "typing": {"type": "typing", "chat_id": chat_id, "username": username},
+        "user_joined": {
+            "type": "user_joined",
+            "chat_id": chat_id,
+            "username": username,
+        },
+        "user_left": {"type": "user_left", "chat_id": chat_id, "username": username},
+        "unread_update": {
+            "type": "unread_update",
+            "chat_id": chat_id,
+            "unread_count": rng.randint(0, 50),
+            "last_message_preview": sentence(rng, 8),
+            "last_message_time": CREATED_AT,
+        },
+        "read_receipts_updated": {
+            "type": "read_receipts_updated",
+            "chat_id": chat_id,
+            "read_receipts": {
+                str(message_id - i): [
+                    {"user_id": uid, "username": name, "read_at": CREATED_AT}
+                    for uid, name in ((1, "alice"), (2, "bob"), (3, "carol"))
+                ]
+                for i in range(rng.randint(1, 20))
+            },
+        },
+        "chat_created": {
+            "type": "chat_created",
+            "chat": chat(rng),
+            "notification": f"You've been added to a new chat by {username}",
+        },
+        "chat_invite": {
+            "type": "chat_invite",
+            "chat": chat(rng),
+            "notification": f"{username} added you to Release planning",
+        },
+        "removed_from_chat": {
+            "type": "removed_from_chat",
+            "chat_id": chat_id,
+            "notification": "You were removed from Release planning",
+        },
+    }
+
+
+# Rough share of each event type in a busy deployment
+MIX = {
+    "bot_stream": 30,
+    "message": 25,
+    "typing": 20,
+    "unread_update": 15,
+    "read_receipts_updated": 5,
+    "user_joined": 2,
+    "user_left": 2,
+    "chat_created": 0.4,
+    "chat_invite": 0.4,
+    "removed_from_chat": 0.2,
+}
+
+
+def build_frames(count: int, seed: int):
+    rng = random.Random(seed)
+    types = rng.choices(list(MIX), weights=list(MIX.values()), k=count)
+    return [sample_events(rng)[event_type] for event_type in types]
+
+
+def payload(event: dict) -> bytes:
+    return event.get("bytes") or event["text"].encode()
+
+
+def bench_encoding(name: str, frames):
+    started = time.perf_counter()
+    encoded = [encoding.encode(frame, name) for frame in frames]
+    encode_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for event in encoded:
+        encoding.decode({"type": "websocket.receive", **event}, name)
+    decode_seconds = time.perf_counter() - started
+    return sum(len(payload(e)) for e in encoded), encode_seconds, decode_seconds
+
+
+def bench_permessage_deflate(frames, context_takeover: bool):
+    """Reference: what permessage-deflate would do at the transport"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    total = 0
+    started = time.perf_counter()
+    for frame in frames:
+        if not context_takeover:
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+        data = json.dumps(frame).encode()
+        total += len(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH))
+    return total, time.perf_counter() - started
+
+
+def report(name, total_bytes, json_bytes, count, encode_seconds, decode_seconds=None):
+    decode = f"{decode_seconds / count * 1e6:7.2f} us" if decode_seconds else " " * 10
+    print(
+        f"   {name:<34} {total_bytes / count:8.1f} B/frame"
+        f" ({total_bytes / json_bytes:6.1%} of json)"
+        f"   encode {encode_seconds / count * 1e6:7.2f} us   decode {decode}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--frames", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    frames = build_frames(args.frames, args.seed)
+    print("=" * 60)
+    print(f"Encoding benchmark: {args.frames:,} frames of mixed chat events")
+    print("=" * 60)
+
+    results = {name: bench_encoding(name, frames) for name in encoding.ENCODINGS}
+    json_bytes = results[encoding.JSON][0]
+    for name, (total, encode_seconds, decode_seconds) in results.items():
+        report(name, total, json_bytes, len(frames), encode_seconds, decode_seconds)
+
+    print("\n   Reference (transport-level, not shareable across sockets):")
+    for label, takeover in (
+        ("permessage-deflate, per message", False),
+        ("permessage-deflate, context takeover", True),
+    ):
+        total, seconds = bench_permessage_deflate(frames, takeover)
+        report(label, total, json_bytes, len(frames), seconds)
+
+    print("\n   Per event type (B/frame):")
+    by_type = {}
+    for frame in frames:
+        by_type.setdefault(frame["type"], frame)
+    print(f"   {'':<24}" + "".join(f"{name:>10}" for name in encoding.ENCODINGS))
+    for event_type, frame in by_type.items():
+        sizes = [len(payload(encoding.encode(frame, n))) for n in encoding.ENCODINGS]
+        print(f"   {event_type:<24}" + "".join(f"{size:>10}" for size in sizes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,698 @@
+"""
+Load test: thousands of WebSocket clients against a server with a fake model
+
+Seeds users and chats, starts the server with GEMINI_PROVIDER=fake (unless
+--target points at a running one), opens --connections WebSockets and
+drives a weighted mix of joins, messages, typing, mark-read, REST reads and
+/bot commands. Reports p50/p95/p99 delivery latency, messages per second,
+server CPU and memory, and database query counts, and writes them to a
+JSON file that a later run can compare against with --baseline.
+
+Usage (from packages/ingress):
+    python -m benchmarks.bench_load --connections 2000 --duration 60
+    python -m benchmarks.bench_load --url postgresql://... --connections 5000
+    python -m benchmarks.bench_load --mix message=50,typing=20,bot=30
+    python -m benchmarks.bench_load --baseline benchmarks/results/release.json
+
+Against a running server, seed its database first (--url, the same
+SECRET_KEY) or reuse an earlier seed with --skip-seed, and list --admin-user
+in its ADMIN_USERNAMES so the harness can read /internal/stats:
+    python -m benchmarks.bench_load --target http://localhost:8000 --url ...
+
+The clients run in this one process, so at very high rates its own CPU can
+become the bottleneck; check that it stays below 100% before trusting the
+numbers.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import re
+import resource
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import httpx
+import orjson
+import websockets
+from jose import jwt
+from sqlalchemy import create_engine, select
+
+from benchmarks.fixtures import build_fixture
+from benchmarks.reports import git_commit, read_results, write_results
+from services.database.models import ChatParticipant, User
+from shared.config import ALGORITHM, SECRET_KEY
+
+# Default share of each action, out of their sum
+DEFAULT_MIX = "message=55,typing=20,mark_read=10,history=5,chat_list=4,join=4,bot=2"
+ACTIONS = ("message", "typing", "mark_read", "history", "chat_list", "join", "bot")
+
+# Message text, after the tag
+WORDS = (
+    "deploy review latency cache index query merge release sprint ticket "
+    "lunch coffee meeting bug fix test build server client frontend backend"
+).split()
+
+# Tag carried in message content so receivers can time the delivery
+NONCE = re.compile(r"lt:(\d+)")
+
+# Metrics compared with --baseline: (label, path in the results, higher is better)
+COMPARED = (
+    ("delivery p50 ms", ("latency_ms", "delivery", "p50"), False),
+    ("delivery p95 ms", ("latency_ms", "delivery", "p95"), False),
+    ("delivery p99 ms", ("latency_ms", "delivery", "p99"), False),
+    ("bot first frame p95 ms", ("latency_ms", "bot_first_frame", "p95"), False),
+    ("mark_read p95 ms", ("latency_ms", "mark_read", "p95"), False),
+    ("messages/s", ("throughput", "messages_per_second"), True),
+    ("deliveries/s", ("throughput", "deliveries_per_second"), True),
+    ("server CPU avg %", ("server", "cpu_percent_avg"), False),
+    ("server RSS peak MB", ("server", "rss_mb_peak"), False),
+    ("queries per action", ("database", "queries_per_action"), False),
+)
+
+
+def summarize(values: List[float]) -> Dict:
+    """Count, p50/p95/p99 and max of a list of latencies"""
+    if not values:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def percentile(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 2)
+
+    return {
+        "count": len(ordered),
+        "p50": percentile(0.5),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "max": round(ordered[-1], 2),
+    }
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse --mix: message=60,bot=5 -> {"message": 60.0, "bot": 5.0}"""
+    mix = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in ACTIONS:
+            raise ValueError(f"Unknown action in --mix: {name} (one of {ACTIONS})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class Recorder:
+    """Timings and counters shared by every client"""
+
+    def __init__(self):
+        self.next_nonce = 0
+        # nonce -> (sent at, sender user id)
+        self.sent: Dict[int, tuple] = {}
+        self.delivery_ms: List[float] = []
+        self.rest_ms: Dict[str, List[float]] = defaultdict(list)
+        # chat id -> send times of /bot commands not yet answered
+        self.bot_pending: Dict[int, deque] = defaultdict(deque)
+        # bot message id -> [sent at, first frame at, last frame at]
+        self.bot_replies: Dict[int, list] = {}
+        self.actions = Counter()
+        self.frames = Counter()
+        self.errors = Counter()
+        self.deliveries = 0
+
+    def nonce(self, user_id: int) -> int:
+        self.next_nonce += 1
+        self.sent[self.next_nonce] = (time.monotonic(), user_id)
+        return self.next_nonce
+
+    def delivered(self, content: str, sender_id: int, receiver_id: int, at: float):
+        match = NONCE.search(content)
+        if match is None or sender_id == receiver_id:
+            return
+        sent = self.sent.get(int(match.group(1)))
+        if sent is not None:
+            self.deliveries += 1
+            self.delivery_ms.append((at - sent[0]) * 1000)
+
+    def bot_frame(self, chat_id: int, message_id: int, at: float):
+        reply = self.bot_replies.get(message_id)
+        if reply is None:
+            pending = self.bot_pending.get(chat_id)
+            if not pending:
+                return
+            # Replies to one chat start in the order the commands were sent
+            reply = self.bot_replies[message_id] = [pending.popleft(), at, at]
+        reply[2] = max(reply[2], at)
+
+
+class LoadClient:
+    """One WebSocket connection of a seeded user"""
+
+    def __init__(self, index: int, user_id: int, token: str, chats: List[int]):
+        self.index = index
+        self.user_id = user_id
+        self.token = token
+        self.chats = chats
+        self.websocket = None
+
+    async def connect(self, ws_url: str, recorder: Recorder) -> Optional[float]:
+        """Open the socket; returns the time it took in ms, None on failure"""
+        started = time.monotonic()
+        try:
+            self.websocket = await websockets.connect(
+                f"{ws_url}/ws?token={self.token}",
+                open_timeout=60,
+                close_timeout=5,
+                ping_interval=None,
+                max_size=None,
+            )
+        except Exception as e:
+            recorder.errors[f"connect: {type(e).__name__}"] += 1
+            return None
+        return (time.monotonic() - started) * 1000
+
+    async def send(self, recorder: Recorder, frame: Dict):
+        try:
+            await self.websocket.send(orjson.dumps(frame).decode())
+        except Exception as e:
+            recorder.errors[f"send: {type(e).__name__}"] += 1
+
+    async def receive(self, recorder: Recorder):
+        try:
+            async for raw in self.websocket:
+                at = time.monotonic()
+                frame = orjson.loads(raw)
+                kind = frame.get("type", "error" if "error" in frame else "other")
+                recorder.frames[kind] += 1
+                if kind == "message":
+                    message = frame["message"]
+                    recorder.delivered(
+                        message["content"], message["user_id"], self.user_id, at
+                    )
+                elif kind == "bot_stream":
+                    message = frame["message"]
+                    recorder.bot_frame(message["chat_id"], message["id"], at)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def rest(self, recorder: Recorder, http, action: str, method: str, path):
+        started = time.monotonic()
+        try:
+            response = await http.request(
+                method, path, headers={"Authorization": f"Bearer {self.token}"}
+            )
+            response.raise_for_status()
+        except Exception as e:
+            recorder.errors[f"{action}: {type(e).__name__}"] += 1
+            return
+        recorder.rest_ms[action].append((time.monotonic() - started) * 1000)
+
+    async def act(self, recorder: Recorder, http, action: str, rng: random.Random):
+        chat_id = rng.choice(self.chats)
+        recorder.actions[action] += 1
+        if action == "message":
+            nonce = recorder.nonce(self.user_id)
+            words = " ".join(rng.choices(WORDS, k=rng.randint(3, 15)))
+            await self.send(
+                recorder,
+                {
+                    "type": "message",
+                    "chat_id": chat_id,
+                    "content": f"lt:{nonce} {words}",
+                },
+            )
+        elif action == "bot":
+            nonce = recorder.nonce(self.user_id)
+            recorder.bot_pending[chat_id].append(time.monotonic())
+            await self.send(
+                recorder,
+                {
+                    "type": "message",
+                    "chat_id": chat_id,
+                    "content": f"/bot lt:{nonce} summarize what we decided so far",
+                },
+            )
+        elif action == "typing":
+            await self.send(recorder, {"type": "typing", "chat_id": chat_id})
+        elif action == "join":
+            await self.send(recorder, {"type": "join", "chat_id": chat_id})
+        elif action == "mark_read":
+            await self.rest(
+                recorder, http, action, "POST", f"/api/chats/{chat_id}/mark-read"
+            )
+        elif action == "history":
+            await self.rest(
+                recorder, http, action, "GET", f"/api/chats/{chat_id}/messages"
+            )
+        elif action == "chat_list":
+            await self.rest(recorder, http, action, "GET", "/api/chats")
+
+    async def run(
+        self,
+        recorder: Recorder,
+        http,
+        mix: Dict[str, float],
+        rate: float,
+        deadline: float,
+        seed: int,
+    ):
+        """Act at `rate` actions per second (Poisson arrivals) until the deadline"""
+        rng = random.Random(f"{seed}-{self.index}")
+        names, weights = list(mix), list(mix.values())
+        while True:
+            await asyncio.sleep(rng.expovariate(rate))
+            if time.monotonic() >= deadline:
+                return
+            await self.act(recorder, http, rng.choices(names, weights)[0], rng)
+
+
+def raise_file_limit(wanted: int) -> int:
+    """Raise the open file limit (inherited by the server) towards `wanted`"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+    if target > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+        soft = target
+    return soft
+
+
+def load_members(url: str) -> Dict[int, tuple]:
+    """user id -> (username, [chat ids]) for every user in a chat"""
+    engine = create_engine(url)
+    members: Dict[int, tuple] = {}
+    with engine.connect() as conn:
+        usernames = dict(conn.execute(select(User.id, User.username)).all())
+        for chat_id, user_id in conn.execute(
+            select(ChatParticipant.chat_id, ChatParticipant.user_id)
+        ):
+            if user_id in usernames:
+                members.setdefault(user_id, (usernames[user_id], []))[1].append(chat_id)
+    engine.dispose()
+    return members
+
+
+def make_token(username: str, secret: str) -> str:
+    expires = datetime.now(timezone.utc) + timedelta(days=1)
+    return jwt.encode({"sub": username, "exp": expires}, secret, algorithm=ALGORITHM)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(url: str, port: int, secret: str, admin: str, args, workdir: str):
+    """Run the API in a subprocess with the fake model provider"""
+    env = {
+        **os.environ,
+        "DATABASE_URL": url,
+        "SECRET_KEY": secret,
+        # /internal/stats is read as this user
+        "ADMIN_USERNAMES": admin,
+        "GEMINI_PROVIDER": "fake",
+        "FAKE_PROVIDER_FIRST_TOKEN_MS": str(args.bot_first_token_ms),
+        "FAKE_PROVIDER_TOKENS_PER_SECOND": str(args.bot_tokens_per_second),
+        "FAKE_PROVIDER_ERROR_RATE": str(args.bot_error_rate),
+        # Load, not quotas, is what is being measured
+        "BOT_USER_REQUESTS_PER_MINUTE": "0",
+        "BOT_CHAT_REQUESTS_PER_MINUTE": "0",
+        "BOT_USER_TOKENS_PER_DAY": "0",
+        "BOT_CHAT_TOKENS_PER_DAY": "0",
+        **dict(item.split("=", 1) for item in args.server_env),
+    }
+    log_path = os.path.join(workdir, "server.log")
+    log = open(log_path, "w")
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "server.main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ],
+        env=env,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    return process, log_path
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+async def wait_until_healthy(http, process, log_path: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            with open(log_path) as log:
+                raise RuntimeError(f"Server exited during startup:\n{log.read()}")
+        try:
+            if (await http.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not become healthy in time")
+
+
+async def read_stats(http, token: str) -> Dict:
+    """The server's /internal/stats, read with an admin's token"""
+    response = await http.get(
+        "/internal/stats", headers={"Authorization": f"Bearer {token}"}
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def sample_server(http, token: str, samples: List[Dict], interval: float):
+    """Poll /internal/stats for the server's CPU time and memory"""
+    while True:
+        try:
+            stats = await read_stats(http, token)
+            samples.append({"at": time.monotonic(), **stats["process"]})
+        except Exception:
+            pass
+        await asyncio.sleep(interval)
+
+
+def server_usage(samples: List[Dict]) -> Dict:
+    """CPU percent (average and peak between samples) and RSS in MB"""
+    cpu = [
+        100 * (b["cpu_seconds"] - a["cpu_seconds"]) / (b["at"] - a["at"])
+        for a, b in zip(samples, samples[1:])
+        if b["at"] > a["at"]
+    ]
+    rss = [s["rss_bytes"] / 2**20 for s in samples if s.get("rss_bytes")]
+    return {
+        "samples": len(samples),
+        "cpu_percent_avg": round(sum(cpu) / len(cpu), 1) if cpu else None,
+        "cpu_percent_max": round(max(cpu), 1) if cpu else None,
+        "rss_mb_start": round(rss[0], 1) if rss else None,
+        "rss_mb_peak": round(max(rss), 1) if rss else None,
+        "rss_mb_end": round(rss[-1], 1) if rss else None,
+    }
+
+
+def query_counts(stats: Dict) -> Dict[str, int]:
+    return dict(stats["db_pool"]["queries"])
+
+
+async def run_load(args) -> Dict:
+    """Seed, connect, drive the mix for --duration seconds; returns the results"""
+    mix = parse_mix(args.mix)
+    workdir = tempfile.mkdtemp(prefix="bench_load_")
+    url = args.url or f"sqlite:///{workdir}/bench_load.db"
+
+    if not args.skip_seed:
+        print("\nSeeding...")
+        build_fixture(
+            url,
+            users=args.users,
+            chats=args.chats,
+            members_per_chat=args.members,
+            messages=args.history,
+            seed=args.seed,
+        ).dispose()
+    members = load_members(url)
+    if not members:
+        raise RuntimeError("No chat members to connect as; seed the database first")
+    admin = args.admin_user or members[min(members)][0]
+
+    if args.target:
+        if not SECRET_KEY:
+            raise RuntimeError("--target needs the server's SECRET_KEY in the env")
+        secret, base_url, process, log_path = SECRET_KEY, args.target, None, None
+    else:
+        secret = SECRET_KEY or secrets.token_urlsafe(32)
+        port = args.port or free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        process, log_path = start_server(url, port, secret, admin, args, workdir)
+    ws_url = "ws" + base_url[len("http") :]
+
+    user_ids = sorted(members)
+    clients = []
+    for index in range(args.connections):
+        user_id = user_ids[index % len(user_ids)]
+        username, chats = members[user_id]
+        clients.append(LoadClient(index, user_id, make_token(username, secret), chats))
+    admin_token = make_token(admin, secret)
+
+    recorder = Recorder()
+    samples: List[Dict] = []
+    connected: List[LoadClient] = []
+    receivers: List[asyncio.Task] = []
+    limits = httpx.Limits(max_connections=args.http_connections)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as http:
+        try:
+            await wait_until_healthy(http, process, log_path)
+
+            print(f"Opening {len(clients):,} WebSockets...")
+            gate = asyncio.Semaphore(args.connect_concurrency)
+
+            async def connect(client):
+                async with gate:
+                    return await client.connect(ws_url, recorder)
+
+            connect_ms = await asyncio.gather(*(connect(c) for c in clients))
+            connected = [c for c, ms in zip(clients, connect_ms) if ms is not None]
+            receivers = [asyncio.create_task(c.receive(recorder)) for c in connected]
+            for client in connected:
+                for chat_id in client.chats:
+                    await client.send(recorder, {"type": "join", "chat_id": chat_id})
+            await asyncio.sleep(args.warmup)
+
+            before = await read_stats(http, admin_token)
+            recorder.actions.clear()
+            sampler = asyncio.create_task(
+                sample_server(http, admin_token, samples, args.sample_interval)
+            )
+            print(
+                f"Driving {args.rate} actions/s per connection for "
+                f"{args.duration}s..."
+            )
+            started = time.monotonic()
+            deadline = started + args.duration
+            await asyncio.gather(
+                *(
+                    c.run(recorder, http, mix, args.rate, deadline, args.seed)
+                    for c in connected
+                )
+            )
+            elapsed = time.monotonic() - started
+            # Let in-flight deliveries and bot replies land
+            await asyncio.sleep(args.drain)
+            sampler.cancel()
+            after = await read_stats(http, admin_token)
+            samples.append({"at": time.monotonic(), **after["process"]})
+        finally:
+            await asyncio.gather(
+                *(c.websocket.close() for c in clients if c.websocket is not None),
+                return_exceptions=True,
+            )
+            if process is not None:
+                stop_server(process)
+
+    for task in receivers:
+        task.cancel()
+    await asyncio.gather(*receivers, return_exceptions=True)
+
+    queries_before, queries_after = query_counts(before), query_counts(after)
+    queries = {
+        kind: count - queries_before.get(kind, 0)
+        for kind, count in queries_after.items()
+    }
+    total_actions = sum(recorder.actions.values())
+    messages_sent = recorder.actions["message"] + recorder.actions["bot"]
+    bot_replies = list(recorder.bot_replies.values())
+    return {
+        "benchmark": "load",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "settings": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "baseline")
+        },
+        "connections": {
+            "opened": len(connected),
+            "failed": len(clients) - len(connected),
+            "connect_ms": summarize([ms for ms in connect_ms if ms is not None]),
+        },
+        "actions": dict(recorder.actions),
+        "frames_received": dict(recorder.frames),
+        "latency_ms": {
+            "delivery": summarize(recorder.delivery_ms),
+            "bot_first_frame": summarize([(r[1] - r[0]) * 1000 for r in bot_replies]),
+            "bot_complete": summarize([(r[2] - r[0]) * 1000 for r in bot_replies]),
+            **{
+                action: summarize(recorder.rest_ms[action])
+                for action in ("mark_read", "history", "chat_list")
+            },
+        },
+        "throughput": {
+            "duration_seconds": round(elapsed, 2),
+            "actions_per_second": round(total_actions / elapsed, 1),
+            "messages_per_second": round(messages_sent / elapsed, 1),
+            "deliveries_per_second": round(recorder.deliveries / elapsed, 1),
+            "frames_per_second": round(sum(recorder.frames.values()) / elapsed, 1),
+        },
+        "server": server_usage(samples),
+        "database": {
+            "queries": queries,
+            "queries_per_action": (
+                round(queries.get("total", 0) / total_actions, 2)
+                if total_actions
+                else None
+            ),
+            "pool": {
+                key: after["db_pool"].get(key)
+                for key in ("timeouts", "checkout_wait_ms")
+            },
+        },
+        "bot": {
+            "sent": recorder.actions["bot"],
+            "answered": len(bot_replies),
+            "fake_provider": after["gemini"].get("fake_provider"),
+        },
+        "errors": dict(recorder.errors),
+    }
+
+
+def _lookup(results: Dict, path):
+    for key in path:
+        if not isinstance(results, dict):
+            return None
+        results = results.get(key)
+    return results
+
+
+def report(results: Dict, baseline: Optional[Dict] = None):
+    connections = results["connections"]
+    print(
+        f"\n   connections   {connections['opened']:,} open, "
+        f"{connections['failed']:,} failed"
+    )
+    for name, latency in results["latency_ms"].items():
+        if latency["count"]:
+            print(
+                f"   {name:<16} p50 {latency['p50']:9.2f} ms   p95 {latency['p95']:9.2f}"
+                f" ms   p99 {latency['p99']:9.2f} ms   (n={latency['count']:,})"
+            )
+    throughput = results["throughput"]
+    print(
+        f"   throughput    {throughput['messages_per_second']:,.1f} messages/s, "
+        f"{throughput['deliveries_per_second']:,.1f} deliveries/s, "
+        f"{throughput['frames_per_second']:,.1f} frames/s"
+    )
+    server = results["server"]
+    print(
+        f"   server        CPU avg {server['cpu_percent_avg']}% "
+        f"(max {server['cpu_percent_max']}%), RSS peak {server['rss_mb_peak']} MB"
+    )
+    database = results["database"]
+    print(
+        f"   database      {database['queries'].get('total', 0):,} queries "
+        f"({database['queries_per_action']} per action)"
+    )
+    if results["errors"]:
+        print(f"   errors        {results['errors']}")
+
+    if baseline is not None:
+        print(
+            f"\nCompared with {baseline.get('commit')} ({baseline.get('created_at')}):"
+        )
+        for label, path, higher_is_better in COMPARED:
+            now, then = _lookup(results, path), _lookup(baseline, path)
+            if now is None or then is None:
+                continue
+            change = (now - then) / then * 100 if then else 0.0
+            worse = change < 0 if higher_is_better else change > 0
+            flag = "  worse" if worse and abs(change) >= 10 else ""
+            print(f"   {label:<24} {then:>10} -> {now:>10} ({change:+.1f}%){flag}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--target", help="Running server (default: start one)")
+    parser.add_argument("--url", help="Database URL (default: temp SQLite file)")
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse --url data")
+    parser.add_argument(
+        "--admin-user",
+        help="User that reads /internal/stats (default: the first seeded user; "
+        "with --target it must be in the server's ADMIN_USERNAMES)",
+    )
+    parser.add_argument("--port", type=int, default=0, help="default: a free one")
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--chats", type=int, default=1_000)
+    parser.add_argument("--members", type=int, default=4, help="members per chat")
+    parser.add_argument("--history", type=int, default=20_000, help="seed messages")
+    parser.add_argument("--connections", type=int, default=2_000)
+    parser.add_argument(
+        "--rate", type=float, default=0.2, help="actions/s per connection"
+    )
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="action=weight,...")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds")
+    parser.add_argument("--drain", type=float, default=3, help="seconds")
+    parser.add_argument("--connect-concurrency", type=int, default=100)
+    parser.add_argument("--http-connections", type=int, default=100)
+    parser.add_argument("--sample-interval", type=float, default=1.0)
+    parser.add_argument("--bot-first-token-ms", type=int, default=400)
+    parser.add_argument("--bot-tokens-per-second", type=float, default=80)
+    parser.add_argument("--bot-error-rate", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--server-env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="Extra setting for the started server (e.g. DB_POOL_SIZE=20)",
+    )
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/)")
+    parser.add_argument("--baseline", help="Earlier results file to compare with")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+
+    raise_file_limit(2 * args.connections + 1024)
+    print("=" * 60)
+    print(
+        f"Load test: {args.connections:,} connections, {args.rate} actions/s each, "
+        f"{args.duration}s"
+    )
+    print("=" * 60)
+
+    results = asyncio.run(run_load(args))
+    baseline = None
+    if args.baseline:
+        baseline = read_results(args.baseline)
+    report(results, baseline)
+
+    output = write_results(results, "load", args.output)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Message search benchmark: ranked full-text search at scale
+
+Builds the synthetic fixture, adds the full-text index (FTS5 on SQLite, a
+tsvector column with a GIN index on Postgres) and times first pages and
+deep keyset pages for rare, common and multi-term queries, within one chat
+and across a user's chats.
+
+Usage (from packages/ingress):
+    python -m benchmarks.bench_message_search --messages 10000000
+    python -m benchmarks.bench_message_search --url postgresql://... --messages 10000000
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.fixtures import build_fixture
+from services.chat.message_search import ensure_message_search_index, search_messages
+from services.database.models import ChatParticipant, Message
+
+QUERIES = ["kubernetes", "deploy", "database timeout", "login error crash"]
+
+
+def time_pages(db, user_id, query, chat_id, pages, repeat):
+    """Timings (ms) for the first page and for page `pages`"""
+    first, deep = [], []
+    for _ in range(repeat):
+        cursor = None
+        for page in range(pages):
+            started = time.perf_counter()
+            results, cursor = search_messages(
+                db, user_id, query, chat_id=chat_id, cursor=cursor
+            )
+            elapsed = (time.perf_counter() - started) * 1000
+            if page == 0:
+                first.append(elapsed)
+            if not cursor:
+                break
+        else:
+            deep.append(elapsed)
+    return first, deep
+
+
+def fmt(timings):
+    if not timings:
+        return "      -    "
+    return f"{statistics.median(timings):8.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--url", help="database URL (default: temporary SQLite)")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--chats", type=int, default=100_000)
+    parser.add_argument("--messages", type=int, default=10_000_000)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite:///{tempfile.mkdtemp()}/bench_message_search.db"
+    print("=" * 60)
+    print(f"Message search benchmark: {args.messages:,} messages ({url.split(':')[0]})")
+    print("=" * 60)
+
+    print("\nBuilding fixture...")
+    engine = build_fixture(
+        url, users=args.users, chats=args.chats, messages=args.messages
+    )
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        ensure_message_search_index(conn)
+    print(f"   search index in {time.perf_counter() - started:.1f}s")
+
+    with sessionmaker(bind=engine)() as db:
+        # The busiest chat, and one of its members for cross-chat search
+        busiest_chat = db.execute(
+            select(Message.chat_id)
+            .group_by(Message.chat_id)
+            .order_by(func.count().desc())
+            .limit(1)
+        ).scalar_one()
+        user_id = db.execute(
+            select(ChatParticipant.user_id)
+            .where(ChatParticipant.chat_id == busiest_chat)
+            .limit(1)
+        ).scalar_one()
+
+        print(
+            f"\n   {'query':<20} {'scope':<12} {'page 1':>11}"
+            f" {f'page {args.pages}':>11}"
+        )
+        for query in QUERIES:
+            for scope, chat_id in (("busiest chat", busiest_chat), ("all chats", None)):
+                first, deep = time_pages(
+                    db, user_id, query, chat_id, args.pages, args.repeat
+                )
+                print(f"   {query:<20} {scope:<12} {fmt(first)} {fmt(deep)}")
+
+
+if __name__ == "__main__":
+    main()
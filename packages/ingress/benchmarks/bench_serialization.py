@@ -0,0 +1,233 @@
+"""
+Serialization benchmark: 500-message history response, before vs after
+
+Serves the same chat history through a copy of the previous handler (dicts
+validated again by response_model, rendered by the stdlib JSON encoder) and
+through the current endpoint (rows dumped by a TypeAdapter), in-process,
+then times the serialization step alone. Both must produce the same JSON.
+
+Usage (from packages/ingress):
+    python -m benchmarks.bench_serialization
+    python -m benchmarks.bench_serialization --messages 500 --requests 300
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+# Point the app at a throwaway SQLite file before anything imports the engine
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_serialization.db"
+)
+os.environ.setdefault("SECRET_KEY", "bench-secret-key")
+os.environ.setdefault("GEMINI_API_KEY", "bench-key")
+
+from fastapi import Depends, HTTPException
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+
+from shared.database import get_db, init_db, read_router, session_scope
+from services.auth.auth_service import create_access_token, create_user
+from services.chat.chat_service import (
+    backfill_last_messages,
+    create_chat,
+    get_chat_messages,
+    is_participant,
+)
+from services.database.models import Message, User
+from services.database.schemas import (
+    MessageResponse,
+    UserCreate,
+    message_list_adapter,
+)
+from shared.serialization import json_list_response
+from server.main import app, get_current_user
+
+
+@app.get(
+    "/bench/legacy/chats/{chat_id}/messages",
+    response_model=List[MessageResponse],
+    response_class=JSONResponse,
+)
+async def legacy_get_messages(
+    chat_id: int,
+    limit: int = 50,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """The previous implementation, kept here for comparison"""
+    if not is_participant(db, chat_id, current_user.id):
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    messages = read_router.run(
+        get_chat_messages, chat_id, limit, user_id=current_user.id
+    )
+
+    result = []
+    for msg in reversed(messages):
+        msg_dict = {
+            "id": msg.id,
+            "chat_id": msg.chat_id,
+            "user_id": msg.user_id,
+            "content": msg.content,
+            "is_bot": msg.is_bot,
+            "created_at": msg.created_at,
+            "username": msg.user.username if msg.user else "AI Assistant",
+        }
+        result.append(msg_dict)
+
+    return result
+
+
+def build_history(messages: int):
+    """Create a user and a chat with `messages` messages; return (token, chat_id)"""
+    init_db()
+    with session_scope() as db:
+        user = create_user(
+            db,
+            UserCreate(
+                username="bench_user",
+                email="bench_user@example.com",
+                password="benchpassword123",
+            ),
+        )
+        chat = create_chat(db, user.id, "Serialization bench", is_group=True)
+        started = datetime.now(timezone.utc) - timedelta(days=1)
+        db.add_all(
+            Message(
+                chat_id=chat.id,
+                user_id=None if i % 3 == 0 else user.id,
+                content=f"Message {i}: " + "lorem ipsum dolor sit amet " * (i % 8 + 1),
+                is_bot=i % 3 == 0,
+                created_at=started + timedelta(seconds=i),
+            )
+            for i in range(messages)
+        )
+        db.commit()
+        backfill_last_messages(db)
+        token = create_access_token(data={"sub": user.username})
+        return token, chat.id
+
+
+def build_rows(chat_id: int, limit: int):
+    """The dicts get_messages builds, straight from the database"""
+    with session_scope() as db:
+        return [
+            {
+                "id": msg.id,
+                "chat_id": msg.chat_id,
+                "user_id": msg.user_id,
+                "content": msg.content,
+                "is_bot": msg.is_bot,
+                "created_at": msg.created_at,
+                "username": msg.user.username if msg.user else "AI Assistant",
+            }
+            for msg in reversed(get_chat_messages(db, chat_id, limit))
+        ]
+
+
+def legacy_serialize(adapter: TypeAdapter, rows):
+    """What FastAPI does with a response_model: validate, to primitives, encode"""
+    models = adapter.validate_python(rows)
+    content = adapter.dump_python(models, mode="json")
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode()
+
+
+def time_serialization(fn, repeat):
+    fn()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def time_requests(client, url, headers, requests):
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.get(url, headers=headers)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.text
+    return timings
+
+
+def report(name, timings, size=None):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(
+        f"   {name:<30} p50 {statistics.median(timings):7.2f} ms"
+        f"   p95 {p95:7.2f} ms" + (f"   {size:,} bytes" if size else "")
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"Serialization benchmark: {args.messages}-message history")
+    print("=" * 60)
+
+    token, chat_id = build_history(args.messages)
+    headers = {"Authorization": f"Bearer {token}"}
+    query = f"messages?limit={args.messages}"
+    legacy_url = f"/bench/legacy/chats/{chat_id}/{query}"
+    current_url = f"/api/chats/{chat_id}/{query}"
+
+    with TestClient(app) as client:
+        legacy = client.get(legacy_url, headers=headers)
+        current = client.get(current_url, headers=headers)
+        assert legacy.json() == current.json()
+        assert len(current.json()) == args.messages
+
+        # Warm up both paths, then time them
+        time_requests(client, legacy_url, headers, 10)
+        time_requests(client, current_url, headers, 10)
+        print(f"\nTiming {args.requests} requests per endpoint...")
+        report(
+            "response_model + json",
+            time_requests(client, legacy_url, headers, args.requests),
+            len(legacy.content),
+        )
+        report(
+            "TypeAdapter + orjson",
+            time_requests(client, current_url, headers, args.requests),
+            len(current.content),
+        )
+
+    # The serialization step alone, on the rows the handler builds
+    rows = build_rows(chat_id, args.messages)
+    models_adapter = TypeAdapter(List[MessageResponse])
+    assert json.loads(legacy_serialize(models_adapter, rows)) == json.loads(
+        json_list_response(message_list_adapter, rows).body
+    )
+    print(f"\nSerializing {len(rows)} rows, {args.requests} times...")
+    report(
+        "response_model + json",
+        time_serialization(
+            lambda: legacy_serialize(models_adapter, rows), args.requests
+        ),
+    )
+    report(
+        "TypeAdapter rows",
+        time_serialization(
+            lambda: json_list_response(message_list_adapter, rows), args.requests
+        ),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+User search benchmark: leading-wildcard ILIKE vs indexed search
+
+Builds a user table with realistic name-based usernames and emails, then
+replays invite-dialog keystrokes (each prefix of a few typed names) through
+the previous ILIKE '%q%' query and through search_users with the search
+indexes in place (pg_trgm on Postgres; lower() indexes and an FTS5 trigram
+table on SQLite).
+
+Usage (from packages/ingress):
+    python -m benchmarks.bench_user_search --users 1000000
+    python -m benchmarks.bench_user_search --url postgresql://... --users 1000000
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.fixtures import build_fixture
+from services.auth.user_search import ensure_user_search_index, search_users
+from services.database.models import User
+
+# What a user types into the dialog; every prefix from 2 characters is a
+# request once the debounce fires
+TYPED = [
+    "maria_garcia",  # prefix of many usernames
+    "olga.novak",  # prefix of emails
+    "smith12",  # substring only
+    "corp.example",  # substring of emails
+    "zzqx",  # no match
+]
+
+
+def legacy_search(db, query, exclude_user_id, limit=10):
+    """The previous query, kept here for comparison"""
+    stmt = (
+        select(User)
+        .where((User.username.ilike(f"%{query}%")) | (User.email.ilike(f"%{query}%")))
+        .where(User.id != exclude_user_id)
+        .limit(limit)
+    )
+    return db.execute(stmt).scalars().all()
+
+
+def time_keystrokes(db, search, typed, repeat):
+    """Median latency (ms) and result count for each prefix of `typed`"""
+    rows = []
+    for length in range(2, len(typed) + 1):
+        query = typed[:length]
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            found = search(db, query, 0)
+            timings.append((time.perf_counter() - started) * 1000)
+        rows.append((query, statistics.median(timings), len(found)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--url", help="database URL (default: temporary SQLite)")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite:///{tempfile.mkdtemp()}/bench_user_search.db"
+    print("=" * 60)
+    print(f"User search benchmark: {args.users:,} users ({url.split(':')[0]})")
+    print("=" * 60)
+
+    print("\nBuilding fixture...")
+    engine = build_fixture(url, users=args.users, chats=0, messages=0)
+    Session = sessionmaker(bind=engine)
+
+    with Session() as db:
+        legacy = {
+            typed: time_keystrokes(db, legacy_search, typed, args.repeat)
+            for typed in TYPED
+        }
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        ensure_user_search_index(conn)
+    print(f"   search indexes in {time.perf_counter() - started:.1f}s")
+
+    with Session() as db:
+        indexed = {
+            typed: time_keystrokes(db, search_users, typed, args.repeat)
+            for typed in TYPED
+        }
+
+    print(f"\n   {'query':<14} {'ILIKE scan':>16} {'indexed':>16}")
+    totals = [0.0, 0.0]
+    for typed in TYPED:
+        for (query, before, _), (_, after, found) in zip(legacy[typed], indexed[typed]):
+            totals[0] += before
+            totals[1] += after
+            print(f"   {query:<14} {before:13.2f} ms {after:13.2f} ms   {found} hits")
+    keystrokes = sum(len(rows) for rows in indexed.values())
+    print(
+        f"\n   mean per keystroke: {totals[0] / keystrokes:.2f} ms -> "
+        f"{totals[1] / keystrokes:.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Retrieval benchmark: top-k search over a memory-mapped chat vector index
+
+Embeds synthetic chat messages with the local hashing embedder into one
+VectorIndex (a single very long chat, the worst case for a per-chat index),
+then times /bot-style queries end to end: embedding the question plus an
+exact top-k scan, with and without the recent-window cut-off.
+
+Usage (from packages/ingress):
+    python -m benchmarks.bench_vector_search --vectors 1000000
+    python -m benchmarks.bench_vector_search --vectors 1000000 --dimensions 128
+"""
+
+import argparse
+import itertools
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.fixtures import VOCABULARY
+from services.retrieval.embedders import HashingEmbedder
+from services.retrieval.vector_index import VectorIndex
+
+QUERIES = [
+    "what was the deploy timeout error",
+    "who is handling the customer refund",
+    "when is the release deadline",
+    "postgres index latency",
+    "birthday party this weekend?",
+]
+
+# Messages embedded and appended per batch
+BATCH = 10_000
+
+
+def synthetic_messages(count, seed=0):
+    """Chat-like texts drawn from the fixture vocabulary with a Zipf-like skew"""
+    rng = random.Random(seed)
+    cum_weights = list(
+        itertools.accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY)))
+    )
+    for _ in range(count):
+        words = rng.choices(VOCABULARY, cum_weights=cum_weights, k=rng.randint(3, 15))
+        yield " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--vectors", type=int, default=1_000_000)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(
+        f"Vector search benchmark: {args.vectors:,} vectors x "
+        f"{args.dimensions} dimensions"
+    )
+    print("=" * 60)
+
+    embedder = HashingEmbedder(args.dimensions)
+    index = VectorIndex(f"{tempfile.mkdtemp()}/chat_1", args.dimensions)
+
+    print("\nIndexing...")
+    started = time.perf_counter()
+    texts = synthetic_messages(args.vectors)
+    next_id = 1
+    while next_id <= args.vectors:
+        batch = list(itertools.islice(texts, BATCH))
+        index.add(list(range(next_id, next_id + len(batch))), embedder.embed(batch))
+        next_id += len(batch)
+    index.flush()
+    elapsed = time.perf_counter() - started
+    size_mb = args.vectors * (args.dimensions * 4 + 8) / 1e6
+    print(
+        f"   {args.vectors:,} messages in {elapsed:.1f}s "
+        f"({args.vectors / elapsed:,.0f}/s), {size_mb:,.0f} MB on disk"
+    )
+
+    # Excluding the newest 200 messages, as a /bot call excludes its window
+    cutoff = args.vectors - 200
+    print(f"\n   {'query':<38} {'top-k':>10} {'windowed':>10}")
+    medians = {"all": [], "windowed": []}
+    for query in QUERIES:
+        row = []
+        for label, before_id in (("all", None), ("windowed", cutoff)):
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                vector = embedder.embed([query])[0]
+                index.search(vector, args.k, before_id)
+                timings.append((time.perf_counter() - started) * 1000)
+            medians[label].append(statistics.median(timings))
+            row.append(statistics.median(timings))
+        print(f"   {query:<38} {row[0]:7.2f} ms {row[1]:7.2f} ms")
+
+    all_timings = medians["all"] + medians["windowed"]
+    print(
+        f"\n   median {statistics.median(all_timings):.2f} ms, "
+        f"max {max(all_timings):.2f} ms per query (k={args.k})"
+    )
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
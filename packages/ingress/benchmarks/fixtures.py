@@ -0,0 +1,225 @@
+"""
+Synthetic data generator for database benchmarks
+"""
+
+import itertools
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from alembic import command
+from sqlalchemy import and_, create_engine, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+from shared.database import Base, alembic_config
+from services.database.models import (
+    User,
+    Chat,
+    ChatParticipant,
+    Message,
+    MessageReadReceipt,
+)
+from services.chat.chat_service import (
+    backfill_last_messages,
+    reconcile_unread_counts,
+)
+
+
+# Chat-flavoured vocabulary; message text draws from it with a Zipf-like skew
+# so full-text queries see realistic mixes of common and rare terms
+VOCABULARY = (
+    "the a to is it and you i that of in for on this we be have can with what "
+    "just do not so but are was like will if get about know think time good "
+    "meeting deploy build release bug fix test review merge branch server "
+    "database query index cache latency timeout error crash log metric alert "
+    "customer invoice payment refund account password login session token "
+    "design mockup feedback sprint ticket deadline launch roadmap budget "
+    "lunch coffee weekend holiday birthday party movie music game football "
+    "gemini assistant summary translate explain python javascript docker "
+    "kubernetes postgres sqlite websocket frontend backend mobile android ios"
+).split()
+
+# Name parts for usernames and emails, so user search sees realistic shared
+# prefixes and substrings
+FIRST_NAMES = (
+    "alex sam jordan taylor morgan casey jamie riley chris pat robin drew "
+    "maria anna sofia lucas noah emma olivia liam mia ethan ava mason "
+    "li wei chen yuki hiro aisha omar fatima ivan olga lars ingrid"
+).split()
+LAST_NAMES = (
+    "smith johnson brown garcia miller davis wilson anderson thomas moore "
+    "martin lee clark lewis walker young king wright lopez hill scott green "
+    "nguyen kim patel singh cohen muller rossi silva tanaka novak"
+).split()
+EMAIL_DOMAINS = ("example.com", "mail.test", "corp.example.org")
+
+
+def _batched(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build_fixture(
+    url: str,
+    users: int = 10_000,
+    chats: int = 100_000,
+    members_per_chat: int = 4,
+    messages: int = 10_000_000,
+    seed: int = 0,
+    batch_size: int = 50_000,
+    receipts: bool = False,
+) -> Engine:
+    """
+    Create the schema at `url` and fill it with synthetic chat data
+
+    Messages are spread over chats with a skewed distribution (a few busy
+    chats, a long tail of quiet ones) and timestamps increase monotonically.
+
+    With `receipts`, each member has read their chats up to a point (most
+    of them recently, some long ago): there is a read receipt for every
+    message from someone else up to their last_read_at, and their unread
+    counter covers the rest.
+
+    Returns:
+        Engine bound to the populated database
+    """
+    rng = random.Random(seed)
+    engine = create_engine(url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    # At the latest revision, so the app starts on it (bench_load). Search
+    # indexes are left to the benchmarks that time building them.
+    with engine.begin() as conn:
+        command.stamp(alembic_config(conn), "head")
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def log(step, started):
+        print(f"   {step} in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        # Own generator, so the chat and message draws do not depend on it
+        names = random.Random(f"{seed}-users")
+
+        def user_rows():
+            for i in range(1, users + 1):
+                first, last = names.choice(FIRST_NAMES), names.choice(LAST_NAMES)
+                yield {
+                    "id": i,
+                    "username": f"{first}_{last}{i}",
+                    "email": f"{first}.{last}{i}@{names.choice(EMAIL_DOMAINS)}",
+                    "hashed_password": "x",
+                    "created_at": start,
+                }
+
+        for batch in _batched(user_rows(), batch_size):
+            conn.execute(insert(User.__table__), batch)
+    log(f"{users:,} users", started)
+
+    started = time.perf_counter()
+    members = {}
+    # Own generator, so the message draws do not depend on it
+    reads = random.Random(f"{seed}-reads")
+
+    def last_read_at():
+        if not receipts:
+            return start
+        # Skewed towards the end of the history: most members keep up
+        return start + timedelta(seconds=int(messages * reads.random() ** 0.3))
+
+    with engine.begin() as conn:
+        chat_rows = []
+        participant_rows = []
+        for chat_id in range(1, chats + 1):
+            chat_members = rng.sample(range(1, users + 1), min(members_per_chat, users))
+            members[chat_id] = chat_members
+            chat_rows.append(
+                {
+                    "id": chat_id,
+                    "name": f"chat{chat_id}",
+                    "owner_id": chat_members[0],
+                    "created_at": start,
+                    "is_group": len(chat_members) > 2,
+                    "last_message_at": start,
+                }
+            )
+            participant_rows.extend(
+                {
+                    "chat_id": chat_id,
+                    "user_id": user_id,
+                    "joined_at": start,
+                    "last_read_at": last_read_at(),
+                }
+                for user_id in chat_members
+            )
+        for batch in _batched(chat_rows, batch_size):
+            conn.execute(insert(Chat.__table__), batch)
+        for batch in _batched(participant_rows, batch_size):
+            conn.execute(insert(ChatParticipant.__table__), batch)
+    log(f"{chats:,} chats", started)
+
+    started = time.perf_counter()
+
+    # Zipf weights over the vocabulary
+    cum_weights = list(
+        itertools.accumulate(1 / rank for rank in range(1, len(VOCABULARY) + 1))
+    )
+
+    def message_rows():
+        for i in range(messages):
+            # Pareto-ish skew: low chat ids receive most of the traffic
+            chat_id = min(chats, int(rng.paretovariate(1.2)) * rng.randint(1, 50))
+            yield {
+                "chat_id": chat_id,
+                "user_id": rng.choice(members[chat_id]),
+                "content": f"message {i} "
+                + " ".join(
+                    rng.choices(
+                        VOCABULARY, cum_weights=cum_weights, k=rng.randint(3, 15)
+                    )
+                ),
+                "is_bot": False,
+                "created_at": start + timedelta(seconds=i),
+            }
+
+    for batch in _batched(message_rows(), batch_size):
+        with engine.begin() as conn:
+            conn.execute(insert(Message.__table__), batch)
+    log(f"{messages:,} messages", started)
+
+    started = time.perf_counter()
+    with sessionmaker(bind=engine)() as db:
+        backfill_last_messages(db)
+    log("last-message backfill", started)
+
+    if receipts:
+        started = time.perf_counter()
+        read = (
+            select(Message.id, ChatParticipant.user_id, ChatParticipant.last_read_at)
+            .join(
+                ChatParticipant,
+                and_(
+                    ChatParticipant.chat_id == Message.chat_id,
+                    ChatParticipant.user_id != Message.user_id,
+                ),
+            )
+            .where(Message.created_at <= ChatParticipant.last_read_at)
+        )
+        with engine.begin() as conn:
+            count = conn.execute(
+                insert(MessageReadReceipt.__table__).from_select(
+                    ["message_id", "user_id", "read_at"], read
+                )
+            ).rowcount
+        with sessionmaker(bind=engine)() as db:
+            reconcile_unread_counts(db)
+        log(f"{count:,} read receipts and unread counters", started)
+
+    return engine
@@ -0,0 +1,47 @@
+"""
+Machine-readable benchmark results, kept comparable across commits
+"""
+
+import os
+import subprocess
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import orjson
+
+RESULTS_DIR = os.path.join("benchmarks", "results")
+
+
+def git_commit() -> Optional[str]:
+    """Short hash of the checked-out commit, or None outside a git checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(results: Dict, name: str, path: Optional[str] = None) -> str:
+    """
+    Write results as indented JSON; returns the path
+
+    Defaults to benchmarks/results/<name>-<commit>-<UTC time>.json.
+    """
+    path = path or os.path.join(
+        RESULTS_DIR,
+        f"{name}-{results.get('commit') or 'unknown'}-"
+        f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.json",
+    )
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+    return path
+
+
+def read_results(path: str) -> Dict:
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
@@ -0,0 +1,59 @@
+"""
+Pytest configuration for the in-process test scripts
+
+Settings are read at import time, so the test environment is set here before
+any test module imports the app. The live-server scripts (test_api.py,
+test_websocket.py) are meant to be run directly and are not collected.
+
+Tests that need a database of their own take the `session_factory` fixture
+(and `tmp_path` for other files); the scripts' main() runners call them
+through run_test, which provides the same in a directory removed afterwards.
+"""
+
+import inspect
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+_db_dir = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_db_dir}/test.db")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from shared.database import Base  # noqa: E402
+
+collect_ignore = ["test_api.py", "test_websocket.py"]
+
+
+def make_session_factory(directory):
+    """A session factory for a fresh SQLite database in `directory`"""
+    engine = create_engine(f"sqlite:///{directory}/test.db")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """A session factory for a fresh SQLite database under tmp_path"""
+    factory = make_session_factory(tmp_path)
+    yield factory
+    factory.kw["bind"].dispose()
+
+
+def run_test(test):
+    """Call a test outside pytest, supplying tmp_path and session_factory"""
+    wanted = inspect.signature(test).parameters
+    with tempfile.TemporaryDirectory() as directory:
+        fixtures = {"tmp_path": Path(directory)}
+        if "session_factory" in wanted:
+            fixtures["session_factory"] = make_session_factory(directory)
+        try:
+            test(**{name: fixtures[name] for name in wanted})
+        finally:
+            if "session_factory" in fixtures:
+                fixtures["session_factory"].kw["bind"].dispose()
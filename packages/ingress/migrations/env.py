@@ -0,0 +1,47 @@
+"""
+Alembic environment for the Gemini Coop schema
+
+Uses the app's engine (DATABASE_URL) from the command line, or the
+connection passed in config.attributes["connection"] when run from code
+(see shared.database.create_schema).
+"""
+
+from logging.config import fileConfig
+
+from alembic import context
+
+from shared.database import Base, engine
+import services.database.models  # noqa: F401  (registers the tables)
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations(connection):
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # SQLite cannot alter or drop columns in place; batch operations
+        # copy the table instead
+        render_as_batch=connection.dialect.name == "sqlite",
+        # One transaction per revision, so a long backfill does not hold
+        # locks taken by the revisions before it
+        transaction_per_migration=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    # Backfills read the data they migrate, so there is no SQL script to emit
+    raise SystemExit("Offline (--sql) migrations are not supported")
+
+connection = config.attributes.get("connection")
+if connection is not None:
+    run_migrations(connection)
+else:
+    with engine.connect() as connection:
+        run_migrations(connection)
@@ -0,0 +1,84 @@
+"""Baseline schema: users, chats, participants, messages, read receipts
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+Databases created before migrations existed already have these tables;
+mark them with `alembic stamp 0001` and upgrade from there.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "chats",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+        sa.Column("is_group", sa.Boolean()),
+    )
+    op.create_index("ix_chats_id", "chats", ["id"])
+
+    op.create_table(
+        "chat_participants",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("chat_id", sa.Integer(), sa.ForeignKey("chats.id"), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("joined_at", sa.DateTime(timezone=True)),
+        sa.Column("last_read_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_chat_participants_id", "chat_participants", ["id"])
+
+    op.create_table(
+        "messages",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("chat_id", sa.Integer(), sa.ForeignKey("chats.id"), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("is_bot", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_messages_id", "messages", ["id"])
+
+    op.create_table(
+        "message_read_receipts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "message_id", sa.Integer(), sa.ForeignKey("messages.id"), nullable=False
+        ),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("read_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_message_read_receipts_id", "message_read_receipts", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("message_read_receipts")
+    op.drop_table("messages")
+    op.drop_table("chat_participants")
+    op.drop_table("chats")
+    op.drop_table("users")
@@ -0,0 +1,85 @@
+"""Denormalize each chat's last message onto chats
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+
+Adds chats.last_message_id/_at/_preview with the indexes the chat list and
+chat history read through, and fills them from messages in batches of
+chats.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Chats backfilled per statement
+BATCH_SIZE = 1000
+# Characters of content kept in last_message_preview
+PREVIEW_LENGTH = 200
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("chats") as batch:
+        batch.add_column(sa.Column("last_message_id", sa.Integer()))
+        batch.add_column(sa.Column("last_message_at", sa.DateTime(timezone=True)))
+        batch.add_column(sa.Column("last_message_preview", sa.String()))
+    op.create_index("ix_chats_last_message_at", "chats", ["last_message_at"])
+    op.create_index(
+        "ix_messages_chat_id_created_at", "messages", ["chat_id", "created_at"]
+    )
+    op.create_index("ix_chat_participants_user_id", "chat_participants", ["user_id"])
+
+    conn = op.get_bind()
+    max_id = conn.execute(sa.text("SELECT max(id) FROM chats")).scalar() or 0
+    for low in range(1, max_id + 1, BATCH_SIZE):
+        bounds = {"low": low, "high": low + BATCH_SIZE - 1}
+        conn.execute(
+            sa.text(
+                """
+                UPDATE chats SET last_message_id = (
+                    SELECT m.id FROM messages m
+                    WHERE m.chat_id = chats.id
+                    ORDER BY m.created_at DESC, m.id DESC
+                    LIMIT 1
+                )
+                WHERE id BETWEEN :low AND :high
+                """
+            ),
+            bounds,
+        )
+        conn.execute(
+            sa.text(
+                f"""
+                UPDATE chats SET
+                    last_message_at = coalesce(
+                        (SELECT m.created_at FROM messages m
+                         WHERE m.id = chats.last_message_id),
+                        chats.created_at
+                    ),
+                    last_message_preview = (
+                        SELECT substr(m.content, 1, {PREVIEW_LENGTH})
+                        FROM messages m WHERE m.id = chats.last_message_id
+                    )
+                WHERE id BETWEEN :low AND :high
+                """
+            ),
+            bounds,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_chat_participants_user_id", "chat_participants")
+    op.drop_index("ix_messages_chat_id_created_at", "messages")
+    op.drop_index("ix_chats_last_message_at", "chats")
+    with op.batch_alter_table("chats") as batch:
+        batch.drop_column("last_message_preview")
+        batch.drop_column("last_message_at")
+        batch.drop_column("last_message_id")
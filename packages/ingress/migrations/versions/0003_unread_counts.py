@@ -0,0 +1,55 @@
+"""Per-participant unread counters
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+Adds chat_participants.unread_count and fills it, in batches of
+participant rows, with the messages from others since last_read_at.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Participant rows backfilled per statement
+BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("chat_participants") as batch:
+        batch.add_column(
+            sa.Column("unread_count", sa.Integer(), nullable=False, server_default="0")
+        )
+
+    conn = op.get_bind()
+    max_id = (
+        conn.execute(sa.text("SELECT max(id) FROM chat_participants")).scalar() or 0
+    )
+    for low in range(1, max_id + 1, BATCH_SIZE):
+        conn.execute(
+            sa.text(
+                """
+                UPDATE chat_participants SET unread_count = (
+                    SELECT count(m.id) FROM messages m
+                    WHERE m.chat_id = chat_participants.chat_id
+                    AND m.created_at > chat_participants.last_read_at
+                    AND m.user_id != chat_participants.user_id
+                )
+                WHERE id BETWEEN :low AND :high
+                """
+            ),
+            {"low": low, "high": low + BATCH_SIZE - 1},
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("chat_participants") as batch:
+        batch.drop_column("unread_count")
@@ -0,0 +1,37 @@
+"""Full-text index over message content
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+
+Postgres gets a generated tsvector column with a GIN index, SQLite an FTS5
+table kept in sync by triggers (see services.chat.message_search). Existing
+messages are indexed as part of the upgrade.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+from services.chat.message_search import ensure_message_search_index
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    ensure_message_search_index(op.get_bind())
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if conn.dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_messages_search_vector")
+        op.execute("ALTER TABLE messages DROP COLUMN IF EXISTS search_vector")
+    elif conn.dialect.name == "sqlite":
+        for trigger in ("messages_fts_ai", "messages_fts_ad", "messages_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS messages_fts")
@@ -0,0 +1,39 @@
+"""Indexes for username and email search
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+
+Postgres gets pg_trgm GIN indexes plus prefix B-trees, SQLite lower()
+expression indexes plus an FTS5 trigram table where the tokenizer exists
+(see services.auth.user_search).
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+from services.auth.user_search import ensure_user_search_index
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    ensure_user_search_index(op.get_bind())
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    for index in ("ix_users_username_prefix", "ix_users_email_prefix"):
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+    if conn.dialect.name == "postgresql":
+        for index in ("ix_users_username_trgm", "ix_users_email_trgm"):
+            op.execute(f"DROP INDEX IF EXISTS {index}")
+    elif conn.dialect.name == "sqlite":
+        for trigger in ("users_trgm_ai", "users_trgm_ad", "users_trgm_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS users_trgm")
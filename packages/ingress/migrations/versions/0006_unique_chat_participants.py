@@ -0,0 +1,39 @@
+"""One chat_participants row per chat and user
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+
+Removes duplicate memberships (keeping the oldest row of each pair), then
+adds the unique (chat_id, user_id) index that bulk adds conflict on.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        DELETE FROM chat_participants WHERE id NOT IN (
+            SELECT min(id) FROM chat_participants GROUP BY chat_id, user_id
+        )
+        """
+    )
+    op.create_index(
+        "ux_chat_participants_chat_id_user_id",
+        "chat_participants",
+        ["chat_id", "user_id"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ux_chat_participants_chat_id_user_id", "chat_participants")
@@ -0,0 +1,29 @@
+"""Rolling per-chat conversation summary
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("chats") as batch:
+        batch.add_column(sa.Column("summary", sa.Text()))
+        batch.add_column(sa.Column("summary_message_id", sa.Integer()))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("chats") as batch:
+        batch.drop_column("summary_message_id")
+        batch.drop_column("summary")
@@ -0,0 +1,51 @@
+"""/bot usage: per-reply usage and the hourly rollup
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("messages") as batch:
+        batch.add_column(sa.Column("bot_usage", sa.JSON()))
+
+    op.create_table(
+        "bot_usage",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("bucket", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("chat_id", sa.Integer(), nullable=False),
+        sa.Column("model", sa.String(), nullable=False),
+        sa.Column("requests", sa.Integer(), nullable=False),
+        sa.Column("errors", sa.Integer(), nullable=False),
+        sa.Column("prompt_tokens", sa.Integer(), nullable=False),
+        sa.Column("cached_tokens", sa.Integer(), nullable=False),
+        sa.Column("output_tokens", sa.Integer(), nullable=False),
+        sa.Column("latency_ms", sa.Integer(), nullable=False),
+    )
+    op.create_index(
+        "ux_bot_usage_bucket_user_chat_model",
+        "bot_usage",
+        ["bucket", "user_id", "chat_id", "model"],
+        unique=True,
+    )
+    op.create_index("ix_bot_usage_user_id_bucket", "bot_usage", ["user_id", "bucket"])
+    op.create_index("ix_bot_usage_chat_id_bucket", "bot_usage", ["chat_id", "bucket"])
+
+
+def downgrade() -> None:
+    op.drop_table("bot_usage")
+    with op.batch_alter_table("messages") as batch:
+        batch.drop_column("bot_usage")
@@ -1,6 +1,6 @@
 import asyncio
-import json
 import os
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 from fastapi import (
     FastAPI,
@@ -11,16 +11,31 @@ from fastapi import (
     status,
 )
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from typing import List
+from typing import List, Literal, Optional
 import uvicorn
 from contextlib import asynccontextmanager
 
 # Import from new modular structure
-from shared.database import get_db, init_db
-from shared.config import CORS_ORIGINS, HOST, PORT
+from shared.database import (
+    get_db,
+    init_db,
+    session_scope,
+    get_pool_stats,
+    read_router,
+)
+from shared.config import (
+    ADMIN_USERNAMES,
+    CORS_ORIGINS,
+    GEMINI_HISTORY_MESSAGES,
+    HOST,
+    PORT,
+    UNREAD_RECONCILE_INTERVAL_SECONDS,
+)
+from shared.serialization import json_list_response
+from shared.metrics import process_stats
 from services.database.models import User
 from services.database.schemas import (
     UserCreate,
@@ -31,7 +46,14 @@ from services.database.schemas import (
     ChatResponse,
     ChatWithUnreadCount,
     ChatInvite,
+    ChatBulkInvite,
+    ChatBulkInviteResult,
+    ChatBotSettings,
     MessageResponse,
+    MessageSearchResults,
+    chat_list_adapter,
+    message_list_adapter,
+    user_list_adapter,
 )
 from services.auth.auth_service import (
     decode_token,
@@ -41,28 +63,53 @@ from services.auth.auth_service import (
     create_user,
     create_access_token,
 )
+from services.auth.user_search import (
+    MIN_QUERY_LENGTH,
+    search_users as search_users_by_name,
+)
 from services.chat.chat_service import (
     create_chat,
-    get_user_chats,
+    get_user_chats_with_unread,
     get_chat,
     is_participant,
     add_participant,
+    add_participants,
+    get_users_by_usernames,
     get_chat_messages,
     get_chat_participants,
     create_message,
+    update_message_content,
     get_chat_history_for_gemini,
-    get_unread_count,
     mark_chat_as_read,
+    reconcile_unread_counts,
+    get_chat_unread_counts,
+    get_chat_member_ids,
+    invalidate_chat_members,
+    message_preview,
     get_chat_read_receipts,
+    get_chat_bot_tier,
+    set_chat_bot_tier,
 )
+from services.chat.message_search import search_messages
 from services.chat.bot_service import get_or_create_bot_user, add_bot_to_chat
 from services.gemini.gemini_service import gemini_service
+from services.gemini.providers import FakeProvider
+from services.gemini.router import parse_bot_command
+from services.gemini.summarizer import ConversationSummarizer
+from services.retrieval.retriever import get_retriever, wait_for_indexing
+from services.usage.usage_service import get_usage_totals
+from services.usage.usage_tracker import UsageTracker
+from services.websocket.encoding import negotiate as negotiate_encoding
 from services.websocket.websocket_manager import websocket_manager
 
 load_dotenv()
 
 # Initialize FastAPI app
-app = FastAPI(title="Gemini Coop API", version="1.0.0")
+app = FastAPI(
+    title="Gemini Coop API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+)
 
 # CORS middleware
 app.add_middleware(
@@ -76,17 +123,83 @@ app.add_middleware(
 # Security
 security = HTTPBearer()
 
+# Rolling per-chat summaries for /bot context, refreshed after bot replies
+conversation_summarizer = ConversationSummarizer(gemini_service)
+
+# Per-user and per-chat /bot usage and quotas, flushed to the rollup table
+usage_tracker = UsageTracker()
+
+
+def run_unread_reconciliation() -> int:
+    """Recompute all unread counters in a dedicated session"""
+    with session_scope() as db:
+        return reconcile_unread_counts(db)
+
+
+async def push_unread_updates(chat_id: int, preview: str, created_at: str):
+    """Send a chat's current unread counters to its online members"""
+    with session_scope() as db:
+        unread_counts = get_chat_unread_counts(
+            db,
+            chat_id,
+            websocket_manager.online_members(get_chat_member_ids(db, chat_id)),
+        )
+    await websocket_manager.send_unread_updates(
+        chat_id, unread_counts, preview, created_at
+    )
+
+
+def load_bot_history(chat_id: int, before_id: int, query: str) -> list:
+    """
+    Chat history for a /bot prompt, in a dedicated session
+
+    Run off the event loop: with retrieval enabled it embeds the question
+    and scans the chat's vector index.
+    """
+    with session_scope() as db:
+        return get_chat_history_for_gemini(
+            db,
+            chat_id,
+            limit=GEMINI_HISTORY_MESSAGES,
+            before_id=before_id,
+            query=query,
+        )
+
+
+async def reconcile_unread_counts_periodically():
+    """Background job that repairs drift in the unread counters"""
+    while True:
+        await asyncio.sleep(UNREAD_RECONCILE_INTERVAL_SECONDS)
+        try:
+            # Off the event loop: this scans messages for every membership
+            fixed = await asyncio.to_thread(run_unread_reconciliation)
+            if fixed:
+                print(f"Reconciled {fixed} unread counters")
+        except Exception as e:
+            print(f"Error reconciling unread counters: {e}")
+
 
 # Initialize database on startup
 @asynccontextmanager
 async def lifespan(app):
     init_db()
     print("Database initialized")
+
+    reconcile_task = None
+    if UNREAD_RECONCILE_INTERVAL_SECONDS > 0:
+        reconcile_task = asyncio.create_task(reconcile_unread_counts_periodically())
+    usage_tracker.start()
     try:
         yield
     finally:
-        # cleanup on shutdown if needed
-        pass
+        if reconcile_task:
+            reconcile_task.cancel()
+        await usage_tracker.close()
+        await conversation_summarizer.close()
+        retriever = get_retriever()
+        if retriever is not None:
+            await asyncio.to_thread(wait_for_indexing)
+            retriever.close()
 
 
 # Attach lifespan to the existing FastAPI app
@@ -115,9 +228,19 @@ async def get_current_user(
     user = get_user_by_username(db, username)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
+
+    # Tag the request session so this user's writes are read back from the primary
+    db.info["user_id"] = user.id
     return user
 
 
+async def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
+    """Current user, if they may read admin reports (ADMIN_USERNAMES)"""
+    if current_user.username not in ADMIN_USERNAMES:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+
 # ============= AUTH ROUTES =============
 
 
@@ -160,18 +283,19 @@ async def search_users(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Search users by username or email"""
-    if len(query) < 2:
+    """Search users by username or email, prefix matches first"""
+    if len(query.strip()) < MIN_QUERY_LENGTH:
         return []
 
-    # Search for users matching the query using SQLAlchemy 2.0 style
-    stmt = (
-        select(User)
-        .where((User.username.ilike(f"%{query}%")) | (User.email.ilike(f"%{query}%")))
-        .where(User.id != current_user.id)  # Exclude current user
-        .limit(limit)
+    # Read-only: may be served by the replica (excludes the current user)
+    users = read_router.run(
+        search_users_by_name,
+        query,
+        current_user.id,
+        limit,
+        user_id=current_user.id,
+        session=db,
     )
-    users = db.execute(stmt).scalars().all()
 
     print(f"Search query: '{query}', Found {len(users)} users")
     return users
@@ -187,22 +311,20 @@ async def create_chat_endpoint(
     db: Session = Depends(get_db),
 ):
     """Create a new chat"""
-    # Create the chat
+    # Resolve all invited usernames in one query; unknown names are skipped
+    invited_users = get_users_by_usernames(db, chat.participant_usernames or [])
+    participant_ids = [user.id for user in invited_users if user.id != current_user.id]
+
+    # Chat, owner and participants in one transaction
     new_chat = create_chat(
-        db, current_user.id, chat.name, chat.is_group, chat.is_ai_chat
+        db,
+        current_user.id,
+        chat.name,
+        chat.is_group,
+        chat.is_ai_chat,
+        participant_ids=participant_ids,
     )
 
-    # Collect all participant user IDs for notifications
-    participant_ids = []
-
-    # Add additional participants if provided
-    if chat.participant_usernames:
-        for username in chat.participant_usernames:
-            invited_user = get_user_by_username(db, username)
-            if invited_user:
-                add_participant(db, new_chat.id, invited_user.id)
-                participant_ids.append(invited_user.id)
-
     # If it's an AI chat, send an initial greeting message
     if chat.is_ai_chat:
         create_message(
@@ -238,17 +360,21 @@ async def get_my_chats(
     current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
 ):
     """Get all chats for current user with unread counts"""
-    chats = get_user_chats(db, current_user.id)
+    # Unread counters live on the membership row, so this is a single query
+    chats = read_router.run(
+        get_user_chats_with_unread,
+        current_user.id,
+        user_id=current_user.id,
+        session=db,
+    )
 
     # Add unread count and last message to each chat
     chats_with_unread = []
-    for chat in chats:
-        unread_count = get_unread_count(db, chat.id, current_user.id)
-
-        # Get last message for this chat
-        messages = get_chat_messages(db, chat.id, limit=1)
-        last_message = messages[0].content if messages else None
-        last_message_time = messages[0].created_at if messages else None
+    for chat, unread_count in chats:
+        # Last message comes from the chat's denormalized pointer
+        has_messages = chat.last_message_id is not None
+        last_message = chat.last_message_preview if has_messages else None
+        last_message_time = chat.last_message_at if has_messages else None
 
         chat_dict = {
             "id": chat.id,
@@ -262,7 +388,7 @@ async def get_my_chats(
         }
         chats_with_unread.append(chat_dict)
 
-    return chats_with_unread
+    return json_list_response(chat_list_adapter, chats_with_unread)
 
 
 @app.get("/api/chats/{chat_id}", response_model=ChatResponse)
@@ -283,6 +409,25 @@ async def get_chat_endpoint(
     return chat
 
 
+@app.put("/api/chats/{chat_id}/bot", response_model=ChatBotSettings)
+async def update_chat_bot_settings(
+    chat_id: int,
+    settings: ChatBotSettings,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Set the model tier /bot uses in a chat (null lets the router choose)"""
+    chat = get_chat(db, chat_id)
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    if not is_participant(db, chat_id, current_user.id):
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    set_chat_bot_tier(db, chat_id, settings.tier)
+    return settings
+
+
 @app.post("/api/chats/{chat_id}/invite")
 async def invite_to_chat(
     chat_id: int,
@@ -326,6 +471,54 @@ async def invite_to_chat(
     return {"message": f"User {invite.username} invited to chat"}
 
 
+@app.post("/api/chats/{chat_id}/invite/bulk", response_model=ChatBulkInviteResult)
+async def bulk_invite_to_chat(
+    chat_id: int,
+    invite: ChatBulkInvite,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Invite several users to a chat at once"""
+    chat = get_chat(db, chat_id)
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    if not is_participant(db, chat_id, current_user.id):
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    # One query to resolve the names, one statement to add the members
+    users = {user.id: user for user in get_users_by_usernames(db, invite.usernames)}
+    added_ids = set(add_participants(db, chat_id, users))
+
+    found = {user.username for user in users.values()}
+    added = {users[user_id].username for user_id in added_ids}
+    requested = list(dict.fromkeys(invite.usernames))
+
+    if added_ids:
+        await websocket_manager.notify_users(
+            added_ids,
+            {
+                "type": "chat_invite",
+                "chat": {
+                    "id": chat.id,
+                    "name": chat.name,
+                    "owner_id": chat.owner_id,
+                    "created_at": chat.created_at.isoformat(),
+                    "is_group": chat.is_group,
+                },
+                "notification": f"{current_user.username} added you to {chat.name or 'a chat'}",
+            },
+        )
+
+    return {
+        "added": [name for name in requested if name in added],
+        "already_members": [
+            name for name in requested if name in found and name not in added
+        ],
+        "not_found": [name for name in requested if name not in found],
+    }
+
+
 @app.delete("/api/chats/{chat_id}/participants/{user_id}")
 async def remove_participant_from_chat(
     chat_id: int,
@@ -361,6 +554,7 @@ async def remove_participant_from_chat(
     db.query(ChatParticipant).filter(
         ChatParticipant.chat_id == chat_id, ChatParticipant.user_id == user_id
     ).delete()
+    invalidate_chat_members(db, chat_id)
     db.commit()
 
     # Notify the removed user
@@ -417,6 +611,7 @@ async def leave_chat(
     db.query(ChatParticipant).filter(
         ChatParticipant.chat_id == chat_id, ChatParticipant.user_id == current_user.id
     ).delete()
+    invalidate_chat_members(db, chat_id)
     db.commit()
 
     # Notify other participants
@@ -457,6 +652,7 @@ async def delete_chat(
     # Delete chat (cascade will handle related records)
     from services.database.models import Chat
 
+    invalidate_chat_members(db, chat_id)
     db.query(Chat).filter(Chat.id == chat_id).delete()
     db.commit()
 
@@ -487,7 +683,9 @@ async def get_messages(
     if not is_participant(db, chat_id, current_user.id):
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    messages = get_chat_messages(db, chat_id, limit)
+    messages = read_router.run(
+        get_chat_messages, chat_id, limit, user_id=current_user.id, session=db
+    )
 
     # Add username to each message
     result = []
@@ -503,7 +701,66 @@ async def get_messages(
         }
         result.append(msg_dict)
 
-    return result
+    return json_list_response(message_list_adapter, result)
+
+
+def run_message_search(
+    db: Session,
+    user_id: int,
+    q: str,
+    chat_id: Optional[int],
+    limit: int,
+    cursor: Optional[str],
+) -> dict:
+    """
+    Run a message search on the read path
+
+    Bad cursors are a 400; a database without a full-text index is a 501.
+    """
+    try:
+        results, next_cursor = read_router.run(
+            search_messages,
+            user_id,
+            q,
+            chat_id,
+            limit,
+            cursor,
+            user_id=user_id,
+            session=db,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return {"results": results, "next_cursor": next_cursor}
+
+
+@app.get("/api/chats/{chat_id}/search", response_model=MessageSearchResults)
+async def search_chat_messages(
+    chat_id: int,
+    q: str,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Full-text search within one chat, best matches first"""
+    if not is_participant(db, chat_id, current_user.id):
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return run_message_search(db, current_user.id, q, chat_id, limit, cursor)
+
+
+@app.get("/api/messages/search", response_model=MessageSearchResults)
+async def search_all_messages(
+    q: str,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Full-text search across every chat the current user belongs to"""
+    return run_message_search(db, current_user.id, q, None, limit, cursor)
 
 
 @app.get("/api/chats/{chat_id}/participants", response_model=List[UserResponse])
@@ -516,7 +773,21 @@ async def get_participants(
     if not is_participant(db, chat_id, current_user.id):
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    return get_chat_participants(db, chat_id)
+    participants = read_router.run(
+        get_chat_participants, chat_id, user_id=current_user.id, session=db
+    )
+    return json_list_response(
+        user_list_adapter,
+        (
+            {
+                "id": user.id,
+                "username": user.username,
+                "email": user.email,
+                "created_at": user.created_at,
+            }
+            for user in participants
+        ),
+    )
 
 
 @app.post("/api/chats/{chat_id}/mark-read")
@@ -533,32 +804,30 @@ async def mark_as_read(
     if not success:
         raise HTTPException(status_code=404, detail="Chat or participant not found")
 
-    # Get updated read receipts and broadcast to all users in the chat
-    receipts = get_chat_read_receipts(db, chat_id)
-
-    # Convert datetime objects to ISO strings for JSON serialization
-    serializable_receipts = {}
-    for message_id, receipt_list in receipts.items():
-        serializable_receipts[message_id] = [
-            {
-                "user_id": r["user_id"],
-                "username": r["username"],
-                "read_at": r["read_at"].isoformat() if r["read_at"] else None,
-            }
-            for r in receipt_list
-        ]
+    # Clear the badge on the reader's other tabs/devices
+    chat = get_chat(db, chat_id)
+    await websocket_manager.send_unread_updates(
+        chat_id,
+        {current_user.id: 0},
+        chat.last_message_preview,
+        chat.last_message_at.isoformat() if chat.last_message_id else None,
+    )
 
-    # Get all participants in the chat
-    participants = get_chat_participants(db, chat_id)
-    participant_ids = [p.id for p in participants]
+    # Get updated read receipts and broadcast to all users in the chat
+    # (read-your-writes keeps this on the primary right after marking)
+    receipts = read_router.run(
+        get_chat_read_receipts, chat_id, user_id=current_user.id, session=db
+    )
 
-    # Notify ALL participants (not just those in chat room) to update their sidebar
+    # Notify ALL online participants (not just those in chat room)
+    online_ids = websocket_manager.online_members(get_chat_member_ids(db, chat_id))
     await websocket_manager.notify_users(
-        participant_ids,
+        online_ids,
         {
             "type": "read_receipts_updated",
             "chat_id": chat_id,
-            "read_receipts": serializable_receipts,
+            # Datetimes are encoded by the shared serializer
+            "read_receipts": receipts,
         },
     )
 
@@ -575,45 +844,93 @@ async def get_read_receipts(
     if not is_participant(db, chat_id, current_user.id):
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    receipts = get_chat_read_receipts(db, chat_id)
+    receipts = read_router.run(
+        get_chat_read_receipts, chat_id, user_id=current_user.id, session=db
+    )
     return receipts
 
 
+# ============= ADMIN =============
+
+
+@app.get("/api/admin/usage")
+async def get_usage_report(
+    hours: int = 24,
+    group_by: Optional[Literal["user", "chat", "model"]] = None,
+    limit: int = 50,
+    admin: User = Depends(get_admin_user),
+    db: Session = Depends(get_db),
+):
+    """/bot usage totals for the last `hours` hours, optionally per user, chat or model"""
+    if not 1 <= hours <= 24 * 90:
+        raise HTTPException(status_code=400, detail="hours must be 1 to 2160")
+    limit = min(max(limit, 1), 500)
+
+    # Include the calls still counted in memory
+    await usage_tracker.flush()
+    now = datetime.now(timezone.utc)
+    # Whole hourly buckets, the current one included
+    since = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+    report = {"since": since, "totals": get_usage_totals(db, since)[0]}
+    if group_by is not None:
+        report["group_by"] = group_by
+        report["groups"] = get_usage_totals(db, since, group_by, limit)
+    return report
+
+
 # ============= WEBSOCKET =============
 
 
 @app.websocket("/ws")
 async def websocket_endpoint(
-    websocket: WebSocket, token: str, db: Session = Depends(get_db)
+    websocket: WebSocket, token: str, encoding: Optional[str] = None
 ):
-    """WebSocket endpoint for real-time chat"""
+    """
+    WebSocket endpoint for real-time chat
+
+    Frames are JSON text by default; clients may pick another wire encoding
+    ("msgpack" or "deflate") with ?encoding= or a "gemini-coop.<encoding>"
+    subprotocol.
+    """
     # Authenticate user
     username = decode_token(token)
     if not username:
         await websocket.close(code=1008)  # Policy violation
         return
 
-    user = get_user_by_username(db, username)
+    # Each unit of work below opens its own short-lived session, so an idle
+    # socket never pins a pooled database connection
+    with session_scope() as db:
+        user = get_user_by_username(db, username)
+        if user:
+            user_id, username = user.id, user.username
+
     if not user:
         await websocket.close(code=1008)
         return
 
     # Connect
-    await websocket_manager.connect(websocket, user.id, user.username)
+    wire_encoding, subprotocol = negotiate_encoding(
+        encoding, websocket.scope.get("subprotocols", [])
+    )
+    await websocket_manager.connect(
+        websocket, user_id, username, wire_encoding, subprotocol
+    )
 
     try:
         while True:
             # Receive message
-            data = await websocket.receive_text()
-            message_data = json.loads(data)
+            message_data = await websocket_manager.receive(websocket)
 
             message_type = message_data.get("type")
             chat_id = message_data.get("chat_id")
 
             # Verify user is participant
-            if not is_participant(db, chat_id, user.id):
+            with session_scope(user_id) as db:
+                authorized = is_participant(db, chat_id, user_id)
+            if not authorized:
                 await websocket_manager.send_personal_message(
-                    json.dumps({"error": "Not authorized"}), websocket
+                    {"error": "Not authorized"}, websocket
                 )
                 continue
 
@@ -625,7 +942,7 @@ async def websocket_endpoint(
                     {
                         "type": "user_joined",
                         "chat_id": chat_id,
-                        "username": user.username,
+                        "username": username,
                     },
                     chat_id,
                     exclude=websocket,
@@ -638,7 +955,7 @@ async def websocket_endpoint(
                     {
                         "type": "user_left",
                         "chat_id": chat_id,
-                        "username": user.username,
+                        "username": username,
                     },
                     chat_id,
                 )
@@ -646,119 +963,187 @@ async def websocket_endpoint(
             elif message_type == "message":
                 content = message_data.get("content", "")
 
-                # Check if it's a bot command
-                if content.startswith("/bot "):
-                    bot_message = content[5:].strip()  # Remove "/bot " prefix
-
-                    # Ensure bot is a participant in this chat
-                    bot_participant = add_bot_to_chat(db, chat_id)
-                    bot_user = get_or_create_bot_user(db)
-
-                    # Save user message
-                    user_msg = create_message(
-                        db, chat_id, content, user.id, is_bot=False
-                    )
-
-                    # Get all participants to notify them
-                    participants = get_chat_participants(db, chat_id)
-                    participant_ids = [p.id for p in participants]
+                # Check if it's a bot command ("/bot ", "/bot! ", "/bot deep ")
+                command = parse_bot_command(content)
+                if command is not None:
+                    requested_tier, bot_message = command
 
-                    # Notify ALL participants about the user message
-                    await websocket_manager.notify_users(
-                        participant_ids,
-                        {
+                    # Quotas are checked before anything is stored or sent
+                    with session_scope(user_id) as db:
+                        refused = usage_tracker.check(db, user_id, chat_id)
+                    if refused is not None:
+                        await websocket_manager.send_personal_message(
+                            {
+                                "type": "bot_quota_exceeded",
+                                "chat_id": chat_id,
+                                "content": content,
+                                "error": refused.message,
+                                "retry_after": refused.retry_after,
+                            },
+                            websocket,
+                        )
+                        continue
+
+                    with session_scope(user_id) as db:
+                        # Ensure bot is a participant in this chat
+                        add_bot_to_chat(db, chat_id)
+                        bot_user = get_or_create_bot_user(db)
+                        bot_user_id, bot_username = bot_user.id, bot_user.username
+                        chat_tier = get_chat_bot_tier(db, chat_id)
+
+                        # Save user message
+                        user_msg = create_message(
+                            db, chat_id, content, user_id, is_bot=False
+                        )
+                        user_msg_payload = {
                             "type": "message",
                             "message": {
                                 "id": user_msg.id,
                                 "chat_id": chat_id,
-                                "user_id": user.id,
-                                "username": user.username,
+                                "user_id": user_id,
+                                "username": username,
                                 "content": content,
                                 "is_bot": False,
                                 "created_at": user_msg.created_at.isoformat(),
                             },
-                        },
-                    )
+                        }
 
-                    # Get chat history for context
-                    history = get_chat_history_for_gemini(db, chat_id, limit=20)
+                        # Only online members get frames; offline ones are skipped
+                        online_ids = websocket_manager.online_members(
+                            get_chat_member_ids(db, chat_id)
+                        )
+                        unread_counts = get_chat_unread_counts(db, chat_id, online_ids)
 
-                    # Create placeholder for bot message with bot user ID
-                    bot_msg = create_message(
-                        db, chat_id, "", user_id=bot_user.id, is_bot=True
+                        user_msg_id = user_msg.id
+
+                        # Create placeholder for bot message with bot user ID
+                        bot_msg = create_message(
+                            db, chat_id, "", user_id=bot_user_id, is_bot=True
+                        )
+                        bot_msg_id = bot_msg.id
+                        bot_msg_created_at = bot_msg.created_at.isoformat()
+
+                    # Notify ALL online participants about the user message
+                    await websocket_manager.notify_users(online_ids, user_msg_payload)
+                    await websocket_manager.send_unread_updates(
+                        chat_id,
+                        unread_counts,
+                        message_preview(content),
+                        user_msg_payload["message"]["created_at"],
                     )
 
+                    # Recent history for context, without the /bot message
+                    # itself (the prompt adds it as the question), plus older
+                    # messages relevant to it when retrieval is on; the
+                    # context builder keeps what fits the token budget
+                    history = await asyncio.to_thread(
+                        load_bot_history, chat_id, user_msg_id, bot_message
+                    )
+
+                    # No session is held while the response streams
                     try:
-                        # Stream Gemini response
+                        # Stream Gemini response from the routed model tier
+                        route = gemini_service.router.route(
+                            bot_message, requested_tier, chat_tier
+                        )
+                        usage = {}
                         stream = gemini_service.generate_stream_response(
-                            bot_message, history
+                            bot_message,
+                            history,
+                            cache_scope=f"chat:{chat_id}",
+                            route=route,
+                            usage=usage,
                         )
                         full_response = await websocket_manager.stream_to_chat(
-                            chat_id, bot_msg.id, stream, username=bot_user.username
+                            chat_id, bot_msg_id, stream, username=bot_username
                         )
-
-                        # Update bot message with full response
-                        bot_msg.content = full_response
-                        db.commit()
+                        usage_tracker.record(user_id, chat_id, usage)
+
+                        # Update bot message with full response and its usage
+                        with session_scope() as db:
+                            update_message_content(
+                                db, bot_msg_id, full_response, bot_usage=usage
+                            )
+                        reply = full_response
+                        # Fold older messages into the chat summary, off the
+                        # reply path
+                        conversation_summarizer.schedule(chat_id)
                     except Exception as e:
                         print(f"Error generating bot response: {e}")
                         # Set error message that's user-friendly
-                        bot_msg.content = "I apologize, but I encountered an error processing your request. Please try again."
-                        db.commit()
+                        error_content = "I apologize, but I encountered an error processing your request. Please try again."
+                        with session_scope() as db:
+                            update_message_content(db, bot_msg_id, error_content)
+                        reply = error_content
 
                         # Broadcast the error message
                         await websocket_manager.broadcast_to_chat(
                             {
                                 "type": "bot_stream",
                                 "message": {
-                                    "id": bot_msg.id,
+                                    "id": bot_msg_id,
                                     "chat_id": chat_id,
-                                    "user_id": bot_user.id,
-                                    "username": bot_user.username,
-                                    "content": bot_msg.content,
+                                    "user_id": bot_user_id,
+                                    "username": bot_username,
+                                    "content": error_content,
                                     "is_bot": True,
-                                    "created_at": bot_msg.created_at.isoformat(),
+                                    "created_at": bot_msg_created_at,
                                 },
                             },
                             chat_id,
                         )
 
-                else:
-                    # Regular message
-                    msg = create_message(db, chat_id, content, user.id, is_bot=False)
-
-                    # Get all participants to notify them
-                    participants = get_chat_participants(db, chat_id)
-                    participant_ids = [p.id for p in participants]
+                    # The reply counted as unread when its placeholder was
+                    # created, so badges move whether or not it succeeded
+                    await push_unread_updates(
+                        chat_id, message_preview(reply), bot_msg_created_at
+                    )
 
-                    # Notify ALL participants (not just those in the chat room)
-                    await websocket_manager.notify_users(
-                        participant_ids,
-                        {
+                else:
+                    with session_scope(user_id) as db:
+                        # Regular message
+                        msg = create_message(
+                            db, chat_id, content, user_id, is_bot=False
+                        )
+                        msg_payload = {
                             "type": "message",
                             "message": {
                                 "id": msg.id,
                                 "chat_id": chat_id,
-                                "user_id": user.id,
-                                "username": user.username,
+                                "user_id": user_id,
+                                "username": username,
                                 "content": content,
                                 "is_bot": False,
                                 "created_at": msg.created_at.isoformat(),
                             },
-                        },
+                        }
+
+                        # Only online members get frames; offline ones are skipped
+                        online_ids = websocket_manager.online_members(
+                            get_chat_member_ids(db, chat_id)
+                        )
+                        unread_counts = get_chat_unread_counts(db, chat_id, online_ids)
+
+                    # Notify ALL online participants (not just those in the chat room)
+                    await websocket_manager.notify_users(online_ids, msg_payload)
+                    await websocket_manager.send_unread_updates(
+                        chat_id,
+                        unread_counts,
+                        message_preview(content),
+                        msg_payload["message"]["created_at"],
                     )
 
             elif message_type == "typing":
                 # Broadcast typing indicator
                 await websocket_manager.broadcast_to_chat(
-                    {"type": "typing", "chat_id": chat_id, "username": user.username},
+                    {"type": "typing", "chat_id": chat_id, "username": username},
                     chat_id,
                     exclude=websocket,
                 )
 
     except WebSocketDisconnect:
         websocket_manager.disconnect(websocket)
-        print(f"User {user.username} disconnected")
+        print(f"User {username} disconnected")
     except Exception as e:
         print(f"WebSocket error: {e}")
         websocket_manager.disconnect(websocket)
@@ -773,5 +1158,38 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/internal/stats")
+async def internal_stats(admin: User = Depends(get_admin_user)):
+    """Internal runtime stats (process, DB pool and queries, bot streams, broadcasts, Gemini, usage, retrieval); admins only"""
+    retriever = get_retriever()
+    return {
+        "process": process_stats(),
+        "db_pool": get_pool_stats(),
+        "bot_stream": websocket_manager.stream_stats.snapshot(),
+        "broadcast": dict(websocket_manager.broadcast_stats),
+        "gemini": {
+            **gemini_service.stats,
+            "resilience": {
+                model: caller.snapshot()
+                for model, caller in gemini_service.callers.items()
+            },
+            "routing": gemini_service.router.snapshot(),
+            "fake_provider": (
+                gemini_service.client.stats
+                if isinstance(gemini_service.client, FakeProvider)
+                else None
+            ),
+            "context_cache": (
+                dict(gemini_service.context_cache.stats)
+                if gemini_service.context_cache is not None
+                else None
+            ),
+        },
+        "summaries": dict(conversation_summarizer.stats),
+        "usage": usage_tracker.snapshot(),
+        "retrieval": dict(retriever.stats) if retriever is not None else None,
+    }
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host=HOST, port=PORT)
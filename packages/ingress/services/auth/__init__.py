@@ -12,6 +12,7 @@ from .auth_service import (
     get_user_by_username,
     get_user_by_email,
 )
+from .user_search import search_users
 
 __all__ = [
     'verify_password',
@@ -22,4 +23,5 @@ __all__ = [
     'create_user',
     'get_user_by_username',
     'get_user_by_email',
+    'search_users',
 ]
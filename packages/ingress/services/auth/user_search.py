@@ -0,0 +1,222 @@
+"""
+User search service
+Indexed username/email lookup for the invite and new-chat dialogs
+"""
+
+from typing import List
+
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from services.database.models import User
+
+# Shorter queries match too much to be useful while the user is still typing
+MIN_QUERY_LENGTH = 2
+# Substring matches need at least one full trigram to use the index
+MIN_SUBSTRING_LENGTH = 3
+MAX_USER_SEARCH_LIMIT = 20
+
+# Highest code point: every string starting with a prefix sorts below
+# prefix + _PREFIX_END
+_PREFIX_END = "\U0010ffff"
+
+_POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # Prefix matches (LIKE 'q%')
+    """
+    CREATE INDEX IF NOT EXISTS ix_users_username_prefix
+    ON users (lower(username) text_pattern_ops)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_users_email_prefix
+    ON users (lower(email) text_pattern_ops)
+    """,
+    # Substring matches (LIKE '%q%')
+    """
+    CREATE INDEX IF NOT EXISTS ix_users_username_trgm
+    ON users USING GIN (lower(username) gin_trgm_ops)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_users_email_trgm
+    ON users USING GIN (lower(email) gin_trgm_ops)
+    """,
+]
+
+# Prefix matches as range scans over lower() expression indexes
+_SQLITE_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_users_username_prefix ON users (lower(username))",
+    "CREATE INDEX IF NOT EXISTS ix_users_email_prefix ON users (lower(email))",
+]
+
+# Substring matches through an FTS5 trigram table kept in sync by triggers.
+# The trigram tokenizer needs SQLite 3.34+; without it substring matches
+# fall back to a scan.
+_SQLITE_TRIGRAM_DDL = [
+    """
+    CREATE VIRTUAL TABLE users_trgm USING fts5(
+        username, email, content='users', content_rowid='id',
+        tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER users_trgm_ai AFTER INSERT ON users BEGIN
+        INSERT INTO users_trgm(rowid, username, email)
+        VALUES (new.id, new.username, new.email);
+    END
+    """,
+    """
+    CREATE TRIGGER users_trgm_ad AFTER DELETE ON users BEGIN
+        INSERT INTO users_trgm(users_trgm, rowid, username, email)
+        VALUES ('delete', old.id, old.username, old.email);
+    END
+    """,
+    """
+    CREATE TRIGGER users_trgm_au AFTER UPDATE OF username, email ON users BEGIN
+        INSERT INTO users_trgm(users_trgm, rowid, username, email)
+        VALUES ('delete', old.id, old.username, old.email);
+        INSERT INTO users_trgm(rowid, username, email)
+        VALUES (new.id, new.username, new.email);
+    END
+    """,
+    # Index the users that already exist
+    "INSERT INTO users_trgm(users_trgm) VALUES ('rebuild')",
+]
+
+
+def ensure_user_search_index(conn: Connection) -> bool:
+    """
+    Create the user search indexes if they are missing
+
+    Postgres gets pg_trgm GIN indexes plus prefix B-trees; SQLite gets
+    lower() expression indexes plus an FTS5 trigram table when the tokenizer
+    is available. Runs in the caller's transaction (a migration, or schema
+    creation on an empty database). Returns True if anything was built.
+    """
+    dialect = conn.dialect.name
+    inspector = inspect(conn)
+    built = False
+
+    if dialect == "postgresql":
+        indexes = {index["name"] for index in inspector.get_indexes("users")}
+        if "ix_users_email_trgm" not in indexes:
+            for statement in _POSTGRES_DDL:
+                conn.execute(text(statement))
+            built = True
+    elif dialect == "sqlite":
+        # The inspector leaves out expression indexes on SQLite
+        indexes = set(
+            conn.execute(
+                text(
+                    "SELECT name FROM sqlite_master "
+                    "WHERE type = 'index' AND tbl_name = 'users'"
+                )
+            ).scalars()
+        )
+        if "ix_users_email_prefix" not in indexes:
+            for statement in _SQLITE_DDL:
+                conn.execute(text(statement))
+            built = True
+        if not inspector.has_table("users_trgm"):
+            # A failed statement does not end an SQLite transaction
+            try:
+                for statement in _SQLITE_TRIGRAM_DDL:
+                    conn.execute(text(statement))
+                built = True
+            except OperationalError as e:
+                print(f"User search: no trigram index ({e}), substring search scans")
+    return built
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _prefix_matches(
+    db: Session, query: str, exclude_user_id: int, limit: int
+) -> List[User]:
+    """Users whose username or email starts with `query` (lowercase)"""
+    dialect = db.get_bind().dialect.name
+    matches = {}
+    for column in (User.username, User.email):
+        key = func.lower(column)
+        if dialect == "sqlite":
+            # SQLite's LIKE optimisation skips expression indexes; a range
+            # over the same expression uses them
+            condition = (key >= query) & (key < query + _PREFIX_END)
+        else:
+            condition = key.like(_like_escape(query) + "%", escape="\\")
+        stmt = (
+            select(User)
+            .where(condition)
+            .where(User.id != exclude_user_id)
+            .order_by(key)
+            .limit(limit)
+        )
+        for user in db.execute(stmt).scalars():
+            matches[user.id] = user
+    return sorted(matches.values(), key=lambda user: user.username.lower())[:limit]
+
+
+def _substring_matches(
+    db: Session, query: str, exclude_ids: List[int], limit: int
+) -> List[User]:
+    """Users whose username or email contains `query` (lowercase)"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite" and inspect(db.get_bind()).has_table("users_trgm"):
+        phrase = '"' + query.replace('"', '""') + '"'
+        ids = db.execute(
+            text(
+                "SELECT rowid FROM users_trgm WHERE users_trgm MATCH :phrase LIMIT :n"
+            ),
+            {"phrase": phrase, "n": limit + len(exclude_ids)},
+        ).scalars()
+        ids = [user_id for user_id in ids if user_id not in exclude_ids][:limit]
+        if not ids:
+            return []
+        users = db.execute(select(User).where(User.id.in_(ids))).scalars()
+    else:
+        # Postgres serves this from the trigram GIN indexes; elsewhere it scans
+        pattern = "%" + _like_escape(query) + "%"
+        stmt = (
+            select(User)
+            .where(
+                func.lower(User.username).like(pattern, escape="\\")
+                | func.lower(User.email).like(pattern, escape="\\")
+            )
+            .where(User.id.not_in(exclude_ids))
+            .limit(limit)
+        )
+        users = db.execute(stmt).scalars()
+    return sorted(users, key=lambda user: user.username.lower())
+
+
+def search_users(
+    db: Session, query: str, exclude_user_id: int, limit: int = 10
+) -> List[User]:
+    """
+    Search users by username or email, excluding one user (the searcher)
+
+    Prefix matches come first and are answered from an index; substring
+    matches fill the rest of the page for queries of MIN_SUBSTRING_LENGTH
+    characters or more.
+
+    Args:
+        query: Text typed so far; case-insensitive
+        exclude_user_id: Searching user, left out of the results
+        limit: Page size, capped at MAX_USER_SEARCH_LIMIT
+
+    Returns:
+        Up to `limit` users
+    """
+    query = query.strip().lower()
+    if len(query) < MIN_QUERY_LENGTH:
+        return []
+    limit = max(1, min(limit, MAX_USER_SEARCH_LIMIT))
+
+    users = _prefix_matches(db, query, exclude_user_id, limit)
+    if len(users) < limit and len(query) >= MIN_SUBSTRING_LENGTH:
+        exclude_ids = [exclude_user_id] + [user.id for user in users]
+        users += _substring_matches(db, query, exclude_ids, limit - len(users))
+    return users
@@ -6,22 +6,46 @@ from .chat_service import (
     create_chat,
     get_chat,
     get_user_chats,
+    get_user_chats_with_unread,
     add_participant,
+    add_participants,
+    get_users_by_usernames,
     is_participant,
     get_chat_participants,
     create_message,
     get_chat_messages,
     get_chat_history_for_gemini,
+    get_relevant_messages,
+    get_chat_summary,
+    get_messages_to_summarize,
+    save_chat_summary,
+    get_chat_bot_tier,
+    set_chat_bot_tier,
+    backfill_last_messages,
+    reconcile_unread_counts,
 )
+from .message_search import search_messages
 
 __all__ = [
     'create_chat',
     'get_chat',
     'get_user_chats',
+    'get_user_chats_with_unread',
     'add_participant',
+    'add_participants',
+    'get_users_by_usernames',
     'is_participant',
     'get_chat_participants',
     'create_message',
     'get_chat_messages',
     'get_chat_history_for_gemini',
+    'get_relevant_messages',
+    'get_chat_summary',
+    'get_messages_to_summarize',
+    'save_chat_summary',
+    'get_chat_bot_tier',
+    'set_chat_bot_tier',
+    'backfill_last_messages',
+    'reconcile_unread_counts',
+    'search_messages',
 ]
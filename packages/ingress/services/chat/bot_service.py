@@ -6,6 +6,7 @@ Manages Gemini AI bot users and their participation in chats
 from sqlalchemy.orm import Session
 from services.database.models import User, ChatParticipant
 from services.auth.auth_service import get_password_hash
+from services.chat.chat_service import invalidate_chat_members
 
 
 # Bot configuration
@@ -69,6 +70,7 @@ def add_bot_to_chat(db: Session, chat_id: int) -> ChatParticipant:
     # Add bot as participant
     participant = ChatParticipant(chat_id=chat_id, user_id=bot_user.id)
     db.add(participant)
+    invalidate_chat_members(db, chat_id)
     db.commit()
     db.refresh(participant)
 
@@ -3,9 +3,12 @@ Chat Service
 Handles chat rooms, participants, and messages
 """
 
-from sqlalchemy.orm import Session
-from sqlalchemy import select, func
-from typing import List, Optional, Dict
+from cachetools import TTLCache
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import select, func, update, or_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import Collection, FrozenSet, List, Optional, Dict, Tuple
 from datetime import datetime, timezone
 
 from services.database.models import (
@@ -15,6 +18,35 @@ from services.database.models import (
     User,
     MessageReadReceipt,
 )
+from services.retrieval.retriever import get_retriever, index_message
+from shared.config import (
+    CHAT_MEMBER_CACHE_SIZE,
+    CHAT_MEMBER_CACHE_TTL_SECONDS,
+    RETRIEVAL_BACKFILL_MESSAGES,
+    RETRIEVAL_TOP_K,
+)
+
+
+# Max characters of message content kept in Chat.last_message_preview
+PREVIEW_LENGTH = 200
+
+# Rows per multi-row membership INSERT (keeps SQLite under its variable limit)
+PARTICIPANT_INSERT_BATCH = 1000
+
+# Participant rows reconciled per transaction (by id range, like the
+# backfill in migration 0003)
+UNREAD_RECONCILE_BATCH = 1000
+
+# chat_id -> (Chat.members_version, frozenset of member user ids), for
+# WebSocket fan-out
+_chat_member_ids: TTLCache = TTLCache(
+    maxsize=CHAT_MEMBER_CACHE_SIZE, ttl=CHAT_MEMBER_CACHE_TTL_SECONDS
+)
+
+
+def message_preview(content: str) -> str:
+    """Shortened message content for chat lists and badge updates"""
+    return content[:PREVIEW_LENGTH]
 
 
 def ensure_timezone_aware(dt: datetime) -> datetime:
@@ -31,21 +63,24 @@ def create_chat(
     name: Optional[str] = None,
     is_group: bool = False,
     is_ai_chat: bool = False,
+    participant_ids: Collection[int] = (),
 ) -> Chat:
-    """Create a new chat"""
+    """
+    Create a new chat with its owner and any other participants
+
+    The chat and all memberships are written in one transaction.
+    """
     # Auto-generate name for AI chats if not provided
     if is_ai_chat and not name:
         name = "AI Chat"
 
     chat = Chat(owner_id=owner_id, name=name, is_group=is_group)
     db.add(chat)
-    db.commit()
-    db.refresh(chat)
+    db.flush()
 
-    # Add owner as participant
-    participant = ChatParticipant(chat_id=chat.id, user_id=owner_id)
-    db.add(participant)
+    add_participants(db, chat.id, {owner_id, *participant_ids}, commit=False)
     db.commit()
+    db.refresh(chat)
 
     return chat
 
@@ -58,31 +93,28 @@ def get_chat(db: Session, chat_id: int) -> Optional[Chat]:
 
 def get_user_chats(db: Session, user_id: int) -> List[Chat]:
     """Get all chats a user is participating in, sorted by most recent activity"""
-    # Subquery to get the latest message timestamp for each chat
-    latest_message_subquery = (
-        select(Message.chat_id, func.max(Message.created_at).label("last_message_at"))
-        .group_by(Message.chat_id)
-        .subquery()
-    )
-
-    # Main query with left join to include chats without messages
+    # last_message_at is maintained on write (and defaults to the chat's
+    # creation time), so this is an indexed sort over the user's memberships
     stmt = (
         select(Chat)
         .join(ChatParticipant)
-        .outerjoin(
-            latest_message_subquery, Chat.id == latest_message_subquery.c.chat_id
-        )
         .where(ChatParticipant.user_id == user_id)
-        .order_by(
-            # Sort by last message time if exists, otherwise by creation time
-            func.coalesce(
-                latest_message_subquery.c.last_message_at, Chat.created_at
-            ).desc()
-        )
+        .order_by(Chat.last_message_at.desc(), Chat.id.desc())
     )
     return db.execute(stmt).scalars().all()
 
 
+def get_user_chats_with_unread(db: Session, user_id: int) -> List[Tuple[Chat, int]]:
+    """Get a user's chats (most recent first) with their unread counts"""
+    stmt = (
+        select(Chat, ChatParticipant.unread_count)
+        .join(ChatParticipant)
+        .where(ChatParticipant.user_id == user_id)
+        .order_by(Chat.last_message_at.desc(), Chat.id.desc())
+    )
+    return db.execute(stmt).tuples().all()
+
+
 def add_participant(db: Session, chat_id: int, user_id: int) -> ChatParticipant:
     """Add a participant to a chat"""
     # Check if participant already exists
@@ -96,11 +128,69 @@ def add_participant(db: Session, chat_id: int, user_id: int) -> ChatParticipant:
 
     participant = ChatParticipant(chat_id=chat_id, user_id=user_id)
     db.add(participant)
+    invalidate_chat_members(db, chat_id)
     db.commit()
     db.refresh(participant)
     return participant
 
 
+def add_participants(
+    db: Session, chat_id: int, user_ids: Collection[int], commit: bool = True
+) -> List[int]:
+    """
+    Add several participants to a chat with one INSERT ... ON CONFLICT DO NOTHING
+
+    Users who are already members are skipped by the unique (chat_id, user_id)
+    index, so concurrent invites cannot create duplicate memberships.
+
+    Args:
+        user_ids: Users to add; duplicates and existing members are ignored
+        commit: Commit here; pass False to join the caller's transaction
+
+    Returns:
+        Ids of the users that were newly added
+    """
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return []
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        insert = postgresql_insert
+    elif dialect == "sqlite":
+        insert = sqlite_insert
+    else:
+        raise NotImplementedError(
+            f"Bulk participant insert is not supported on {dialect}"
+        )
+
+    added = []
+    for start in range(0, len(user_ids), PARTICIPANT_INSERT_BATCH):
+        batch = user_ids[start : start + PARTICIPANT_INSERT_BATCH]
+        stmt = (
+            insert(ChatParticipant)
+            .values([{"chat_id": chat_id, "user_id": user_id} for user_id in batch])
+            .on_conflict_do_nothing(index_elements=["chat_id", "user_id"])
+            .returning(ChatParticipant.user_id)
+        )
+        added.extend(db.execute(stmt).scalars())
+
+    if added:
+        invalidate_chat_members(db, chat_id)
+    if commit:
+        db.commit()
+    return added
+
+
+def get_users_by_usernames(db: Session, usernames: Collection[str]) -> List[User]:
+    """Resolve usernames to users in one query; unknown names are skipped"""
+    usernames = set(usernames)
+    if not usernames:
+        return []
+    stmt = select(User).where(User.username.in_(usernames))
+    return db.execute(stmt).scalars().all()
+
+
 def is_participant(db: Session, chat_id: int, user_id: int) -> bool:
     """Check if a user is a participant in a chat"""
     stmt = select(ChatParticipant).where(
@@ -116,6 +206,48 @@ def get_chat_participants(db: Session, chat_id: int) -> List[User]:
     return db.execute(stmt).scalars().all()
 
 
+def get_chat_member_ids(db: Session, chat_id: int) -> FrozenSet[int]:
+    """
+    Get the user ids of a chat's members (cached, no ORM objects)
+
+    A cached set is used while the chat's members_version is unchanged; that
+    check is one primary-key read, whatever the size of the chat, and sees
+    changes committed by other processes. Callers that change membership
+    must call invalidate_chat_members().
+    """
+    version = db.execute(
+        select(Chat.members_version).where(Chat.id == chat_id)
+    ).scalar_one_or_none()
+    if version is None:  # No such chat (or deleted)
+        _chat_member_ids.pop(chat_id, None)
+        return frozenset()
+
+    cached = _chat_member_ids.get(chat_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    stmt = select(ChatParticipant.user_id).where(ChatParticipant.chat_id == chat_id)
+    member_ids = frozenset(db.execute(stmt).scalars().all())
+    _chat_member_ids[chat_id] = (version, member_ids)
+    return member_ids
+
+
+def invalidate_chat_members(db: Session, chat_id: int) -> None:
+    """
+    Record a membership change, in the caller's transaction
+
+    Bumps the chat's members_version, so every process reloads its member
+    ids once the change commits, and drops this process's entry now.
+    """
+    db.execute(
+        update(Chat)
+        .where(Chat.id == chat_id)
+        .values(members_version=Chat.members_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    _chat_member_ids.pop(chat_id, None)
+
+
 def create_message(
     db: Session,
     chat_id: int,
@@ -126,16 +258,121 @@ def create_message(
     """Create a new message"""
     message = Message(chat_id=chat_id, user_id=user_id, content=content, is_bot=is_bot)
     db.add(message)
+    db.flush()
+
+    # Every other member has one more unread message. Messages without a
+    # sender (the AI chat greeting) are not counted, as in
+    # reconcile_unread_counts.
+    if user_id is not None:
+        db.execute(
+            update(ChatParticipant)
+            .where(
+                ChatParticipant.chat_id == chat_id, ChatParticipant.user_id != user_id
+            )
+            .values(unread_count=ChatParticipant.unread_count + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    # Move the chat's last-message pointer forward in the same transaction
+    db.execute(
+        update(Chat)
+        .where(
+            Chat.id == chat_id,
+            or_(
+                Chat.last_message_at.is_(None),
+                Chat.last_message_at <= message.created_at,
+            ),
+        )
+        .values(
+            last_message_id=message.id,
+            last_message_at=message.created_at,
+            last_message_preview=message_preview(content),
+        )
+        .execution_options(synchronize_session=False)
+    )
     db.commit()
     db.refresh(message)
+
+    # Keep the chat's retrieval index current (no-op unless enabled)
+    index_message(chat_id, message.id, content)
     return message
 
 
+def update_message_content(
+    db: Session, message_id: int, content: str, bot_usage: Optional[Dict] = None
+) -> None:
+    """
+    Replace the content of an existing message (e.g. a finished bot stream)
+
+    A bot reply's usage (model, tokens, latency) is stored with it in the
+    same write.
+    """
+    message = db.get(Message, message_id)
+    if message:
+        message.content = content
+        if bot_usage is not None:
+            message.bot_usage = bot_usage
+
+        # Refresh the preview if this is still the chat's latest message
+        db.execute(
+            update(Chat)
+            .where(Chat.id == message.chat_id, Chat.last_message_id == message_id)
+            .values(last_message_preview=message_preview(content))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        index_message(message.chat_id, message_id, content)
+
+
+def backfill_last_messages(db: Session) -> None:
+    """
+    Populate Chat.last_message_* from the messages table
+
+    Safe to re-run; used once when the columns are added to an existing
+    database, and to repair drift.
+    """
+    latest_message_id = (
+        select(Message.id)
+        .where(Message.chat_id == Chat.id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(Chat)
+        .values(last_message_id=latest_message_id)
+        .execution_options(synchronize_session=False)
+    )
+
+    last_message = select(Message).where(Message.id == Chat.last_message_id)
+    db.execute(
+        update(Chat)
+        .where(Chat.last_message_id.is_not(None))
+        .values(
+            last_message_at=last_message.with_only_columns(
+                Message.created_at
+            ).scalar_subquery(),
+            last_message_preview=last_message.with_only_columns(
+                func.substr(Message.content, 1, PREVIEW_LENGTH)
+            ).scalar_subquery(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(Chat)
+        .where(Chat.last_message_id.is_(None))
+        .values(last_message_at=Chat.created_at, last_message_preview=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
 def get_chat_messages(db: Session, chat_id: int, limit: int = 50) -> List[Message]:
     """Get messages from a chat"""
     stmt = (
         select(Message)
         .where(Message.chat_id == chat_id)
+        .options(selectinload(Message.user))  # Senders are read after the session
         .order_by(Message.created_at.desc())
         .limit(limit)
     )
@@ -143,50 +380,185 @@ def get_chat_messages(db: Session, chat_id: int, limit: int = 50) -> List[Messag
 
 
 def get_chat_history_for_gemini(
-    db: Session, chat_id: int, limit: int = 20
+    db: Session,
+    chat_id: int,
+    limit: int = 20,
+    before_id: Optional[int] = None,
+    query: Optional[str] = None,
 ) -> List[dict]:
     """
-    Get chat history formatted for Gemini API
-    Returns list of messages in format: [{'role': 'user'/'model', 'parts': [text]}]
+    Get a chat's rolling summary and most recent messages formatted for Gemini API
+
+    Returns the newest `limit` messages not yet covered by the chat's summary
+    (older than `before_id` if given), oldest first, as
+    [{'id': message id, 'role': 'user'/'model', 'parts': [text]}]. If the chat
+    has a summary it comes first, as a user turn marked 'summary': True.
+    Given a `query` and with retrieval enabled, older messages relevant to it
+    follow the summary, marked 'retrieved': True.
     """
+    summary, summary_message_id = get_chat_summary(db, chat_id)
+
     stmt = (
-        select(Message)
+        select(Message.id, Message.content, Message.is_bot)
         .where(Message.chat_id == chat_id)
-        .order_by(Message.created_at.asc())
+        .order_by(Message.created_at.desc(), Message.id.desc())
         .limit(limit)
     )
-    messages = db.execute(stmt).scalars().all()
+    if before_id is not None:
+        stmt = stmt.where(Message.id < before_id)
+    if summary_message_id is not None:
+        stmt = stmt.where(Message.id > summary_message_id)
+    messages = db.execute(stmt).all()
 
     history = []
-    for msg in messages:
-        if msg.is_bot:
-            history.append({'role': 'model', 'parts': [msg.content]})
-        else:
-            history.append({'role': 'user', 'parts': [msg.content]})
+    if summary:
+        history.append(
+            {'id': None, 'role': 'user', 'parts': [summary], 'summary': True}
+        )
+    if query:
+        # Only messages older than the recent window are worth recalling
+        oldest_recent_id = min((msg.id for msg in messages), default=before_id)
+        history.extend(get_relevant_messages(db, chat_id, query, oldest_recent_id))
+    for msg in reversed(messages):
+        role = 'model' if msg.is_bot else 'user'
+        history.append({'id': msg.id, 'role': role, 'parts': [msg.content]})
 
     return history
 
 
-def get_unread_count(db: Session, chat_id: int, user_id: int) -> int:
+def get_relevant_messages(
+    db: Session,
+    chat_id: int,
+    query: str,
+    before_id: Optional[int] = None,
+    k: int = RETRIEVAL_TOP_K,
+) -> List[dict]:
     """
-    Get count of unread messages in a chat for a user
+    Get up to k messages most similar to `query` from the retrieval index
+
+    A chat that has no index yet is backfilled from its newest
+    RETRIEVAL_BACKFILL_MESSAGES messages first. Returns them oldest first in
+    Gemini format, marked 'retrieved': True; empty when retrieval is off.
     """
-    # Get user's last_read_at timestamp
-    stmt = select(ChatParticipant).where(
-        ChatParticipant.chat_id == chat_id, ChatParticipant.user_id == user_id
+    retriever = get_retriever()
+    if retriever is None or not query.strip():
+        return []
+
+    if not retriever.has_index(chat_id):
+        rows = db.execute(
+            select(Message.id, Message.content)
+            .where(Message.chat_id == chat_id)
+            .order_by(Message.id.desc())
+            .limit(RETRIEVAL_BACKFILL_MESSAGES)
+        ).all()
+        retriever.backfill(chat_id, [(row.id, row.content) for row in reversed(rows)])
+
+    hits = retriever.search(chat_id, query, k, before_id)
+    if not hits:
+        return []
+    rows = db.execute(
+        select(Message.id, Message.content, Message.is_bot)
+        .where(
+            Message.chat_id == chat_id,
+            Message.id.in_([message_id for message_id, _ in hits]),
+        )
+        .order_by(Message.id)
+    ).all()
+    return [
+        {
+            'id': row.id,
+            'role': 'model' if row.is_bot else 'user',
+            'parts': [row.content],
+            'retrieved': True,
+        }
+        for row in rows
+    ]
+
+
+def get_chat_summary(db: Session, chat_id: int) -> Tuple[Optional[str], Optional[int]]:
+    """Get a chat's rolling summary and the id of the last message it covers"""
+    row = db.execute(
+        select(Chat.summary, Chat.summary_message_id).where(Chat.id == chat_id)
+    ).one_or_none()
+    return (row.summary, row.summary_message_id) if row else (None, None)
+
+
+def get_messages_to_summarize(
+    db: Session, chat_id: int, after_id: Optional[int], keep_recent: int, limit: int
+) -> List[Dict]:
+    """
+    Get messages that have left the recent window but are not summarized yet
+
+    Skips the newest `keep_recent` messages (they are sent verbatim) and
+    returns at most `limit` of the rest, the newest of them, oldest first, as
+    [{'id': message id, 'username': sender, 'content': text}].
+    """
+    stmt = (
+        select(Message.id, Message.content, Message.is_bot, User.username)
+        .outerjoin(User, User.id == Message.user_id)
+        .where(Message.chat_id == chat_id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .offset(keep_recent)
+        .limit(limit)
     )
-    participant = db.execute(stmt).scalar_one_or_none()
+    if after_id is not None:
+        stmt = stmt.where(Message.id > after_id)
+    rows = db.execute(stmt).all()
+    return [
+        {
+            'id': row.id,
+            'username': "Assistant" if row.is_bot else row.username or "Unknown",
+            'content': row.content,
+        }
+        for row in reversed(rows)
+    ]
+
+
+def save_chat_summary(
+    db: Session,
+    chat_id: int,
+    summary: str,
+    summary_message_id: int,
+    previous_message_id: Optional[int],
+) -> bool:
+    """
+    Store a chat's new rolling summary if nobody else has moved it on
+
+    Compare-and-set on summary_message_id, so two refreshes racing on the
+    same chat cannot overwrite each other. Returns True if it was saved.
+    """
+    if previous_message_id is None:
+        unchanged = Chat.summary_message_id.is_(None)
+    else:
+        unchanged = Chat.summary_message_id == previous_message_id
+    result = db.execute(
+        update(Chat)
+        .where(Chat.id == chat_id, unchanged)
+        .values(summary=summary, summary_message_id=summary_message_id)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def get_chat_bot_tier(db: Session, chat_id: int) -> Optional[str]:
+    """Get the model tier configured for /bot in a chat, if any"""
+    return db.execute(select(Chat.bot_tier).where(Chat.id == chat_id)).scalar()
+
+
+def set_chat_bot_tier(db: Session, chat_id: int, tier: Optional[str]) -> None:
+    """Set (or with None, clear) the model tier for /bot in a chat"""
+    db.execute(update(Chat).where(Chat.id == chat_id).values(bot_tier=tier))
+    db.commit()
 
-    if not participant:
-        return 0
 
-    # Count messages created after last_read_at
-    count_stmt = select(func.count(Message.id)).where(
-        Message.chat_id == chat_id,
-        Message.created_at > participant.last_read_at,
-        Message.user_id != user_id,  # Don't count user's own messages
+def get_unread_count(db: Session, chat_id: int, user_id: int) -> int:
+    """
+    Get count of unread messages in a chat for a user
+    """
+    stmt = select(ChatParticipant.unread_count).where(
+        ChatParticipant.chat_id == chat_id, ChatParticipant.user_id == user_id
     )
-    count = db.execute(count_stmt).scalar()
+    count = db.execute(stmt).scalar_one_or_none()
 
     return count or 0
 
@@ -204,6 +576,7 @@ def mark_chat_as_read(db: Session, chat_id: int, user_id: int) -> bool:
         return False
 
     participant.last_read_at = datetime.now(timezone.utc)
+    participant.unread_count = 0
     db.commit()
 
     # Also create read receipts for all unread messages in this chat
@@ -212,6 +585,88 @@ def mark_chat_as_read(db: Session, chat_id: int, user_id: int) -> bool:
     return True
 
 
+def get_chat_unread_counts(
+    db: Session, chat_id: int, user_ids: Optional[Collection[int]] = None
+) -> Dict[int, int]:
+    """
+    Get unread counters of a chat's members (user_id -> count)
+
+    Args:
+        db: Database session
+        chat_id: Chat ID
+        user_ids: Only these members (e.g. the online ones); default all
+    """
+    if user_ids is not None and not user_ids:
+        return {}
+
+    stmt = select(ChatParticipant.user_id, ChatParticipant.unread_count).where(
+        ChatParticipant.chat_id == chat_id
+    )
+    if user_ids is not None:
+        stmt = stmt.where(ChatParticipant.user_id.in_(user_ids))
+    return dict(db.execute(stmt).tuples().all())
+
+
+def reconcile_unread_counts(db: Session, chat_id: Optional[int] = None) -> int:
+    """
+    Recompute unread counters from messages and fix any that drifted
+
+    Walks participant rows in id ranges of UNREAD_RECONCILE_BATCH, one short
+    transaction per range. Each range first locks its rows, skipping any that
+    a message in flight is incrementing: the correction then counts from a
+    snapshot that includes every increment it could overwrite, and skipped
+    rows are left for the next run. (SQLite ignores the row locks; it
+    serializes writers anyway.)
+
+    Args:
+        db: Database session
+        chat_id: Limit to one chat (default: all chats)
+
+    Returns:
+        Number of participant rows corrected
+    """
+    bounds = select(func.min(ChatParticipant.id), func.max(ChatParticipant.id))
+    if chat_id is not None:
+        bounds = bounds.where(ChatParticipant.chat_id == chat_id)
+    first_id, last_id = db.execute(bounds).one()
+    if first_id is None:
+        return 0
+
+    actual_count = (
+        select(func.count(Message.id))
+        .where(
+            Message.chat_id == ChatParticipant.chat_id,
+            Message.created_at > ChatParticipant.last_read_at,
+            Message.user_id != ChatParticipant.user_id,
+        )
+        .scalar_subquery()
+    )
+    fixed = 0
+    for low in range(first_id, last_id + 1, UNREAD_RECONCILE_BATCH):
+        locked = (
+            select(ChatParticipant.id)
+            .where(ChatParticipant.id.between(low, low + UNREAD_RECONCILE_BATCH - 1))
+            .order_by(ChatParticipant.id)
+            .with_for_update(skip_locked=True)
+        )
+        if chat_id is not None:
+            locked = locked.where(ChatParticipant.chat_id == chat_id)
+        participant_ids = db.execute(locked).scalars().all()
+        if participant_ids:
+            result = db.execute(
+                update(ChatParticipant)
+                .where(
+                    ChatParticipant.id.in_(participant_ids),
+                    ChatParticipant.unread_count != actual_count,
+                )
+                .values(unread_count=actual_count)
+                .execution_options(synchronize_session=False)
+            )
+            fixed += result.rowcount
+        db.commit()
+    return fixed
+
+
 def mark_messages_as_read(db: Session, chat_id: int, user_id: int) -> None:
     """
     Mark all messages in a chat as read by a user by creating read receipts
@@ -0,0 +1,335 @@
+"""
+Message search service
+Ranked full-text search over message content
+"""
+
+import base64
+import html
+import json
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, inspect, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from services.database.models import Chat, Message, User
+
+# Text search configuration for the Postgres tsvector column
+TS_CONFIG = "english"
+MAX_SEARCH_LIMIT = 50
+# Matches ranked together: results come from windows of this many matches,
+# newest window first. Bounds the cost of common terms, whose match count
+# grows with the table, while paging still reaches every match.
+MAX_RANKED_CANDIDATES = 1000
+
+# Snippet highlight markers; swapped for <mark> tags after HTML-escaping
+_HIGHLIGHT_START = "\x02"
+_HIGHLIGHT_STOP = "\x03"
+
+_POSTGRES_DDL = [
+    f"""
+    ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('{TS_CONFIG}', coalesce(content, ''))) STORED
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_messages_search_vector
+    ON messages USING GIN (search_vector)
+    """,
+]
+
+# External-content FTS5 table kept in sync with messages by triggers
+_SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE messages_fts USING fts5(
+        content, content='messages', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER messages_fts_ai AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER messages_fts_ad AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER messages_fts_au AFTER UPDATE OF content ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+        INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    # Index the messages that already exist
+    "INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')",
+]
+
+
+def ensure_message_search_index(conn: Connection) -> bool:
+    """
+    Create the full-text index for messages if it is missing
+
+    Postgres gets a generated tsvector column with a GIN index; SQLite gets
+    an FTS5 table maintained by triggers. Runs in the caller's transaction
+    (a migration, or schema creation on an empty database). Returns True if
+    anything was built.
+    """
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        columns = {c["name"] for c in inspect(conn).get_columns("messages")}
+        if "search_vector" in columns:
+            return False
+        statements = _POSTGRES_DDL
+    elif dialect == "sqlite":
+        if inspect(conn).has_table("messages_fts"):
+            return False
+        statements = _SQLITE_DDL
+    else:
+        return False
+
+    for statement in statements:
+        conn.execute(text(statement))
+    return True
+
+
+def _fts5_query(query: str) -> str:
+    """Turn free text into an FTS5 query matching all terms, literally"""
+    terms = [term.replace('"', '""') for term in query.split()]
+    return " ".join(f'"{term}"' for term in terms)
+
+
+def _encode_cursor(rank: float, message_id: int, max_id: int) -> str:
+    raw = json.dumps([rank, message_id, max_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, int, int]:
+    """Raises ValueError for a malformed cursor"""
+    try:
+        rank, message_id, max_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(rank), int(message_id), int(max_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid search cursor") from e
+
+
+def _highlight(snippet: Optional[str]) -> str:
+    """HTML-escape a snippet, then turn the markers into <mark> tags"""
+    escaped = html.escape(snippet or "")
+    return escaped.replace(_HIGHLIGHT_START, "<mark>").replace(
+        _HIGHLIGHT_STOP, "</mark>"
+    )
+
+
+def _postgres_window(
+    db: Session, params: Dict, join: str, where: str
+) -> List[Tuple[int, float]]:
+    # Newest-first over the GIN matches, ranking only the rows kept. float8,
+    # so the rank round-trips through the cursor exactly
+    stmt = text(
+        f"""
+        SELECT hits.id, ts_rank_cd(m.search_vector, q)::float8 AS rank
+        FROM (
+            SELECT m.id
+            FROM messages m
+            {join}
+            CROSS JOIN websearch_to_tsquery('{TS_CONFIG}', :query) AS q
+            WHERE m.search_vector @@ q AND m.id <= :max_id {where}
+            ORDER BY m.id DESC
+            LIMIT :candidates
+        ) AS hits
+        JOIN messages m ON m.id = hits.id
+        CROSS JOIN websearch_to_tsquery('{TS_CONFIG}', :query) AS q
+        ORDER BY hits.id DESC
+        """
+    )
+    return db.execute(stmt, params).tuples().all()
+
+
+def _postgres_snippets(db: Session, query: str, ids: List[int]) -> Dict[int, str]:
+    stmt = text(
+        f"""
+        SELECT m.id,
+               ts_headline('{TS_CONFIG}', m.content, q,
+                           'StartSel={_HIGHLIGHT_START}, StopSel={_HIGHLIGHT_STOP}, '
+                           'MaxWords=30, MinWords=10, MaxFragments=2')
+        FROM messages m
+        CROSS JOIN websearch_to_tsquery('{TS_CONFIG}', :query) AS q
+        WHERE m.id IN :ids
+        """
+    ).bindparams(bindparam("ids", expanding=True))
+    return dict(db.execute(stmt, {"query": query, "ids": ids}).tuples().all())
+
+
+def _sqlite_window(
+    db: Session, params: Dict, join: str, where: str
+) -> List[Tuple[int, float]]:
+    # FTS5 walks its doclist newest-first here, so the scan stops after the
+    # window. Its rank column is bm25(), lower-is-better; negate it so scores
+    # sort the same way as on Postgres (higher first). Unlike ts_rank_cd it
+    # depends on corpus statistics, so writes between pages can nudge scores
+    # and reorder a few hits across the page boundary.
+    stmt = text(
+        f"""
+        SELECT messages_fts.rowid, -messages_fts.rank
+        FROM messages_fts
+        JOIN messages m ON m.id = messages_fts.rowid
+        {join}
+        WHERE messages_fts MATCH :query AND messages_fts.rowid <= :max_id {where}
+        ORDER BY messages_fts.rowid DESC
+        LIMIT :candidates
+        """
+    )
+    params = dict(params, query=_fts5_query(params["query"]))
+    return db.execute(stmt, params).tuples().all()
+
+
+def _sqlite_snippets(db: Session, query: str, ids: List[int]) -> Dict[int, str]:
+    stmt = text(
+        """
+        SELECT rowid, snippet(messages_fts, 0, char(2), char(3), '…', 16)
+        FROM messages_fts
+        WHERE messages_fts MATCH :query AND rowid IN :ids
+        """
+    ).bindparams(bindparam("ids", expanding=True))
+    return dict(
+        db.execute(stmt, {"query": _fts5_query(query), "ids": ids}).tuples().all()
+    )
+
+
+def _attach_details(db: Session, hits: List[Dict]) -> List[Dict]:
+    """Add message, sender and chat fields to a page of hits, keeping order"""
+    if not hits:
+        return []
+    stmt = (
+        select(
+            Message.id,
+            Message.chat_id,
+            Chat.name.label("chat_name"),
+            Message.user_id,
+            User.username,
+            Message.is_bot,
+            Message.created_at,
+        )
+        .join(Chat, Chat.id == Message.chat_id)
+        .outerjoin(User, User.id == Message.user_id)
+        .where(Message.id.in_([hit["id"] for hit in hits]))
+    )
+    details = {row.id: row._mapping for row in db.execute(stmt)}
+    results = []
+    for hit in hits:
+        row = details.get(hit["id"])
+        if row is None:  # Deleted between the two queries
+            continue
+        results.append(
+            {
+                **row,
+                "username": row["username"] or "AI Assistant",
+                "snippet": _highlight(hit["snippet"]),
+            }
+        )
+    return results
+
+
+def search_messages(
+    db: Session,
+    user_id: int,
+    query: str,
+    chat_id: Optional[int] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Search message content in one chat or across the user's chats
+
+    Matches are ranked by relevance in windows of MAX_RANKED_CANDIDATES, the
+    newest window first, so a page costs about the same whether the table
+    holds 1M or 10M messages. Paging runs through each window in rank order,
+    then on to the next older one, so every match is reached. The keyset
+    cursor over (rank, id) also holds the newest message id of its window,
+    which starts at the newest message id at the first page, so messages
+    sent while paging stay out of later pages.
+
+    Args:
+        user_id: Searching user; only chats they belong to are searched
+        query: Free-text query
+        chat_id: Restrict to this chat (membership is checked by the caller)
+        limit: Page size, capped at MAX_SEARCH_LIMIT
+        cursor: next_cursor from the previous page
+
+    Returns:
+        (results, next_cursor); next_cursor is None on the last page
+
+    Raises:
+        ValueError: For a malformed cursor
+        NotImplementedError: On a database without a full-text index
+    """
+    if not query.split():
+        return [], None
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        window, snippets = _postgres_window, _postgres_snippets
+    elif dialect == "sqlite":
+        window, snippets = _sqlite_window, _sqlite_snippets
+    else:
+        raise NotImplementedError(f"Message search is not supported on {dialect}")
+
+    limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+    # One extra match tells us whether there is an older window
+    params = {"query": query, "candidates": MAX_RANKED_CANDIDATES + 1}
+    if chat_id is not None:
+        join, where = "", "AND m.chat_id = :chat_id"
+        params["chat_id"] = chat_id
+    else:
+        join = (
+            "JOIN chat_participants cp "
+            "ON cp.chat_id = m.chat_id AND cp.user_id = :user_id"
+        )
+        where = ""
+        params["user_id"] = user_id
+    after = None
+    if cursor:
+        after_rank, after_id, params["max_id"] = _decode_cursor(cursor)
+        after = (after_rank, after_id)
+    else:
+        # Pin the result set: later pages rank the same matches as new
+        # messages arrive
+        params["max_id"] = db.execute(select(func.max(Message.id))).scalar() or 0
+
+    # One extra hit tells us whether there is a next page
+    hits: List[Dict] = []
+    while True:
+        matches = window(db, params, join, where)
+        older = matches[MAX_RANKED_CANDIDATES:]
+        ranked = sorted(
+            (
+                (rank, message_id)
+                for message_id, rank in matches[:MAX_RANKED_CANDIDATES]
+            ),
+            reverse=True,
+        )
+        if after is not None:
+            ranked = [key for key in ranked if key < after]
+        for rank, message_id in ranked[: limit + 1 - len(hits)]:
+            hits.append({"id": message_id, "rank": rank, "max_id": params["max_id"]})
+        if len(hits) > limit or not older:
+            break
+        # Window used up: continue with the older matches
+        params["max_id"] = older[0][0]
+        after = None
+
+    next_cursor = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        last = hits[-1]
+        next_cursor = _encode_cursor(last["rank"], last["id"], last["max_id"])
+
+    if hits:
+        # Snippets only for the page, not for every match
+        found = snippets(db, query, [hit["id"] for hit in hits])
+        for hit in hits:
+            hit["snippet"] = found.get(hit["id"])
+    return _attach_details(db, hits), next_cursor
@@ -2,7 +2,17 @@
 Database service - Models
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    DateTime,
+    ForeignKey,
+    Text,
+    Boolean,
+    Index,
+    JSON,
+)
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from shared.database import Base
@@ -39,6 +49,25 @@ class Chat(Base):
     created_at = Column(DateTime(timezone=True), default=utc_now)
     is_group = Column(Boolean, default=False)
 
+    # Denormalized pointer to the latest message, maintained on write so the
+    # chat list never has to aggregate over messages. Not a foreign key, to
+    # avoid a chats <-> messages dependency cycle.
+    last_message_id = Column(Integer, nullable=True)
+    # Defaults to created_at so chats without messages still sort by recency
+    last_message_at = Column(DateTime(timezone=True), default=utc_now, index=True)
+    last_message_preview = Column(String, nullable=True)
+
+    # Rolling summary of the conversation for the bot, covering every message
+    # up to and including summary_message_id (maintained in the background)
+    summary = Column(Text, nullable=True)
+    summary_message_id = Column(Integer, nullable=True)
+    # Model tier for /bot in this chat ("lite", "standard", "deep"); None
+    # lets the router choose per request
+    bot_tier = Column(String, nullable=True)
+    # Bumped by every membership change, so processes caching the member ids
+    # (chat_service.get_chat_member_ids) notice changes made elsewhere
+    members_version = Column(Integer, nullable=False, default=0, server_default="0")
+
     # Relationships
     owner = relationship("User", back_populates="owned_chats", foreign_keys=[owner_id])
     participants = relationship(
@@ -51,14 +80,23 @@ class Chat(Base):
 
 class ChatParticipant(Base):
     __tablename__ = "chat_participants"
+    __table_args__ = (
+        # One row per member. Also serves membership lookups by chat (fan-out,
+        # is_participant, unread counters) and ON CONFLICT for bulk adds.
+        Index(
+            "ux_chat_participants_chat_id_user_id", "chat_id", "user_id", unique=True
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     chat_id = Column(Integer, ForeignKey("chats.id"), nullable=False)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     joined_at = Column(DateTime(timezone=True), default=utc_now)
     last_read_at = Column(
         DateTime(timezone=True), default=utc_now
     )  # Track when user last read messages
+    # Messages from others since last_read_at, maintained incrementally
+    unread_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationships
     chat = relationship("Chat", back_populates="participants")
@@ -67,6 +105,10 @@ class ChatParticipant(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Per-chat history in time order (chat view, backfill, Gemini context)
+        Index("ix_messages_chat_id_created_at", "chat_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     chat_id = Column(Integer, ForeignKey("chats.id"), nullable=False)
@@ -76,6 +118,9 @@ class Message(Base):
     content = Column(Text, nullable=False)
     is_bot = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), default=utc_now)
+    # Model, token counts and latency of a bot reply, stored with its final
+    # content
+    bot_usage = Column(JSON, nullable=True)
 
     # Relationships
     chat = relationship("Chat", back_populates="messages")
@@ -96,3 +141,39 @@ class MessageReadReceipt(Base):
     # Relationships
     message = relationship("Message", back_populates="read_receipts")
     user = relationship("User")
+
+
+class BotUsage(Base):
+    """Hourly rollup of /bot usage per user, chat and model"""
+
+    __tablename__ = "bot_usage"
+    __table_args__ = (
+        # One row per hour, user, chat and model; the target of the periodic
+        # upsert, and serves time-range reports
+        Index(
+            "ux_bot_usage_bucket_user_chat_model",
+            "bucket",
+            "user_id",
+            "chat_id",
+            "model",
+            unique=True,
+        ),
+        # Daily quota lookups for one user or one chat
+        Index("ix_bot_usage_user_id_bucket", "user_id", "bucket"),
+        Index("ix_bot_usage_chat_id_bucket", "chat_id", "bucket"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    # Start of the hour (UTC). No foreign keys: usage outlives deleted chats
+    bucket = Column(DateTime(timezone=True), nullable=False)
+    user_id = Column(Integer, nullable=False)
+    chat_id = Column(Integer, nullable=False)
+    model = Column(String, nullable=False)
+
+    requests = Column(Integer, nullable=False, default=0)
+    errors = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    cached_tokens = Column(Integer, nullable=False, default=0)
+    output_tokens = Column(Integer, nullable=False, default=0)
+    # Summed; divide by requests for the average
+    latency_ms = Column(Integer, nullable=False, default=0)
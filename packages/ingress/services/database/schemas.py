@@ -2,9 +2,14 @@
 Database service - Pydantic Schemas
 """
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
-from typing import Optional, List
+from typing import Literal, Optional, List
+
+from shared.serialization import row_list_adapter
+
+# Most usernames accepted by one bulk invite
+MAX_BULK_INVITE = 500
 
 
 # User schemas
@@ -52,17 +57,33 @@ class ChatInvite(BaseModel):
     username: str
 
 
+class ChatBulkInvite(BaseModel):
+    usernames: List[str] = Field(min_length=1, max_length=MAX_BULK_INVITE)
+
+
+class ChatBulkInviteResult(BaseModel):
+    added: List[str]
+    already_members: List[str]
+    not_found: List[str]
+
+
 class ChatResponse(BaseModel):
     id: int
     name: Optional[str]
     owner_id: int
     created_at: datetime
     is_group: bool
+    bot_tier: Optional[str] = None
 
     class Config:
         from_attributes = True
 
 
+class ChatBotSettings(BaseModel):
+    # Model tier for /bot in this chat; None lets the router choose
+    tier: Optional[Literal["lite", "standard", "deep"]] = None
+
+
 class ChatWithUnreadCount(ChatResponse):
     unread_count: int = 0
     last_message: Optional[str] = None
@@ -94,6 +115,30 @@ class MessageResponse(MessageBase):
         from_attributes = True
 
 
+# Message search schemas
+class MessageSearchHit(BaseModel):
+    id: int
+    chat_id: int
+    chat_name: Optional[str]
+    user_id: Optional[int]
+    username: Optional[str]
+    is_bot: bool
+    created_at: datetime
+    snippet: str  # HTML-escaped, matches wrapped in <mark>
+
+
+class MessageSearchResults(BaseModel):
+    results: List[MessageSearchHit]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page
+
+
+# Row adapters for list endpoints that dump dicts directly
+# (see shared.serialization.json_list_response)
+user_list_adapter = row_list_adapter(UserResponse)
+chat_list_adapter = row_list_adapter(ChatWithUnreadCount)
+message_list_adapter = row_list_adapter(MessageResponse)
+
+
 # WebSocket message types
 class WSMessage(BaseModel):
     type: str  # 'message', 'bot_command', 'typing', 'join', 'leave'
@@ -2,6 +2,27 @@
 Gemini service initialization
 """
 
+from .context_builder import ContextBuilder, estimate_tokens
+from .context_cache import ContextCache
 from .gemini_service import GeminiService, gemini_service
+from .providers import FakeProvider, build_client
+from .resilience import CircuitBreaker, CircuitOpenError, ResilientCaller
+from .router import ModelRouter, Route, parse_bot_command
+from .summarizer import ConversationSummarizer
 
-__all__ = ['GeminiService', 'gemini_service']
+__all__ = [
+    'ContextBuilder',
+    'estimate_tokens',
+    'ContextCache',
+    'GeminiService',
+    'gemini_service',
+    'FakeProvider',
+    'build_client',
+    'CircuitBreaker',
+    'CircuitOpenError',
+    'ResilientCaller',
+    'ModelRouter',
+    'Route',
+    'parse_bot_command',
+    'ConversationSummarizer',
+]
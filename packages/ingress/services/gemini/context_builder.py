@@ -0,0 +1,258 @@
+"""
+Gemini Context Builder
+Assembles prompts from chat history within a token budget
+"""
+
+import math
+from typing import Dict, List, Optional, Tuple
+
+from cachetools import LRUCache
+from google.genai import types
+
+from shared.config import (
+    GEMINI_CACHE_TURN_BLOCK,
+    GEMINI_CONTEXT_MESSAGE_TOKENS,
+    GEMINI_CONTEXT_TOKENS,
+    RETRIEVAL_CONTEXT_TOKENS,
+    TOKEN_COUNT_CACHE_SIZE,
+)
+
+# English text averages about four characters per token
+CHARS_PER_TOKEN = 4
+# Role label and separators around each turn ("User: ...\n\n")
+TURN_OVERHEAD_TOKENS = 4
+TRUNCATION_MARKER = "\n[…truncated…]\n"
+SUMMARY_LABEL = "Summary of the earlier conversation: "
+RETRIEVED_LABEL = "Earlier messages that may be relevant:\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate token count without a tokenizer
+
+    ASCII text counts CHARS_PER_TOKEN characters per token; every other
+    character counts as a token of its own, which overestimates accented
+    Latin a little and keeps CJK text from being undercounted.
+    """
+    non_ascii = len(text) - len(text.encode("ascii", "ignore"))
+    return math.ceil((len(text) - non_ascii) / CHARS_PER_TOKEN) + non_ascii
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Shorten text to at most max_tokens, keeping its start and its end
+
+    The middle is replaced by TRUNCATION_MARKER; the start usually says what
+    a message is about and the end holds its conclusion or question.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens - estimate_tokens(TRUNCATION_MARKER)
+    if budget <= 0:
+        return ""
+    # Scale by the text's own characters-per-token, then trim until it fits
+    keep = len(text) * budget // estimate_tokens(text)
+    while keep > 0:
+        head = keep * 2 // 3
+        tail = keep - head
+        shortened = text[:head] + TRUNCATION_MARKER + (text[-tail:] if tail else "")
+        if estimate_tokens(shortened) <= max_tokens:
+            return shortened
+        keep -= max(1, keep // 10)
+    return ""
+
+
+class ContextBuilder:
+    """
+    Builds Gemini prompts from the newest chat turns that fit a token budget
+
+    Token counts are cached per stored message, so a busy chat's history is
+    not re-measured on every /bot call.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = GEMINI_CONTEXT_TOKENS,
+        max_message_tokens: int = GEMINI_CONTEXT_MESSAGE_TOKENS,
+        cache_size: int = TOKEN_COUNT_CACHE_SIZE,
+        max_retrieved_tokens: int = RETRIEVAL_CONTEXT_TOKENS,
+        cache_turn_block: int = GEMINI_CACHE_TURN_BLOCK,
+    ):
+        self.max_tokens = max_tokens
+        self.max_message_tokens = max_message_tokens
+        self.max_retrieved_tokens = max_retrieved_tokens
+        self.cache_turn_block = cache_turn_block
+        # (message id, content length) -> token count; the length guards
+        # against a bot placeholder that was counted before it was filled
+        self._token_counts: LRUCache = LRUCache(maxsize=cache_size)
+        self.stats = {"cache_hits": 0, "cache_misses": 0, "truncated": 0}
+
+    def count_tokens(self, text: str, message_id: Optional[int] = None) -> int:
+        """Estimated tokens in text, cached when it is a stored message"""
+        if message_id is None:
+            return estimate_tokens(text)
+        key = (message_id, len(text))
+        count = self._token_counts.get(key)
+        if count is None:
+            self.stats["cache_misses"] += 1
+            count = self._token_counts[key] = estimate_tokens(text)
+        else:
+            self.stats["cache_hits"] += 1
+        return count
+
+    def _fit(self, text: str, max_tokens: int, message_id: Optional[int] = None):
+        """(text, tokens) with text truncated to max_tokens if needed"""
+        tokens = self.count_tokens(text, message_id)
+        if tokens <= max_tokens:
+            return text, tokens
+        self.stats["truncated"] += 1
+        text = truncate_to_tokens(text, max_tokens)
+        return text, estimate_tokens(text)
+
+    def _select(
+        self, message: str, history: Optional[List[Dict]], reserved: int
+    ) -> Tuple[str, Optional[str], List[Tuple[str, str]], List[Tuple[str, str]]]:
+        """
+        Pick what fits the budget: (message, summary, recalled, turns)
+
+        `reserved` tokens are set aside for the prompt's fixed framing.
+        Recalled messages and turns are (role, content) pairs, oldest first.
+        """
+        budget = self.max_tokens - reserved
+        message, tokens = self._fit(message, max(0, budget))
+        budget -= tokens
+
+        # A rolling summary of older messages goes first, ahead of the
+        # recent turns, if it fits (it is sized like one long message)
+        history = list(history or [])
+        summary = None
+        if history and history[0].get('summary'):
+            text, tokens = self._fit(
+                history.pop(0)['parts'][0], self.max_message_tokens
+            )
+            tokens += estimate_tokens(SUMMARY_LABEL + "\n\n")
+            if tokens <= budget:
+                budget -= tokens
+                summary = text
+
+        # Recalled older messages come next, within their own share of the
+        # budget so they cannot crowd out the recent turns
+        recalled = []
+        candidates = []
+        while history and history[0].get('retrieved'):
+            candidates.append(history.pop(0))
+        if candidates:
+            share = min(budget, self.max_retrieved_tokens)
+            share -= estimate_tokens(RETRIEVED_LABEL)
+            for msg in candidates:
+                content, tokens = self._fit(
+                    msg['parts'][0], self.max_message_tokens, msg.get('id')
+                )
+                if tokens + TURN_OVERHEAD_TOKENS > share:
+                    continue
+                share -= tokens + TURN_OVERHEAD_TOKENS
+                budget -= tokens + TURN_OVERHEAD_TOKENS
+                recalled.append((msg['role'], content))
+            if recalled:
+                budget -= estimate_tokens(RETRIEVED_LABEL)
+
+        # Newest turns first, stopping at the first one that does not fit,
+        # so the kept history is contiguous with the question
+        turns = []
+        for msg in reversed(history):
+            content = msg['parts'][0] if msg['parts'] else ""
+            content, tokens = self._fit(content, self.max_message_tokens, msg.get('id'))
+            if tokens + TURN_OVERHEAD_TOKENS > budget:
+                break
+            budget -= tokens + TURN_OVERHEAD_TOKENS
+            turns.append((msg['role'], content))
+        turns.reverse()
+
+        return message, summary, recalled, turns
+
+    def build(self, message: str, history: Optional[List[Dict]] = None) -> str:
+        """
+        Build the prompt for `message` with as much recent history as fits
+
+        Args:
+            message: The user's message; always included, truncated to the
+                budget if it is larger on its own
+            history: Chat history, oldest first, in Gemini format
+                [{'id': ..., 'role': 'user'/'model', 'parts': [text]}], optionally
+                led by a rolling summary marked 'summary': True and then by
+                recalled older messages marked 'retrieved': True
+
+        Returns:
+            Prompt text of at most max_tokens estimated tokens
+        """
+        closing = "\n\nAssistant:"
+        message, summary, recalled, turns = self._select(
+            message, history, estimate_tokens("User: " + closing)
+        )
+        preamble = f"{SUMMARY_LABEL}{summary}\n\n" if summary else ""
+        if recalled:
+            preamble += RETRIEVED_LABEL + _render_turns(recalled)
+        return preamble + _render_turns(turns) + f"User: {message}{closing}"
+
+    def build_contents(
+        self,
+        message: str,
+        history: Optional[List[Dict]] = None,
+        instructions: str = "",
+    ) -> Tuple[Optional[str], List[types.Content], List[types.Content]]:
+        """
+        Build role-tagged turns for `message` with as much history as fits
+
+        Same selection and budget as build(), but the model gets real
+        user/model turns instead of one flattened string, and the stable part
+        of the prompt is returned separately so it can be cached: the system
+        instruction (`instructions` plus the rolling summary) and the oldest
+        turns, when they are anchored to the summary. That is when history
+        is led by a summary and every turn after it fits; those turns then
+        only change when the summary is refreshed. They are taken in whole
+        blocks of cache_turn_block, so the prefix moves once per block.
+
+        Returns:
+            (system instruction or None, stable leading turns, the rest of
+            the contents ending with the question); the prompt is the stable
+            turns followed by the rest
+        """
+        message, summary, recalled, turns = self._select(
+            message, history, estimate_tokens(instructions) + TURN_OVERHEAD_TOKENS
+        )
+        system = [instructions] if instructions else []
+        if summary:
+            system.append(SUMMARY_LABEL + summary)
+
+        anchored = summary is not None and len(turns) == sum(
+            1 for msg in history if not msg.get('summary') and not msg.get('retrieved')
+        )
+        block = max(self.cache_turn_block, 1)
+        split = len(turns) // block * block if anchored else 0
+
+        stable: List[types.Content] = []
+        for role, content in turns[:split]:
+            _append_turn(stable, role, content)
+        contents: List[types.Content] = []
+        if recalled:
+            _append_turn(contents, 'user', RETRIEVED_LABEL + _render_turns(recalled))
+        for role, content in turns[split:]:
+            _append_turn(contents, role, content)
+        _append_turn(contents, 'user', message)
+        return "\n\n".join(system) or None, stable, contents
+
+
+def _render_turns(turns: List[Tuple[str, str]]) -> str:
+    return "".join(
+        f"{'User' if role == 'user' else 'Assistant'}: {content}\n\n"
+        for role, content in turns
+    )
+
+
+def _append_turn(contents: List[types.Content], role: str, text: str) -> None:
+    """Add a turn, merging it into the previous one if the role repeats"""
+    role = 'user' if role == 'user' else 'model'
+    if contents and contents[-1].role == role:
+        contents[-1].parts.append(types.Part(text=text))
+    else:
+        contents.append(types.Content(role=role, parts=[types.Part(text=text)]))
@@ -0,0 +1,187 @@
+"""
+Gemini Context Cache
+Reuses server-side cached contents for stable prompt prefixes
+"""
+
+import asyncio
+import hashlib
+import time
+from typing import Dict, List, Optional
+
+from google.genai import types
+
+from shared.config import GEMINI_CACHE_MIN_TOKENS, GEMINI_CACHE_TTL_SECONDS
+from .context_builder import estimate_tokens
+
+# A cache this close to expiring is not handed out; a new one is created
+EXPIRY_MARGIN_SECONDS = 10
+
+
+class _Entry:
+    __slots__ = ("name", "expires_at")
+
+    def __init__(self, name: str, expires_at: float):
+        self.name = name
+        self.expires_at = expires_at
+
+
+class ContextCache:
+    """
+    Creates, extends and retires Gemini cached contents
+
+    A cached content holds a system instruction (instructions plus a chat's
+    rolling summary) and the stable turns that follow it, so requests only
+    send the turns after those and the model does not re-read the prefix at
+    full price on every /bot call.
+
+    TTLs are managed locally: a cache used in the second half of its TTL is
+    extended, one that is about to expire is replaced, and when a scope (a
+    chat) moves on to a new prefix its previous cache is deleted instead of
+    being left to expire.
+    """
+
+    def __init__(
+        self,
+        client,
+        ttl_seconds: int = GEMINI_CACHE_TTL_SECONDS,
+        min_tokens: int = GEMINI_CACHE_MIN_TOKENS,
+        clock=time.monotonic,
+    ):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        self.clock = clock
+        self._entries: Dict[str, _Entry] = {}
+        # scope -> key of the cache it used last
+        self._scopes: Dict[str, str] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # Prefixes that failed to cache are not retried until this time
+        self._failed_until: Dict[str, float] = {}
+        self.stats = {
+            "hits": 0,
+            "creates": 0,
+            "refreshes": 0,
+            "deletes": 0,
+            "errors": 0,
+        }
+
+    @staticmethod
+    def _key(model: str, system_instruction: str, contents: List[types.Content]) -> str:
+        digest = hashlib.sha256(f"{model}\0{system_instruction}".encode())
+        for content in contents:
+            digest.update(b"\0" + content.model_dump_json().encode())
+        return digest.hexdigest()
+
+    async def get(
+        self,
+        model: str,
+        system_instruction: str,
+        scope: Optional[str] = None,
+        contents: Optional[List[types.Content]] = None,
+    ) -> Optional[str]:
+        """
+        Name of a live cached content for this prefix, or None to send it inline
+
+        Args:
+            model: Model the cache is for (caches are model-specific)
+            system_instruction: The stable prefix
+            scope: Who uses the prefix (e.g. "chat:42"); their previous
+                cache is deleted once they move on to a new prefix
+            contents: Stable turns that follow the system instruction
+        """
+        contents = contents or []
+        tokens = estimate_tokens(system_instruction) + sum(
+            estimate_tokens(part.text or "") for c in contents for part in c.parts
+        )
+        if tokens < self.min_tokens:
+            return None
+        key = self._key(model, system_instruction, contents)
+        if self._failed_until.get(key, 0) > self.clock():
+            return None
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            try:
+                name = await self._get_locked(
+                    key, model, system_instruction, contents, scope
+                )
+            except Exception as e:
+                self.stats["errors"] += 1
+                self._failed_until[key] = self.clock() + self.ttl_seconds
+                print(f"Error caching Gemini context: {e}")
+                return None
+
+        if scope is not None:
+            previous = self._scopes.get(scope)
+            self._scopes[scope] = key
+            if previous is not None and previous != key:
+                await self._delete(previous)
+        return name
+
+    async def _get_locked(
+        self,
+        key: str,
+        model: str,
+        system_instruction: str,
+        contents: List[types.Content],
+        scope: Optional[str],
+    ) -> str:
+        now = self.clock()
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at - now > EXPIRY_MARGIN_SECONDS:
+            if entry.expires_at - now < self.ttl_seconds / 2:
+                await self.client.aio.caches.update(
+                    name=entry.name,
+                    config=types.UpdateCachedContentConfig(ttl=f"{self.ttl_seconds}s"),
+                )
+                entry.expires_at = now + self.ttl_seconds
+                self.stats["refreshes"] += 1
+            self.stats["hits"] += 1
+            return entry.name
+
+        self._prune(now)
+        cached = await self.client.aio.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                system_instruction=system_instruction,
+                contents=contents or None,
+                ttl=f"{self.ttl_seconds}s",
+                display_name=scope,
+            ),
+        )
+        self._entries[key] = _Entry(cached.name, now + self.ttl_seconds)
+        self.stats["creates"] += 1
+        return cached.name
+
+    def _prune(self, now: float) -> None:
+        """Forget caches that have expired on the server anyway"""
+        for key in [k for k, e in self._entries.items() if e.expires_at <= now]:
+            del self._entries[key]
+        for key in [k for k, until in self._failed_until.items() if until <= now]:
+            del self._failed_until[key]
+        for scope in [s for s, k in self._scopes.items() if k not in self._entries]:
+            del self._scopes[scope]
+        for key in [
+            k
+            for k, lock in self._locks.items()
+            if k not in self._entries and not lock.locked()
+        ]:
+            del self._locks[key]
+
+    async def _delete(self, key: str) -> None:
+        # Still in use by another scope (e.g. the shared instructions alone)
+        if key in self._scopes.values():
+            return
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        try:
+            await self.client.aio.caches.delete(name=entry.name)
+            self.stats["deletes"] += 1
+        except Exception as e:
+            print(f"Error deleting Gemini cached content: {e}")
+
+    def invalidate(self, name: str) -> None:
+        """Forget a cache the API no longer accepts (e.g. expired early)"""
+        for key in [k for k, e in self._entries.items() if e.name == name]:
+            del self._entries[key]
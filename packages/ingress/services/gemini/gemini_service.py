@@ -3,90 +3,288 @@ Gemini AI Service
 Handles integration with Google's Gemini API for AI responses
 """
 
-from google import genai
-from google.genai import types
-from typing import AsyncGenerator, List, Dict
-from shared.config import GEMINI_API_KEY, GEMINI_MODEL
+import time
+from functools import partial
+from google.genai import errors, types
+from typing import AsyncGenerator, List, Dict, Optional, Tuple
+from shared.config import (
+    GEMINI_CACHE_ENABLED,
+    GEMINI_MODEL,
+    GEMINI_SYSTEM_INSTRUCTION,
+)
+from .context_builder import ContextBuilder, estimate_tokens
+from .context_cache import ContextCache
+from .providers import build_client
+from .resilience import CircuitOpenError, ResilientCaller
+from .router import ModelRouter, Route
+
+APOLOGY = "I apologize, but I'm having trouble processing your request right now. Please try again in a moment."
+UNAVAILABLE = "The assistant is temporarily unavailable. Please try again in about {seconds} seconds."
+INTERRUPTED = "\n\n[The response was interrupted. Please try again.]"
+# Statuses the API may answer with, besides NOT_FOUND, when a request's
+# cached content has expired or been deleted (INVALID_ARGUMENT,
+# PERMISSION_DENIED); those also cover unrelated errors, so the message
+# must name the cached content too
+CACHE_MISSING_AMBIGUOUS_CODES = frozenset({400, 403})
+
+
+def is_missing_cache(error: BaseException) -> bool:
+    """Whether a request failed because its cached content is gone"""
+    if not isinstance(error, errors.ClientError):
+        return False
+    if error.code == 404:
+        return True
+    message = (error.message or "").lower().replace(" ", "")
+    return error.code in CACHE_MISSING_AMBIGUOUS_CODES and "cachedcontent" in message
 
 
 class GeminiService:
     """Service for interacting with Gemini API"""
 
-    def __init__(self):
-        if not GEMINI_API_KEY:
-            raise ValueError("GEMINI_API_KEY environment variable is required")
-        self.client = genai.Client(api_key=GEMINI_API_KEY)
-        self.model_name = GEMINI_MODEL
+    def __init__(
+        self,
+        client=None,
+        model_name: str = GEMINI_MODEL,
+        resilience: Optional[ResilientCaller] = None,
+        router: Optional[ModelRouter] = None,
+    ):
+        # The Gemini API, or the fake provider when GEMINI_PROVIDER=fake
+        self.client = client if client is not None else build_client()
+        self.model_name = model_name
+        self.instructions = GEMINI_SYSTEM_INSTRUCTION
+        # Fits history into the prompt token budget
+        self.context_builder = ContextBuilder()
+        # Server-side caching of the stable prompt prefix, when enabled
+        self.context_cache = ContextCache(self.client) if GEMINI_CACHE_ENABLED else None
+        # Timeouts, retries, hedging and the circuit breaker
+        self.resilience = resilience or ResilientCaller()
+        # One caller (and breaker) per model, so a failing tier does not
+        # shut out the others
+        self.callers: Dict[str, ResilientCaller] = {model_name: self.resilience}
+        # Model tiers for /bot requests, with per-model latency
+        self.router = router or ModelRouter()
+        # Token usage as reported by the API
+        self.stats = {
+            "requests": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "output_tokens": 0,
+        }
+
+    async def _prepare(
+        self,
+        message: str,
+        history: Optional[List[Dict]],
+        cache_scope: Optional[str],
+        use_cache: bool = True,
+        model: Optional[str] = None,
+    ) -> Tuple[List[types.Content], types.GenerateContentConfig, Optional[str]]:
+        """(contents, config, cached content name) for a request"""
+        model = model or self.model_name
+        system, stable, contents = self.context_builder.build_contents(
+            message, history, self.instructions
+        )
+        cached = None
+        if system and use_cache and self.context_cache is not None:
+            cached = await self.context_cache.get(model, system, cache_scope, stable)
+        if cached:
+            # The prefix lives in the cache; only the turns after it are sent
+            config = types.GenerateContentConfig(cached_content=cached)
+        else:
+            config = types.GenerateContentConfig(system_instruction=system)
+            contents = stable + contents
+        return contents, config, cached
+
+    def resilience_for(self, model: str) -> ResilientCaller:
+        """The resilient caller for a model, created on first use"""
+        caller = self.callers.get(model)
+        if caller is None:
+            caller = self.callers[model] = self.resilience.clone()
+        return caller
+
+    async def _open(
+        self,
+        model: str,
+        message: str,
+        history: Optional[List[Dict]],
+        cache_scope: Optional[str],
+    ):
+        """Start a stream on a model: (first chunk, rest of the chunks)"""
+        caller = self.resilience_for(model)
+        for use_cache in (True, False):
+            contents, config, cached = await self._prepare(
+                message, history, cache_scope, use_cache, model
+            )
+            request = partial(
+                self.client.aio.models.generate_content_stream,
+                model=model,
+                contents=contents,
+                config=config,
+            )
+            try:
+                first, chunks = await caller.open_stream(request)
+                return first, caller.iterate(chunks)
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                # A cache can vanish before its local TTL; retry uncached.
+                # Other failures already went through the retry policy
+                if cached and is_missing_cache(e):
+                    self.context_cache.invalidate(cached)
+                    continue
+                raise
+
+    def _record_usage(self, usage) -> None:
+        self.stats["requests"] += 1
+        if usage is None:
+            return
+        self.stats["prompt_tokens"] += usage.prompt_token_count or 0
+        self.stats["cached_tokens"] += usage.cached_content_token_count or 0
+        self.stats["output_tokens"] += usage.candidates_token_count or 0
 
     async def generate_stream_response(
-        self, message: str, history: List[Dict] = None
+        self,
+        message: str,
+        history: List[Dict] = None,
+        cache_scope: Optional[str] = None,
+        route: Optional[Route] = None,
+        usage: Optional[Dict] = None,
     ) -> AsyncGenerator[str, None]:
         """
         Generate streaming response from Gemini
 
         Args:
             message: The user's message
-            history: Chat history in Gemini format [{'role': 'user'/'model', 'parts': [text]}]
+            history: Chat history, oldest first, in Gemini format [{'role': 'user'/'model', 'parts': [text]}]
+            cache_scope: Owner of the prompt prefix (e.g. "chat:42"), so its
+                previous cached content is retired when the prefix changes
+            route: Models to try in order (from the router); a model that
+                fails before its first token falls back to the next one.
+                Defaults to the service's own model
+            usage: Filled in when the stream ends with the model used, its
+                prompt, cached and output tokens, first_token_ms, latency_ms
+                and whether the call failed (error)
 
         Yields:
             Chunks of the response text
         """
+        models = route.models if route is not None else [self.model_name]
+        model = None
+        streamed = False
+        failed = False
+        requested = time.monotonic()
+        first_token_at = None
+        metadata = None
+        # Estimated from the text when the API reports no usage
+        estimated_tokens = 0
         try:
-            # Build conversation history as a simple string if history exists
-            # Gemini 2.5 Flash works better with string content
-            conversation_context = ""
-            if history:
-                for msg in history[-10:]:  # Last 10 messages for context
-                    role = "User" if msg['role'] == 'user' else "Assistant"
-                    content = msg['parts'][0] if msg['parts'] else ""
-                    conversation_context += f"{role}: {content}\n\n"
-
-            # Combine context with current message
-            full_prompt = conversation_context + f"User: {message}\n\nAssistant:"
-
-            # Generate streaming response with simple string content
-            response = self.client.models.generate_content_stream(
-                model=self.model_name, contents=full_prompt
-            )
+            # Role-tagged turns that fit the token budget, via the async
+            # client so the event loop keeps serving other rooms meanwhile
+            for index, model in enumerate(models):
+                started = time.monotonic()
+                try:
+                    first, rest = await self._open(model, message, history, cache_scope)
+                except Exception as e:
+                    if not isinstance(e, CircuitOpenError):
+                        self.router.record_failure(model)
+                    if index + 1 == len(models):
+                        raise
+                    print(f"Gemini model {model} failed ({e!r}); falling back")
+                    self.router.record_fallback()
+                    continue
 
-            # Stream the response
-            for chunk in response:
-                if chunk.text:
-                    yield chunk.text
+                first_token_at = time.monotonic()
+                chunk = first
+                while chunk is not None:
+                    if chunk.usage_metadata:
+                        metadata = chunk.usage_metadata
+                    if chunk.text:
+                        streamed = True
+                        estimated_tokens += estimate_tokens(chunk.text)
+                        yield chunk.text
+                    chunk = await anext(rest, None)
+                self._record_usage(metadata)
+                self.router.record_success(
+                    model,
+                    first_token_at - started,
+                    (metadata and metadata.candidates_token_count) or estimated_tokens,
+                    time.monotonic() - first_token_at,
+                )
+                return
 
-        except Exception:
-            yield "I apologize, but I'm having trouble processing your request right now. Please try again in a moment."
+        except CircuitOpenError as e:
+            failed = True
+            # Fail fast and tell the room, instead of queueing on a dead upstream
+            yield UNAVAILABLE.format(seconds=max(1, round(e.retry_after)))
+        except Exception as e:
+            failed = True
+            print(f"Gemini request failed: {e!r}")
+            if streamed:
+                # Text already reached the room; a stalled or broken stream
+                # counts against the upstream
+                self.resilience_for(model).breaker.record_failure()
+                self.router.record_failure(model)
+                yield INTERRUPTED
+            else:
+                yield APOLOGY
+        finally:
+            if usage is not None:
+                usage.update(
+                    model=model,
+                    prompt_tokens=(metadata and metadata.prompt_token_count) or 0,
+                    cached_tokens=(
+                        (metadata and metadata.cached_content_token_count) or 0
+                    ),
+                    output_tokens=(
+                        (metadata and metadata.candidates_token_count)
+                        or estimated_tokens
+                    ),
+                    first_token_ms=(
+                        round((first_token_at - requested) * 1000)
+                        if first_token_at is not None
+                        else None
+                    ),
+                    latency_ms=round((time.monotonic() - requested) * 1000),
+                    error=failed,
+                )
 
-    async def generate_response(self, message: str, history: List[Dict] = None) -> str:
+    async def generate_response(
+        self, message: str, history: List[Dict] = None, raise_errors: bool = False
+    ) -> str:
         """
         Generate a complete response from Gemini (non-streaming)
 
         Args:
             message: The user's message
             history: Chat history in Gemini format
+            raise_errors: Raise API errors instead of returning an apology
+                (for background callers that must not store it)
 
         Returns:
             Complete response text
         """
         try:
-            # Build conversation context
-            conversation_context = ""
-            if history:
-                for msg in history[-10:]:  # Last 10 messages for context
-                    role = "User" if msg['role'] == 'user' else "Assistant"
-                    content = msg['parts'][0] if msg['parts'] else ""
-                    conversation_context += f"{role}: {content}\n\n"
-
-            # Combine context with current message
-            full_prompt = conversation_context + f"User: {message}\n\nAssistant:"
-
-            response = self.client.models.generate_content(
-                model=self.model_name, contents=full_prompt
+            # Newest history that fits the token budget
+            contents, config, _ = await self._prepare(
+                message, history, None, use_cache=False
+            )
+
+            # Async client, so background callers do not block the event loop
+            response = await self.resilience.call(
+                partial(
+                    self.client.aio.models.generate_content,
+                    model=self.model_name,
+                    contents=contents,
+                    config=config,
+                )
             )
+            self._record_usage(response.usage_metadata)
 
             return response.text
         except Exception:
-            return "I apologize, but I'm having trouble processing your request right now. Please try again in a moment."
+            if raise_errors:
+                raise
+            return APOLOGY
 
 
 # Singleton instance
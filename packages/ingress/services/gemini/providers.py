@@ -0,0 +1,308 @@
+"""
+Gemini Model Providers
+The client GeminiService talks to: the Gemini API or a local fake
+"""
+
+import asyncio
+import random
+import zlib
+from itertools import count
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from google import genai
+from google.genai import errors, types
+
+from shared.config import (
+    FAKE_PROVIDER_CHUNK_TOKENS,
+    FAKE_PROVIDER_ERROR_CODE,
+    FAKE_PROVIDER_ERROR_RATE,
+    FAKE_PROVIDER_FIRST_TOKEN_MS,
+    FAKE_PROVIDER_JITTER,
+    FAKE_PROVIDER_OUTPUT_TOKENS,
+    FAKE_PROVIDER_SEED,
+    FAKE_PROVIDER_STREAM_ERROR_RATE,
+    FAKE_PROVIDER_TOKENS_PER_SECOND,
+    GEMINI_API_KEY,
+    GEMINI_PROVIDER,
+)
+from .context_builder import estimate_tokens
+
+# Words the fake provider's replies are made of (about one token each)
+FAKE_WORDS = (
+    "the team could ship this after the review and keep the chat fast while "
+    "we measure latency on every request so nothing regresses next week"
+).split()
+
+
+def _text(contents) -> str:
+    """Plain text of a prompt given as a string, Content objects or dicts"""
+    if isinstance(contents, str):
+        return contents
+    texts = []
+    for content in contents or []:
+        if isinstance(content, str):
+            parts = [content]
+        elif isinstance(content, dict):
+            parts = content.get("parts", [])
+        else:
+            parts = content.parts or []
+        for part in parts:
+            text = part if isinstance(part, str) else getattr(part, "text", None)
+            if text:
+                texts.append(text)
+    return "\n".join(texts)
+
+
+class FakeModels:
+    """
+    Answers generate_content(_stream) locally, with simulated timing
+
+    Replies are deterministic for a prompt (the same words for the same
+    question), streamed in chunks of `chunk_tokens` tokens: the first after
+    `first_token_ms` (plus up to `jitter` of it again), the rest at
+    `tokens_per_second`. A share of requests fails with an API error before
+    the first token (`error_rate`) or part-way through the stream
+    (`stream_error_rate`).
+    """
+
+    def __init__(
+        self,
+        caches: "FakeCaches",
+        first_token_ms: float,
+        tokens_per_second: float,
+        output_tokens: int,
+        chunk_tokens: int,
+        jitter: float,
+        error_rate: float,
+        stream_error_rate: float,
+        error_code: int,
+        seed: int,
+    ):
+        self.caches = caches
+        self.first_token_ms = first_token_ms
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.stream_error_rate = stream_error_rate
+        self.error_code = error_code
+        self.seed = seed
+        # Drives jitter and error injection, so a seeded run fails the same
+        # requests every time
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "errors": 0, "output_tokens": 0}
+
+    def _error(self, message: str) -> errors.APIError:
+        self.stats["errors"] += 1
+        payload = {
+            "error": {
+                "code": self.error_code,
+                "message": message,
+                "status": "UNAVAILABLE" if self.error_code >= 500 else "ERROR",
+            }
+        }
+        if self.error_code >= 500:
+            return errors.ServerError(self.error_code, payload)
+        return errors.ClientError(self.error_code, payload)
+
+    def _first_token_seconds(self) -> float:
+        return self.first_token_ms / 1000 * (1 + self.jitter * self.random.random())
+
+    def _chunk_seconds(self, tokens: int) -> float:
+        if self.tokens_per_second <= 0:
+            return 0.0
+        return tokens / self.tokens_per_second
+
+    def _prompt(self, contents, config) -> Dict:
+        """Prompt text and its (prompt, cached) token counts"""
+        text = _text(contents)
+        prompt_tokens = estimate_tokens(text)
+        cached_tokens = 0
+        if config is not None and config.system_instruction:
+            prompt_tokens += estimate_tokens(_text([config.system_instruction]))
+        if config is not None and config.cached_content:
+            system = self.caches.system_instruction(config.cached_content)
+            cached_tokens = estimate_tokens(system)
+            prompt_tokens += cached_tokens
+        return {"text": text, "prompt": prompt_tokens, "cached": cached_tokens}
+
+    def _reply(self, prompt: str) -> List[str]:
+        """The reply's chunks, the same for the same prompt"""
+        rng = random.Random(zlib.crc32(prompt.encode("utf-8")) ^ self.seed)
+        words = [rng.choice(FAKE_WORDS) for _ in range(self.output_tokens)]
+        return [
+            " ".join(words[start : start + self.chunk_tokens]) + " "
+            for start in range(0, len(words), self.chunk_tokens)
+        ]
+
+    @staticmethod
+    def _response(text: str, usage=None) -> types.GenerateContentResponse:
+        return types.GenerateContentResponse(
+            candidates=[
+                types.Candidate(
+                    content=types.Content(role="model", parts=[types.Part(text=text)])
+                )
+            ],
+            usage_metadata=usage,
+        )
+
+    @staticmethod
+    def _usage(prompt: Dict, output_tokens: int):
+        return types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt["prompt"],
+            cached_content_token_count=prompt["cached"] or None,
+            candidates_token_count=output_tokens,
+        )
+
+    async def generate_content_stream(self, model: str, contents, config=None):
+        self.stats["requests"] += 1
+        prompt = self._prompt(contents, config)
+        chunks = self._reply(prompt["text"])
+        await asyncio.sleep(self._first_token_seconds())
+        if self.random.random() < self.error_rate:
+            raise self._error(f"{model} is overloaded (injected)")
+        # Index of the chunk a mid-stream failure replaces, if any
+        fail_at = (
+            self.random.randrange(1, len(chunks))
+            if len(chunks) > 1 and self.random.random() < self.stream_error_rate
+            else None
+        )
+
+        async def stream():
+            sent = 0
+            for index, chunk in enumerate(chunks):
+                tokens = len(chunk.split())
+                if index:
+                    await asyncio.sleep(self._chunk_seconds(tokens))
+                if index == fail_at:
+                    raise self._error(f"{model} stream broke off (injected)")
+                sent += tokens
+                self.stats["output_tokens"] += tokens
+                last = index + 1 == len(chunks)
+                yield self._response(chunk, self._usage(prompt, sent) if last else None)
+
+        return stream()
+
+    async def generate_content(self, model: str, contents, config=None):
+        self.stats["requests"] += 1
+        prompt = self._prompt(contents, config)
+        chunks = self._reply(prompt["text"])
+        await asyncio.sleep(
+            self._first_token_seconds() + self._chunk_seconds(self.output_tokens)
+        )
+        if self.random.random() < self.error_rate:
+            raise self._error(f"{model} is overloaded (injected)")
+        self.stats["output_tokens"] += self.output_tokens
+        return self._response("".join(chunks), self._usage(prompt, self.output_tokens))
+
+
+class FakeCaches:
+    """In-memory stand-in for cached contents (create, update, delete)"""
+
+    def __init__(self):
+        self._caches: Dict[str, str] = {}
+        self._ids = count(1)
+
+    def _missing(self, name: str) -> errors.ClientError:
+        return errors.ClientError(
+            404,
+            {
+                "error": {
+                    "code": 404,
+                    "message": f"{name} not found",
+                    "status": "NOT_FOUND",
+                }
+            },
+        )
+
+    def system_instruction(self, name: str) -> str:
+        if name not in self._caches:
+            raise self._missing(name)
+        return self._caches[name]
+
+    async def create(self, model: str, config=None) -> types.CachedContent:
+        name = f"cachedContents/fake-{next(self._ids)}"
+        self._caches[name] = (
+            _text([config.system_instruction, *(config.contents or [])])
+            if config
+            else ""
+        )
+        return types.CachedContent(
+            name=name, model=model, display_name=config and config.display_name
+        )
+
+    async def update(self, name: str, config=None) -> types.CachedContent:
+        self.system_instruction(name)
+        return types.CachedContent(name=name)
+
+    async def delete(self, name: str, config=None) -> None:
+        if self._caches.pop(name, None) is None:
+            raise self._missing(name)
+
+    def __len__(self) -> int:
+        return len(self._caches)
+
+
+class FakeProvider:
+    """
+    Local stand-in for the Gemini client, for offline runs and load tests
+
+    Exposes the part of genai.Client that GeminiService and ContextCache use:
+    aio.models.generate_content_stream / generate_content and
+    aio.caches.create / update / delete. No API key or network is needed.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        first_token_ms: float = FAKE_PROVIDER_FIRST_TOKEN_MS,
+        tokens_per_second: float = FAKE_PROVIDER_TOKENS_PER_SECOND,
+        output_tokens: int = FAKE_PROVIDER_OUTPUT_TOKENS,
+        chunk_tokens: int = FAKE_PROVIDER_CHUNK_TOKENS,
+        jitter: float = FAKE_PROVIDER_JITTER,
+        error_rate: float = FAKE_PROVIDER_ERROR_RATE,
+        stream_error_rate: float = FAKE_PROVIDER_STREAM_ERROR_RATE,
+        error_code: int = FAKE_PROVIDER_ERROR_CODE,
+        seed: int = FAKE_PROVIDER_SEED,
+    ):
+        caches = FakeCaches()
+        models = FakeModels(
+            caches,
+            first_token_ms=first_token_ms,
+            tokens_per_second=tokens_per_second,
+            output_tokens=output_tokens,
+            chunk_tokens=chunk_tokens,
+            jitter=jitter,
+            error_rate=error_rate,
+            stream_error_rate=stream_error_rate,
+            error_code=error_code,
+            seed=seed,
+        )
+        self.aio = SimpleNamespace(models=models, caches=caches)
+
+    @property
+    def stats(self) -> Dict:
+        return {**self.aio.models.stats, "caches": len(self.aio.caches)}
+
+
+def build_client(provider: Optional[str] = None):
+    """
+    The model client described by shared.config (GEMINI_PROVIDER)
+
+    "gemini" is the Gemini API and needs GEMINI_API_KEY; "fake" is a
+    FakeProvider configured from the FAKE_PROVIDER_* settings.
+    """
+    provider = provider or GEMINI_PROVIDER
+    if provider == "gemini":
+        if not GEMINI_API_KEY:
+            raise ValueError(
+                "GEMINI_API_KEY environment variable is required "
+                "(or set GEMINI_PROVIDER=fake to run without the API)"
+            )
+        return genai.Client(api_key=GEMINI_API_KEY)
+    if provider == "fake":
+        return FakeProvider()
+    raise ValueError(f"Unknown GEMINI_PROVIDER: {provider}")
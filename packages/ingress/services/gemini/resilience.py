@@ -0,0 +1,360 @@
+"""
+Gemini Call Resilience
+Timeouts, retries, hedged requests and a circuit breaker for model calls
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Optional, Tuple
+
+import httpx
+from google.genai import errors
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+from shared.config import (
+    GEMINI_BREAKER_FAILURES,
+    GEMINI_BREAKER_RESET_SECONDS,
+    GEMINI_CONNECT_TIMEOUT_SECONDS,
+    GEMINI_FIRST_TOKEN_TIMEOUT_SECONDS,
+    GEMINI_HEDGE_ENABLED,
+    GEMINI_HEDGE_MIN_SAMPLES,
+    GEMINI_MAX_ATTEMPTS,
+    GEMINI_RETRY_BACKOFF_SECONDS,
+    GEMINI_RETRY_MAX_BACKOFF_SECONDS,
+    GEMINI_STREAM_IDLE_TIMEOUT_SECONDS,
+)
+
+# HTTP statuses worth retrying: timeouts, rate limits and server trouble
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(Exception):
+    """The upstream is failing; calls are refused until the breaker resets"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Gemini is unavailable; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class StreamTimeoutError(asyncio.TimeoutError):
+    """A call did not connect, start or continue streaming in time"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether a failed call may succeed if sent again"""
+    if isinstance(error, errors.APIError):
+        return error.code in RETRYABLE_STATUS_CODES
+    return isinstance(
+        error, (asyncio.TimeoutError, httpx.TransportError, ConnectionError)
+    )
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+
+    Closed: calls go through. After `failure_threshold` consecutive failures
+    it opens and refuses calls for `reset_seconds`; then it lets a single
+    trial call through (half-open), which closes it on success or opens it
+    again on failure.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = GEMINI_BREAKER_FAILURES,
+        reset_seconds: float = GEMINI_BREAKER_RESET_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self.stats = {"opened": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self.clock() - self._opened_at < self.reset_seconds:
+            return "open"
+        return "half_open"
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go through now"""
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return
+        self.stats["rejected"] += 1
+        retry_after = self._opened_at + self.reset_seconds - self.clock()
+        raise CircuitOpenError(max(retry_after, 0.0))
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """Give up a half-open trial call without an outcome"""
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial_in_flight or (
+            self._opened_at is None and self.failures >= self.failure_threshold
+        ):
+            self._opened_at = self.clock()
+            self.stats["opened"] += 1
+        self._trial_in_flight = False
+
+
+class LatencyTracker:
+    """Recent first-token latencies (seconds), for the hedging delay"""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# A function that starts a model call and returns its response stream
+StreamFactory = Callable[[], Awaitable[AsyncIterator]]
+
+
+class ResilientCaller:
+    """
+    Wraps Gemini calls with timeouts, retries, hedging and a circuit breaker
+
+    Retries and hedges only happen before the first token: once text has
+    reached the room a stream cannot be replayed without repeating it.
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float = GEMINI_CONNECT_TIMEOUT_SECONDS,
+        first_token_timeout: float = GEMINI_FIRST_TOKEN_TIMEOUT_SECONDS,
+        idle_timeout: float = GEMINI_STREAM_IDLE_TIMEOUT_SECONDS,
+        max_attempts: int = GEMINI_MAX_ATTEMPTS,
+        backoff: float = GEMINI_RETRY_BACKOFF_SECONDS,
+        max_backoff: float = GEMINI_RETRY_MAX_BACKOFF_SECONDS,
+        hedge: bool = GEMINI_HEDGE_ENABLED,
+        hedge_min_samples: int = GEMINI_HEDGE_MIN_SAMPLES,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.connect_timeout = connect_timeout
+        self.first_token_timeout = first_token_timeout
+        self.idle_timeout = idle_timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self.first_token_latency = LatencyTracker()
+        self.stats = {
+            "calls": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "failures": 0,
+        }
+
+    def clone(self) -> "ResilientCaller":
+        """A caller with the same settings but its own breaker and latencies"""
+        breaker = CircuitBreaker(
+            self.breaker.failure_threshold,
+            self.breaker.reset_seconds,
+            self.breaker.clock,
+        )
+        return ResilientCaller(
+            connect_timeout=self.connect_timeout,
+            first_token_timeout=self.first_token_timeout,
+            idle_timeout=self.idle_timeout,
+            max_attempts=self.max_attempts,
+            backoff=self.backoff,
+            max_backoff=self.max_backoff,
+            hedge=self.hedge,
+            hedge_min_samples=self.hedge_min_samples,
+            breaker=breaker,
+        )
+
+    def snapshot(self) -> dict:
+        p95 = self.first_token_latency.percentile(0.95)
+        return {
+            **self.stats,
+            "breaker": self.breaker.state,
+            "breaker_opened": self.breaker.stats["opened"],
+            "breaker_rejected": self.breaker.stats["rejected"],
+            "first_token_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait for a first token before hedging, or None"""
+        if not self.hedge or len(self.first_token_latency) < self.hedge_min_samples:
+            return None
+        return self.first_token_latency.percentile(0.95)
+
+    async def _open(self, factory: StreamFactory):
+        """Start one call and wait for its first chunk: (first, rest)"""
+        started = time.monotonic()
+
+        async def first_chunk():
+            try:
+                stream = await asyncio.wait_for(factory(), self.connect_timeout)
+            except asyncio.TimeoutError:
+                raise StreamTimeoutError("Gemini did not respond in time") from None
+            chunks = stream.__aiter__()
+            try:
+                return await chunks.__anext__(), chunks
+            except StopAsyncIteration:
+                return None, chunks
+
+        try:
+            first, chunks = await asyncio.wait_for(
+                first_chunk(), self.first_token_timeout
+            )
+        except asyncio.TimeoutError as e:
+            self.stats["timeouts"] += 1
+            if isinstance(e, StreamTimeoutError):
+                raise
+            raise StreamTimeoutError("Gemini sent no first token in time") from None
+        self.first_token_latency.record(time.monotonic() - started)
+        return first, chunks
+
+    async def _open_hedged(self, factory: StreamFactory):
+        """_open(), plus a second identical call if the first is slow to start"""
+        delay = self.hedge_delay()
+        primary = asyncio.ensure_future(self._open(factory))
+        if delay is None:
+            return await primary
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        self.stats["hedges"] += 1
+        hedge = asyncio.ensure_future(self._open(factory))
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            winners = [task for task in done if task.exception() is None]
+            if winners:
+                for other in pending:
+                    other.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                # Both started at once: keep one stream and close the other
+                for loser in winners[1:]:
+                    await _close(loser.result()[1])
+                if winners[0] is hedge:
+                    self.stats["hedge_wins"] += 1
+                return winners[0].result()
+            error = next(iter(done)).exception()
+        raise error
+
+    async def _attempt(self, factory: StreamFactory):
+        self.breaker.before_call()
+        try:
+            opened = await self._open_hedged(factory)
+        except asyncio.CancelledError:
+            # Not the upstream's fault; free the half-open trial slot
+            self.breaker.release_trial()
+            raise
+        except Exception as e:
+            # Only upstream trouble counts; a rejected request (bad input,
+            # lost cache, auth) says nothing about the upstream's health
+            if is_retryable(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.release_trial()
+            raise
+        self.breaker.record_success()
+        return opened
+
+    async def open_stream(self, factory: StreamFactory) -> Tuple[object, AsyncIterator]:
+        """
+        Start a streaming call, retrying retryable failures before its first chunk
+
+        Returns:
+            (first chunk or None if the stream was empty, iterator over the rest)
+
+        Raises:
+            CircuitOpenError: The breaker is open (raised without calling)
+            Exception: The last error once attempts run out or if it is not
+                retryable
+        """
+        self.stats["calls"] += 1
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(self.max_attempts),
+            wait=wait_random_exponential(multiplier=self.backoff, max=self.max_backoff),
+            retry=retry_if_exception(is_retryable),
+            before_sleep=lambda state: self._count_retry(),
+            reraise=True,
+        )
+        try:
+            return await retrying(self._attempt, factory)
+        except Exception:
+            self.stats["failures"] += 1
+            raise
+
+    def _count_retry(self) -> None:
+        self.stats["retries"] += 1
+
+    async def iterate(self, chunks: AsyncIterator) -> AsyncIterator:
+        """The rest of a stream, failing if it goes quiet for idle_timeout"""
+        while True:
+            try:
+                yield await asyncio.wait_for(chunks.__anext__(), self.idle_timeout)
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                raise StreamTimeoutError("Gemini stream stalled") from None
+
+    async def call(self, factory: Callable[[], Awaitable]):
+        """
+        A non-streaming call with the same retries and breaker
+
+        The whole call must finish within first_token_timeout.
+        """
+
+        async def as_stream():
+            async def single():
+                yield await factory()
+
+            return single()
+
+        first, _ = await self.open_stream(as_stream)
+        return first
+
+
+async def _close(chunks) -> None:
+    """Close a stream that will not be read (releases its connection)"""
+    aclose = getattr(chunks, "aclose", None)
+    if aclose is not None:
+        try:
+            await aclose()
+        except Exception:
+            pass
@@ -0,0 +1,243 @@
+"""
+Gemini Model Router
+Picks a model tier per /bot request and tracks per-model latency
+"""
+
+import time
+from collections import Counter, deque
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from shared.config import (
+    GEMINI_MODEL,
+    GEMINI_MODEL_DEEP,
+    GEMINI_MODEL_LITE,
+    GEMINI_ROUTING_DEEP_MIN_TOKENS,
+    GEMINI_ROUTING_ENABLED,
+    GEMINI_ROUTING_LITE_MAX_TOKENS,
+    GEMINI_ROUTING_SLOW_TTFT_SECONDS,
+)
+from .context_builder import estimate_tokens
+
+# Tiers to try, in order, when the preferred one is slow or failing
+FALLBACKS = {
+    "lite": ("standard",),
+    "standard": ("lite",),
+    "deep": ("standard", "lite"),
+}
+
+# Command prefixes and the tier they ask for (None: let the router decide)
+BOT_COMMANDS = (
+    ("/bot! ", "lite"),
+    ("/bot deep ", "deep"),
+    ("/bot ", None),
+)
+
+# Only outcomes and latencies this recent count towards a model's health,
+# so a model passed over for a while gets tried again
+HEALTH_WINDOW_SECONDS = 300
+# A model is passed over when at least half its recent calls failed
+# (given at least this many), or its p95 first-token latency is too slow
+# (given at least this many samples)
+MIN_OUTCOMES = 3
+MIN_LATENCY_SAMPLES = 5
+
+
+def parse_bot_command(content: str) -> Optional[Tuple[Optional[str], str]]:
+    """
+    Split a /bot command into (requested tier or None, question)
+
+    Returns None if the message is not a bot command.
+    """
+    for prefix, tier in BOT_COMMANDS:
+        if content.startswith(prefix):
+            return tier, content[len(prefix) :].strip()
+    return None
+
+
+class Route(NamedTuple):
+    """A routing decision: the tier chosen and the models to try, in order"""
+
+    tier: str
+    models: List[str]
+    reason: str
+
+
+class ModelStats:
+    """Recent outcomes, first-token latencies and throughput of one model"""
+
+    def __init__(self, window: int = 200):
+        self.requests = 0
+        self.errors = 0
+        self.output_tokens = 0
+        # (time, ok)
+        self.outcomes: deque = deque(maxlen=20)
+        # (time, first-token seconds, output tokens per second)
+        self.samples: deque = deque(maxlen=window)
+
+    def recent(self, now: float) -> Tuple[List[bool], List[float], List[float]]:
+        """(outcomes, first-token latencies, throughputs) within the window"""
+        since = now - HEALTH_WINDOW_SECONDS
+        outcomes = [ok for at, ok in self.outcomes if at >= since]
+        samples = [(ttft, tps) for at, ttft, tps in self.samples if at >= since]
+        return (
+            outcomes,
+            [ttft for ttft, _ in samples],
+            [tps for _, tps in samples if tps is not None],
+        )
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ModelRouter:
+    """
+    Chooses a model tier for each /bot request
+
+    An explicit command flag wins, then the chat's own setting, then the
+    question's size. The preferred tier's model goes first unless it has
+    been slow or failing recently, in which case its fallbacks are tried
+    first; the caller moves down the list when a model fails before its
+    first token.
+    """
+
+    def __init__(
+        self,
+        tiers: Optional[Dict[str, str]] = None,
+        enabled: bool = GEMINI_ROUTING_ENABLED,
+        lite_max_tokens: int = GEMINI_ROUTING_LITE_MAX_TOKENS,
+        deep_min_tokens: int = GEMINI_ROUTING_DEEP_MIN_TOKENS,
+        slow_ttft_seconds: float = GEMINI_ROUTING_SLOW_TTFT_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.tiers = tiers or {
+            "lite": GEMINI_MODEL_LITE,
+            "standard": GEMINI_MODEL,
+            "deep": GEMINI_MODEL_DEEP,
+        }
+        self.enabled = enabled
+        self.lite_max_tokens = lite_max_tokens
+        self.deep_min_tokens = deep_min_tokens
+        self.slow_ttft_seconds = slow_ttft_seconds
+        self.clock = clock
+        self.models: Dict[str, ModelStats] = {}
+        self.decisions: Counter = Counter()
+        self.fallbacks = 0
+        self.recent_decisions: deque = deque(maxlen=50)
+
+    def _stats(self, model: str) -> ModelStats:
+        stats = self.models.get(model)
+        if stats is None:
+            stats = self.models[model] = ModelStats()
+        return stats
+
+    def degraded(self, model: str) -> Optional[str]:
+        """Why a model should be passed over right now ("errors", "slow"), or None"""
+        stats = self.models.get(model)
+        if stats is None:
+            return None
+        outcomes, latencies, _ = stats.recent(self.clock())
+        if len(outcomes) >= MIN_OUTCOMES and outcomes.count(False) * 2 >= len(outcomes):
+            return "errors"
+        if len(latencies) >= MIN_LATENCY_SAMPLES:
+            if _percentile(latencies, 0.95) > self.slow_ttft_seconds:
+                return "slow"
+        return None
+
+    def route(
+        self,
+        message: str,
+        requested_tier: Optional[str] = None,
+        chat_tier: Optional[str] = None,
+    ) -> Route:
+        """
+        Pick the tier and the models to try for a /bot question
+
+        Args:
+            message: The question (without the command prefix)
+            requested_tier: Tier asked for by a command flag, if any
+            chat_tier: The chat's configured tier, if any
+        """
+        if not self.enabled:
+            tier, reason = "standard", "disabled"
+        elif requested_tier in self.tiers:
+            tier, reason = requested_tier, "flag"
+        elif chat_tier in self.tiers:
+            tier, reason = chat_tier, "chat"
+        else:
+            size = estimate_tokens(message)
+            if size <= self.lite_max_tokens:
+                tier = "lite"
+            elif size >= self.deep_min_tokens:
+                tier = "deep"
+            else:
+                tier = "standard"
+            reason = "size"
+
+        models = [self.tiers[tier]]
+        if self.enabled:
+            for fallback in FALLBACKS[tier]:
+                if self.tiers[fallback] not in models:
+                    models.append(self.tiers[fallback])
+            # Healthy models first, keeping the preference order otherwise
+            healthy = [model for model in models if not self.degraded(model)]
+            if healthy and healthy[0] != models[0]:
+                reason = f"{reason}+{self.degraded(models[0])}"
+            models = healthy + [model for model in models if model not in healthy]
+
+        self.decisions[f"{tier}:{reason}"] += 1
+        self.recent_decisions.append(
+            {"tier": tier, "model": models[0], "reason": reason}
+        )
+        return Route(tier, models, reason)
+
+    def record_success(
+        self, model: str, first_token_seconds: float, output_tokens: int, seconds: float
+    ) -> None:
+        """Record a completed call: time to first token, then tokens over seconds"""
+        stats = self._stats(model)
+        now = self.clock()
+        stats.requests += 1
+        stats.output_tokens += output_tokens
+        stats.outcomes.append((now, True))
+        throughput = output_tokens / seconds if seconds > 0 and output_tokens else None
+        stats.samples.append((now, first_token_seconds, throughput))
+
+    def record_failure(self, model: str) -> None:
+        stats = self._stats(model)
+        stats.requests += 1
+        stats.errors += 1
+        stats.outcomes.append((self.clock(), False))
+
+    def record_fallback(self) -> None:
+        """A request moved on to its next model after a failure"""
+        self.fallbacks += 1
+
+    def snapshot(self) -> dict:
+        now = self.clock()
+        models = {}
+        for model, stats in self.models.items():
+            _, latencies, throughputs = stats.recent(now)
+            p50 = _percentile(latencies, 0.5)
+            p95 = _percentile(latencies, 0.95)
+            tps = _percentile(throughputs, 0.5)
+            models[model] = {
+                "requests": stats.requests,
+                "errors": stats.errors,
+                "output_tokens": stats.output_tokens,
+                "first_token_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "first_token_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                "tokens_per_second_p50": round(tps, 1) if tps is not None else None,
+                "degraded": self.degraded(model),
+            }
+        return {
+            "enabled": self.enabled,
+            "tiers": dict(self.tiers),
+            "decisions": dict(self.decisions),
+            "fallbacks": self.fallbacks,
+            "recent": list(self.recent_decisions),
+            "models": models,
+        }
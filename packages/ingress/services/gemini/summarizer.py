@@ -0,0 +1,175 @@
+"""
+Conversation Summarizer
+Keeps a rolling per-chat summary of messages older than the /bot window
+"""
+
+import asyncio
+from typing import Dict, List, Optional
+
+from shared.config import (
+    GEMINI_CONTEXT_MESSAGE_TOKENS,
+    GEMINI_CONTEXT_TOKENS,
+    GEMINI_SYSTEM_INSTRUCTION,
+    SUMMARY_EVERY_MESSAGES,
+    SUMMARY_KEEP_RECENT,
+)
+from shared.database import session_scope
+from services.chat.chat_service import (
+    get_chat_summary,
+    get_messages_to_summarize,
+    save_chat_summary,
+)
+from .context_builder import TURN_OVERHEAD_TOKENS, estimate_tokens, truncate_to_tokens
+
+# Most messages folded into the summary per refresh; a chat with a longer
+# backlog (e.g. from before summaries existed) starts from its newest ones
+MAX_BACKFILL = 200
+# Each message is cut down to this before it goes into the prompt
+MAX_LINE_TOKENS = 200
+# Largest summary prompt: what GeminiService's context builder passes on
+# untruncated once its system instruction is set aside. Messages are batched
+# to fit, so none is cut out of the middle of a prompt.
+MAX_PROMPT_TOKENS = (
+    GEMINI_CONTEXT_TOKENS
+    - estimate_tokens(GEMINI_SYSTEM_INSTRUCTION)
+    - TURN_OVERHEAD_TOKENS
+)
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a group chat for an assistant that "
+    "will only see this summary and the latest messages. Update the summary "
+    "with the new messages below. Keep names, decisions, open questions and "
+    "facts people may ask about later; drop small talk. Reply with the "
+    "updated summary only, in at most {words} words."
+)
+
+
+def _header(previous: Optional[str]) -> List[str]:
+    words = GEMINI_CONTEXT_MESSAGE_TOKENS * 3 // 4
+    return [
+        SUMMARY_INSTRUCTIONS.format(words=words),
+        "",
+        "Current summary:",
+        previous or "(none yet)",
+        "",
+        "New messages:",
+    ]
+
+
+def _line(msg: Dict) -> str:
+    content = truncate_to_tokens(msg['content'], MAX_LINE_TOKENS)
+    return f"{msg['username']}: {content}"
+
+
+def build_summary_prompt(previous: Optional[str], messages: List[Dict]) -> str:
+    """Prompt asking the model to fold `messages` into the previous summary"""
+    return "\n".join(_header(previous) + [_line(msg) for msg in messages])
+
+
+def summary_batch_size(
+    previous: Optional[str], messages: List[Dict], max_tokens: int = MAX_PROMPT_TOKENS
+) -> int:
+    """
+    How many of `messages` fit one prompt of at most max_tokens
+
+    Always at least one, so a refresh makes progress whatever the budget.
+    """
+    # Per-line estimates (plus the newline) add up to at least the estimate
+    # of the joined prompt, so the prompt never exceeds the budget
+    budget = max_tokens - estimate_tokens("\n".join(_header(previous))) - 1
+    count = 0
+    for msg in messages:
+        budget -= estimate_tokens(_line(msg)) + 1
+        if budget < 0:
+            break
+        count += 1
+    return max(1, count)
+
+
+class ConversationSummarizer:
+    """
+    Refreshes chat summaries in the background after /bot replies
+
+    The model is anything with GeminiService's `generate_response`, so tests
+    can pass a local fake. No database session is held while the model runs,
+    and a failed call leaves the stored summary untouched.
+    """
+
+    def __init__(
+        self,
+        model,
+        session_factory=session_scope,
+        every: int = SUMMARY_EVERY_MESSAGES,
+        keep_recent: int = SUMMARY_KEEP_RECENT,
+        max_prompt_tokens: int = MAX_PROMPT_TOKENS,
+    ):
+        self.model = model
+        self.session_factory = session_factory
+        self.every = max(1, every)
+        self.keep_recent = keep_recent
+        self.max_prompt_tokens = max_prompt_tokens
+        # Chats with a refresh in flight, and the tasks running them
+        self._running: set = set()
+        self._tasks: set = set()
+        self.stats = {"refreshes": 0, "failures": 0, "messages_summarized": 0}
+
+    def schedule(self, chat_id: int) -> None:
+        """Refresh a chat's summary in the background unless one is running"""
+        if chat_id in self._running:
+            return
+        self._running.add(chat_id)
+        task = asyncio.create_task(self._refresh_guarded(chat_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh_guarded(self, chat_id: int) -> None:
+        try:
+            await self.refresh(chat_id)
+        except Exception as e:
+            self.stats["failures"] += 1
+            print(f"Error summarizing chat {chat_id}: {e}")
+        finally:
+            self._running.discard(chat_id)
+
+    async def refresh(self, chat_id: int) -> bool:
+        """
+        Fold messages that left the recent window into the chat's summary
+
+        Does nothing until at least `every` such messages are pending.
+
+        Returns:
+            True if a new summary was stored
+        """
+        with self.session_factory() as db:
+            summary, summary_message_id = get_chat_summary(db, chat_id)
+            pending = get_messages_to_summarize(
+                db, chat_id, summary_message_id, self.keep_recent, MAX_BACKFILL
+            )
+        if len(pending) < self.every:
+            return False
+
+        start = 0
+        while start < len(pending):
+            rest = pending[start:]
+            batch = rest[: summary_batch_size(summary, rest, self.max_prompt_tokens)]
+            start += len(batch)
+            prompt = build_summary_prompt(summary, batch)
+            text = await self.model.generate_response(prompt, raise_errors=True)
+            if not text or not text.strip():
+                raise ValueError("model returned an empty summary")
+            summary = truncate_to_tokens(text.strip(), GEMINI_CONTEXT_MESSAGE_TOKENS)
+
+        with self.session_factory() as db:
+            saved = save_chat_summary(
+                db, chat_id, summary, pending[-1]['id'], summary_message_id
+            )
+        if saved:
+            self.stats["refreshes"] += 1
+            self.stats["messages_summarized"] += len(pending)
+        return saved
+
+    async def close(self) -> None:
+        """Cancel refreshes still running (at shutdown)"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,24 @@
+"""
+Retrieval service initialization
+"""
+
+from .embedders import GeminiEmbedder, HashingEmbedder
+from .retriever import (
+    MessageRetriever,
+    get_retriever,
+    index_message,
+    use_retriever,
+    wait_for_indexing,
+)
+from .vector_index import VectorIndex
+
+__all__ = [
+    'GeminiEmbedder',
+    'HashingEmbedder',
+    'MessageRetriever',
+    'get_retriever',
+    'index_message',
+    'use_retriever',
+    'wait_for_indexing',
+    'VectorIndex',
+]
@@ -0,0 +1,91 @@
+"""
+Text Embedders
+Turn message text into unit-length vectors for similarity search
+"""
+
+import math
+import re
+import zlib
+from collections import Counter
+from typing import List, Sequence
+
+import numpy as np
+from google.genai import types
+
+_WORD = re.compile(r"\w+")
+# Words too common in chat to say anything about what a message is about
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do for from has have he her his how i "
+    "if in is it its me my no not of on or our she so that the their them "
+    "there they this to up was we what when where which who why will with "
+    "you your".split()
+)
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length (all-zero rows stay zero)"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+class HashingEmbedder:
+    """
+    Local embedder: hashed word and word-pair counts, no model or network
+
+    Words and adjacent word pairs are hashed into `dimensions` buckets with a
+    stable hash (CRC32, so vectors match across processes) and weighted by
+    log term frequency. Similar messages share words, so their vectors have a
+    high cosine similarity.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+
+    def _features(self, text: str) -> Counter:
+        words = [w for w in _WORD.findall(text.lower()) if w not in STOPWORDS]
+        features = Counter(words)
+        features.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+        return features
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts as a (len(texts), dimensions) float32 array"""
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, count in self._features(text).items():
+                digest = zlib.crc32(feature.encode("utf-8"))
+                # The top bit picks the sign, so collisions tend to cancel out
+                sign = -1.0 if digest & 0x80000000 else 1.0
+                vectors[row, digest % self.dimensions] += sign * (1.0 + math.log(count))
+        return normalize_rows(vectors)
+
+
+class GeminiEmbedder:
+    """Embedder backed by the Gemini embeddings API"""
+
+    name = "gemini"
+
+    # Texts per embed_content request
+    BATCH = 100
+
+    def __init__(self, client, model: str, dimensions: int = 256):
+        self.client = client
+        self.model = model
+        self.dimensions = dimensions
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts as a (len(texts), dimensions) float32 array"""
+        config = types.EmbedContentConfig(output_dimensionality=self.dimensions)
+        values: List[List[float]] = []
+        for start in range(0, len(texts), self.BATCH):
+            result = self.client.models.embed_content(
+                model=self.model,
+                contents=list(texts[start : start + self.BATCH]),
+                config=config,
+            )
+            values.extend(embedding.values for embedding in result.embeddings)
+        # Truncated Gemini embeddings are not unit length; normalize them
+        vectors = np.array(values, dtype=np.float32).reshape(-1, self.dimensions)
+        return normalize_rows(vectors)
@@ -0,0 +1,273 @@
+"""
+Message Retriever
+Per-chat vector indexes of message text, for recalling older messages
+"""
+
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from cachetools import LRUCache
+from google import genai
+
+from shared.config import (
+    GEMINI_API_KEY,
+    RETRIEVAL_DIMENSIONS,
+    RETRIEVAL_EMBEDDER,
+    RETRIEVAL_EMBEDDING_MODEL,
+    RETRIEVAL_ENABLED,
+    RETRIEVAL_INDEX_DIR,
+    RETRIEVAL_MIN_SCORE,
+)
+from .embedders import GeminiEmbedder, HashingEmbedder
+from .vector_index import VectorIndex
+
+
+class _OpenIndexes(LRUCache):
+    """
+    LRU of open chat indexes that flushes and closes the ones it evicts
+
+    An index is only closed once no caller holds it (see acquire), so an
+    eviction never pulls the files out from under an add or a search in
+    another thread. Not thread-safe; MessageRetriever serializes access.
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize=maxsize)
+        # chat_id -> callers currently using its index
+        self._holders: Dict[int, int] = {}
+        # Evicted while held: closed by the last release, or put back in
+        # the cache if the chat is opened again first
+        self._evicted: Dict[int, VectorIndex] = {}
+
+    def popitem(self):
+        key, index = super().popitem()
+        if self._holders.get(key):
+            self._evicted[key] = index
+        else:
+            index.close()
+        return key, index
+
+    def acquire(
+        self, chat_id: int, open_index: Callable[[], VectorIndex]
+    ) -> VectorIndex:
+        """The chat's index, opened if needed and held until release()"""
+        index = self.get(chat_id)
+        if index is None:
+            # Not `or`: an empty index is falsy
+            index = self._evicted.pop(chat_id, None)
+            if index is None:
+                index = open_index()
+            self[chat_id] = index
+        self._holders[chat_id] = self._holders.get(chat_id, 0) + 1
+        return index
+
+    def release(self, chat_id: int) -> None:
+        self._holders[chat_id] -= 1
+        if not self._holders[chat_id]:
+            del self._holders[chat_id]
+            index = self._evicted.pop(chat_id, None)
+            if index is not None:
+                index.close()
+
+    def close_all(self) -> None:
+        """Close every index, held or not (at shutdown)"""
+        for index in [*self.values(), *self._evicted.values()]:
+            index.close()
+        # del, not clear(): clear() evicts through popitem()
+        for chat_id in list(self):
+            del self[chat_id]
+        self._evicted.clear()
+
+
+class MessageRetriever:
+    """
+    Embeds chat messages into one vector index per chat and searches them
+
+    Index files are named after the embedder and its dimensions, so changing
+    either starts fresh indexes instead of mixing incompatible vectors.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        embedder,
+        min_score: float = RETRIEVAL_MIN_SCORE,
+        max_open_indexes: int = 256,
+    ):
+        self.directory = directory
+        self.embedder = embedder
+        self.min_score = min_score
+        os.makedirs(directory, exist_ok=True)
+        self._indexes = _OpenIndexes(maxsize=max_open_indexes)
+        self._lock = threading.Lock()
+        self.stats = {"indexed": 0, "searches": 0, "backfilled_chats": 0}
+
+    def _path(self, chat_id: int) -> str:
+        name = f"chat_{chat_id}.{self.embedder.name}{self.embedder.dimensions}"
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _index(self, chat_id: int) -> Iterator[VectorIndex]:
+        """Hold a chat's index open for the duration of the block"""
+        with self._lock:
+            index = self._indexes.acquire(
+                chat_id,
+                lambda: VectorIndex(self._path(chat_id), self.embedder.dimensions),
+            )
+        try:
+            yield index
+        finally:
+            with self._lock:
+                self._indexes.release(chat_id)
+
+    def has_index(self, chat_id: int) -> bool:
+        """Whether the chat's messages have been indexed before"""
+        return chat_id in self._indexes or VectorIndex.exists(self._path(chat_id))
+
+    def add(self, chat_id: int, messages: Iterable[Tuple[int, str]]) -> None:
+        """Embed and index (message id, text) pairs; blank texts are skipped"""
+        messages = [(mid, text) for mid, text in messages if text and text.strip()]
+        if not messages:
+            return
+        vectors = self.embedder.embed([text for _, text in messages])
+        with self._index(chat_id) as index:
+            index.add([mid for mid, _ in messages], vectors)
+        self.stats["indexed"] += len(messages)
+
+    def backfill(self, chat_id: int, messages: Iterable[Tuple[int, str]]) -> None:
+        """Create a chat's index from its existing (message id, text) pairs"""
+        with self._index(chat_id):
+            self.add(chat_id, messages)
+        self.stats["backfilled_chats"] += 1
+
+    def search(
+        self, chat_id: int, query: str, k: int, before_id: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Messages in a chat most similar to `query`
+
+        Returns:
+            [(message id, similarity)], best first, at least min_score each
+        """
+        self.stats["searches"] += 1
+        vector = self.embedder.embed([query])[0]
+        with self._index(chat_id) as index:
+            hits = index.search(vector, k, before_id)
+        return [(mid, score) for mid, score in hits if score >= self.min_score]
+
+    def close(self) -> None:
+        with self._lock:
+            self._indexes.close_all()
+
+
+def build_retriever() -> Optional[MessageRetriever]:
+    """The retriever described by shared.config, or None if retrieval is off"""
+    if not RETRIEVAL_ENABLED:
+        return None
+    if RETRIEVAL_EMBEDDER == "gemini":
+        embedder = GeminiEmbedder(
+            genai.Client(api_key=GEMINI_API_KEY),
+            RETRIEVAL_EMBEDDING_MODEL,
+            RETRIEVAL_DIMENSIONS,
+        )
+    elif RETRIEVAL_EMBEDDER == "hashing":
+        embedder = HashingEmbedder(RETRIEVAL_DIMENSIONS)
+    else:
+        raise ValueError(f"Unknown RETRIEVAL_EMBEDDER: {RETRIEVAL_EMBEDDER}")
+    return MessageRetriever(RETRIEVAL_INDEX_DIR, embedder)
+
+
+_retriever: Optional[MessageRetriever] = build_retriever()
+
+
+def get_retriever() -> Optional[MessageRetriever]:
+    """The shared retriever, or None when retrieval is disabled"""
+    return _retriever
+
+
+def use_retriever(retriever: Optional[MessageRetriever]) -> Optional[MessageRetriever]:
+    """Replace the shared retriever (None disables retrieval); returns the old one"""
+    global _retriever
+    previous, _retriever = _retriever, retriever
+    return previous
+
+
+class _BackgroundIndexer:
+    """
+    Embeds and indexes stored messages on one worker thread
+
+    Embedding can be a network call (RETRIEVAL_EMBEDDER=gemini), so writers
+    only queue the message and return; they may be running on the event
+    loop. Each pass takes everything queued since the last one and embeds a
+    chat's messages in one call.
+    """
+
+    def __init__(self):
+        self._pending: Deque[Tuple[MessageRetriever, int, int, str]] = deque()
+        self._condition = threading.Condition()
+        self._busy = False
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(
+        self, retriever: MessageRetriever, chat_id: int, message_id: int, content: str
+    ) -> None:
+        with self._condition:
+            self._pending.append((retriever, chat_id, message_id, content))
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="retrieval-indexer", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify_all()
+
+    def wait(self) -> None:
+        """Block until everything queued so far has been indexed"""
+        with self._condition:
+            self._condition.wait_for(lambda: not self._pending and not self._busy)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending)
+                queued, self._pending = self._pending, deque()
+                self._busy = True
+            try:
+                by_chat: Dict[Tuple[MessageRetriever, int], List] = {}
+                for retriever, chat_id, message_id, content in queued:
+                    by_chat.setdefault((retriever, chat_id), []).append(
+                        (message_id, content)
+                    )
+                for (retriever, chat_id), messages in by_chat.items():
+                    try:
+                        retriever.add(chat_id, messages)
+                    except Exception as e:
+                        # Retrieval is best effort; the messages stay unindexed
+                        print(f"Error indexing messages in chat {chat_id}: {e}")
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+
+_indexer = _BackgroundIndexer()
+
+
+def index_message(chat_id: int, message_id: int, content: str) -> None:
+    """
+    Queue a stored message for its chat's index, if retrieval is enabled
+
+    The embedding happens on a background thread, so the write never waits
+    for it. Chats without an index yet are skipped; their history is
+    backfilled in one batch the first time they are searched.
+    """
+    if _retriever is None or not _retriever.has_index(chat_id):
+        return
+    _indexer.submit(_retriever, chat_id, message_id, content)
+
+
+def wait_for_indexing() -> None:
+    """Block until every queued message has been indexed (tests, shutdown)"""
+    _indexer.wait()
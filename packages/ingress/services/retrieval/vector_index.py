@@ -0,0 +1,135 @@
+"""
+Vector Index
+Append-only, memory-mapped vector file with exact top-k cosine search
+"""
+
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Rows allocated when an index file is created; it doubles when full
+INITIAL_CAPACITY = 1024
+
+
+class VectorIndex:
+    """
+    Unit vectors and their message ids in two memory-mapped files
+
+    `{path}.vectors` holds float32 rows and `{path}.ids` the matching int64
+    message ids (0 marks an unused row). Files grow by doubling, so appends
+    are amortized O(1), and the OS page cache keeps hot chats in memory
+    without loading cold ones. Search is an exact dot product over all rows.
+    """
+
+    def __init__(self, path: str, dimensions: int):
+        self.path = path
+        self.dimensions = dimensions
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.memmap] = None
+        self._ids: Optional[np.memmap] = None
+        self._count = 0
+
+        if os.path.exists(f"{path}.ids"):
+            self._open()
+            # Rows are filled in order, so the first unused row ends the data
+            unused = np.flatnonzero(self._ids == 0)
+            self._count = int(unused[0]) if len(unused) else len(self._ids)
+        else:
+            self._resize(INITIAL_CAPACITY)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(f"{path}.ids")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _open(self):
+        self._ids = np.memmap(f"{self.path}.ids", dtype=np.int64, mode="r+")
+        self._vectors = np.memmap(
+            f"{self.path}.vectors", dtype=np.float32, mode="r+"
+        ).reshape(-1, self.dimensions)
+
+    def _resize(self, capacity: int):
+        """Grow both files to `capacity` rows (new rows read as zeros)"""
+        self.flush()
+        self._vectors = self._ids = None
+        for suffix, row_bytes in (
+            ("vectors", self.dimensions * 4),
+            ("ids", 8),
+        ):
+            with open(f"{self.path}.{suffix}", "ab") as f:
+                f.truncate(capacity * row_bytes)
+        self._open()
+
+    def add(self, ids: List[int], vectors: np.ndarray) -> None:
+        """Append vectors (unit length, shape (len(ids), dimensions))"""
+        if not len(ids):
+            return
+        with self._lock:
+            needed = self._count + len(ids)
+            if needed > len(self._ids):
+                capacity = len(self._ids)
+                while capacity < needed:
+                    capacity *= 2
+                self._resize(capacity)
+            self._vectors[self._count : needed] = vectors
+            self._ids[self._count : needed] = ids
+            self._count = needed
+
+    def search(
+        self, query: np.ndarray, k: int, before_id: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        The k most similar rows to a unit query vector
+
+        Args:
+            query: Query vector, shape (dimensions,)
+            k: Number of results
+            before_id: Only consider message ids lower than this
+
+        Returns:
+            [(message id, cosine similarity)], most similar first, one entry
+            per message id
+        """
+        with self._lock:
+            count = self._count
+            vectors, ids = self._vectors, self._ids
+        if count == 0 or k <= 0:
+            return []
+
+        scores = vectors[:count] @ query
+        ids = ids[:count]
+        if before_id is not None:
+            scores = np.where(ids < before_id, scores, -np.inf)
+
+        # An edited message is appended again, so over-fetch before deduping
+        fetch = min(count, k * 2)
+        top = np.argpartition(-scores, fetch - 1)[:fetch]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        results, seen = [], set()
+        for row in top:
+            score = float(scores[row])
+            message_id = int(ids[row])
+            if score == -np.inf or message_id in seen:
+                continue
+            seen.add(message_id)
+            results.append((message_id, score))
+            if len(results) == k:
+                break
+        return results
+
+    def flush(self) -> None:
+        """Write dirty pages back to the files"""
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._ids.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            self._vectors = self._ids = None
+            self._count = 0
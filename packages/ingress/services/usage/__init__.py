@@ -0,0 +1,14 @@
+"""
+Usage service initialization
+"""
+
+from .usage_service import add_usage, get_tokens_since, get_usage_totals
+from .usage_tracker import QuotaExceeded, UsageTracker
+
+__all__ = [
+    'add_usage',
+    'get_tokens_since',
+    'get_usage_totals',
+    'QuotaExceeded',
+    'UsageTracker',
+]
@@ -0,0 +1,140 @@
+"""
+Usage Service
+Reads and writes the hourly /bot usage rollup
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from services.database.models import BotUsage, Chat, User
+
+# Counters summed into each rollup row
+COUNTERS = (
+    "requests",
+    "errors",
+    "prompt_tokens",
+    "cached_tokens",
+    "output_tokens",
+    "latency_ms",
+)
+
+# (bucket, user_id, chat_id, model)
+UsageKey = Tuple[datetime, int, int, str]
+
+# Rows per multi-row upsert (keeps SQLite under its variable limit)
+UPSERT_BATCH = 100
+
+
+def add_usage(db: Session, rows: Dict[UsageKey, Dict[str, int]]) -> int:
+    """
+    Add counters to the rollup, creating rows as needed
+
+    One multi-row INSERT ... ON CONFLICT DO UPDATE per batch, so a flush
+    costs a few statements however many /bot calls it covers. Returns the
+    number of rows written.
+    """
+    if not rows:
+        return 0
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        insert = postgresql_insert
+    elif dialect == "sqlite":
+        insert = sqlite_insert
+    else:
+        raise NotImplementedError(f"Usage rollup upsert is not supported on {dialect}")
+
+    values = [
+        {
+            "bucket": bucket,
+            "user_id": user_id,
+            "chat_id": chat_id,
+            "model": model,
+            **{name: counters.get(name, 0) for name in COUNTERS},
+        }
+        for (bucket, user_id, chat_id, model), counters in rows.items()
+    ]
+    for start in range(0, len(values), UPSERT_BATCH):
+        stmt = insert(BotUsage).values(values[start : start + UPSERT_BATCH])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["bucket", "user_id", "chat_id", "model"],
+            set_={
+                name: getattr(BotUsage, name) + getattr(stmt.excluded, name)
+                for name in COUNTERS
+            },
+        )
+        db.execute(stmt)
+    db.commit()
+    return len(values)
+
+
+def get_tokens_since(
+    db: Session,
+    since: datetime,
+    user_id: Optional[int] = None,
+    chat_id: Optional[int] = None,
+) -> int:
+    """Prompt plus output tokens recorded since a time, for a user or a chat"""
+    stmt = select(
+        func.coalesce(func.sum(BotUsage.prompt_tokens + BotUsage.output_tokens), 0)
+    ).where(BotUsage.bucket >= since)
+    if user_id is not None:
+        stmt = stmt.where(BotUsage.user_id == user_id)
+    if chat_id is not None:
+        stmt = stmt.where(BotUsage.chat_id == chat_id)
+    return int(db.execute(stmt).scalar())
+
+
+def get_usage_totals(
+    db: Session, since: datetime, group_by: Optional[str] = None, limit: int = 50
+) -> List[Dict]:
+    """
+    Usage totals since a time, overall or per "user", "chat" or "model"
+
+    Groups are ordered by tokens used, highest first, at most `limit` of
+    them. Each entry has the summed counters and, when grouped, the group's
+    key and display name.
+    """
+    sums = [func.coalesce(func.sum(getattr(BotUsage, name)), 0) for name in COUNTERS]
+    if group_by is None:
+        row = db.execute(select(*sums).where(BotUsage.bucket >= since)).one()
+        return [_totals(row)]
+
+    if group_by == "user":
+        key, name = BotUsage.user_id, User.username
+        join = (User, User.id == BotUsage.user_id)
+    elif group_by == "chat":
+        key, name = BotUsage.chat_id, Chat.name
+        join = (Chat, Chat.id == BotUsage.chat_id)
+    elif group_by == "model":
+        key, name, join = BotUsage.model, BotUsage.model, None
+    else:
+        raise ValueError(f"Unknown usage grouping: {group_by}")
+
+    tokens = func.sum(BotUsage.prompt_tokens + BotUsage.output_tokens)
+    stmt = (
+        select(*sums, key, name)
+        .where(BotUsage.bucket >= since)
+        .group_by(key, name)
+        .order_by(tokens.desc())
+        .limit(limit)
+    )
+    if join is not None:
+        stmt = stmt.outerjoin(*join)
+    return [
+        {"key": row[-2], "name": row[-1], **_totals(row)}
+        for row in db.execute(stmt).all()
+    ]
+
+
+def _totals(row) -> Dict:
+    totals = {name: int(row[i]) for i, name in enumerate(COUNTERS)}
+    latency = totals.pop("latency_ms")
+    totals["avg_latency_ms"] = (
+        round(latency / totals["requests"]) if totals["requests"] else None
+    )
+    return totals
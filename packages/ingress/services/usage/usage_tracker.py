@@ -0,0 +1,249 @@
+"""
+Usage Tracker
+Counts /bot usage in memory, enforces quotas and flushes to the rollup
+"""
+
+import asyncio
+import math
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+from itertools import chain
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from shared.config import (
+    BOT_CHAT_REQUESTS_PER_MINUTE,
+    BOT_CHAT_TOKENS_PER_DAY,
+    BOT_USER_REQUESTS_PER_MINUTE,
+    BOT_USER_TOKENS_PER_DAY,
+    USAGE_FLUSH_INTERVAL_SECONDS,
+)
+from shared.database import session_scope
+from .usage_service import UsageKey, add_usage, get_tokens_since
+
+# Window of the per-minute request limits
+RATE_WINDOW_SECONDS = 60
+
+
+class QuotaExceeded(NamedTuple):
+    """Why a /bot request was refused, and when it may be retried"""
+
+    message: str
+    retry_after: int
+
+
+def _hour(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _midnight(moment: datetime) -> datetime:
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class UsageTracker:
+    """
+    Per-user and per-chat /bot accounting and quotas
+
+    Each finished call is added to in-memory counters keyed by hour, user,
+    chat and model; a background task adds them to the bot_usage rollup
+    every flush interval, so accounting costs no database write per request.
+
+    Quotas are checked before the model is called: requests per minute
+    (sliding window, per process) and tokens per UTC day. A user's or chat's
+    daily total is read from the rollup once a day and kept up to date in
+    memory afterwards.
+    """
+
+    def __init__(
+        self,
+        session_factory=session_scope,
+        flush_interval: float = USAGE_FLUSH_INTERVAL_SECONDS,
+        user_requests_per_minute: int = BOT_USER_REQUESTS_PER_MINUTE,
+        chat_requests_per_minute: int = BOT_CHAT_REQUESTS_PER_MINUTE,
+        user_tokens_per_day: int = BOT_USER_TOKENS_PER_DAY,
+        chat_tokens_per_day: int = BOT_CHAT_TOKENS_PER_DAY,
+        clock=time.time,
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.requests_per_minute = {
+            "user": user_requests_per_minute,
+            "chat": chat_requests_per_minute,
+        }
+        self.tokens_per_day = {"user": user_tokens_per_day, "chat": chat_tokens_per_day}
+        self.clock = clock
+        # Counters not yet in the rollup, and those being written right now
+        self._pending: Dict[UsageKey, Counter] = {}
+        self._in_flight: Dict[UsageKey, Counter] = {}
+        # ("user" | "chat", id) -> admission times within the rate window
+        self._recent: Dict[Tuple[str, int], deque] = {}
+        # ("user" | "chat", id) -> tokens used on self._day
+        self._day: Optional[datetime] = None
+        self._day_tokens: Dict[Tuple[str, int], int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "recorded": 0,
+            "rejected": 0,
+            "flushes": 0,
+            "rows_flushed": 0,
+            "flush_errors": 0,
+        }
+
+    def _now(self) -> Tuple[float, datetime]:
+        now = self.clock()
+        return now, datetime.fromtimestamp(now, timezone.utc)
+
+    def _today(self, moment: datetime) -> datetime:
+        """Midnight UTC of `moment`, resetting the daily totals on a new day"""
+        day = _midnight(moment)
+        if day != self._day:
+            self._day = day
+            self._day_tokens = {}
+        return day
+
+    def _tokens_today(self, db, scope: str, owner_id: int, moment: datetime) -> int:
+        day = self._today(moment)
+        key = (scope, owner_id)
+        if key not in self._day_tokens:
+            stored = get_tokens_since(db, day, **{f"{scope}_id": owner_id})
+            position = 1 if scope == "user" else 2
+            unflushed = sum(
+                counters["prompt_tokens"] + counters["output_tokens"]
+                for usage_key, counters in chain(
+                    self._pending.items(), self._in_flight.items()
+                )
+                if usage_key[0] >= day and usage_key[position] == owner_id
+            )
+            self._day_tokens[key] = stored + unflushed
+        return self._day_tokens[key]
+
+    def check(self, db, user_id: int, chat_id: int) -> Optional[QuotaExceeded]:
+        """
+        Admit a /bot request, or say why it is refused
+
+        An admitted request counts against the per-minute limits straight
+        away; its tokens count once it is recorded.
+        """
+        now, moment = self._now()
+        owners = (("user", user_id), ("chat", chat_id))
+
+        for scope, owner_id in owners:
+            limit = self.requests_per_minute[scope]
+            times = self._recent.get((scope, owner_id))
+            if limit <= 0 or not times:
+                continue
+            while times and times[0] <= now - RATE_WINDOW_SECONDS:
+                times.popleft()
+            if len(times) >= limit:
+                retry_after = math.ceil(times[0] + RATE_WINDOW_SECONDS - now)
+                return self._reject(
+                    (
+                        f"You're sending /bot requests too quickly (limit {limit} "
+                        f"per minute). Try again in {retry_after} seconds."
+                        if scope == "user"
+                        else f"This chat has reached its limit of {limit} /bot "
+                        f"requests per minute. Try again in {retry_after} seconds."
+                    ),
+                    retry_after,
+                )
+
+        for scope, owner_id in owners:
+            limit = self.tokens_per_day[scope]
+            if limit > 0 and self._tokens_today(db, scope, owner_id, moment) >= limit:
+                midnight = self._today(moment) + timedelta(days=1)
+                retry_after = math.ceil((midnight - moment).total_seconds())
+                who = "You've" if scope == "user" else "This chat has"
+                return self._reject(
+                    f"{who} used the daily /bot quota of {limit:,} tokens. "
+                    "It resets at midnight UTC.",
+                    retry_after,
+                )
+
+        for scope, owner_id in owners:
+            if self.requests_per_minute[scope] > 0:
+                self._recent.setdefault((scope, owner_id), deque()).append(now)
+        return None
+
+    def _reject(self, message: str, retry_after: int) -> QuotaExceeded:
+        self.stats["rejected"] += 1
+        return QuotaExceeded(message, max(1, retry_after))
+
+    def record(self, user_id: int, chat_id: int, usage: Dict) -> None:
+        """
+        Count a finished /bot call
+
+        Args:
+            usage: As filled in by GeminiService.generate_stream_response
+                (model, prompt/cached/output tokens, latency_ms, error)
+        """
+        _, moment = self._now()
+        key = (_hour(moment), user_id, chat_id, usage.get("model") or "unknown")
+        counters = self._pending.setdefault(key, Counter())
+        counters["requests"] += 1
+        counters["errors"] += 1 if usage.get("error") else 0
+        counters["prompt_tokens"] += usage.get("prompt_tokens") or 0
+        counters["cached_tokens"] += usage.get("cached_tokens") or 0
+        counters["output_tokens"] += usage.get("output_tokens") or 0
+        counters["latency_ms"] += round(usage.get("latency_ms") or 0)
+        self.stats["recorded"] += 1
+
+        tokens = (usage.get("prompt_tokens") or 0) + (usage.get("output_tokens") or 0)
+        self._today(moment)
+        for owner in (("user", user_id), ("chat", chat_id)):
+            # Totals not loaded yet will include this call when they are
+            if owner in self._day_tokens:
+                self._day_tokens[owner] += tokens
+
+    async def flush(self) -> int:
+        """Add the pending counters to the rollup; returns rows written"""
+        pending, self._pending = self._pending, {}
+        self._prune_rate_windows()
+        if not pending:
+            return 0
+        self._in_flight = pending
+        try:
+            rows = await asyncio.to_thread(self._write, pending)
+        except Exception as e:
+            # Keep them for the next flush
+            for key, counters in pending.items():
+                self._pending.setdefault(key, Counter()).update(counters)
+            self.stats["flush_errors"] += 1
+            print(f"Error flushing bot usage: {e}")
+            return 0
+        finally:
+            self._in_flight = {}
+        self.stats["flushes"] += 1
+        self.stats["rows_flushed"] += rows
+        return rows
+
+    def _write(self, pending: Dict[UsageKey, Counter]) -> int:
+        with self.session_factory() as db:
+            return add_usage(db, pending)
+
+    def _prune_rate_windows(self) -> None:
+        cutoff = self.clock() - RATE_WINDOW_SECONDS
+        for key in [
+            k for k, times in self._recent.items() if not times or times[-1] <= cutoff
+        ]:
+            del self._recent[key]
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        """Start the periodic flush (call from the running event loop)"""
+        if self._task is None and self.flush_interval > 0:
+            self._task = asyncio.create_task(self._flush_periodically())
+
+    async def close(self) -> None:
+        """Stop the periodic flush and write what is left"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def snapshot(self) -> Dict:
+        return {**self.stats, "pending_rows": len(self._pending)}
@@ -0,0 +1,152 @@
+"""
+WebSocket Encoding
+Negotiated wire encodings for WebSocket frames
+"""
+
+import zlib
+from typing import Dict, Iterable, Optional, Tuple
+
+import msgpack
+
+from shared.config import WS_MAX_INBOUND_FRAME_BYTES
+from shared.serialization import dumps, dumps_str, loads, to_primitive
+from .socket_writer import conflation_key
+
+# Plain JSON text frames (the default, what the web client speaks)
+JSON = "json"
+# MessagePack binary frames
+MSGPACK = "msgpack"
+# JSON, raw-deflated against DEFLATE_DICTIONARY, as binary frames
+DEFLATE = "deflate"
+
+ENCODINGS = (JSON, MSGPACK, DEFLATE)
+
+# Clients may also ask for an encoding as a subprotocol, e.g. "gemini-coop.msgpack"
+SUBPROTOCOL_PREFIX = "gemini-coop."
+
+# Preset dictionary for DEFLATE. Chat frames are small (often < 300 bytes),
+# which leaves a per-message compressor nothing to back-reference; seeding
+# it with the keys and values every event repeats lets even a single frame
+# compress, without per-connection compressor state, so one compressed frame
+# can be shared by every socket. zlib favours matches near the end of the
+# dictionary, so the most frequent strings come last.
+DEFLATE_DICTIONARY = (
+    b'{"type":"chat_created","chat_invite","notification":"You\'ve been added'
+    b' to a new chat by ","owner_id":,"is_group":true,"name":'
+    b'{"type":"removed_from_chat","chat_deleted","user_joined","user_left"'
+    b'{"type":"read_receipts_updated","read_receipts":{"":[{"user_id":'
+    b',"username":"","read_at":"2025-01-01T00:00:00.000000+00:00"}]}'
+    b'{"type":"unread_update","chat_id":,"unread_count":0,'
+    b'"last_message_preview":"","last_message_time":"'
+    b'{"type":"typing","chat_id":,"username":"'
+    b'{"type":"bot_stream","message":{"id":,"chat_id":,"user_id":null,'
+    b'"username":"AI Assistant","content":"","is_bot":true,"created_at":"'
+    b'{"type":"message","message":{"id":,"chat_id":,"user_id":,'
+    b'"username":"","content":"","is_bot":false,"created_at":"2025-'
+    b'T00:00:00.000000+00:00"}}'
+)
+
+
+class FrameTooLargeError(ValueError):
+    """Raised when an inbound frame exceeds WS_MAX_INBOUND_FRAME_BYTES"""
+
+
+def negotiate(
+    requested: Optional[str], subprotocols: Iterable[str]
+) -> Tuple[str, Optional[str]]:
+    """
+    Pick the wire encoding for a new connection
+
+    Args:
+        requested: Value of the `encoding` query parameter, if any
+        subprotocols: Subprotocols offered in Sec-WebSocket-Protocol
+
+    Returns:
+        (encoding, subprotocol to accept with or None)
+    """
+    if requested in ENCODINGS:
+        return requested, None
+    for subprotocol in subprotocols:
+        if subprotocol.startswith(SUBPROTOCOL_PREFIX):
+            encoding = subprotocol[len(SUBPROTOCOL_PREFIX) :]
+            if encoding in ENCODINGS:
+                return encoding, subprotocol
+    return JSON, None
+
+
+def encode(message: dict, encoding: str) -> dict:
+    """Encode a message as an ASGI "websocket.send" event"""
+    if encoding == MSGPACK:
+        return {
+            "type": "websocket.send",
+            "bytes": msgpack.packb(message, default=to_primitive),
+        }
+    if encoding == DEFLATE:
+        compressor = zlib.compressobj(
+            6, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=DEFLATE_DICTIONARY
+        )
+        data = dumps(message)
+        return {
+            "type": "websocket.send",
+            "bytes": compressor.compress(data) + compressor.flush(),
+        }
+    return {"type": "websocket.send", "text": dumps_str(message)}
+
+
+def inflate(data: bytes, max_size: int = WS_MAX_INBOUND_FRAME_BYTES) -> bytes:
+    """
+    Decompress a DEFLATE frame, refusing to produce more than max_size bytes
+
+    Raises:
+        FrameTooLargeError: If the frame inflates past max_size
+    """
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS, zdict=DEFLATE_DICTIONARY)
+    inflated = decompressor.decompress(data, max_size)
+    if decompressor.unconsumed_tail:
+        raise FrameTooLargeError(f"frame inflates past {max_size} bytes")
+    # All input was consumed; flush returns whatever output is still buffered
+    inflated += decompressor.flush()
+    if len(inflated) > max_size:
+        raise FrameTooLargeError(f"frame inflates past {max_size} bytes")
+    return inflated
+
+
+def decode(message: dict, encoding: str) -> dict:
+    """
+    Decode an ASGI "websocket.receive" event
+
+    Text frames are always JSON; binary frames use the connection's encoding.
+
+    Raises:
+        FrameTooLargeError: If the frame, decompressed, exceeds
+            WS_MAX_INBOUND_FRAME_BYTES
+    """
+    text = message.get("text")
+    data = text if text is not None else message.get("bytes") or b""
+    if len(data) > WS_MAX_INBOUND_FRAME_BYTES:
+        raise FrameTooLargeError(f"{len(data)} byte frame")
+    if text is not None:
+        return loads(text)
+    if encoding == MSGPACK:
+        return msgpack.unpackb(data, strict_map_key=False)
+    if encoding == DEFLATE:
+        data = inflate(data)
+    return loads(data)
+
+
+class OutboundFrame:
+    """One outbound event, encoded at most once per wire encoding"""
+
+    __slots__ = ("message", "key", "_encoded")
+
+    def __init__(self, message: dict):
+        self.message = message
+        self.key = conflation_key(message)
+        self._encoded: Dict[str, dict] = {}
+
+    def asgi(self, encoding: str) -> dict:
+        """ASGI send event for `encoding`, shared by every socket using it"""
+        event = self._encoded.get(encoding)
+        if event is None:
+            event = self._encoded[encoding] = encode(self.message, encoding)
+        return event
@@ -0,0 +1,126 @@
+"""
+Socket Writer
+Per-connection outbound queue drained by a dedicated task
+"""
+
+import asyncio
+from collections import deque
+from typing import Callable, Deque, Dict, Hashable, List, Optional
+
+from fastapi import WebSocket
+
+
+class SlowConsumerError(Exception):
+    """Raised when a socket falls too far behind its outbound queue"""
+
+
+def conflation_key(message: dict) -> Optional[tuple]:
+    """
+    Key under which a newer frame supersedes an older undelivered one
+
+    Only events whose latest frame carries the full state qualify; everything
+    else returns None and is always delivered.
+    """
+    event_type = message.get("type")
+    if event_type == "bot_stream":
+        # Each frame carries the whole response so far
+        inner = message["message"]
+        return (event_type, inner["chat_id"], inner["id"])
+    if event_type == "typing":
+        return (event_type, message.get("chat_id"), message.get("username"))
+    if event_type in ("read_receipts_updated", "unread_update"):
+        return (event_type, message.get("chat_id"))
+    return None
+
+
+class SocketWriter:
+    """
+    Outbound frame queue for one WebSocket
+
+    Senders enqueue pre-encoded ASGI messages without awaiting the socket,
+    so one slow client never holds up a room or a notification fan-out.
+    Frames are written in order by the writer's own task.
+
+    A frame enqueued with a conflation key drops an undelivered frame with
+    the same key and joins the back of the queue, so a client that falls
+    behind catches up with the latest state instead of replaying every
+    intermediate frame, and never sees that state before frames sent ahead
+    of it.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_pending: int,
+        on_error: Callable[[WebSocket, Exception], None],
+    ):
+        self.websocket = websocket
+        self.max_pending = max_pending
+        # Entries are [key, frame]; a superseded entry's frame is set to None
+        # and skipped, so dropping it never scans the queue
+        self.pending: Deque[List] = deque()
+        self._keyed: Dict[Hashable, List] = {}
+        self._superseded = 0
+        self._on_error = on_error
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def enqueue(self, frame: dict, key: Optional[Hashable] = None) -> bool:
+        """
+        Queue an ASGI "websocket.send" message for this socket
+
+        Args:
+            frame: ASGI message, shared between sockets
+            key: Optional conflation key (see conflation_key)
+
+        Returns:
+            True if the frame superseded an undelivered one
+        """
+        superseded = self._keyed.pop(key, None) if key is not None else None
+        if superseded is not None:
+            superseded[1] = None
+            self._superseded += 1
+            if self._superseded > len(self.pending) // 2:
+                self._compact()
+        elif len(self.pending) - self._superseded >= self.max_pending:
+            error = SlowConsumerError(f"{self.max_pending} frames pending")
+            self.close()
+            self._on_error(self.websocket, error)
+            return False
+
+        entry = [key, frame]
+        self.pending.append(entry)
+        if key is not None:
+            self._keyed[key] = entry
+        self._wakeup.set()
+        return superseded is not None
+
+    def _compact(self):
+        """Drop superseded entries once they make up half the queue"""
+        self.pending = deque(entry for entry in self.pending if entry[1] is not None)
+        self._superseded = 0
+
+    async def _run(self):
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                while self.pending:
+                    key, frame = self.pending.popleft()
+                    if frame is None:
+                        self._superseded -= 1
+                        continue
+                    if key is not None:
+                        del self._keyed[key]
+                    await self.websocket.send(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._on_error(self.websocket, e)
+
+    def close(self):
+        """Stop the writer task and drop anything still queued"""
+        self.pending.clear()
+        self._keyed.clear()
+        self._superseded = 0
+        self._task.cancel()
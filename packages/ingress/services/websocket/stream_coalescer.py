@@ -0,0 +1,140 @@
+"""
+Stream Coalescer
+Batches streamed text chunks into WebSocket frames by time window or size
+"""
+
+import asyncio
+from typing import AsyncGenerator, AsyncIterator, Optional
+
+from shared.metrics import Histogram
+
+
+class StreamStats:
+    """Counters for bot stream framing, used to tune the coalescer"""
+
+    # Upper bounds (in bytes) of the per-frame size histogram buckets
+    FRAME_SIZE_BUCKETS = (16, 64, 256, 1024, 4096, 16384)
+
+    def __init__(self):
+        self.streams = 0
+        self.chunks = 0
+        self.frame_sizes = Histogram(self.FRAME_SIZE_BUCKETS)
+
+    def record_frame(self, size: int):
+        """Record one flushed frame carrying `size` bytes of new text"""
+        self.frame_sizes.observe(size)
+
+    def snapshot(self) -> dict:
+        """Return a JSON-serializable view of the counters"""
+        frames = self.frame_sizes.count
+        return {
+            "streams": self.streams,
+            "chunks": self.chunks,
+            "frames": frames,
+            "avg_chunks_per_frame": round(self.chunks / frames, 2) if frames else 0,
+            "frame_bytes": self.frame_sizes.snapshot(),
+        }
+
+
+# Queued by the pump after the upstream's last chunk
+_END = object()
+
+
+async def _pump(stream: AsyncIterator[str], queue: asyncio.Queue):
+    """
+    Move every chunk of `stream` into `queue`, then _END
+
+    The whole upstream is iterated by this one task, so context variables and
+    timeouts entered inside it stay bound to the task that entered them. An
+    upstream error is queued and re-raised to the consumer.
+    """
+    try:
+        async for chunk in stream:
+            queue.put_nowait(chunk)
+    except Exception as e:
+        queue.put_nowait(e)
+    else:
+        queue.put_nowait(_END)
+
+
+class StreamCoalescer:
+    """
+    Coalesces a stream of text chunks into frames
+
+    The first chunk is flushed immediately to keep time-to-first-token low.
+    After that, text accumulates until either `frame_interval` seconds have
+    passed since the previous frame or `max_frame_bytes` of new text is
+    pending, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        frame_interval: float,
+        max_frame_bytes: int,
+        stats: Optional[StreamStats] = None,
+    ):
+        self.frame_interval = frame_interval
+        self.max_frame_bytes = max_frame_bytes
+        self.stats = stats or StreamStats()
+
+    async def frames(self, stream: AsyncIterator[str]) -> AsyncGenerator[str, None]:
+        """
+        Consume `stream` and yield the accumulated text at each flush
+
+        Args:
+            stream: Async iterator yielding text chunks
+
+        Yields:
+            The full text received so far, once per frame
+        """
+        loop = asyncio.get_running_loop()
+        self.stats.streams += 1
+
+        queue: asyncio.Queue = asyncio.Queue()
+        pump = asyncio.create_task(_pump(stream, queue))
+
+        text = ""
+        pending_bytes = 0
+        last_flush: Optional[float] = None
+
+        try:
+            while True:
+                # Only wait on a deadline while there is unsent text
+                timeout = None
+                if pending_bytes:
+                    timeout = max(0.0, last_flush + self.frame_interval - loop.time())
+
+                try:
+                    chunk = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    # Window elapsed while the upstream is still producing
+                    self.stats.record_frame(pending_bytes)
+                    pending_bytes = 0
+                    last_flush = loop.time()
+                    yield text
+                    continue
+
+                if chunk is _END:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+
+                self.stats.chunks += 1
+                text += chunk
+                pending_bytes += len(chunk.encode("utf-8"))
+
+                if (
+                    last_flush is None
+                    or pending_bytes >= self.max_frame_bytes
+                    or loop.time() - last_flush >= self.frame_interval
+                ):
+                    self.stats.record_frame(pending_bytes)
+                    pending_bytes = 0
+                    last_flush = loop.time()
+                    yield text
+
+            if pending_bytes:
+                self.stats.record_frame(pending_bytes)
+                yield text
+        finally:
+            pump.cancel()
@@ -3,12 +3,20 @@ WebSocket Service
 Manages WebSocket connections and real-time message broadcasting
 """
 
-from fastapi import WebSocket
-from typing import Dict, Set
-import json
+from fastapi import WebSocket, WebSocketDisconnect
+from typing import AbstractSet, Dict, Iterable, List, Optional, Set
 import asyncio
 from datetime import datetime, timezone
 
+from shared.config import (
+    BOT_STREAM_FRAME_INTERVAL_MS,
+    BOT_STREAM_MAX_FRAME_BYTES,
+    WS_MAX_PENDING_FRAMES,
+)
+from .encoding import JSON, FrameTooLargeError, OutboundFrame, decode
+from .socket_writer import SlowConsumerError, SocketWriter
+from .stream_coalescer import StreamCoalescer, StreamStats
+
 
 class ConnectionManager:
     """Manages WebSocket connections for real-time chat"""
@@ -20,14 +28,40 @@ class ConnectionManager:
         self.websocket_users: Dict[WebSocket, int] = {}
         # Maps: websocket -> username
         self.websocket_usernames: Dict[WebSocket, str] = {}
+        # Maps: websocket -> negotiated wire encoding (see encoding.py)
+        self.websocket_encodings: Dict[WebSocket, str] = {}
         # Maps: user_id -> set of websockets (for multiple tabs/devices)
         self.user_connections: Dict[int, Set[WebSocket]] = {}
+        # Maps: websocket -> send queue (created on the first frame sent)
+        self.writers: Dict[WebSocket, SocketWriter] = {}
+        # Frame counters for bot streams (shared across all streams)
+        self.stream_stats = StreamStats()
+        self.max_pending_frames = WS_MAX_PENDING_FRAMES
+        # Close tasks for sockets dropped by their send queue
+        self._closing: Set[asyncio.Task] = set()
+        # Room broadcast counters
+        self.broadcast_stats = {
+            "room_broadcasts": 0,
+            "queued_frames": 0,
+            "slow_consumer_disconnects": 0,
+            # Undelivered frames replaced by a newer frame with the same key
+            "conflated_frames": 0,
+            "conflated_by_type": {},
+        }
 
-    async def connect(self, websocket: WebSocket, user_id: int, username: str):
+    async def connect(
+        self,
+        websocket: WebSocket,
+        user_id: int,
+        username: str,
+        encoding: str = JSON,
+        subprotocol: Optional[str] = None,
+    ):
         """Accept a new WebSocket connection"""
-        await websocket.accept()
+        await websocket.accept(subprotocol=subprotocol)
         self.websocket_users[websocket] = user_id
         self.websocket_usernames[websocket] = username
+        self.websocket_encodings[websocket] = encoding
 
         # Track user connections for push notifications
         if user_id not in self.user_connections:
@@ -57,11 +91,17 @@ class ConnectionManager:
             if not self.user_connections[user_id]:
                 del self.user_connections[user_id]
 
+        # Stop the send queue, if one was started
+        writer = self.writers.pop(websocket, None)
+        if writer is not None:
+            writer.close()
+
         # Remove user mapping
         if websocket in self.websocket_users:
             del self.websocket_users[websocket]
         if websocket in self.websocket_usernames:
             del self.websocket_usernames[websocket]
+        self.websocket_encodings.pop(websocket, None)
 
     async def join_chat(self, websocket: WebSocket, chat_id: int):
         """Add a websocket to a chat room"""
@@ -74,10 +114,70 @@ class ConnectionManager:
         if chat_id in self.active_connections:
             self.active_connections[chat_id].discard(websocket)
 
-    async def send_personal_message(self, message: str, websocket: WebSocket):
+    def _writer_for(self, websocket: WebSocket) -> SocketWriter:
+        """Get or start the send queue for a websocket"""
+        writer = self.writers.get(websocket)
+        if writer is None:
+            writer = SocketWriter(
+                websocket, self.max_pending_frames, self._on_writer_error
+            )
+            self.writers[websocket] = writer
+        return writer
+
+    def _on_writer_error(self, websocket: WebSocket, error: Exception):
+        """Drop a socket whose send queue failed or overflowed"""
+        print(f"Error writing to connection, disconnecting: {error!r}")
+        if isinstance(error, SlowConsumerError):
+            self.broadcast_stats["slow_consumer_disconnects"] += 1
+        self.disconnect(websocket)
+        # Close with "try again later" so the client reconnects and resyncs
+        task = asyncio.create_task(self._close_quietly(websocket, 1013))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close_quietly(self, websocket: WebSocket, code: int):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    def _record_conflated(self, key: tuple, count: int):
+        self.broadcast_stats["conflated_frames"] += count
+        by_type = self.broadcast_stats["conflated_by_type"]
+        by_type[key[0]] = by_type.get(key[0], 0) + count
+
+    async def receive(self, websocket: WebSocket) -> dict:
+        """
+        Receive and decode the next frame in the socket's encoding
+
+        A frame over the inbound size limit closes the socket with 1009
+        (message too big) and raises WebSocketDisconnect.
+        """
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+        try:
+            return decode(message, self.websocket_encodings.get(websocket, JSON))
+        except FrameTooLargeError as e:
+            await self._close_quietly(websocket, 1009)
+            raise WebSocketDisconnect(1009, str(e))
+
+    async def _send(self, websocket: WebSocket, frame: OutboundFrame):
+        """
+        Queue a frame for one websocket in its negotiated encoding
+
+        Every frame goes through the socket's send queue, so frames arrive
+        in the order they were sent, a slow client never blocks the sender,
+        and the frame's conflation key can supersede a stale queued frame.
+        """
+        event = frame.asgi(self.websocket_encodings.get(websocket, JSON))
+        if self._writer_for(websocket).enqueue(event, frame.key):
+            self._record_conflated(frame.key, 1)
+
+    async def send_personal_message(self, message: dict, websocket: WebSocket):
         """Send a message to a specific websocket"""
         try:
-            await websocket.send_text(message)
+            await self._send(websocket, OutboundFrame(message))
         except Exception as e:
             print(f"Error sending personal message: {e}")
 
@@ -95,21 +195,39 @@ class ConnectionManager:
         if chat_id not in self.active_connections:
             return
 
-        message_json = json.dumps(message)
-        disconnected = set()
+        # Encoded lazily, once per wire encoding in use
+        self._broadcast_queued(
+            self.active_connections[chat_id], OutboundFrame(message), exclude
+        )
 
-        for connection in self.active_connections[chat_id]:
-            if connection == exclude:
-                continue
-            try:
-                await connection.send_text(message_json)
-            except Exception as e:
-                print(f"Error broadcasting to connection: {e}")
-                disconnected.add(connection)
+    def _broadcast_queued(
+        self,
+        connections: Set[WebSocket],
+        frame: OutboundFrame,
+        exclude: Optional[WebSocket] = None,
+    ):
+        """
+        Queue one pre-built frame on every socket in a room
 
-        # Clean up disconnected connections
-        for connection in disconnected:
-            self.active_connections[chat_id].discard(connection)
+        Each encoding's ASGI message is built once and shared, and nothing is
+        awaited per socket, so the broadcaster's cost is one append per
+        subscriber and a slow client only delays itself, whatever the size
+        of the room. Failed or overflowing sockets are dropped by their writer.
+        """
+        encodings = self.websocket_encodings
+        key = frame.key
+        conflated = 0
+        # Snapshot: a writer error may disconnect sockets mid-loop
+        for connection in tuple(connections):
+            if connection is not exclude:
+                event = frame.asgi(encodings.get(connection, JSON))
+                conflated += self._writer_for(connection).enqueue(event, key)
+        if conflated:
+            self._record_conflated(key, conflated)
+        self.broadcast_stats["room_broadcasts"] += 1
+        self.broadcast_stats["queued_frames"] += len(connections) - (
+            exclude in connections
+        )
 
     async def stream_to_chat(
         self,
@@ -134,10 +252,15 @@ class ConnectionManager:
         # Use current UTC time for streaming messages
         stream_timestamp = datetime.now(timezone.utc).isoformat()
 
-        async for chunk in stream_generator:
-            full_response += chunk
+        # Coalesce chunks into frames instead of broadcasting each one
+        coalescer = StreamCoalescer(
+            frame_interval=BOT_STREAM_FRAME_INTERVAL_MS / 1000,
+            max_frame_bytes=BOT_STREAM_MAX_FRAME_BYTES,
+            stats=self.stream_stats,
+        )
 
-            # Broadcast chunk to all connections in the chat
+        async for full_response in coalescer.frames(stream_generator):
+            # Broadcast accumulated content to all connections in the chat
             message = {
                 "type": "bot_stream",
                 "message": {
@@ -152,8 +275,6 @@ class ConnectionManager:
             }
 
             await self.broadcast_to_chat(message, chat_id)
-            # Small delay to prevent overwhelming clients
-            await asyncio.sleep(0.01)
 
         return full_response
 
@@ -176,12 +297,15 @@ class ConnectionManager:
         if user_id not in self.user_connections:
             return
 
-        message_json = json.dumps(message)
+        await self._send_to_user(user_id, OutboundFrame(message))
+
+    async def _send_to_user(self, user_id: int, frame: OutboundFrame):
+        """Send a frame to all of a user's connections"""
         disconnected = set()
 
-        for connection in self.user_connections[user_id]:
+        for connection in self.user_connections.get(user_id, ()):
             try:
-                await connection.send_text(message_json)
+                await self._send(connection, frame)
             except Exception as e:
                 print(f"Error notifying user {user_id}: {e}")
                 disconnected.add(connection)
@@ -190,16 +314,59 @@ class ConnectionManager:
         for connection in disconnected:
             self.user_connections[user_id].discard(connection)
 
-    async def notify_users(self, user_ids: list[int], message: dict):
+    async def notify_users(self, user_ids: Iterable[int], message: dict):
         """
         Send a notification to multiple users
 
         Args:
-            user_ids: List of user IDs to notify
+            user_ids: User IDs to notify
             message: Message dict to send
         """
+        # Encoded at most once per wire encoding for every recipient
+        frame = OutboundFrame(message)
         for user_id in user_ids:
-            await self.notify_user(user_id, message)
+            if user_id in self.user_connections:
+                await self._send_to_user(user_id, frame)
+
+    def online_members(self, member_ids: AbstractSet[int]) -> List[int]:
+        """
+        Intersect a chat's member ids with the users that have open sockets
+
+        Iterates whichever side is smaller, so fan-out cost follows the
+        number of online members rather than the size of the chat.
+        """
+        if len(member_ids) <= len(self.user_connections):
+            return [uid for uid in member_ids if uid in self.user_connections]
+        return [uid for uid in self.user_connections if uid in member_ids]
+
+    async def send_unread_updates(
+        self,
+        chat_id: int,
+        unread_counts: Dict[int, int],
+        last_message_preview: Optional[str],
+        last_message_time: Optional[str] = None,
+    ):
+        """
+        Push sidebar badge counters to the chat members that are online
+
+        Args:
+            chat_id: Chat whose counters changed
+            unread_counts: Map of user_id -> unread count, computed once per message
+            last_message_preview: Preview of the chat's latest message
+            last_message_time: ISO timestamp of the chat's latest message
+        """
+        # Only users with open sockets get a frame
+        for user_id in unread_counts.keys() & self.user_connections.keys():
+            await self.notify_user(
+                user_id,
+                {
+                    "type": "unread_update",
+                    "chat_id": chat_id,
+                    "unread_count": unread_counts[user_id],
+                    "last_message_preview": last_message_preview,
+                    "last_message_time": last_message_time,
+                },
+            )
 
 
 # Singleton instance
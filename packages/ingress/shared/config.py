@@ -5,6 +5,8 @@ Shared configuration
 import os
 from dotenv import load_dotenv
 
+from shared.utils import get_env_bool, get_env_float, get_env_int
+
 load_dotenv()
 
 # JWT Configuration
@@ -15,13 +17,158 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 # Database Configuration
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Optional read replica for read-only chat queries
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+# Keep a user's reads on the primary this long after they write
+REPLICA_READ_YOUR_WRITES_SECONDS = get_env_float(
+    "REPLICA_READ_YOUR_WRITES_SECONDS", 5.0
+)
+# Stop using a failing replica for this long before retrying it
+REPLICA_RETRY_AFTER_SECONDS = get_env_float("REPLICA_RETRY_AFTER_SECONDS", 30.0)
+
+# How often to recompute unread counters to repair drift (0 disables)
+UNREAD_RECONCILE_INTERVAL_SECONDS = get_env_int(
+    "UNREAD_RECONCILE_INTERVAL_SECONDS", 3600
+)
+
 # Gemini API Configuration
+# "gemini" calls the Gemini API (needs GEMINI_API_KEY); "fake" answers locally
+# with the simulated latency and errors below, for offline runs and load tests
+GEMINI_PROVIDER = os.getenv("GEMINI_PROVIDER", "gemini")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+# Fake provider: time to first token (plus up to the jitter fraction more),
+# generation speed, reply length and stream chunk size (tokens), and the
+# share of requests that fail before their first token or mid-stream
+FAKE_PROVIDER_FIRST_TOKEN_MS = get_env_int("FAKE_PROVIDER_FIRST_TOKEN_MS", 400)
+FAKE_PROVIDER_JITTER = get_env_float("FAKE_PROVIDER_JITTER", 0.2)
+FAKE_PROVIDER_TOKENS_PER_SECOND = get_env_float("FAKE_PROVIDER_TOKENS_PER_SECOND", 80.0)
+FAKE_PROVIDER_OUTPUT_TOKENS = get_env_int("FAKE_PROVIDER_OUTPUT_TOKENS", 150)
+FAKE_PROVIDER_CHUNK_TOKENS = get_env_int("FAKE_PROVIDER_CHUNK_TOKENS", 10)
+FAKE_PROVIDER_ERROR_RATE = get_env_float("FAKE_PROVIDER_ERROR_RATE", 0.0)
+FAKE_PROVIDER_STREAM_ERROR_RATE = get_env_float("FAKE_PROVIDER_STREAM_ERROR_RATE", 0.0)
+# HTTP status of injected errors (5xx and 429 are retried)
+FAKE_PROVIDER_ERROR_CODE = get_env_int("FAKE_PROVIDER_ERROR_CODE", 503)
+FAKE_PROVIDER_SEED = get_env_int("FAKE_PROVIDER_SEED", 0)
+# System instruction sent with every /bot request
+GEMINI_SYSTEM_INSTRUCTION = os.getenv(
+    "GEMINI_SYSTEM_INSTRUCTION",
+    "You are a helpful assistant taking part in a group chat. Earlier messages "
+    "from the chat's members appear as user turns.",
+)
+# Explicit context caching of the stable prompt prefix: the system
+# instruction, the rolling summary and the turns since the summary, taken in
+# whole blocks of GEMINI_CACHE_TURN_BLOCK so the prefix changes once per
+# block rather than with every message. Only prefixes of at least
+# GEMINI_CACHE_MIN_TOKENS estimated tokens are cached, since smaller ones are
+# not accepted; the instruction and summary alone rarely reach it
+GEMINI_CACHE_ENABLED = get_env_bool("GEMINI_CACHE_ENABLED", False)
+GEMINI_CACHE_TTL_SECONDS = get_env_int("GEMINI_CACHE_TTL_SECONDS", 600)
+GEMINI_CACHE_MIN_TOKENS = get_env_int("GEMINI_CACHE_MIN_TOKENS", 1024)
+GEMINI_CACHE_TURN_BLOCK = get_env_int("GEMINI_CACHE_TURN_BLOCK", 10)
+# Gemini call resilience: give up on a request that has not connected, or
+# not produced its first token, within these times (and on a stream that
+# goes quiet mid-response)
+GEMINI_CONNECT_TIMEOUT_SECONDS = get_env_float("GEMINI_CONNECT_TIMEOUT_SECONDS", 10.0)
+GEMINI_FIRST_TOKEN_TIMEOUT_SECONDS = get_env_float(
+    "GEMINI_FIRST_TOKEN_TIMEOUT_SECONDS", 30
+)
+GEMINI_STREAM_IDLE_TIMEOUT_SECONDS = get_env_float(
+    "GEMINI_STREAM_IDLE_TIMEOUT_SECONDS", 30
+)
+# Attempts per request for retryable errors, with jittered exponential backoff
+GEMINI_MAX_ATTEMPTS = get_env_int("GEMINI_MAX_ATTEMPTS", 3)
+GEMINI_RETRY_BACKOFF_SECONDS = get_env_float("GEMINI_RETRY_BACKOFF_SECONDS", 0.5)
+GEMINI_RETRY_MAX_BACKOFF_SECONDS = get_env_float(
+    "GEMINI_RETRY_MAX_BACKOFF_SECONDS", 8.0
+)
+# Hedging: send a second request if the first has no token after the p95
+# first-token latency (needs this many samples first)
+GEMINI_HEDGE_ENABLED = get_env_bool("GEMINI_HEDGE_ENABLED", False)
+GEMINI_HEDGE_MIN_SAMPLES = get_env_int("GEMINI_HEDGE_MIN_SAMPLES", 20)
+# Circuit breaker: fail fast after this many consecutive failures, and try
+# the upstream again after the reset time
+GEMINI_BREAKER_FAILURES = get_env_int("GEMINI_BREAKER_FAILURES", 5)
+GEMINI_BREAKER_RESET_SECONDS = get_env_float("GEMINI_BREAKER_RESET_SECONDS", 30.0)
+# Model routing for /bot: pick a tier per request from command flags
+# ("/bot! " for lite, "/bot deep " for deep), the chat's setting and the
+# question's size, passing over models that are slow or failing. When off,
+# every request goes to GEMINI_MODEL (the standard tier)
+GEMINI_ROUTING_ENABLED = get_env_bool("GEMINI_ROUTING_ENABLED", False)
+GEMINI_MODEL_LITE = os.getenv("GEMINI_MODEL_LITE", "gemini-2.5-flash-lite")
+GEMINI_MODEL_DEEP = os.getenv("GEMINI_MODEL_DEEP", "gemini-2.5-pro")
+# Questions up to this many estimated tokens go to lite, from this many to deep
+GEMINI_ROUTING_LITE_MAX_TOKENS = get_env_int("GEMINI_ROUTING_LITE_MAX_TOKENS", 32)
+GEMINI_ROUTING_DEEP_MIN_TOKENS = get_env_int("GEMINI_ROUTING_DEEP_MIN_TOKENS", 1500)
+# A model whose recent p95 first-token latency exceeds this is passed over
+GEMINI_ROUTING_SLOW_TTFT_SECONDS = get_env_float(
+    "GEMINI_ROUTING_SLOW_TTFT_SECONDS", 8.0
+)
+# Prompt budget for /bot calls (estimated tokens, history plus question)
+GEMINI_CONTEXT_TOKENS = get_env_int("GEMINI_CONTEXT_TOKENS", 8000)
+# Longer history messages are truncated to this many tokens
+GEMINI_CONTEXT_MESSAGE_TOKENS = get_env_int("GEMINI_CONTEXT_MESSAGE_TOKENS", 1000)
+# Most recent messages loaded as candidates for the prompt
+GEMINI_HISTORY_MESSAGES = get_env_int("GEMINI_HISTORY_MESSAGES", 200)
+# Cached per-message token counts
+TOKEN_COUNT_CACHE_SIZE = get_env_int("TOKEN_COUNT_CACHE_SIZE", 100000)
+# Rolling chat summaries: refresh once this many messages have left the
+# recent window, which keeps the newest SUMMARY_KEEP_RECENT verbatim
+SUMMARY_EVERY_MESSAGES = get_env_int("SUMMARY_EVERY_MESSAGES", 20)
+SUMMARY_KEEP_RECENT = get_env_int("SUMMARY_KEEP_RECENT", 20)
+
+# Retrieval of relevant older messages for /bot prompts (off by default)
+RETRIEVAL_ENABLED = get_env_bool("RETRIEVAL_ENABLED", False)
+# "hashing" embeds locally; "gemini" calls the embeddings API on every write
+RETRIEVAL_EMBEDDER = os.getenv("RETRIEVAL_EMBEDDER", "hashing")
+RETRIEVAL_EMBEDDING_MODEL = os.getenv(
+    "RETRIEVAL_EMBEDDING_MODEL", "gemini-embedding-001"
+)
+RETRIEVAL_DIMENSIONS = get_env_int("RETRIEVAL_DIMENSIONS", 256)
+# Per-chat memory-mapped vector files live here
+RETRIEVAL_INDEX_DIR = os.getenv("RETRIEVAL_INDEX_DIR", "./vector_index")
+# Past messages added per /bot prompt, the least similarity they need, and
+# the share of the prompt budget they may use (estimated tokens)
+RETRIEVAL_TOP_K = get_env_int("RETRIEVAL_TOP_K", 5)
+RETRIEVAL_MIN_SCORE = get_env_float("RETRIEVAL_MIN_SCORE", 0.2)
+RETRIEVAL_CONTEXT_TOKENS = get_env_int("RETRIEVAL_CONTEXT_TOKENS", 1500)
+# Most recent messages embedded when a chat without an index is first queried
+RETRIEVAL_BACKFILL_MESSAGES = get_env_int("RETRIEVAL_BACKFILL_MESSAGES", 10000)
+
+# /bot usage accounting: per-call usage is counted in memory and added to
+# the hourly bot_usage rollup every USAGE_FLUSH_INTERVAL_SECONDS
+USAGE_FLUSH_INTERVAL_SECONDS = get_env_int("USAGE_FLUSH_INTERVAL_SECONDS", 30)
+# /bot quotas, checked before the model is called (0 turns a limit off);
+# request rates are counted per server process, daily tokens (prompt plus
+# output) from midnight UTC
+BOT_USER_REQUESTS_PER_MINUTE = get_env_int("BOT_USER_REQUESTS_PER_MINUTE", 10)
+BOT_CHAT_REQUESTS_PER_MINUTE = get_env_int("BOT_CHAT_REQUESTS_PER_MINUTE", 30)
+BOT_USER_TOKENS_PER_DAY = get_env_int("BOT_USER_TOKENS_PER_DAY", 0)
+BOT_CHAT_TOKENS_PER_DAY = get_env_int("BOT_CHAT_TOKENS_PER_DAY", 0)
+# Usernames allowed to read the admin usage report (comma-separated)
+ADMIN_USERNAMES = frozenset(
+    name.strip() for name in os.getenv("ADMIN_USERNAMES", "").split(",") if name.strip()
+)
+
+# Chat member-id cache used for WebSocket fan-out
+CHAT_MEMBER_CACHE_SIZE = get_env_int("CHAT_MEMBER_CACHE_SIZE", 10000)
+CHAT_MEMBER_CACHE_TTL_SECONDS = get_env_int("CHAT_MEMBER_CACHE_TTL_SECONDS", 300)
+
+# Bot stream framing: flush accumulated text at most every N ms,
+# or sooner once this many bytes of new text are pending
+BOT_STREAM_FRAME_INTERVAL_MS = get_env_int("BOT_STREAM_FRAME_INTERVAL_MS", 50)
+BOT_STREAM_MAX_FRAME_BYTES = get_env_int("BOT_STREAM_MAX_FRAME_BYTES", 1024)
+
+# Every socket sends through its own queue; one with this many undelivered
+# frames is disconnected as too slow
+WS_MAX_PENDING_FRAMES = get_env_int("WS_MAX_PENDING_FRAMES", 1000)
+# Largest inbound frame accepted, measured after decompression, so a small
+# DEFLATE frame cannot inflate into an unbounded buffer
+WS_MAX_INBOUND_FRAME_BYTES = get_env_int("WS_MAX_INBOUND_FRAME_BYTES", 1048576)
 
 # Server Configuration
 HOST = os.getenv("HOST", "0.0.0.0")
-PORT = int(os.getenv("PORT", "8000"))
+PORT = get_env_int("PORT", 8000)
 
 # CORS Configuration
 CORS_ORIGINS = os.getenv(
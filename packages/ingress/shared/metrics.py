@@ -0,0 +1,58 @@
+"""
+Shared in-process metrics helpers
+"""
+
+import os
+import time
+from typing import Dict, Optional, Sequence
+
+
+class Histogram:
+    """Fixed-bucket histogram with count, sum and max"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        """Record a single observation"""
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def snapshot(self) -> Dict:
+        """Return a JSON-serializable view of the histogram"""
+        buckets = {f"<={bound}": n for bound, n in zip(self.buckets, self.counts)}
+        buckets[f">{self.buckets[-1]}"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 3) if self.count else 0,
+            "max": round(self.max, 3),
+            "buckets": buckets,
+        }
+
+
+def _rss_bytes() -> Optional[int]:
+    """Resident memory of this process, where /proc is available"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def process_stats() -> Dict:
+    """CPU time and memory of the server process, for load tests to sample"""
+    return {
+        "pid": os.getpid(),
+        "cpu_seconds": round(time.process_time(), 3),
+        "rss_bytes": _rss_bytes(),
+    }
@@ -0,0 +1,122 @@
+"""
+Read replica routing
+Sends explicitly read-only work to a replica, with primary fallback
+"""
+
+import time
+from typing import Callable, Dict, Optional, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session, sessionmaker
+
+T = TypeVar("T")
+
+
+class ReadReplicaRouter:
+    """
+    Routes read-only units of work between a primary and a replica
+
+    Reads go to the primary instead of the replica when:
+      - no replica is configured
+      - the replica failed recently (it is retried after `retry_after_seconds`)
+      - the acting user committed a write within `read_your_writes_seconds`
+
+    Writes are detected from primary sessions tagged with
+    `session.info["user_id"]`.
+    """
+
+    def __init__(
+        self,
+        primary: sessionmaker,
+        replica: Optional[sessionmaker] = None,
+        read_your_writes_seconds: float = 5.0,
+        retry_after_seconds: float = 30.0,
+    ):
+        self.primary = primary
+        self.replica = replica
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self.retry_after_seconds = retry_after_seconds
+        self.stats = {"replica_reads": 0, "primary_reads": 0, "fallbacks": 0}
+        self._last_write_at: Dict[int, float] = {}
+        self._replica_down_until = 0.0
+
+        event.listen(primary, "after_flush", self._on_flush)
+        event.listen(primary, "after_commit", self._on_commit)
+        event.listen(primary, "after_rollback", self._on_rollback)
+
+    def _on_flush(self, session: Session, flush_context):
+        session.info["has_writes"] = True
+
+    def _on_commit(self, session: Session):
+        if session.info.pop("has_writes", False):
+            user_id = session.info.get("user_id")
+            if user_id is not None:
+                self.record_write(user_id)
+
+    def _on_rollback(self, session: Session):
+        session.info.pop("has_writes", None)
+
+    def record_write(self, user_id: int):
+        """Pin this user's reads to the primary for the read-your-writes window"""
+        now = time.monotonic()
+        self._last_write_at[user_id] = now
+
+        # Drop expired entries so the map stays bounded by active writers
+        if len(self._last_write_at) > 10000:
+            cutoff = now - self.read_your_writes_seconds
+            self._last_write_at = {
+                uid: at for uid, at in self._last_write_at.items() if at > cutoff
+            }
+
+    def use_replica(self, user_id: Optional[int] = None) -> bool:
+        """Whether a read for `user_id` may go to the replica right now"""
+        if self.replica is None:
+            return False
+        now = time.monotonic()
+        if now < self._replica_down_until:
+            return False
+        if user_id is not None:
+            last_write = self._last_write_at.get(user_id)
+            if last_write and now - last_write < self.read_your_writes_seconds:
+                return False
+        return True
+
+    def run(
+        self,
+        fn: Callable[..., T],
+        *args,
+        user_id: Optional[int] = None,
+        session: Optional[Session] = None,
+        **kwargs,
+    ) -> T:
+        """
+        Run a read-only function `fn(db, *args, **kwargs)` on the best bind
+
+        Args:
+            fn: Read-only function taking a session as its first argument
+            user_id: Acting user, for read-your-writes routing
+            session: Primary session the caller already holds; reads that
+                stay on the primary run on it instead of checking out another
+
+        Returns:
+            Whatever `fn` returns
+        """
+        if self.use_replica(user_id):
+            try:
+                with self.replica() as db:
+                    result = fn(db, *args, **kwargs)
+                self.stats["replica_reads"] += 1
+                return result
+            except (DBAPIError, PoolTimeoutError) as e:
+                print(f"Read replica error, falling back to primary: {e}")
+                self._replica_down_until = time.monotonic() + self.retry_after_seconds
+                self.stats["fallbacks"] += 1
+
+        if session is not None:
+            result = fn(session, *args, **kwargs)
+        else:
+            with self.primary() as db:
+                result = fn(db, *args, **kwargs)
+        self.stats["primary_reads"] += 1
+        return result
@@ -0,0 +1,66 @@
+"""
+Shared JSON serialization
+One orjson-backed encoder for REST responses and WebSocket frames
+"""
+
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Type
+
+import orjson
+from fastapi.responses import Response
+from pydantic import BaseModel, TypeAdapter
+from typing_extensions import TypedDict
+
+# Integer dict keys (e.g. read receipts keyed by message id) become strings,
+# as they would with the stdlib encoder; fastapi.responses.ORJSONResponse,
+# the REST default response class, sets the same option
+DUMPS_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode to JSON bytes; datetimes come out in isoformat()"""
+    return orjson.dumps(obj, option=DUMPS_OPTIONS)
+
+
+def dumps_str(obj: Any) -> str:
+    """Encode to a JSON string, for text WebSocket frames"""
+    return orjson.dumps(obj, option=DUMPS_OPTIONS).decode()
+
+
+loads = orjson.loads
+
+
+def to_primitive(obj: Any) -> Any:
+    """`default` hook for encoders without native datetime support"""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def row_list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    """
+    TypeAdapter for a list of plain dicts shaped like `model`
+
+    The row type is derived from the model's fields, so it cannot drift from
+    the response schema, and dumping dicts skips building a model per row.
+    """
+    row = TypedDict(
+        f"{model.__name__}Row",
+        {name: field.annotation for name, field in model.model_fields.items()},
+    )
+    return TypeAdapter(List[row])
+
+
+def json_list_response(adapter: TypeAdapter, rows: Iterable[Dict]) -> Response:
+    """
+    Serialize list endpoint rows straight to JSON
+
+    Skips FastAPI's response_model round trip (validate, convert to
+    primitives, encode again); pydantic-core writes the rows in one pass,
+    with the same output as the response_model path.
+
+    Args:
+        adapter: Adapter from row_list_adapter()
+        rows: Dicts with the response model's fields, built from trusted data
+    """
+    return Response(adapter.dump_json(list(rows)), media_type="application/json")
@@ -22,4 +22,19 @@ def get_env_bool(key: str, default: bool = False) -> bool:
 
 def get_env_int(key: str, default: int) -> int:
     """Get environment variable as integer"""
-    return int(os.getenv(key, str(default)))
+    value = os.getenv(key, str(default))
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(
+            f"Environment variable {key} must be an integer, got {value!r}"
+        )
+
+
+def get_env_float(key: str, default: float) -> float:
+    """Get environment variable as float"""
+    value = os.getenv(key, str(default))
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"Environment variable {key} must be a number, got {value!r}")
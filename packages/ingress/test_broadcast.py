@@ -0,0 +1,230 @@
+"""
+Room broadcast test for Gemini Coop
+
+Drives ConnectionManager against in-process Starlette WebSockets whose ASGI
+send records frames, checking send order, slow consumers and conflation
+(no running server needed).
+
+Usage:
+    python test_broadcast.py
+    # or
+    python -m pytest test_broadcast.py
+"""
+
+import asyncio
+import json
+
+from starlette.websockets import WebSocket, WebSocketState
+
+from services.websocket.websocket_manager import ConnectionManager
+
+CHAT_ID = 1
+
+
+class RecordingSocket:
+    """ASGI side of one WebSocket: records sent frames, optionally stalls"""
+
+    def __init__(self, stall: bool = False):
+        self.frames = []
+        self.closed_with = None
+        # Sends block until the gate opens
+        self.gate = asyncio.Event()
+        if not stall:
+            self.gate.set()
+        self.websocket = WebSocket(
+            {"type": "websocket", "path": "/ws", "headers": []},
+            self.receive,
+            self.send,
+        )
+        self.websocket.client_state = WebSocketState.CONNECTED
+        self.websocket.application_state = WebSocketState.CONNECTED
+
+    async def receive(self):
+        await asyncio.Event().wait()
+
+    async def send(self, message: dict):
+        if message["type"] == "websocket.close":
+            self.closed_with = message["code"]
+            return
+        await self.gate.wait()
+        if "bytes" in message:
+            self.frames.append(message["bytes"])
+        else:
+            self.frames.append(json.loads(message["text"]))
+
+
+def open_room(manager: ConnectionManager, sockets):
+    for user_id, socket in enumerate(sockets, start=1):
+        manager.websocket_users[socket.websocket] = user_id
+        manager.user_connections.setdefault(user_id, set()).add(socket.websocket)
+        manager.active_connections.setdefault(CHAT_ID, set()).add(socket.websocket)
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+async def run_room_keeps_order():
+    manager = ConnectionManager()
+    sockets = [RecordingSocket() for _ in range(5)]
+    open_room(manager, sockets)
+
+    await manager.broadcast_to_chat({"type": "new_message", "n": 1}, CHAT_ID)
+    # Sent while the room frame is still queued: must not overtake it
+    await manager.notify_user(1, {"type": "unread_update", "n": 2})
+    await manager.broadcast_to_chat({"type": "new_message", "n": 3}, CHAT_ID)
+    await settle()
+
+    assert [f["n"] for f in sockets[0].frames] == [1, 2, 3]
+    for socket in sockets[1:]:
+        assert [f["n"] for f in socket.frames] == [1, 3]
+    assert manager.broadcast_stats["room_broadcasts"] == 2
+    assert manager.broadcast_stats["queued_frames"] == 10
+
+
+async def run_slow_consumer_does_not_block_room():
+    manager = ConnectionManager()
+    slow = RecordingSocket(stall=True)
+    fast = RecordingSocket()
+    open_room(manager, [slow, fast])
+
+    for n in range(3):
+        await asyncio.wait_for(
+            manager.broadcast_to_chat({"type": "new_message", "n": n}, CHAT_ID), 1
+        )
+    await manager.notify_users([1, 2], {"type": "unread_update", "n": 3})
+    await settle()
+    assert [f["n"] for f in fast.frames] == [0, 1, 2, 3]
+    assert slow.frames == []
+
+    slow.gate.set()
+    await settle()
+    assert [f["n"] for f in slow.frames] == [0, 1, 2, 3]
+
+
+async def run_slow_consumer_is_dropped():
+    manager = ConnectionManager()
+    manager.max_pending_frames = 3
+    slow = RecordingSocket(stall=True)
+    sockets = [RecordingSocket() for _ in range(3)] + [slow]
+    open_room(manager, sockets)
+
+    for n in range(10):
+        await manager.broadcast_to_chat({"type": "new_message", "n": n}, CHAT_ID)
+        await settle()
+
+    assert slow.websocket not in manager.active_connections[CHAT_ID]
+    assert slow.closed_with == 1013
+    assert manager.broadcast_stats["slow_consumer_disconnects"] == 1
+    for socket in sockets[:3]:
+        assert [f["n"] for f in socket.frames] == list(range(10))
+
+
+async def run_slow_consumer_catches_up_in_one_frame():
+    manager = ConnectionManager()
+    slow = RecordingSocket(stall=True)
+    sockets = [RecordingSocket() for _ in range(3)] + [slow]
+    open_room(manager, sockets)
+
+    content = ""
+    for word in ["Hello", " there", ",", " how", " are", " you", "?"]:
+        content += word
+        await manager.broadcast_to_chat(
+            {
+                "type": "bot_stream",
+                "message": {"id": 7, "chat_id": CHAT_ID, "content": content},
+            },
+            CHAT_ID,
+        )
+        await manager.broadcast_to_chat(
+            {"type": "typing", "chat_id": CHAT_ID, "username": "alice"}, CHAT_ID
+        )
+        await settle()
+    await manager.broadcast_to_chat({"type": "message", "n": 1}, CHAT_ID)
+
+    # Fast sockets saw every frame
+    await settle()
+    assert len(sockets[0].frames) == 15
+
+    # The slow socket was stuck on the first frame; the rest collapsed
+    slow.gate.set()
+    await settle()
+    assert [f["type"] for f in slow.frames] == [
+        "bot_stream",
+        "bot_stream",
+        "typing",
+        "message",
+    ]
+    assert slow.frames[1]["message"]["content"] == content
+    stats = manager.broadcast_stats
+    assert stats["conflated_by_type"] == {"bot_stream": 5, "typing": 6}
+    assert stats["conflated_frames"] == 11
+
+
+async def run_conflated_frame_keeps_its_place():
+    manager = ConnectionManager()
+    slow = RecordingSocket(stall=True)
+    open_room(manager, [slow])
+
+    await manager.broadcast_to_chat({"type": "new_message", "n": 0}, CHAT_ID)
+    await settle()
+    # Stuck sending n=0; the badge update is superseded after a message
+    # was queued behind it
+    badge = {"type": "unread_update", "chat_id": CHAT_ID}
+    await manager.notify_user(1, {**badge, "n": 1})
+    await manager.broadcast_to_chat({"type": "new_message", "n": 2}, CHAT_ID)
+    await manager.notify_user(1, {**badge, "n": 3})
+    await manager.broadcast_to_chat({"type": "new_message", "n": 4}, CHAT_ID)
+
+    slow.gate.set()
+    await settle()
+    # The latest badge arrives where it was sent, never before n=2
+    assert [f["n"] for f in slow.frames] == [0, 2, 3, 4]
+    assert manager.broadcast_stats["conflated_by_type"] == {"unread_update": 1}
+
+
+def test_room_keeps_order():
+    """Room frames and direct frames reach each socket in send order"""
+    asyncio.run(run_room_keeps_order())
+
+
+def test_slow_consumer_does_not_block_room():
+    """A stalled socket in a small room delays only itself"""
+    asyncio.run(run_slow_consumer_does_not_block_room())
+
+
+def test_slow_consumer_is_dropped():
+    """A socket that stops reading is disconnected without stalling the room"""
+    asyncio.run(run_slow_consumer_is_dropped())
+
+
+def test_slow_consumer_catches_up_in_one_frame():
+    """Superseded stream and typing frames are conflated for a slow socket"""
+    asyncio.run(run_slow_consumer_catches_up_in_one_frame())
+
+
+def test_conflated_frame_keeps_its_place():
+    """A superseding frame is delivered after the frames queued before it"""
+    asyncio.run(run_conflated_frame_keeps_its_place())
+
+
+def main():
+    print("=" * 50)
+    print("Room Broadcast Test")
+    print("=" * 50)
+
+    test_room_keeps_order()
+    print("✅ Frames delivered in order")
+    test_slow_consumer_does_not_block_room()
+    print("✅ Stalled socket did not block a small room")
+    test_slow_consumer_is_dropped()
+    print("✅ Slow consumer dropped, room unaffected")
+    test_slow_consumer_catches_up_in_one_frame()
+    print("✅ Slow consumer caught up through conflated frames")
+    test_conflated_frame_keeps_its_place()
+    print("✅ Conflated frame kept its place in the queue")
+
+
+if __name__ == "__main__":
+    main()
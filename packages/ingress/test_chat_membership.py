@@ -0,0 +1,276 @@
+"""
+Chat membership test for Gemini Coop
+
+Covers bulk participant resolution, single-transaction chat creation, the
+bulk invite endpoint, and the cached member ids used for WebSocket fan-out,
+in-process (no running server needed).
+
+Usage:
+    python test_chat_membership.py
+    # or
+    python -m pytest test_chat_membership.py
+"""
+
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, select
+
+from shared.database import engine, init_db, session_scope
+from services.auth.auth_service import create_access_token
+from services.chat import chat_service
+from services.chat.bot_service import add_bot_to_chat, get_or_create_bot_user
+from services.chat.chat_service import (
+    add_participant,
+    add_participants,
+    create_chat,
+    get_chat_member_ids,
+    get_users_by_usernames,
+)
+from services.database.models import ChatParticipant, User
+from services.websocket.websocket_manager import ConnectionManager
+from server.main import app
+
+
+class StatementCounter:
+    """Counts SQL statements and commits issued through the engine"""
+
+    def __init__(self):
+        self.statements = 0
+        self.commits = 0
+
+    def __enter__(self):
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        event.listen(engine, "commit", self._on_commit)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self._on_execute)
+        event.remove(engine, "commit", self._on_commit)
+
+    def _on_execute(self, *args):
+        self.statements += 1
+
+    def _on_commit(self, *args):
+        self.commits += 1
+
+
+def make_users(db, count):
+    """Create `count` users with unique names; returns them"""
+    prefix = uuid.uuid4().hex[:8]
+    users = [
+        User(
+            username=f"{prefix}_{i}",
+            email=f"{prefix}_{i}@example.com",
+            hashed_password="not-a-real-hash",
+        )
+        for i in range(count)
+    ]
+    db.add_all(users)
+    db.commit()
+    return users
+
+
+def member_ids(db, chat_id):
+    stmt = select(ChatParticipant.user_id).where(ChatParticipant.chat_id == chat_id)
+    return sorted(db.execute(stmt).scalars())
+
+
+def test_create_chat_in_one_transaction():
+    """A chat with 100 participants is one commit and a handful of statements"""
+    init_db()
+    with session_scope() as db:
+        owner, *invited = make_users(db, 101)
+        names = [user.username for user in invited] + ["no_such_user"]
+
+        with StatementCounter() as counter:
+            users = get_users_by_usernames(db, names)
+            chat = create_chat(
+                db,
+                owner.id,
+                "Big group",
+                is_group=True,
+                participant_ids=[user.id for user in users],
+            )
+
+        assert counter.commits == 1
+        assert counter.statements <= 6
+        assert member_ids(db, chat.id) == sorted(u.id for u in [owner, *invited])
+
+
+def test_add_participants_skips_existing_members():
+    """Existing members and repeated ids are skipped, defaults are filled in"""
+    init_db()
+    with session_scope() as db:
+        owner, member, newcomer = make_users(db, 3)
+        chat = create_chat(db, owner.id, "Group", participant_ids=[member.id])
+
+        added = add_participants(db, chat.id, [member.id, newcomer.id, newcomer.id])
+        assert added == [newcomer.id]
+        assert add_participants(db, chat.id, [newcomer.id]) == []
+        assert member_ids(db, chat.id) == sorted([owner.id, member.id, newcomer.id])
+
+        row = db.execute(
+            select(ChatParticipant).where(
+                ChatParticipant.chat_id == chat.id,
+                ChatParticipant.user_id == newcomer.id,
+            )
+        ).scalar_one()
+        assert row.joined_at is not None and row.last_read_at is not None
+        assert row.unread_count == 0
+
+
+def test_bulk_invite_endpoint():
+    """Bulk invite reports added, already-member and unknown usernames"""
+    init_db()
+    with session_scope() as db:
+        owner, member, *newcomers = make_users(db, 4)
+        chat = create_chat(db, owner.id, "Group", participant_ids=[member.id])
+        chat_id = chat.id
+        token = create_access_token(data={"sub": owner.username})
+        names = [member.username] + [user.username for user in newcomers]
+
+    with TestClient(app) as client:
+        response = client.post(
+            f"/api/chats/{chat_id}/invite/bulk",
+            json={"usernames": names + ["no_such_user"]},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+    assert response.status_code == 200, response.text
+    assert response.json() == {
+        "added": names[1:],
+        "already_members": names[:1],
+        "not_found": ["no_such_user"],
+    }
+
+
+def test_member_ids_are_cached():
+    """Repeated lookups of a chat's members cost one primary-key read"""
+    init_db()
+    with session_scope() as db:
+        owner, *members = make_users(db, 50)
+        chat = create_chat(db, owner.id, "Big", participant_ids=[m.id for m in members])
+        expected = frozenset(u.id for u in [owner, *members])
+
+        assert get_chat_member_ids(db, chat.id) == expected
+        with StatementCounter() as counter:
+            assert get_chat_member_ids(db, chat.id) == expected
+        assert counter.statements == 1
+
+
+def stale_after(chat_id, write):
+    """
+    Run a membership write, then put back the cached member ids from before
+
+    Leaves this process's cache the way another worker's would be after the
+    write, so only the shared members_version can reveal the change.
+    """
+    with session_scope() as db:
+        get_chat_member_ids(db, chat_id)
+    stale = chat_service._chat_member_ids[chat_id]
+    write()
+    chat_service._chat_member_ids[chat_id] = stale
+
+
+def test_membership_writes_reach_other_processes():
+    """Every membership write path invalidates cached member ids everywhere"""
+    init_db()
+    with session_scope() as db:
+        owner, member, invitee, bulk, leaver = make_users(db, 5)
+        chat_id = create_chat(
+            db, owner.id, "Group", participant_ids=[member.id, leaver.id]
+        ).id
+        ids = {user.username: user.id for user in (owner, member, leaver)}
+        invitee_id, bulk_name, bulk_id = invitee.id, bulk.username, bulk.id
+    headers = {
+        name: {"Authorization": f"Bearer {create_access_token(data={'sub': name})}"}
+        for name in ids
+    }
+    owner_name, member_name, leaver_name = ids
+
+    def members():
+        with session_scope() as db:
+            return get_chat_member_ids(db, chat_id)
+
+    def in_session(write):
+        def run():
+            with session_scope() as db:
+                write(db)
+
+        return run
+
+    with TestClient(app) as client:
+        stale_after(
+            chat_id, in_session(lambda db: add_participant(db, chat_id, invitee_id))
+        )
+        assert invitee_id in members()
+
+        stale_after(
+            chat_id,
+            lambda: client.post(
+                f"/api/chats/{chat_id}/invite/bulk",
+                json={"usernames": [bulk_name]},
+                headers=headers[owner_name],
+            ),
+        )
+        assert bulk_id in members()
+
+        stale_after(chat_id, in_session(lambda db: add_bot_to_chat(db, chat_id)))
+        with session_scope() as db:
+            assert get_or_create_bot_user(db).id in members()
+
+        stale_after(
+            chat_id,
+            lambda: client.post(
+                f"/api/chats/{chat_id}/leave", headers=headers[leaver_name]
+            ),
+        )
+        assert ids[leaver_name] not in members()
+
+        stale_after(
+            chat_id,
+            lambda: client.delete(
+                f"/api/chats/{chat_id}/participants/{ids[member_name]}",
+                headers=headers[owner_name],
+            ),
+        )
+        assert ids[member_name] not in members()
+
+        stale_after(
+            chat_id,
+            lambda: client.delete(f"/api/chats/{chat_id}", headers=headers[owner_name]),
+        )
+        assert members() == frozenset()
+
+
+def test_online_members():
+    """Members with open sockets, whichever side of the intersection is smaller"""
+    manager = ConnectionManager()
+    manager.user_connections = {user_id: {object()} for user_id in (1, 2, 3)}
+    assert sorted(manager.online_members(frozenset({2, 3, 4}))) == [2, 3]
+    assert sorted(manager.online_members(frozenset(range(2, 100)))) == [2, 3]
+    assert manager.online_members(frozenset({7})) == []
+    manager.user_connections = {}
+    assert manager.online_members(frozenset({1, 2})) == []
+
+
+def main():
+    print("=" * 50)
+    print("Chat Membership Test")
+    print("=" * 50)
+
+    for test in (
+        test_create_chat_in_one_transaction,
+        test_add_participants_skips_existing_members,
+        test_bulk_invite_endpoint,
+        test_member_ids_are_cached,
+        test_membership_writes_reach_other_processes,
+        test_online_members,
+    ):
+        print(f"\n{test.__doc__}...")
+        test()
+        print("   ✅ passed")
+
+
+if __name__ == "__main__":
+    main()
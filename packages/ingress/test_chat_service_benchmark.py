@@ -0,0 +1,112 @@
+"""
+Chat service benchmark test for Gemini Coop
+
+Builds a small fixture with read receipts and runs the chat_service
+benchmark (benchmarks.bench_chat_service) over it, checking that receipts
+and unread counters match the messages, and that the results carry timings,
+query counts and plans and leave the fixture unchanged (no running server
+or API key needed).
+
+Usage:
+    python test_chat_service_benchmark.py
+    # or
+    python -m pytest test_chat_service_benchmark.py
+"""
+
+import tempfile
+
+import orjson
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.bench_chat_service import FUNCTIONS, build_parser, run
+from benchmarks.fixtures import build_fixture
+from services.database.models import ChatParticipant, Message, MessageReadReceipt
+
+
+def test_fixture_receipts_match_messages():
+    """Members have receipts for others' messages they read, and count the rest"""
+    engine = build_fixture(
+        f"sqlite:///{tempfile.mkdtemp()}/receipts.db",
+        users=20,
+        chats=10,
+        messages=500,
+        receipts=True,
+    )
+    with sessionmaker(bind=engine)() as db:
+        from_others = and_(
+            Message.chat_id == ChatParticipant.chat_id,
+            Message.user_id != ChatParticipant.user_id,
+        )
+        read = db.execute(
+            select(func.count())
+            .select_from(Message)
+            .join(ChatParticipant, from_others)
+            .where(Message.created_at <= ChatParticipant.last_read_at)
+        ).scalar()
+        unread = db.execute(
+            select(func.count())
+            .select_from(Message)
+            .join(ChatParticipant, from_others)
+            .where(Message.created_at > ChatParticipant.last_read_at)
+        ).scalar()
+        receipts = db.execute(select(func.count(MessageReadReceipt.id))).scalar()
+        counters = db.execute(select(func.sum(ChatParticipant.unread_count))).scalar()
+
+        assert receipts == read > 0
+        assert counters == unread > 0
+
+
+def test_benchmark_results():
+    """Every function is timed, with query counts and plans, on an unchanged fixture"""
+    url = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    args = build_parser().parse_args(
+        [
+            f"--url={url}",
+            "--users=30",
+            "--chats=20",
+            "--messages=2000",
+            "--sample=6",
+            "--repeat=2",
+        ]
+    )
+    first = run(args)
+    orjson.loads(orjson.dumps(first))
+
+    assert first["dialect"] == "sqlite" and first["fixture"]["messages"] == 2000
+    assert [pair["kind"] for pair in first["pairs"]] == ["busy"] * 3 + ["quiet"] * 3
+    assert set(first["functions"]) == {name for name, _, _ in FUNCTIONS}
+    for name, result in first["functions"].items():
+        writes = name == "mark_messages_as_read"
+        assert result["calls"] == 6 * (1 if writes else 2), name
+        assert result["p50_ms"] <= result["p95_ms"] <= result["max_ms"]
+        assert result["queries_per_call"] >= 1
+        assert result["plans"] and all(plan["plan"] for plan in result["plans"])
+        assert not result["errors"] and not result["truncated"]
+
+    # Reusing the fixture measures the same data and the same sample
+    args.reuse = True
+    second = run(args)
+    assert second["fixture"] == first["fixture"]
+    assert second["pairs"] == first["pairs"]
+    assert [p["plan"] for p in second["functions"]["get_chat_messages"]["plans"]] == [
+        p["plan"] for p in first["functions"]["get_chat_messages"]["plans"]
+    ]
+
+
+def main():
+    print("=" * 50)
+    print("Chat Service Benchmark Test")
+    print("=" * 50)
+
+    for test in (
+        test_fixture_receipts_match_messages,
+        test_benchmark_results,
+    ):
+        print(f"\n{test.__doc__}...")
+        test()
+        print("   ✅ passed")
+
+
+if __name__ == "__main__":
+    main()
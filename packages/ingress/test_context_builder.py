@@ -0,0 +1,143 @@
+"""
+Gemini context builder test for Gemini Coop
+
+Checks that /bot prompts stay within their token budget whatever the chat
+history looks like (no running server or API key needed).
+
+Usage:
+    python test_context_builder.py
+    # or
+    python -m pytest test_context_builder.py
+"""
+
+import random
+
+from services.gemini.context_builder import (
+    TRUNCATION_MARKER,
+    ContextBuilder,
+    estimate_tokens,
+    truncate_to_tokens,
+)
+
+
+def make_history(sizes, start_id=1):
+    """Alternating user/model turns whose contents are `sizes` characters long"""
+    history = []
+    for i, size in enumerate(sizes):
+        message_id = start_id + i
+        body = f"[{message_id}] " + "word " * (size // 5)
+        history.append(
+            {
+                'id': message_id,
+                'role': 'user' if i % 2 == 0 else 'model',
+                'parts': [body[:size]],
+            }
+        )
+    return history
+
+
+def test_prompt_never_exceeds_budget():
+    """Prompts stay within max_tokens for any mix of message sizes"""
+    rng = random.Random(0)
+    for max_tokens in (50, 200, 1000, 8000):
+        builder = ContextBuilder(max_tokens=max_tokens, max_message_tokens=300)
+        for _ in range(50):
+            sizes = [rng.choice([5, 80, 600, 5000, 40000]) for _ in range(30)]
+            question = "q" * rng.choice([10, 1000, 100000])
+            prompt = builder.build(question, make_history(sizes))
+            assert estimate_tokens(prompt) <= max_tokens
+            assert prompt.endswith("Assistant:")
+
+
+def test_keeps_newest_contiguous_turns():
+    """The newest turns are kept, in order, with no gaps"""
+    builder = ContextBuilder(max_tokens=200, max_message_tokens=100)
+    prompt = builder.build("What now?", make_history([40] * 50))
+    kept = [int(line.split("[")[1].split("]")[0]) for line in prompt.split("\n\n")[:-2]]
+    assert kept == list(range(kept[0], 51))
+    assert len(kept) > 3
+    # A fixed message count would have sent the same ten turns regardless
+    roomy = ContextBuilder(max_tokens=2000, max_message_tokens=100)
+    assert roomy.build("What now?", make_history([40] * 50)).count("[") == 50
+
+
+def test_oversized_messages_are_truncated():
+    """A huge message is cut down (start and end kept) instead of dropping history"""
+    builder = ContextBuilder(max_tokens=1000, max_message_tokens=100)
+    history = make_history([40, 100000, 40])
+    prompt = builder.build("Summarize", history)
+    assert "[1]" in prompt and "[2]" in prompt and "[3]" in prompt
+    assert TRUNCATION_MARKER in prompt
+    assert builder.stats["truncated"] == 1
+
+    shortened = truncate_to_tokens(history[1]['parts'][0], 100)
+    assert estimate_tokens(shortened) <= 100
+    assert shortened.startswith("[2] word")
+
+
+def test_question_always_included():
+    """The question survives even when it is bigger than the whole budget"""
+    builder = ContextBuilder(max_tokens=100, max_message_tokens=50)
+    question = "Start of question " + "x" * 10000 + " end of question?"
+    prompt = builder.build(question, make_history([40] * 5))
+    assert "Start of question" in prompt and "end of question?" in prompt
+    assert estimate_tokens(prompt) <= 100
+
+
+def test_token_counts_are_cached_per_message():
+    """Repeat builds over the same history reuse cached counts"""
+    builder = ContextBuilder(max_tokens=8000, max_message_tokens=1000)
+    history = make_history([200] * 20)
+    builder.build("first", history)
+    assert builder.stats["cache_misses"] == 20
+    builder.build("second", history + make_history([200], start_id=21))
+    assert builder.stats["cache_misses"] == 21
+    assert builder.stats["cache_hits"] == 20
+
+
+def test_turns_anchored_to_summary_are_stable():
+    """Whole blocks of turns after a summary are split off as the stable prefix"""
+    builder = ContextBuilder(max_tokens=2000, cache_turn_block=10)
+    summary = {'id': None, 'role': 'user', 'parts': ["Earlier talk."], 'summary': True}
+    history = [summary, *make_history([40] * 25)]
+
+    system, stable, contents = builder.build_contents("q", history, "Be helpful.")
+    assert system == "Be helpful.\n\nSummary of the earlier conversation: Earlier talk."
+    # The newest turn merges with the question (both from users)
+    assert len(stable) == 20 and len(contents) == 5
+    assert stable[0].parts[0].text.startswith("[1]")
+    assert contents[0].parts[0].text.startswith("[21]")
+
+    # Without a summary, or when the oldest turns do not fit, nothing is stable
+    assert builder.build_contents("q", history[1:], "Be helpful.")[1] == []
+    small = ContextBuilder(max_tokens=300, cache_turn_block=10)
+    assert small.build_contents("q", history, "Be helpful.")[1] == []
+
+
+def test_non_ascii_is_not_undercounted():
+    """CJK text counts roughly a token per character"""
+    assert estimate_tokens("hello world!") == 3
+    assert estimate_tokens("你好世界") == 4
+
+
+def main():
+    print("=" * 50)
+    print("Gemini Context Builder Test")
+    print("=" * 50)
+
+    for test in (
+        test_prompt_never_exceeds_budget,
+        test_keeps_newest_contiguous_turns,
+        test_oversized_messages_are_truncated,
+        test_question_always_included,
+        test_token_counts_are_cached_per_message,
+        test_turns_anchored_to_summary_are_stable,
+        test_non_ascii_is_not_undercounted,
+    ):
+        print(f"\n{test.__doc__}...")
+        test()
+        print("   ✅ passed")
+
+
+if __name__ == "__main__":
+    main()
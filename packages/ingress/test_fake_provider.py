@@ -0,0 +1,203 @@
+"""
+Fake model provider test for Gemini Coop
+
+Checks the local stand-in for the Gemini API (GEMINI_PROVIDER=fake): its
+simulated first-token latency, throughput and chunking, deterministic
+replies and usage, injected errors, context caching, and that the server's
+Gemini service starts without GEMINI_API_KEY (no API key or network needed).
+
+Usage:
+    python test_fake_provider.py
+    # or
+    python -m pytest test_fake_provider.py
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from google.genai import types
+
+from services.gemini.context_cache import ContextCache
+from services.gemini.gemini_service import APOLOGY, INTERRUPTED, GeminiService
+from services.gemini.providers import FakeProvider, build_client
+from services.gemini.resilience import CircuitBreaker, ResilientCaller
+
+
+def collect(service, message="hi", **kwargs):
+    async def run():
+        stream = service.generate_stream_response(message, **kwargs)
+        return [chunk async for chunk in stream]
+
+    return asyncio.run(run())
+
+
+def test_simulated_timing_and_chunks():
+    """First token after first_token_ms, then chunks at tokens_per_second"""
+    provider = FakeProvider(
+        first_token_ms=100,
+        jitter=0,
+        tokens_per_second=200,
+        output_tokens=40,
+        chunk_tokens=10,
+    )
+
+    async def run():
+        started = time.monotonic()
+        stream = await provider.aio.models.generate_content_stream(
+            model="m", contents="hello"
+        )
+        arrivals = []
+        async for chunk in stream:
+            arrivals.append((time.monotonic() - started, chunk))
+        return arrivals
+
+    arrivals = asyncio.run(run())
+    assert len(arrivals) == 4
+    first_at = arrivals[0][0]
+    assert 0.09 <= first_at < 0.3
+    # Three more chunks of 10 tokens at 200 tokens/s
+    assert 0.14 <= arrivals[-1][0] - first_at < 0.4
+    assert all(len(chunk.text.split()) == 10 for _, chunk in arrivals)
+    assert arrivals[-1][1].usage_metadata.candidates_token_count == 40
+    assert all(chunk.usage_metadata is None for _, chunk in arrivals[:-1])
+
+
+def test_replies_are_deterministic():
+    """The same prompt gets the same reply, with usage from the prompt size"""
+    provider = FakeProvider(first_token_ms=0, tokens_per_second=0, output_tokens=12)
+    service = GeminiService(client=provider, model_name="m")
+
+    first = collect(service, "what is the plan?")
+    assert first == collect(service, "what is the plan?")
+    assert first != collect(service, "something else entirely")
+
+    usage = {}
+    collect(service, "x" * 400, usage=usage)
+    assert usage["model"] == "m" and usage["error"] is False
+    assert usage["output_tokens"] == 12
+    # 100 tokens of question plus the system instruction
+    assert usage["prompt_tokens"] > 100
+    assert provider.stats["requests"] == 4 and provider.stats["errors"] == 0
+
+    response = asyncio.run(service.generate_response("what is the plan?"))
+    assert response == "".join(first)
+
+
+def test_injected_errors():
+    """Errors before the first token and mid-stream reach the service's handling"""
+    failing = FakeProvider(first_token_ms=0, tokens_per_second=0, error_rate=1)
+    service = GeminiService(
+        client=failing, model_name="m", resilience=ResilientCaller(max_attempts=1)
+    )
+    assert collect(service) == [APOLOGY]
+    assert failing.stats["errors"] == 1
+
+    broken = FakeProvider(
+        first_token_ms=0,
+        tokens_per_second=0,
+        output_tokens=30,
+        chunk_tokens=10,
+        stream_error_rate=1,
+    )
+    service = GeminiService(
+        client=broken, model_name="m", resilience=ResilientCaller(max_attempts=1)
+    )
+    chunks = collect(service)
+    assert 2 <= len(chunks) <= 3 and chunks[-1] == INTERRUPTED
+
+    # Injected 503s are retried like real ones
+    flaky = FakeProvider(first_token_ms=0, tokens_per_second=0, error_rate=0.5, seed=3)
+    service = GeminiService(
+        client=flaky,
+        model_name="m",
+        resilience=ResilientCaller(
+            max_attempts=4, backoff=0, breaker=CircuitBreaker(failure_threshold=100)
+        ),
+    )
+    replies = [collect(service, f"q{i}") for i in range(10)]
+    assert flaky.stats["errors"] > 0
+    assert sum(reply == [APOLOGY] for reply in replies) < flaky.stats["errors"]
+
+
+def test_context_cache_against_fake_caches():
+    """Cached prefixes are created, counted as cached tokens and deleted"""
+    provider = FakeProvider(first_token_ms=0, tokens_per_second=0)
+    cache = ContextCache(provider, min_tokens=10)
+    system = "You are helpful. " * 20
+
+    async def run():
+        name = await cache.get("m", system, "chat:1")
+        stream = await provider.aio.models.generate_content_stream(
+            model="m",
+            contents="hi",
+            config=types.GenerateContentConfig(cached_content=name),
+        )
+        chunks = [chunk async for chunk in stream]
+        await cache.get("m", "Another prefix entirely. " * 20, "chat:1")
+        return chunks[-1].usage_metadata
+
+    usage = asyncio.run(run())
+    assert usage.cached_content_token_count == 85
+    assert usage.prompt_token_count == 86
+    # The chat moved on to a new prefix, so its old cache was deleted
+    assert cache.stats["creates"] == 2 and cache.stats["deletes"] == 1
+    assert provider.stats["caches"] == 1
+
+
+def test_provider_selection():
+    """GEMINI_PROVIDER picks the client, and fake needs no API key"""
+    assert isinstance(build_client("fake"), FakeProvider)
+    try:
+        build_client("openai")
+    except ValueError as e:
+        assert "Unknown GEMINI_PROVIDER" in str(e)
+    else:
+        raise AssertionError("expected ValueError")
+
+    env = {k: v for k, v in os.environ.items() if k != "GEMINI_API_KEY"}
+    check = (
+        "from services.gemini.gemini_service import gemini_service; "
+        "print(gemini_service.client.name)"
+    )
+    fake = subprocess.run(
+        [sys.executable, "-c", check],
+        env={**env, "GEMINI_PROVIDER": "fake"},
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    assert fake.returncode == 0, fake.stderr
+    assert fake.stdout.strip() == "fake"
+
+    real = subprocess.run(
+        [sys.executable, "-c", check],
+        env={**env, "GEMINI_PROVIDER": "gemini"},
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    assert real.returncode != 0 and "GEMINI_PROVIDER=fake" in real.stderr
+
+
+def main():
+    print("=" * 50)
+    print("Fake Provider Test")
+    print("=" * 50)
+
+    for test in (
+        test_simulated_timing_and_chunks,
+        test_replies_are_deterministic,
+        test_injected_errors,
+        test_context_cache_against_fake_caches,
+        test_provider_selection,
+    ):
+        print(f"\n{test.__doc__}...")
+        test()
+        print("   ✅ passed")
+
+
+if __name__ == "__main__":
+    main()
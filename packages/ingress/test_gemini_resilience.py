@@ -0,0 +1,248 @@
+"""
+Gemini resilience test for Gemini Coop
+
+Points the real google-genai client at a local fake Gemini server that
+injects faults (error statuses, hangs, slow first tokens, stalled streams)
+and checks the timeouts, retries, hedging and circuit breaker around it
+(no API key or network needed).
+
+Usage:
+    python test_gemini_resilience.py
+    # or
+    python -m pytest test_gemini_resilience.py
+"""
+
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import uvicorn
+from google import genai
+from google.genai import types
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from services.gemini.gemini_service import (
+    APOLOGY,
+    INTERRUPTED,
+    GeminiService,
+)
+from services.gemini.resilience import CircuitBreaker, ResilientCaller
+
+REPLY = ["Hello ", "from ", "the fake server"]
+
+
+class FaultServer:
+    """
+    Local stand-in for the Gemini REST API
+
+    Each request takes the next fault from `faults` (or none when it is
+    empty): ("status", code), ("hang", seconds) before responding,
+    ("slow_first", seconds) before the first chunk, or ("stall", seconds)
+    after the first chunk.
+    """
+
+    def __init__(self):
+        self.faults = []
+        self.requests = 0
+        app = Starlette(routes=[Route("/{path:path}", self.handle, methods=["POST"])])
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.server = uvicorn.Server(
+            uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="error")
+        )
+        threading.Thread(target=self.server.run, daemon=True).start()
+        while not self.server.started:
+            time.sleep(0.01)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    async def handle(self, request):
+        self.requests += 1
+        kind, value = self.faults.pop(0) if self.faults else (None, None)
+        if kind == "status":
+            return JSONResponse(
+                {"error": {"code": value, "message": "injected", "status": "ERROR"}},
+                status_code=value,
+            )
+        if kind == "hang":
+            await asyncio.sleep(value)
+
+        async def events():
+            for i, text in enumerate(REPLY):
+                if i == 0 and kind == "slow_first":
+                    await asyncio.sleep(value)
+                if i == 1 and kind == "stall":
+                    await asyncio.sleep(value)
+                chunk = {
+                    "candidates": [
+                        {"content": {"role": "model", "parts": [{"text": text}]}}
+                    ]
+                }
+                yield f"data: {json.dumps(chunk)}\r\n\r\n"
+
+        if request.url.path.endswith(":streamGenerateContent"):
+            return StreamingResponse(events(), media_type="text/event-stream")
+        return JSONResponse(
+            {"candidates": [{"content": {"role": "model", "parts": [{"text": "ok"}]}}]}
+        )
+
+
+_server = None
+
+
+def fake_server(*faults):
+    """The shared fake server, reset with the given faults queued"""
+    global _server
+    if _server is None:
+        _server = FaultServer()
+    _server.faults = list(faults)
+    _server.requests = 0
+    return _server
+
+
+def make_service(server, **options):
+    options = {
+        "connect_timeout": 1.0,
+        "first_token_timeout": 1.0,
+        "idle_timeout": 1.0,
+        "backoff": 0.01,
+        "max_backoff": 0.05,
+        **options,
+    }
+    client = genai.Client(
+        api_key="test-key", http_options=types.HttpOptions(base_url=server.url)
+    )
+    resilience = ResilientCaller(**options)
+    return GeminiService(client=client, model_name="fake-model", resilience=resilience)
+
+
+async def collect(service, message="hi"):
+    return "".join([chunk async for chunk in service.generate_stream_response(message)])
+
+
+def ask(service, message="hi"):
+    return asyncio.run(collect(service, message))
+
+
+def test_retryable_errors_are_retried():
+    """503s are retried with backoff until a call succeeds"""
+    server = fake_server(("status", 503), ("status", 503))
+    service = make_service(server, max_attempts=3)
+    assert ask(service) == "".join(REPLY)
+    assert server.requests == 3
+    assert service.resilience.stats["retries"] == 2
+
+
+def test_client_errors_are_not_retried():
+    """A 400 fails at once, without retries or tripping the breaker"""
+    server = fake_server(("status", 400))
+    service = make_service(server, max_attempts=3)
+    assert ask(service) == APOLOGY
+    assert server.requests == 1
+    assert service.resilience.breaker.failures == 0
+
+
+def test_hung_upstream_times_out_and_retries():
+    """A request with no first token is abandoned and sent again"""
+    server = fake_server(("hang", 3.0))
+    service = make_service(server, first_token_timeout=0.3, max_attempts=2)
+    started = time.monotonic()
+    assert ask(service) == "".join(REPLY)
+    assert time.monotonic() - started < 2.0
+    assert service.resilience.stats["timeouts"] == 1
+
+
+def test_stalled_stream_is_cut_off():
+    """A stream that goes quiet mid-response ends with a notice"""
+    server = fake_server(("stall", 3.0))
+    service = make_service(server, idle_timeout=0.3)
+    started = time.monotonic()
+    assert ask(service) == REPLY[0] + INTERRUPTED
+    assert time.monotonic() - started < 2.0
+
+
+def test_circuit_breaker_fails_fast_and_recovers():
+    """After repeated failures calls fail fast, then one trial call closes it"""
+    now = [0.0]
+    breaker = CircuitBreaker(
+        failure_threshold=2, reset_seconds=30, clock=lambda: now[0]
+    )
+    server = fake_server(("status", 503), ("status", 503))
+    service = make_service(server, max_attempts=1, breaker=breaker)
+
+    # One event loop throughout: the client's connections belong to it
+    async def scenario():
+        assert await collect(service) == APOLOGY
+        assert await collect(service) == APOLOGY
+        assert breaker.state == "open"
+        notice = await collect(service)
+        assert "temporarily unavailable" in notice and "30 seconds" in notice
+        assert server.requests == 2  # the third call never reached the upstream
+
+        now[0] = 31
+        assert breaker.state == "half_open"
+        assert await collect(service) == "".join(REPLY)
+        assert breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_slow_first_token_is_hedged():
+    """A call slower than the usual p95 is raced by a second one"""
+    server = fake_server(("slow_first", 2.0))
+    service = make_service(server, hedge=True, hedge_min_samples=5)
+    for _ in range(5):
+        service.resilience.first_token_latency.record(0.05)
+
+    started = time.monotonic()
+    assert ask(service) == "".join(REPLY)
+    assert time.monotonic() - started < 1.5
+    assert server.requests == 2
+    assert service.resilience.stats["hedges"] == 1
+    assert service.resilience.stats["hedge_wins"] == 1
+
+
+def test_non_streaming_calls_are_protected():
+    """generate_response retries too, and raises for background callers"""
+    server = fake_server(("status", 503))
+    service = make_service(server, max_attempts=2)
+    assert asyncio.run(service.generate_response("hi", raise_errors=True)) == "ok"
+
+    server = fake_server(("status", 503), ("status", 503))
+    service = make_service(server, max_attempts=2)
+    try:
+        asyncio.run(service.generate_response("hi", raise_errors=True))
+    except Exception as e:
+        assert getattr(e, "code", None) == 503
+    else:
+        raise AssertionError("expected the 503 to be raised")
+
+
+def main():
+    print("=" * 50)
+    print("Gemini Resilience Test")
+    print("=" * 50)
+
+    for test in (
+        test_retryable_errors_are_retried,
+        test_client_errors_are_not_retried,
+        test_hung_upstream_times_out_and_retries,
+        test_stalled_stream_is_cut_off,
+        test_circuit_breaker_fails_fast_and_recovers,
+        test_slow_first_token_is_hedged,
+        test_non_streaming_calls_are_protected,
+    ):
+        print(f"\n{test.__doc__}...")
+        test()
+        print("   ✅ passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+Gemini service test for Gemini Coop
+
+Runs GeminiService against a local stub of the google-genai client, checking
+the role-tagged turns it sends and its use of cached contents (no API key or
+network needed).
+
+Usage:
+    python test_gemini_service.py
+    # or
+    python -m pytest test_gemini_service.py
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from google.genai import errors
+
+from shared.config import GEMINI_CACHE_MIN_TOKENS, GEMINI_SYSTEM_INSTRUCTION
+from services.gemini.context_builder import estimate_tokens
+from services.gemini.context_cache import ContextCache
+from services.gemini.gemini_service import APOLOGY, GeminiService
+from services.gemini.resilience import ResilientCaller
+
+
+class StubModels:
+    """Records requests and streams a canned reply with usage metadata"""
+
+    def __init__(self, caches):
+        self.caches = caches
+        self.requests = []
+        # Raised for every request when set (e.g. an overloaded model)
+        self.error = None
+
+    async def generate_content_stream(self, model, contents, config=None):
+        self.requests.append({"model": model, "contents": contents, "config": config})
+        if self.error is not None:
+            raise self.error
+        cached_tokens = 0
+        if config is not None and config.cached_content:
+            if config.cached_content not in self.caches.live:
+                raise errors.ClientError(
+                    403, {"error": {"message": "CachedContent not found"}}
+                )
+            cached_tokens = self.caches.live[config.cached_content]
+        system = config.system_instruction if config is not None else None
+        prompt_tokens = cached_tokens + estimate_tokens(system or "")
+        prompt_tokens += sum(
+            estimate_tokens(part.text) for content in contents for part in content.parts
+        )
+        usage = SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            cached_content_token_count=cached_tokens,
+            candidates_token_count=2,
+        )
+
+        async def stream():
+            yield SimpleNamespace(text="Hello ", usage_metadata=None)
+            yield SimpleNamespace(text="there", usage_metadata=usage)
+
+        return stream()
+
+
+class StubCaches:
+    """Cached contents kept in a dict: name -> cached token count"""
+
+    def __init__(self):
+        self.live = {}
+        self.calls = []
+
+    async def create(self, model, config):
+        name = f"cachedContents/{len(self.calls)}"
+        self.calls.append(("create", name, config.ttl))
+        self.live[name] = estimate_tokens(config.system_instruction) + sum(
+            estimate_tokens(part.text)
+            for content in config.contents or []
+            for part in content.parts
+        )
+        return SimpleNamespace(name=name)
+
+    async def update(self, name, config):
+        self.calls.append(("update", name, config.ttl))
+        return SimpleNamespace(name=name)
+
+    async def delete(self, name):
+        self.calls.append(("delete", name, None))
+        self.live.pop(name, None)
+
+
+class StubClient:
+    def __init__(self):
+        caches = StubCaches()
+        self.aio = SimpleNamespace(caches=caches, models=StubModels(caches))
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_service(cache=False, **cache_options):
+    client = StubClient()
+    service = GeminiService(client=client, model_name="stub-model")
+    service.instructions = "Be helpful. " * 600  # a large, stable prefix
+    if cache:
+        service.context_cache = ContextCache(client, **cache_options)
+    return service, client
+
+
+def ask(service, message, history=None, scope="chat:1"):
+    async def collect():
+        stream = service.generate_stream_response(message, history, cache_scope=scope)
+        return "".join([chunk async for chunk in stream])
+
+    return asyncio.run(collect())
+
+
+def history_with_summary(summary="They planned a launch."):
+    return [
+        {'id': None, 'role': 'user', 'parts': [summary], 'summary': True},
+        {'id': 1, 'role': 'user', 'parts': ["When is the launch?"]},
+        {'id': 2, 'role': 'user', 'parts': ["I think Friday"]},
+        {'id': 3, 'role': 'model', 'parts': ["Friday at 10am."]},
+    ]
+
+
+def test_history_is_sent_as_role_tagged_turns():
+    """Turns keep their roles, repeated roles merge, the question comes last"""
+    service, client = make_service()
+    assert ask(service, "Is it still on?", history_with_summary()) == "Hello there"
+
+    request = client.aio.models.requests[0]
+    contents = request["contents"]
+    assert [c.role for c in contents] == ['user', 'model', 'user']
+    assert [p.text for p in contents[0].parts] == [
+        "When is the launch?",
+        "I think Friday",
+    ]
+    assert contents[-1].parts[-1].text == "Is it still on?"
+    # The summary travels with the instructions, not as a turn
+    system = request["config"].system_instruction
+    assert system.startswith("Be helpful.") and "They planned a launch." in system
+    assert service.stats["requests"] == 1 and service.stats["cached_tokens"] == 0
+
+
+def test_stable_prefix_is_cached_and_reused():
+    """The prefix is cached once and later requests only send the turns"""
+    service, client = make_service(cache=True, min_tokens=100)
+    ask(service, "Is it still on?", history_with_summary())
+    ask(service, "And the venue?", history_with_summary())
+
+    creates = [call for call in client.aio.caches.calls if call[0] == "create"]
+    assert len(creates) == 1
+    first, second = client.aio.models.requests
+    for request in (first, second):
+        assert request["config"].cached_content == creates[0][1]
+        assert request["config"].system_instruction is None
+    assert service.context_cache.stats == {
+        "hits": 1,
+        "creates": 1,
+        "refreshes": 0,
+        "deletes": 0,
+        "errors": 0,
+    }
+
+    uncached, _ = make_service()
+    ask(uncached, "And the venue?", history_with_summary())
+    # Same prompt size either way, but most of it is now billed as cached
+    assert service.stats["cached_tokens"] > 0.9 * service.stats["prompt_tokens"]
+    assert uncached.stats["prompt_tokens"] * 2 == service.stats["prompt_tokens"]
+
+
+def test_cache_ttl_is_extended_and_replaced():
+    """Used caches are extended; expired ones and outdated summaries are replaced"""
+    clock = Clock()
+    service, client = make_service(
+        cache=True, min_tokens=100, ttl_seconds=600, clock=clock
+    )
+    ask(service, "q", history_with_summary())
+    clock.now = 400  # in the second half of its TTL: extend it
+    ask(service, "q", history_with_summary())
+    clock.now = 1500  # long expired: create a new one
+    ask(service, "q", history_with_summary())
+    ask(service, "q", history_with_summary("They moved the launch."))
+
+    calls = [(kind, name) for kind, name, _ in client.aio.caches.calls]
+    assert calls == [
+        ("create", "cachedContents/0"),
+        ("update", "cachedContents/0"),
+        ("create", "cachedContents/2"),
+        ("create", "cachedContents/3"),
+        # The chat moved on to a new summary, so its old cache is retired
+        ("delete", "cachedContents/2"),
+    ]
+    assert all(ttl == "600s" for kind, _, ttl in client.aio.caches.calls if ttl)
+
+
+def chat_since_summary(count):
+    """A realistic summary followed by `count` alternating chat turns"""
+    summary = "They planned the launch for Friday and split up the work. " * 40
+    turns = [
+        {
+            'id': i,
+            'role': 'user' if i % 2 else 'model',
+            'parts': [f"Message {i}: " + "the checklist looks good so far " * 3],
+        }
+        for i in range(1, count + 1)
+    ]
+    return [{'id': None, 'role': 'user', 'parts': [summary], 'summary': True}, *turns]
+
+
+def test_turns_since_summary_engage_default_cache():
+    """With default settings, the turns since the summary make the prefix cacheable"""
+    service, client = make_service()
+    service.instructions = GEMINI_SYSTEM_INSTRUCTION
+    service.context_cache = ContextCache(client)
+    summary = chat_since_summary(0)[0]['parts'][0]
+    # Instructions and summary alone are below the minimum
+    assert (
+        estimate_tokens(GEMINI_SYSTEM_INSTRUCTION + summary) < GEMINI_CACHE_MIN_TOKENS
+    )
+
+    ask(service, "q", chat_since_summary(25))
+    ask(service, "q", chat_since_summary(26))  # same block: reused
+    ask(service, "q", chat_since_summary(30))  # a new block: replaced
+
+    calls = [(kind, name) for kind, name, _ in client.aio.caches.calls]
+    assert calls == [
+        ("create", "cachedContents/0"),
+        ("create", "cachedContents/1"),
+        ("delete", "cachedContents/0"),
+    ]
+    first, second, third = client.aio.models.requests
+    # Only the turns after the cached block, then the question
+    assert [len(r["contents"]) for r in (first, second, third)] == [5, 7, 1]
+    assert second["contents"][0].parts[0].text.startswith("Message 21:")
+    assert service.context_cache.stats["hits"] == 1
+    assert service.stats["cached_tokens"] > 0.8 * service.stats["prompt_tokens"]
+
+
+def test_small_prefix_and_lost_cache_fall_back_to_inline():
+    """Prefixes below the minimum are sent inline; a lost cache is retried inline"""
+    service, client = make_service(cache=True, min_tokens=100_000)
+    ask(service, "q", history_with_summary())
+    assert client.aio.caches.calls == []
+
+    service, client = make_service(cache=True, min_tokens=100)
+    ask(service, "q", history_with_summary())
+    client.aio.caches.live.clear()  # expired on the server before our TTL
+    assert ask(service, "q", history_with_summary()) == "Hello there"
+    retried = client.aio.models.requests[-1]["config"]
+    assert retried.cached_content is None and retried.system_instruction
+
+
+def test_only_a_missing_cache_is_retried_inline():
+    """Other failures of a cached request are not resent uncached"""
+    service, client = make_service(cache=True, min_tokens=100)
+    service.resilience = ResilientCaller(max_attempts=2, backoff=0)
+    service.callers = {service.model_name: service.resilience}
+    client.aio.models.error = errors.ServerError(
+        503, {"error": {"message": "overloaded"}}
+    )
+    assert ask(service, "q", history_with_summary()) == APOLOGY
+
+    # Both attempts came from the retry policy, and both used the cache
+    requests = client.aio.models.requests
+    assert len(requests) == 2
+    assert all(r["config"].cached_content for r in requests)
+
+
+def test_plain_bad_request_is_not_retried_inline():
+    """A 400 that does not name the cached content is not resent uncached"""
+    service, client = make_service(cache=True, min_tokens=100)
+    client.aio.models.error = errors.ClientError(
+        400, {"error": {"message": "Request contains an invalid argument."}}
+    )
+    assert ask(service, "q", history_with_summary()) == APOLOGY
+
+    (request,) = client.aio.models.requests
+    assert request["config"].cached_content
+
+
+def main():
+    print("=" * 50)
+    print("Gemini Service Test")
+    print("=" * 50)
+
+    for test in (
+        test_history_is_sent_as_role_tagged_turns,
+        test_stable_prefix_is_cached_and_reused,
+        test_cache_ttl_is_extended_and_replaced,
+        test_turns_since_summary_engage_default_cache,
+        test_small_prefix_and_lost_cache_fall_back_to_inline,
+        test_only_a_missing_cache_is_retried_inline,
+        test_plain_bad_request_is_not_retried_inline,
+    ):
+        print(f"\n{test.__doc__}...")
+        test()
+        print("   ✅ passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Internal stats access test for Gemini Coop
+
+Checks that /internal/stats is only served to users listed in
+ADMIN_USERNAMES, in-process (no running server needed).
+
+Usage:
+    python test_internal_stats.py
+    # or
+    python -m pytest test_internal_stats.py
+"""
+
+from fastapi.testclient import TestClient
+
+import server.main
+from shared.database import init_db, session_scope
+from services.auth.auth_service import create_access_token, create_user
+from services.auth.auth_service import get_user_by_username
+from services.database.schemas import UserCreate
+from server.main import app
+
+USERNAME = "internal_stats_user"
+
+
+def user_token() -> str:
+    init_db()
+    with session_scope() as db:
+        if not get_user_by_username(db, USERNAME):
+            create_user(
+                db,
+                UserCreate(
+                    username=USERNAME,
+                    email=f"{USERNAME}@example.com",
+                    password="testpassword123",
+                ),
+            )
+    return create_access_token(data={"sub": USERNAME})
+
+
+def test_stats_need_an_admin():
+    """Anonymous and non-admin requests are refused, admins get the stats"""
+    headers = {"Authorization": f"Bearer {user_token()}"}
+    original = server.main.ADMIN_USERNAMES
+    with TestClient(app) as client:
+        try:
+            assert client.get("/internal/stats").status_code in (401, 403)
+
+            server.main.ADMIN_USERNAMES = frozenset()
+            assert client.get("/internal/stats", headers=headers).status_code == 403
+
+            server.main.ADMIN_USERNAMES = frozenset({USERNAME})
+            response = client.get("/internal/stats", headers=headers)
+            assert response.status_code == 200
+            assert {"process", "db_pool", "gemini"} <= set(response.json())
+        finally:
+            server.main.ADMIN_USERNAMES = original
+
+
+def main():
+    print("=" * 50)
+    print("Internal Stats Test")
+    print("=" * 50)
+
+    test_stats_need_an_admin()
+    print("✅ /internal/stats is admin-only")
+
+
+if __name__ == "__main__":
+    main()
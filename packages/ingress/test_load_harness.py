@@ -0,0 +1,107 @@
+"""
+Load harness test for Gemini Coop
+
+Runs a short, small load test (benchmarks.bench_load) end to end: seeds a
+temporary SQLite database, starts the server with the fake model provider,
+drives every kind of action and checks the machine-readable results. Also
+checks the query counters behind the report's database numbers (no API key
+or network needed).
+
+Usage:
+    python test_load_harness.py
+    # or
+    python -m pytest test_load_harness.py
+"""
+
+import asyncio
+import tempfile
+
+import orjson
+from sqlalchemy import text
+
+from benchmarks.bench_load import build_parser, parse_mix, run_load, summarize
+from shared.database import PoolStats, _create_engine
+
+
+def test_query_counters():
+    """Every statement is counted by its leading keyword"""
+    stats = PoolStats()
+    engine = _create_engine(f"sqlite:///{tempfile.mkdtemp()}/queries.db", stats)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        conn.execute(text("INSERT INTO t VALUES (1)"))
+        conn.execute(text("  select x from t"))
+        conn.execute(text("UPDATE t SET x = 2"))
+    queries = stats.snapshot(engine.pool)["queries"]
+    assert queries["select"] == 1 and queries["insert"] == 1
+    assert queries["update"] == 1 and queries["other"] == 1
+    assert queries["total"] == 4
+
+
+def test_summaries_and_mix():
+    """Percentiles of latencies, and --mix parsing"""
+    summary = summarize([float(ms) for ms in range(1, 101)])
+    assert (summary["p50"], summary["p95"], summary["p99"]) == (51.0, 96.0, 100.0)
+    assert summarize([])["count"] == 0
+    assert parse_mix("message=3,bot") == {"message": 3.0, "bot": 1.0}
+    try:
+        parse_mix("dance=1")
+    except ValueError as e:
+        assert "Unknown action" in str(e)
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def test_short_load_run():
+    """A few seconds of mixed load produce complete, serializable results"""
+    args = build_parser().parse_args(
+        [
+            "--users=30",
+            "--chats=10",
+            "--history=100",
+            "--connections=40",
+            "--rate=2",
+            "--duration=2",
+            "--warmup=0.5",
+            "--drain=2",
+            "--mix=message=5,typing=1,mark_read=1,history=1,chat_list=1,join=1,bot=1",
+            "--bot-first-token-ms=20",
+            "--bot-tokens-per-second=0",
+        ]
+    )
+    results = asyncio.run(run_load(args))
+    orjson.loads(orjson.dumps(results))
+
+    connections = results["connections"]
+    assert connections["opened"] == 40 and connections["failed"] == 0
+    assert set(results["actions"]) <= set(parse_mix(args.mix))
+    assert results["actions"]["message"] > 0
+    delivery = results["latency_ms"]["delivery"]
+    assert delivery["count"] > 0 and delivery["p50"] <= delivery["p99"]
+    assert results["throughput"]["messages_per_second"] > 0
+    assert results["server"]["samples"] >= 2
+    assert results["server"]["rss_mb_peak"] > 0
+    assert results["database"]["queries"]["total"] > 0
+    bot = results["bot"]
+    assert bot["answered"] == bot["sent"]
+    assert bot["fake_provider"]["requests"] >= bot["sent"]
+    assert not results["errors"]
+
+
+def main():
+    print("=" * 50)
+    print("Load Harness Test")
+    print("=" * 50)
+
+    for test in (
+        test_query_counters,
+        test_summaries_and_mix,
+        test_short_load_run,
+    ):
+        print(f"\n{test.__doc__}...")
+        test()
+        print("   ✅ passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Message search test for Gemini Coop
+
+Builds a small chat history in a local SQLite file with the FTS5 index (no
+running server needed). Set TEST_POSTGRES_URL to an empty scratch database
+to run the same checks against the Postgres tsvector index as well.
+
+Usage:
+    python test_message_search.py
+    # or
+    python -m pytest test_message_search.py
+"""
+
+import os
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+from conftest import run_test
+import server.main
+from shared.database import Base, init_db, session_scope
+from services.auth.auth_service import create_access_token
+from services.chat import message_search
+from services.chat.message_search import ensure_message_search_index, search_messages
+from services.database.models import Chat, ChatParticipant, Message, User
+from server.main import app
+
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+
+def make_history(session_factory):
+    """Two chats; alice is only in the first. Returns ids by name"""
+    with session_factory() as db:
+        alice, bob = (
+            User(username=name, email=f"{name}@example.com", hashed_password="x")
+            for name in ("alice", "bob")
+        )
+        db.add_all([alice, bob])
+        db.flush()
+        ours = Chat(name="Ours", owner_id=alice.id, is_group=True)
+        theirs = Chat(name="Theirs", owner_id=bob.id, is_group=True)
+        db.add_all([ours, theirs])
+        db.flush()
+        db.add_all(
+            [
+                ChatParticipant(chat_id=ours.id, user_id=alice.id),
+                ChatParticipant(chat_id=ours.id, user_id=bob.id),
+                ChatParticipant(chat_id=theirs.id, user_id=bob.id),
+            ]
+        )
+        for i in range(25):
+            db.add(Message(chat_id=ours.id, user_id=alice.id, content=f"deploy {i}"))
+        db.add(Message(chat_id=ours.id, content="Deploying <b>now</b>", is_bot=True))
+        db.add(Message(chat_id=theirs.id, user_id=bob.id, content="secret deploy"))
+        db.commit()
+        ids = {"alice": alice.id, "ours": ours.id, "theirs": theirs.id}
+
+    # Built after the rows exist, so the initial rebuild is covered too
+    with session_factory.begin() as db:
+        assert ensure_message_search_index(db.connection())
+        assert not ensure_message_search_index(db.connection())
+    return ids
+
+
+def all_pages(db, user_id, query, chat_id=None, limit=10):
+    results, cursor = search_messages(db, user_id, query, chat_id, limit)
+    while cursor:
+        page, cursor = search_messages(db, user_id, query, chat_id, limit, cursor)
+        results.extend(page)
+    return results
+
+
+def test_pages_cover_every_match_once(session_factory):
+    """Keyset pages return each match exactly once"""
+    ids = make_history(session_factory)
+    with session_factory() as db:
+        results = all_pages(db, ids["alice"], "deploy", chat_id=ids["ours"])
+        # Stemming matches "Deploying" as well
+        assert len(results) == 26
+        assert len({r["id"] for r in results}) == 26
+
+
+def test_cursor_pins_window(session_factory):
+    """Messages sent after the first page stay out of later pages"""
+    ids = make_history(session_factory)
+    with session_factory() as db:
+        first, cursor = search_messages(db, ids["alice"], "deploy", limit=10)
+        late = Message(chat_id=ids["ours"], user_id=ids["alice"], content="deploy")
+        db.add(late)
+        db.commit()
+
+        seen = [r["id"] for r in first]
+        while cursor:
+            page, cursor = search_messages(
+                db, ids["alice"], "deploy", limit=10, cursor=cursor
+            )
+            seen.extend(r["id"] for r in page)
+        assert late.id not in seen
+        # A fresh search does find it
+        assert late.id in {r["id"] for r in all_pages(db, ids["alice"], "deploy")}
+
+
+def check_ranking_covers_every_match(session_factory, ids):
+    with session_factory() as db:
+        oldest = min(r["id"] for r in all_pages(db, ids["alice"], "deploy"))
+        db.execute(
+            update(Message)
+            .where(Message.id == oldest)
+            .values(content="deploy deploy deploy")
+        )
+        db.commit()
+
+        results = all_pages(db, ids["alice"], "deploy", limit=3)
+        assert len(results) == len({r["id"] for r in results}) == 26
+        # The best match comes first, however many newer matches there are
+        assert results[0]["id"] == oldest
+
+
+def test_ranking_covers_every_match(session_factory):
+    """Every match is ranked, so the oldest message can be the best hit"""
+    check_ranking_covers_every_match(session_factory, make_history(session_factory))
+
+
+def test_pages_run_through_ranked_windows(session_factory):
+    """Common terms are ranked a window at a time, newest window first"""
+    ids = make_history(session_factory)
+    original = message_search.MAX_RANKED_CANDIDATES
+    message_search.MAX_RANKED_CANDIDATES = 10
+    try:
+        with session_factory() as db:
+            newest = all_pages(db, ids["alice"], "deploy")
+            oldest = min(r["id"] for r in newest)
+            db.execute(
+                update(Message)
+                .where(Message.id == oldest)
+                .values(content="deploy deploy deploy")
+            )
+            db.commit()
+
+            for chat_id in (ids["ours"], None):
+                results = all_pages(db, ids["alice"], "deploy", chat_id, limit=4)
+                assert len(results) == len({r["id"] for r in results}) == 26
+                ranked = [r["id"] for r in results]
+                # Each window holds the next 10 newest matches
+                for start in range(0, 26, 10):
+                    window = sorted(ranked, reverse=True)[start : start + 10]
+                    assert set(ranked[start : start + 10]) == set(window)
+                # The best match leads the oldest window
+                assert ranked[20] == oldest
+    finally:
+        message_search.MAX_RANKED_CANDIDATES = original
+
+
+def test_cross_chat_search_respects_membership(session_factory):
+    """Search across chats only covers the user's own chats"""
+    ids = make_history(session_factory)
+    with session_factory() as db:
+        results = all_pages(db, ids["alice"], "deploy")
+        assert {r["chat_id"] for r in results} == {ids["ours"]}
+        assert not all_pages(db, ids["alice"], "secret")
+
+
+def test_snippets_are_escaped_and_highlighted(session_factory):
+    """Snippets escape message HTML and mark the matched terms"""
+    ids = make_history(session_factory)
+    with session_factory() as db:
+        (hit,) = all_pages(db, ids["alice"], "now", chat_id=ids["ours"])
+        assert hit["snippet"] == "Deploying &lt;b&gt;<mark>now</mark>&lt;/b&gt;"
+        assert hit["username"] == "AI Assistant"
+        assert hit["chat_name"] == "Ours"
+
+
+@pytest.mark.skipif(not TEST_POSTGRES_URL, reason="TEST_POSTGRES_URL is not set")
+def test_postgres_search():
+    """The tsvector index ranks, pages, scopes and highlights like FTS5"""
+    engine = create_engine(TEST_POSTGRES_URL)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    try:
+        ids = make_history(session_factory)
+        with session_factory() as db:
+            results = all_pages(db, ids["alice"], "deploy", limit=4)
+            assert len(results) == len({r["id"] for r in results}) == 26
+            assert {r["chat_id"] for r in results} == {ids["ours"]}
+            assert not all_pages(db, ids["alice"], "secret")
+            (hit,) = all_pages(db, ids["alice"], "now", chat_id=ids["ours"])
+            assert hit["snippet"] == "Deploying &lt;b&gt;<mark>now</mark>&lt;/b&gt;"
+        check_ranking_covers_every_match(session_factory, ids)
+    finally:
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+
+def test_unsupported_database_is_501():
+    """Search on a database without a full-text index answers 501"""
+    init_db()
+    name = f"search_{uuid.uuid4().hex[:8]}"
+    with session_scope() as db:
+        user = User(username=name, email=f"{name}@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+    token = create_access_token(data={"sub": name})
+
+    def unsupported(*args, **kwargs):
+        raise NotImplementedError("Message search is not supported on mysql")
+
+    original = server.main.search_messages
+    server.main.search_messages = unsupported
+    try:
+        with TestClient(app) as client:
+            response = client.get(
+                "/api/messages/search",
+                params={"q": "deploy"},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+    finally:
+        server.main.search_messages = original
+    assert response.status_code == 501
+    assert "not supported" in response.json()["detail"]
+
+
+def test_bad_cursor_is_rejected(session_factory):
+    """A malformed cursor raises ValueError (a 400 at the API)"""
+    ids = make_history(session_factory)
+    with session_factory() as db:
+        with pytest.raises(ValueError):
+            search_messages(db, ids["alice"], "deploy", cursor="not-a-cursor")
+
+
+def main():
+    print("=" * 50)
+    print("Message Search Test")
+    print("=" * 50)
+
+    for test in (
+        test_pages_cover_every_match_once,
+        test_cursor_pins_window,
+        test_ranking_covers_every_match,
+        test_pages_run_through_ranked_windows,
+        test_cross_chat_search_respects_membership,
+        test_snippets_are_escaped_and_highlighted,
+        test_unsupported_database_is_501,
+        test_bad_cursor_is_rejected,
+    ):
+        print(f"\n{test.__doc__}...")
+        run_test(test)
+        print("   ✅ passed")
+
+    if TEST_POSTGRES_URL:
+        print(f"\n{test_postgres_search.__doc__}...")
+        test_postgres_search()
+        print("   ✅ passed")
+
+
+if __name__ == "__main__":
+    main()
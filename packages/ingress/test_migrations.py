@@ -0,0 +1,176 @@
+"""
+Schema migration test for Gemini Coop
+
+Runs the alembic revisions against temporary SQLite databases: from empty
+they must produce the models' schema, upgrading baseline data must backfill
+it, and downgrading must get back to the baseline. Also checks that the app
+refuses to start on an outdated schema (no running server needed).
+
+Usage:
+    python test_migrations.py
+    # or
+    python -m pytest test_migrations.py
+"""
+
+import tempfile
+import warnings
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import create_engine, inspect, text
+
+import shared.database
+from shared.database import Base, alembic_config, create_schema, schema_revisions
+import services.database.models  # noqa: F401  (registers the tables)
+
+
+def temp_engine(name: str):
+    return create_engine(f"sqlite:///{tempfile.mkdtemp()}/{name}.db")
+
+
+def migrate(engine, revision: str, down: bool = False):
+    with engine.begin() as conn:
+        if down:
+            command.downgrade(alembic_config(conn), revision)
+        else:
+            command.upgrade(alembic_config(conn), revision)
+
+
+def schema_diff(engine) -> list:
+    """Differences between the database and the models, ignoring search tables"""
+
+    def include_object(obj, name, kind, reflected, compare_to):
+        # FTS5 tables and their shadow tables are not models
+        return not (kind == "table" and reflected and compare_to is None)
+
+    with engine.connect() as conn, warnings.catch_warnings():
+        # Reflection skips the expression indexes built for user search
+        warnings.filterwarnings("ignore", message="Skipped unsupported reflection")
+        context = MigrationContext.configure(
+            conn, opts={"include_object": include_object, "compare_type": True}
+        )
+        return compare_metadata(context, Base.metadata)
+
+
+def test_migrations_match_models():
+    """Upgrading an empty database gives the same schema as creating it"""
+    migrated = temp_engine("migrated")
+    migrate(migrated, "head")
+    assert schema_diff(migrated) == []
+
+    created = temp_engine("created")
+    with created.begin() as conn:
+        create_schema(conn)
+        current, head = schema_revisions(conn)
+    assert schema_diff(created) == []
+    assert current == head
+
+    for engine in (migrated, created):
+        tables = set(inspect(engine).get_table_names())
+        assert {"messages_fts", "alembic_version"} <= tables
+
+
+def test_upgrade_backfills_baseline_data():
+    """Last messages, unread counters and duplicate memberships are migrated"""
+    engine = temp_engine("upgrade")
+    migrate(engine, "0001")
+    with engine.begin() as conn:
+        for statement in (
+            "INSERT INTO users (id, username, email, hashed_password) VALUES "
+            "(1, 'alice', 'alice@example.com', 'x'), (2, 'bob', 'bob@example.com', 'x')",
+            "INSERT INTO chats (id, name, owner_id, created_at, is_group) VALUES "
+            "(1, 'Busy', 1, '2025-01-01 00:00:00', 1), "
+            "(2, 'Quiet', 1, '2025-01-02 00:00:00', 0)",
+            # bob is in chat 1 twice, as older databases allowed
+            "INSERT INTO chat_participants (chat_id, user_id, last_read_at) VALUES "
+            "(1, 1, '2025-01-01 00:00:00'), (1, 2, '2025-01-01 00:01:30'), "
+            "(1, 2, '2025-01-01 00:01:30'), (2, 1, '2025-01-02 00:00:00')",
+            "INSERT INTO messages (chat_id, user_id, content, is_bot, created_at) "
+            "VALUES (1, 1, 'first deploy', 0, '2025-01-01 00:01:00'), "
+            "(1, 2, 'second', 0, '2025-01-01 00:02:00'), "
+            "(1, 1, 'third', 0, '2025-01-01 00:03:00')",
+        ):
+            conn.execute(text(statement))
+
+    migrate(engine, "head")
+
+    with engine.connect() as conn:
+        chats = conn.execute(
+            text("SELECT id, last_message_preview, last_message_at FROM chats")
+        ).all()
+        assert [(c.id, c.last_message_preview) for c in chats] == [
+            (1, "third"),
+            (2, None),
+        ]
+        # A chat without messages sorts by when it was created
+        assert chats[1].last_message_at == "2025-01-02 00:00:00"
+        unread = conn.execute(
+            text("SELECT chat_id, user_id, unread_count FROM chat_participants")
+        ).all()
+        assert sorted(map(tuple, unread)) == [(1, 1, 1), (1, 2, 1), (2, 1, 0)]
+        hits = conn.execute(
+            text("SELECT rowid FROM messages_fts WHERE messages_fts MATCH 'deploy'")
+        ).all()
+        assert len(hits) == 1
+    assert schema_diff(engine) == []
+
+
+def test_downgrade_to_baseline():
+    """Every revision can be rolled back"""
+    engine = temp_engine("downgrade")
+    migrate(engine, "head")
+    migrate(engine, "0001", down=True)
+
+    inspector = inspect(engine)
+    assert "bot_usage" not in inspector.get_table_names()
+    assert "messages_fts" not in inspector.get_table_names()
+    assert {c["name"] for c in inspector.get_columns("chats")} == {
+        "id",
+        "name",
+        "owner_id",
+        "created_at",
+        "is_group",
+    }
+    migrate(engine, "head")
+    assert schema_diff(engine) == []
+
+
+def test_init_db_refuses_outdated_schema():
+    """The app creates an empty database but never migrates an existing one"""
+    original = shared.database.engine
+    try:
+        shared.database.engine = temp_engine("init")
+        shared.database.init_db()
+        shared.database.init_db()
+
+        shared.database.engine = temp_engine("outdated")
+        migrate(shared.database.engine, "0003")
+        try:
+            shared.database.init_db()
+        except RuntimeError as e:
+            assert "alembic upgrade head" in str(e)
+        else:
+            raise AssertionError("expected RuntimeError")
+    finally:
+        shared.database.engine = original
+
+
+def main():
+    print("=" * 50)
+    print("Schema Migration Test")
+    print("=" * 50)
+
+    for test in (
+        test_migrations_match_models,
+        test_upgrade_backfills_baseline_data,
+        test_downgrade_to_baseline,
+        test_init_db_refuses_outdated_schema,
+    ):
+        print(f"\n{test.__doc__}...")
+        test()
+        print("   ✅ passed")
+
+
+if __name__ == "__main__":
+    main()
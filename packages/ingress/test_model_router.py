@@ -0,0 +1,198 @@
+"""
+Model router test for Gemini Coop
+
+Checks how /bot requests are routed to model tiers (command flags, chat
+settings, question size), how slow or failing models are passed over, and
+that GeminiService falls back between models, against a local stub of the
+google-genai client (no API key or network needed).
+
+Usage:
+    python test_model_router.py
+    # or
+    python -m pytest test_model_router.py
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from google.genai import errors
+
+from conftest import run_test
+from services.chat.chat_service import (
+    create_chat,
+    get_chat_bot_tier,
+    set_chat_bot_tier,
+)
+from services.database.models import User
+from services.gemini.gemini_service import GeminiService
+from services.gemini.resilience import ResilientCaller
+from services.gemini.router import ModelRouter, parse_bot_command
+
+TIERS = {"lite": "m-lite", "standard": "m-standard", "deep": "m-deep"}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class StubModels:
+    """Streams a canned reply, except from models set to fail with a 503"""
+
+    def __init__(self):
+        self.failing = set()
+        self.requests = []
+
+    async def generate_content_stream(self, model, contents, config=None):
+        self.requests.append(model)
+        if model in self.failing:
+            raise errors.ServerError(503, {"error": {"message": "overloaded"}})
+        usage = SimpleNamespace(
+            prompt_token_count=10,
+            cached_content_token_count=0,
+            candidates_token_count=4,
+        )
+
+        async def stream():
+            yield SimpleNamespace(text=f"{model} ", usage_metadata=None)
+            yield SimpleNamespace(text="says hi", usage_metadata=usage)
+
+        return stream()
+
+
+def make_service():
+    models = StubModels()
+    client = SimpleNamespace(aio=SimpleNamespace(models=models))
+    service = GeminiService(
+        client=client,
+        model_name="m-standard",
+        resilience=ResilientCaller(max_attempts=1),
+        router=ModelRouter(tiers=TIERS, enabled=True),
+    )
+    return service, models
+
+
+def ask(service, route):
+    async def collect():
+        stream = service.generate_stream_response("hi", route=route)
+        return "".join([chunk async for chunk in stream])
+
+    return asyncio.run(collect())
+
+
+def test_bot_command_flags():
+    """/bot, /bot! and /bot deep are parsed into a tier and a question"""
+    assert parse_bot_command("/bot what's up") == (None, "what's up")
+    assert parse_bot_command("/bot! quick one") == ("lite", "quick one")
+    assert parse_bot_command("/bot deep analyze this thread") == (
+        "deep",
+        "analyze this thread",
+    )
+    assert parse_bot_command("/bot deeper thoughts") == (None, "deeper thoughts")
+    assert parse_bot_command("hello /bot") is None
+    assert parse_bot_command("/botany") is None
+
+
+def test_tier_selection():
+    """A flag beats the chat setting, which beats the question's size"""
+    router = ModelRouter(tiers=TIERS, enabled=True, deep_min_tokens=100)
+    assert router.route("hi").tier == "lite"
+    assert router.route("please explain " * 10).tier == "standard"
+    assert router.route("long pasted text " * 40).tier == "deep"
+    assert router.route("hi", chat_tier="deep").tier == "deep"
+    assert router.route("hi", requested_tier="lite", chat_tier="deep").tier == "lite"
+
+    route = router.route("please explain " * 10)
+    assert route.models == ["m-standard", "m-lite"]
+    assert router.route("x", requested_tier="deep").models == [
+        "m-deep",
+        "m-standard",
+        "m-lite",
+    ]
+    assert router.decisions["lite:size"] == 1 and router.decisions["deep:flag"] == 1
+
+    disabled = ModelRouter(tiers=TIERS, enabled=False)
+    route = disabled.route("long pasted text " * 40, requested_tier="deep")
+    assert route.models == ["m-standard"] and route.reason == "disabled"
+
+
+def test_slow_or_failing_models_are_passed_over():
+    """Degraded models move behind their fallbacks until they recover"""
+    clock = Clock()
+    router = ModelRouter(tiers=TIERS, enabled=True, slow_ttft_seconds=2, clock=clock)
+    for _ in range(3):
+        router.record_failure("m-deep")
+    route = router.route("x", requested_tier="deep")
+    assert route.models == ["m-standard", "m-lite", "m-deep"]
+    assert route.reason == "flag+errors"
+
+    for _ in range(5):
+        router.record_success("m-lite", 5.0, 100, 1.0)
+    route = router.route("hi")
+    assert route.models == ["m-standard", "m-lite"] and route.reason == "size+slow"
+
+    clock.now = 1000  # old samples no longer count
+    assert router.route("x", requested_tier="deep").models[0] == "m-deep"
+    assert router.route("hi").models[0] == "m-lite"
+
+
+def test_service_falls_back_and_records_latency():
+    """A model failing before its first token hands over to the next one"""
+    service, models = make_service()
+    models.failing.add("m-deep")
+    route = service.router.route("x", requested_tier="deep")
+
+    assert ask(service, route) == "m-standard says hi"
+    assert models.requests == ["m-deep", "m-standard"]
+    snapshot = service.router.snapshot()
+    assert snapshot["fallbacks"] == 1
+    assert snapshot["models"]["m-deep"]["errors"] == 1
+    standard = snapshot["models"]["m-standard"]
+    assert standard["requests"] == 1 and standard["output_tokens"] == 4
+    assert standard["first_token_p50_ms"] is not None
+    # Each model has its own breaker
+    assert set(service.callers) == {"m-deep", "m-standard"}
+    assert service.callers["m-deep"].breaker is not service.resilience.breaker
+
+    models.failing.update(TIERS.values())
+    route = service.router.route("hi")
+    assert ask(service, route).startswith("I apologize")
+
+
+def test_chat_bot_tier_setting(session_factory):
+    """A chat's tier is stored on the chat and can be cleared"""
+    with session_factory() as db:
+        user = User(username="alice", email="alice@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        chat_id = create_chat(db, user.id, "Group", is_group=True).id
+
+        assert get_chat_bot_tier(db, chat_id) is None
+        set_chat_bot_tier(db, chat_id, "deep")
+        assert get_chat_bot_tier(db, chat_id) == "deep"
+        set_chat_bot_tier(db, chat_id, None)
+        assert get_chat_bot_tier(db, chat_id) is None
+
+
+def main():
+    print("=" * 50)
+    print("Model Router Test")
+    print("=" * 50)
+
+    for test in (
+        test_bot_command_flags,
+        test_tier_selection,
+        test_slow_or_failing_models_are_passed_over,
+        test_service_falls_back_and_records_latency,
+        test_chat_bot_tier_setting,
+    ):
+        print(f"\n{test.__doc__}...")
+        run_test(test)
+        print("   ✅ passed")
+
+
+if __name__ == "__main__":
+    main()
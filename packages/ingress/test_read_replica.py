@@ -0,0 +1,124 @@
+"""
+Read replica routing test for Gemini Coop
+
+Uses two local SQLite files as primary and replica (no running server needed).
+
+Usage:
+    python test_read_replica.py
+    # or
+    python -m pytest test_read_replica.py
+"""
+
+import tempfile
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from shared.database import Base
+from shared.read_replica import ReadReplicaRouter
+from services.auth.user_search import search_users
+from services.database.models import User
+
+
+def make_sessionmaker(path: str, with_tables: bool = True) -> sessionmaker:
+    engine = create_engine(f"sqlite:///{path}")
+    if with_tables:
+        Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def add_user(session_factory: sessionmaker, username: str, acting_user_id=None):
+    with session_factory() as db:
+        if acting_user_id is not None:
+            db.info["user_id"] = acting_user_id
+        db.add(
+            User(
+                username=username,
+                email=f"{username}@example.com",
+                hashed_password="not-a-real-hash",
+            )
+        )
+        db.commit()
+
+
+def usernames(db, query):
+    return [u.username for u in search_users(db, query, exclude_user_id=0)]
+
+
+def test_reads_go_to_replica():
+    """Read-only calls are served by the replica when it is healthy"""
+    tmp = tempfile.mkdtemp()
+    primary = make_sessionmaker(f"{tmp}/primary.db")
+    replica = make_sessionmaker(f"{tmp}/replica.db")
+    router = ReadReplicaRouter(primary, replica)
+
+    add_user(primary, "alice_primary")
+    add_user(replica, "alice_replica")
+
+    assert router.run(usernames, "alice") == ["alice_replica"]
+    assert router.stats["replica_reads"] == 1
+
+
+def test_read_your_writes():
+    """A user's reads stay on the primary right after they write"""
+    tmp = tempfile.mkdtemp()
+    primary = make_sessionmaker(f"{tmp}/primary.db")
+    replica = make_sessionmaker(f"{tmp}/replica.db")
+    router = ReadReplicaRouter(primary, replica, read_your_writes_seconds=60)
+
+    # User 7 writes through a tagged primary session; the replica lags behind
+    add_user(primary, "bob", acting_user_id=7)
+
+    assert router.run(usernames, "bob", user_id=7) == ["bob"]
+    # Other users may still read the (stale) replica
+    assert router.run(usernames, "bob", user_id=8) == []
+
+
+def test_falls_back_on_replica_error():
+    """Replica errors fall back to the primary and pause replica reads"""
+    tmp = tempfile.mkdtemp()
+    primary = make_sessionmaker(f"{tmp}/primary.db")
+    broken_replica = make_sessionmaker(f"{tmp}/replica.db", with_tables=False)
+    router = ReadReplicaRouter(primary, broken_replica, retry_after_seconds=60)
+
+    add_user(primary, "carol")
+
+    assert router.run(usernames, "carol") == ["carol"]
+    assert router.stats["fallbacks"] == 1
+    assert not router.use_replica()
+
+
+def test_primary_reads_use_the_held_session():
+    """Without a replica, reads run on the caller's session"""
+    tmp = tempfile.mkdtemp()
+    primary = make_sessionmaker(f"{tmp}/primary.db")
+    router = ReadReplicaRouter(primary)
+
+    add_user(primary, "dave")
+
+    with primary() as held:
+        assert router.run(lambda db: db, session=held) is held
+        assert router.run(usernames, "dave", session=held) == ["dave"]
+    # Without one, the router opens its own
+    assert router.run(usernames, "dave") == ["dave"]
+    assert router.stats["primary_reads"] == 3
+
+
+def main():
+    print("=" * 50)
+    print("Read Replica Routing Test")
+    print("=" * 50)
+
+    for test in (
+        test_reads_go_to_replica,
+        test_read_your_writes,
+        test_falls_back_on_replica_error,
+        test_primary_reads_use_the_held_session,
+    ):
+        print(f"\n{test.__doc__}...")
+        test()
+        print("   ✅ passed")
+
+
+if __name__ == "__main__":
+    main()
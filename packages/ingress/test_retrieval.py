@@ -0,0 +1,276 @@
+"""
+Retrieval test for Gemini Coop
+
+Covers the local embedder, the memory-mapped vector index, background
+indexing, open-index eviction under concurrent use, and recall of older
+messages into /bot prompts, using temporary files (no running server or API
+key needed).
+
+Usage:
+    python test_retrieval.py
+    # or
+    python -m pytest test_retrieval.py
+"""
+
+import threading
+
+import numpy as np
+
+from conftest import run_test
+from services.chat.chat_service import (
+    create_chat,
+    create_message,
+    get_chat_history_for_gemini,
+)
+from services.database.models import User
+from services.gemini.context_builder import ContextBuilder, estimate_tokens
+from services.retrieval.embedders import HashingEmbedder
+from services.retrieval.retriever import (
+    MessageRetriever,
+    use_retriever,
+    wait_for_indexing,
+)
+from services.retrieval.vector_index import INITIAL_CAPACITY, VectorIndex
+
+FILLER = [
+    "lunch at noon?",
+    "sure, see you there",
+    "did anyone watch the game last night",
+    "the build is green again",
+    "running five minutes late",
+]
+
+
+def make_chat(session_factory):
+    """A chat with one member; returns (chat_id, user_id)"""
+    with session_factory() as db:
+        user = User(username="alice", email="alice@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        chat_id = create_chat(db, user.id, "Group", is_group=True).id
+        return chat_id, user.id
+
+
+def test_hashing_embedder_ranks_related_text_higher():
+    """Texts sharing words score higher, and vectors are stable across instances"""
+    embedder = HashingEmbedder(256)
+    vectors = embedder.embed(
+        [
+            "The office wifi password is hunter2",
+            "what is the wifi password again?",
+            "running five minutes late",
+        ]
+    )
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    assert vectors[0] @ vectors[1] > 0.3 > vectors[0] @ vectors[2]
+    assert np.array_equal(
+        HashingEmbedder(256).embed(["wifi"]), embedder.embed(["wifi"])
+    )
+    assert not embedder.embed(["the and of"]).any()
+
+
+def test_vector_index_grows_and_persists(tmp_path):
+    """The index grows past its initial size and reopens with the same contents"""
+    path = f"{tmp_path}/chat_1"
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((INITIAL_CAPACITY * 2 + 10, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = list(range(1, len(vectors) + 1))
+
+    index = VectorIndex(path, 16)
+    for start in range(0, len(ids), 500):
+        index.add(ids[start : start + 500], vectors[start : start + 500])
+    index.close()
+
+    reopened = VectorIndex(path, 16)
+    assert len(reopened) == len(ids)
+    hits = reopened.search(vectors[41], k=3)
+    assert hits[0][0] == 42 and abs(hits[0][1] - 1.0) < 1e-5
+    assert [mid for mid, _ in hits] == sorted(
+        ids, key=lambda i: -float(vectors[i - 1] @ vectors[41])
+    )[:3]
+    assert all(mid < 42 for mid, _ in reopened.search(vectors[41], 3, before_id=42))
+
+
+def test_search_returns_each_message_once(tmp_path):
+    """A re-indexed message is returned once, and k is respected"""
+    index = VectorIndex(f"{tmp_path}/chat_1", 4)
+    vector = np.array([[1, 0, 0, 0]], dtype=np.float32)
+    index.add([7], vector)
+    index.add([7], vector)
+    index.add([8], np.array([[0, 1, 0, 0]], dtype=np.float32))
+    assert [mid for mid, _ in index.search(vector[0], k=5)] == [7, 8]
+    assert len(index.search(vector[0], k=1)) == 1
+
+
+def test_bot_history_recalls_old_messages(session_factory, tmp_path):
+    """An old message relevant to the question reaches the prompt"""
+    chat_id, user_id = make_chat(session_factory)
+    retriever = MessageRetriever(f"{tmp_path}/vectors", HashingEmbedder(256))
+    previous = use_retriever(retriever)
+    try:
+        with session_factory() as db:
+            create_message(db, chat_id, "The office wifi password is hunter2", user_id)
+            for i in range(300):
+                create_message(db, chat_id, FILLER[i % len(FILLER)], user_id)
+
+            # First search backfills the chat; later messages are indexed on write
+            history = get_chat_history_for_gemini(
+                db, chat_id, limit=50, query="what was the wifi password?"
+            )
+            assert retriever.stats["backfilled_chats"] == 1
+            recalled = [msg for msg in history if msg.get('retrieved')]
+            assert [msg['parts'][0] for msg in recalled] == [
+                "The office wifi password is hunter2"
+            ]
+            assert history[: len(recalled)] == recalled
+
+            create_message(db, chat_id, "The printer code is 4417", user_id)
+            for i in range(60):
+                create_message(db, chat_id, FILLER[i % len(FILLER)], user_id)
+            wait_for_indexing()
+            history = get_chat_history_for_gemini(
+                db, chat_id, limit=50, query="printer code"
+            )
+            assert retriever.stats["backfilled_chats"] == 1
+            assert "The printer code is 4417" in [
+                msg['parts'][0] for msg in history if msg.get('retrieved')
+            ]
+
+        builder = ContextBuilder(
+            max_tokens=400, max_message_tokens=100, max_retrieved_tokens=50
+        )
+        prompt = builder.build("printer code", history)
+        assert "Earlier messages that may be relevant" in prompt
+        assert "4417" in prompt and estimate_tokens(prompt) <= 400
+    finally:
+        use_retriever(previous)
+        retriever.close()
+
+
+class BlockingEmbedder(HashingEmbedder):
+    """Hashing embedder that waits for `release` and records its threads"""
+
+    def __init__(self):
+        super().__init__(64)
+        self.release = threading.Event()
+        self.threads = set()
+
+    def embed(self, texts):
+        self.threads.add(threading.current_thread())
+        self.release.wait(5)
+        return super().embed(texts)
+
+
+def test_messages_are_indexed_in_the_background(session_factory, tmp_path):
+    """Storing a message never waits for its embedding"""
+    chat_id, user_id = make_chat(session_factory)
+    embedder = BlockingEmbedder()
+    embedder.release.set()
+    retriever = MessageRetriever(f"{tmp_path}/vectors", embedder)
+    retriever.backfill(chat_id, [])
+    embedder.release.clear()
+    embedder.threads.clear()
+    previous = use_retriever(retriever)
+    try:
+        with session_factory() as db:
+            # Would block for seconds if the embedding ran inline
+            printer, _ = (
+                create_message(db, chat_id, text, user_id).id
+                for text in ("The printer code is 4417", "lunch at noon?")
+            )
+        assert retriever.stats["indexed"] == 0
+
+        embedder.release.set()
+        wait_for_indexing()
+        assert threading.current_thread() not in embedder.threads
+        assert retriever.stats["indexed"] == 2
+        assert retriever.search(chat_id, "printer code", k=1)[0][0] == printer
+    finally:
+        use_retriever(previous)
+        retriever.close()
+
+
+def test_evicted_index_stays_open_while_held(tmp_path):
+    """An index evicted from the open set is closed only once released"""
+    retriever = MessageRetriever(str(tmp_path), HashingEmbedder(64), max_open_indexes=1)
+    vector = HashingEmbedder(64).embed(["wifi password"])
+    try:
+        with retriever._index(1) as held:
+            retriever.add(2, [(10, "lunch at noon?")])  # evicts chat 1
+            held.add([1], vector)
+            with retriever._index(1) as reopened:
+                assert reopened is held
+            retriever.add(2, [(11, "see you there")])  # evicts chat 1 again
+            held.add([2], vector)
+        assert len(held) == 0  # closed on release
+        assert [mid for mid, _ in retriever.search(1, "wifi password", k=5)] == [1, 2]
+    finally:
+        retriever.close()
+
+
+def test_concurrent_use_with_few_open_indexes(tmp_path):
+    """Threads adding to and searching more chats than stay open never fail"""
+    retriever = MessageRetriever(str(tmp_path), HashingEmbedder(64), max_open_indexes=2)
+    errors = []
+
+    def work(worker):
+        try:
+            for i in range(60):
+                chat_id = (worker + i) % 5
+                retriever.add(chat_id, [(worker * 1000 + i + 1, FILLER[i % 5])])
+                retriever.search(chat_id, "lunch", k=3)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    try:
+        assert errors == []
+        total = 0
+        for chat_id in range(5):
+            with retriever._index(chat_id) as index:
+                total += len(index)
+        assert total == 6 * 60
+    finally:
+        retriever.close()
+
+
+def test_no_recall_when_disabled(session_factory):
+    """With retrieval off the history is just the recent window"""
+    chat_id, user_id = make_chat(session_factory)
+    previous = use_retriever(None)
+    try:
+        with session_factory() as db:
+            create_message(db, chat_id, "The office wifi password is hunter2", user_id)
+            history = get_chat_history_for_gemini(db, chat_id, query="wifi password")
+        assert [msg.get('retrieved') for msg in history] == [None]
+    finally:
+        use_retriever(previous)
+
+
+def main():
+    print("=" * 50)
+    print("Retrieval Test")
+    print("=" * 50)
+
+    for test in (
+        test_hashing_embedder_ranks_related_text_higher,
+        test_vector_index_grows_and_persists,
+        test_search_returns_each_message_once,
+        test_bot_history_recalls_old_messages,
+        test_messages_are_indexed_in_the_background,
+        test_evicted_index_stays_open_while_held,
+        test_concurrent_use_with_few_open_indexes,
+        test_no_recall_when_disabled,
+    ):
+        print(f"\n{test.__doc__}...")
+        run_test(test)
+        print("   ✅ passed")
+
+
+if __name__ == "__main__":
+    main()
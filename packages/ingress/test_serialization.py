@@ -0,0 +1,127 @@
+"""
+JSON serialization test for Gemini Coop
+
+Round-trips payloads with datetimes and integer keys through the REST
+response class, the shared WebSocket encoder, and the TypedDict row
+adapters, checking they agree with FastAPI's response_model output (no
+running server needed).
+
+Usage:
+    python test_serialization.py
+    # or
+    python -m pytest test_serialization.py
+"""
+
+import json
+from datetime import datetime, timezone
+from typing import List
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+
+from shared.serialization import (
+    dumps,
+    dumps_str,
+    json_list_response,
+    loads,
+    to_primitive,
+)
+from services.database.schemas import (
+    ChatWithUnreadCount,
+    MessageResponse,
+    chat_list_adapter,
+    message_list_adapter,
+)
+from server.main import app
+
+CREATED = datetime(2025, 10, 19, 12, 34, 56, 789012, tzinfo=timezone.utc)
+
+READ_RECEIPTS_EVENT = {
+    "type": "read_receipts_updated",
+    "chat_id": 7,
+    "read_receipts": {42: [{"user_id": 4, "username": "bob", "read_at": CREATED}]},
+}
+
+MESSAGE_ROWS = [
+    {
+        "id": 1,
+        "chat_id": 7,
+        "user_id": 3,
+        "username": "alice",
+        "content": "Has anyone tried the new build? 🚀",
+        "is_bot": False,
+        "created_at": CREATED,
+    },
+    {
+        "id": 2,
+        "chat_id": 7,
+        "user_id": None,
+        "username": None,
+        "content": "Hello!",
+        "is_bot": True,
+        "created_at": datetime(2025, 10, 19, 12, 35),
+    },
+]
+
+CHAT_ROWS = [
+    {
+        "id": 7,
+        "name": "Build",
+        "owner_id": 3,
+        "created_at": CREATED,
+        "is_group": True,
+        "bot_tier": None,
+        "unread_count": 2,
+        "last_message": "Hello!",
+        "last_message_time": None,
+    }
+]
+
+
+def test_rest_and_websocket_encoders_agree():
+    """REST responses and WebSocket frames encode the same bytes"""
+    assert app.router.default_response_class is ORJSONResponse
+    body = ORJSONResponse(READ_RECEIPTS_EVENT).body
+    assert body == dumps(READ_RECEIPTS_EVENT)
+    assert body.decode() == dumps_str(READ_RECEIPTS_EVENT)
+
+    decoded = loads(body)
+    # Integer keys become strings and datetimes isoformat(), as with the
+    # stdlib encoder
+    assert decoded == json.loads(json.dumps(READ_RECEIPTS_EVENT, default=to_primitive))
+    assert decoded["read_receipts"]["42"][0]["read_at"] == CREATED.isoformat()
+
+
+def test_row_adapters_match_response_models():
+    """List endpoints written by the row adapters parse back into their models"""
+    for model, adapter, rows in (
+        (MessageResponse, message_list_adapter, MESSAGE_ROWS),
+        (ChatWithUnreadCount, chat_list_adapter, CHAT_ROWS),
+    ):
+        body = json_list_response(adapter, iter(rows)).body
+        models = TypeAdapter(List[model]).validate_json(body)
+        assert [m.model_dump() for m in models] == rows
+
+        # Same document as the response_model path
+        expected = jsonable_encoder([model(**row) for row in rows])
+        assert orjson.loads(body) == expected
+
+
+def main():
+    print("=" * 50)
+    print("JSON Serialization Test")
+    print("=" * 50)
+
+    for test in (
+        test_rest_and_websocket_encoders_agree,
+        test_row_adapters_match_response_models,
+    ):
+        print(f"\n{test.__doc__}...")
+        test()
+        print("   ✅ passed")
+
+
+if __name__ == "__main__":
+    main()
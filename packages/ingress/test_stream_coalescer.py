@@ -0,0 +1,116 @@
+"""
+Bot stream coalescer test for Gemini Coop
+
+Feeds scripted chunk streams through StreamCoalescer and checks where frames
+are cut: first chunk, size window, time window and the final flush (no
+running server needed).
+
+Usage:
+    python test_stream_coalescer.py
+    # or
+    python -m pytest test_stream_coalescer.py
+"""
+
+import asyncio
+import contextvars
+
+from services.websocket.stream_coalescer import StreamCoalescer
+
+# Set by the upstream generator, read back between its chunks
+stream_marker = contextvars.ContextVar("stream_marker", default=None)
+
+
+async def chunks(*script):
+    """Yield each string of `script`; a number is a pause in seconds"""
+    for item in script:
+        if isinstance(item, str):
+            yield item
+        else:
+            await asyncio.sleep(item)
+
+
+async def collect(coalescer: StreamCoalescer, stream):
+    return [text async for text in coalescer.frames(stream)]
+
+
+def test_first_chunk_and_size_window():
+    """The first chunk goes out alone, then a frame per max_frame_bytes"""
+    coalescer = StreamCoalescer(frame_interval=10, max_frame_bytes=10)
+    frames = asyncio.run(collect(coalescer, chunks("a", "bbbbb", "ccccc", "dd")))
+    assert frames == ["a", "abbbbbccccc", "abbbbbcccccdd"]
+
+    stats = coalescer.stats.snapshot()
+    assert (stats["streams"], stats["chunks"], stats["frames"]) == (1, 4, 3)
+
+
+def test_time_window():
+    """Pending text is flushed when the window ends, even if upstream stalls"""
+    coalescer = StreamCoalescer(frame_interval=0.05, max_frame_bytes=1000)
+    frames = asyncio.run(collect(coalescer, chunks("a", "b", "c", 0.3, "d")))
+    assert frames == ["a", "abc", "abcd"]
+
+
+def test_final_flush():
+    """Text still pending when the stream ends is sent once, at the end"""
+    coalescer = StreamCoalescer(frame_interval=10, max_frame_bytes=1000)
+    assert asyncio.run(collect(coalescer, chunks("a", "b", "c"))) == ["a", "abc"]
+    assert asyncio.run(collect(coalescer, chunks())) == []
+
+
+def test_upstream_runs_in_one_task():
+    """The upstream keeps its task, context and timeouts across chunks"""
+    tasks = set()
+
+    async def upstream():
+        stream_marker.set("upstream")
+        async with asyncio.timeout(5):
+            for chunk in ("a", "b", "c"):
+                tasks.add(asyncio.current_task())
+                assert stream_marker.get() == "upstream"
+                yield chunk
+                await asyncio.sleep(0.01)
+
+    coalescer = StreamCoalescer(frame_interval=0.001, max_frame_bytes=1000)
+    frames = asyncio.run(collect(coalescer, upstream()))
+    assert frames[-1] == "abc"
+    assert len(tasks) == 1
+
+
+def test_upstream_error_propagates():
+    """An upstream error reaches the consumer after the frames before it"""
+
+    async def failing():
+        yield "a"
+        raise ValueError("upstream failed")
+
+    async def run():
+        frames = []
+        try:
+            async for text in StreamCoalescer(10, 1000).frames(failing()):
+                frames.append(text)
+        except ValueError as e:
+            return frames, str(e)
+        raise AssertionError("expected ValueError")
+
+    assert asyncio.run(run()) == (["a"], "upstream failed")
+
+
+def main():
+    print("=" * 50)
+    print("Stream Coalescer Test")
+    print("=" * 50)
+
+    for test in (
+        test_first_chunk_and_size_window,
+        test_time_window,
+        test_final_flush,
+        test_upstream_runs_in_one_task,
+        test_upstream_error_propagates,
+    ):
+        print(f"\n{test.__doc__}...")
+        test()
+        print("   ✅ passed")
+
+
+if __name__ == "__main__":
+    main()
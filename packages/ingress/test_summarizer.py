@@ -0,0 +1,198 @@
+"""
+Conversation summarizer test for Gemini Coop
+
+Runs the rolling chat summary against a local fake model and a temporary
+SQLite database (no running server or API key needed).
+
+Usage:
+    python test_summarizer.py
+    # or
+    python -m pytest test_summarizer.py
+"""
+
+import asyncio
+
+from conftest import run_test
+from services.chat.chat_service import (
+    create_chat,
+    create_message,
+    get_chat_history_for_gemini,
+    get_chat_summary,
+)
+from services.database.models import User
+from services.gemini.context_builder import ContextBuilder, estimate_tokens
+from services.gemini.gemini_service import GeminiService
+from services.gemini.summarizer import MAX_PROMPT_TOKENS, ConversationSummarizer
+
+
+class FakeModel:
+    """Stands in for GeminiService; records prompts and can be made to fail"""
+
+    def __init__(self):
+        self.prompts = []
+        self.fail = False
+
+    async def generate_response(self, message, history=None, raise_errors=False):
+        self.prompts.append(message)
+        if self.fail:
+            raise RuntimeError("model unavailable")
+        return f"summary #{len(self.prompts)}"
+
+
+def make_chat(session_factory, messages=0):
+    """A chat with `messages` posted; returns (chat_id, user_id)"""
+    with session_factory() as db:
+        user = User(username="alice", email="alice@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        chat_id = create_chat(db, user.id, "Group", is_group=True).id
+        user_id = user.id
+    post(session_factory, chat_id, user_id, messages)
+    return chat_id, user_id
+
+
+def post(session_factory, chat_id, user_id, count, start=0):
+    with session_factory() as db:
+        for i in range(start, start + count):
+            create_message(db, chat_id, f"message {i}", user_id)
+
+
+def test_summary_waits_for_enough_messages(session_factory):
+    """Nothing is summarized until N messages have left the recent window"""
+    chat_id, _ = make_chat(session_factory, messages=29)
+    model = FakeModel()
+    summarizer = ConversationSummarizer(
+        model, session_factory, every=10, keep_recent=20
+    )
+
+    assert not asyncio.run(summarizer.refresh(chat_id))
+    assert model.prompts == []
+
+
+def test_summary_is_persisted_and_refreshed_incrementally(session_factory):
+    """Each refresh folds only new messages into the previous summary"""
+    chat_id, user_id = make_chat(session_factory, messages=30)
+    model = FakeModel()
+    summarizer = ConversationSummarizer(
+        model, session_factory, every=10, keep_recent=20
+    )
+
+    assert asyncio.run(summarizer.refresh(chat_id))
+    with session_factory() as db:
+        summary, covered = get_chat_summary(db, chat_id)
+    assert summary == "summary #1"
+    assert "message 9\n" in model.prompts[0] + "\n"
+    assert "message 10" not in model.prompts[0]
+
+    post(session_factory, chat_id, user_id, 10, start=30)
+    assert asyncio.run(summarizer.refresh(chat_id))
+    assert "summary #1" in model.prompts[1]
+    assert "message 9" not in model.prompts[1]
+    assert "alice: message 19" in model.prompts[1]
+    with session_factory() as db:
+        summary, newer = get_chat_summary(db, chat_id)
+    assert summary == "summary #2" and newer == covered + 10
+    assert summarizer.stats["messages_summarized"] == 20
+
+
+def test_history_leads_with_summary(session_factory):
+    """Bot history is the summary followed by the messages it does not cover"""
+    chat_id, _ = make_chat(session_factory, messages=30)
+    summarizer = ConversationSummarizer(
+        FakeModel(), session_factory, every=10, keep_recent=20
+    )
+    asyncio.run(summarizer.refresh(chat_id))
+
+    with session_factory() as db:
+        history = get_chat_history_for_gemini(db, chat_id, limit=200)
+    assert history[0]['summary'] and history[0]['parts'] == ["summary #1"]
+    assert [msg['parts'][0] for msg in history[1:]] == [
+        f"message {i}" for i in range(10, 30)
+    ]
+
+    prompt = ContextBuilder(max_tokens=2000).build("What did we decide?", history)
+    assert prompt.startswith("Summary of the earlier conversation: summary #1")
+    assert "message 10" in prompt and "message 9\n" not in prompt
+
+
+def test_model_failure_keeps_previous_summary(session_factory):
+    """A failed model call stores nothing and is retried on the next refresh"""
+    chat_id, _ = make_chat(session_factory, messages=30)
+    model = FakeModel()
+    model.fail = True
+    summarizer = ConversationSummarizer(
+        model, session_factory, every=10, keep_recent=20
+    )
+
+    async def scheduled():
+        summarizer.schedule(chat_id)
+        summarizer.schedule(chat_id)  # already running: ignored
+        await asyncio.gather(*summarizer._tasks)
+
+    asyncio.run(scheduled())
+    assert len(model.prompts) == 1
+    assert summarizer.stats["failures"] == 1
+    with session_factory() as db:
+        assert get_chat_summary(db, chat_id) == (None, None)
+
+    model.fail = False
+    assert asyncio.run(summarizer.refresh(chat_id))
+
+
+def test_prompts_stay_bounded(session_factory):
+    """A long backlog of huge messages is summarized in bounded prompts"""
+    chat_id, user_id = make_chat(session_factory)
+    with session_factory() as db:
+        for i in range(150):
+            create_message(db, chat_id, f"long {i} " + "word " * 5000, user_id)
+    model = FakeModel()
+    summarizer = ConversationSummarizer(model, session_factory, every=10, keep_recent=0)
+
+    assert asyncio.run(summarizer.refresh(chat_id))
+    assert len(model.prompts) > 1
+    assert "summary #1" in model.prompts[1]
+    for prompt in model.prompts:
+        assert estimate_tokens(prompt) <= MAX_PROMPT_TOKENS
+    # Every message went into exactly one prompt
+    for i in range(150):
+        assert sum(f"alice: long {i} " in p for p in model.prompts) == 1
+
+
+def test_full_batch_reaches_model_untruncated(session_factory):
+    """GeminiService's context builder passes each summary prompt on whole"""
+    chat_id, user_id = make_chat(session_factory)
+    with session_factory() as db:
+        for i in range(200):
+            create_message(db, chat_id, f"long {i} " + "word " * 5000, user_id)
+    model = FakeModel()
+    summarizer = ConversationSummarizer(model, session_factory, every=10, keep_recent=0)
+    assert asyncio.run(summarizer.refresh(chat_id))
+
+    service = GeminiService()
+    for prompt in model.prompts:
+        _, _, contents = service.context_builder.build_contents(
+            prompt, None, service.instructions
+        )
+        assert [part.text for part in contents[-1].parts] == [prompt]
+
+
+def main():
+    print("=" * 50)
+    print("Conversation Summarizer Test")
+    print("=" * 50)
+
+    for test in (
+        test_summary_waits_for_enough_messages,
+        test_summary_is_persisted_and_refreshed_incrementally,
+        test_history_leads_with_summary,
+        test_model_failure_keeps_previous_summary,
+        test_prompts_stay_bounded,
+        test_full_batch_reaches_model_untruncated,
+    ):
+        print(f"\n{test.__doc__}...")
+        run_test(test)
+        print("   ✅ passed")
+
+
+if __name__ == "__main__":
+    main()
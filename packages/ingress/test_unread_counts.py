@@ -0,0 +1,181 @@
+"""
+Unread counter test for Gemini Coop
+
+Checks that the per-participant unread counters follow new messages and
+read marks, and that the reconciliation job repairs counters that drifted,
+in-process (no running server needed).
+
+Usage:
+    python test_unread_counts.py
+    # or
+    python -m pytest test_unread_counts.py
+"""
+
+import uuid
+
+from sqlalchemy import update
+
+from server.main import run_unread_reconciliation
+from shared.database import init_db, session_scope
+from services.chat import chat_service
+from services.chat.bot_service import get_or_create_bot_user
+from services.chat.chat_service import (
+    create_chat,
+    create_message,
+    get_unread_count,
+    mark_chat_as_read,
+    reconcile_unread_counts,
+)
+from services.database.models import ChatParticipant, User
+
+
+def make_chat(db, members=3):
+    """A group chat of `members` new users; returns (chat_id, [user ids])"""
+    prefix = uuid.uuid4().hex[:8]
+    users = [
+        User(
+            username=f"{prefix}_{i}",
+            email=f"{prefix}_{i}@example.com",
+            hashed_password="not-a-real-hash",
+        )
+        for i in range(members)
+    ]
+    db.add_all(users)
+    db.commit()
+    user_ids = [user.id for user in users]
+    chat = create_chat(db, user_ids[0], "Unread", True, participant_ids=user_ids[1:])
+    return chat.id, user_ids
+
+
+def counts(db, chat_id, user_ids):
+    return [get_unread_count(db, chat_id, user_id) for user_id in user_ids]
+
+
+def test_counters_follow_messages():
+    """Each message counts for every member except its sender"""
+    init_db()
+    with session_scope() as db:
+        chat_id, (alice, bob, carol) = make_chat(db)
+        create_message(db, chat_id, "one", user_id=alice)
+        create_message(db, chat_id, "two", user_id=alice)
+        create_message(db, chat_id, "three", user_id=bob)
+
+        assert counts(db, chat_id, [alice, bob, carol]) == [1, 2, 3]
+        assert reconcile_unread_counts(db, chat_id) == 0
+
+
+def test_bot_messages():
+    """Bot replies count for everyone; the sender-less greeting does not"""
+    init_db()
+    with session_scope() as db:
+        chat_id, (alice, bob) = make_chat(db, members=2)
+        bot_id = get_or_create_bot_user(db).id
+        create_message(db, chat_id, "Hello!", user_id=None, is_bot=True)
+        assert counts(db, chat_id, [alice, bob]) == [0, 0]
+
+        create_message(db, chat_id, "Here is a summary", user_id=bot_id, is_bot=True)
+        assert counts(db, chat_id, [alice, bob]) == [1, 1]
+        assert reconcile_unread_counts(db, chat_id) == 0
+
+
+def test_mark_read_resets_one_member():
+    """Reading a chat zeroes the reader's counter, and counting starts over"""
+    init_db()
+    with session_scope() as db:
+        chat_id, (alice, bob, carol) = make_chat(db)
+        create_message(db, chat_id, "one", user_id=alice)
+        create_message(db, chat_id, "two", user_id=alice)
+
+        assert mark_chat_as_read(db, chat_id, bob)
+        assert counts(db, chat_id, [alice, bob, carol]) == [0, 0, 2]
+
+        create_message(db, chat_id, "three", user_id=carol)
+        assert counts(db, chat_id, [alice, bob, carol]) == [1, 1, 2]
+        assert reconcile_unread_counts(db, chat_id) == 0
+
+
+def test_reconciliation_repairs_drift():
+    """The reconciliation job recomputes counters that drifted, and only those"""
+    init_db()
+    with session_scope() as db:
+        chat_id, (alice, bob, carol) = make_chat(db)
+        other_chat_id, others = make_chat(db, members=2)
+        create_message(db, chat_id, "one", user_id=alice)
+        create_message(db, chat_id, "two", user_id=bob)
+        create_message(db, other_chat_id, "elsewhere", user_id=others[0])
+
+        # A lost increment, a counter written by a buggy path, and drift in
+        # another chat
+        for member_chat, member, value in (
+            (chat_id, bob, 0),
+            (chat_id, carol, 7),
+            (other_chat_id, others[1], 5),
+        ):
+            db.execute(
+                update(ChatParticipant)
+                .where(
+                    ChatParticipant.chat_id == member_chat,
+                    ChatParticipant.user_id == member,
+                )
+                .values(unread_count=value)
+            )
+        db.commit()
+
+        assert reconcile_unread_counts(db, chat_id) == 2
+        assert counts(db, chat_id, [alice, bob, carol]) == [1, 1, 2]
+        assert counts(db, other_chat_id, others) == [0, 5]
+
+    # The periodic job covers every chat
+    assert run_unread_reconciliation() >= 1
+    assert run_unread_reconciliation() == 0
+    with session_scope() as db:
+        assert counts(db, other_chat_id, others) == [0, 1]
+
+
+def test_reconciliation_runs_in_batches():
+    """Reconciliation fixes drift in every batch, committing per batch"""
+    init_db()
+    with session_scope() as db:
+        chat_id, members = make_chat(db, members=5)
+        create_message(db, chat_id, "hello", user_id=members[0])
+        db.execute(
+            update(ChatParticipant)
+            .where(ChatParticipant.chat_id == chat_id)
+            .values(unread_count=9)
+        )
+        db.commit()
+
+        commits = []
+        original_batch = chat_service.UNREAD_RECONCILE_BATCH
+        original_commit = db.commit
+        chat_service.UNREAD_RECONCILE_BATCH = 2
+        db.commit = lambda: (commits.append(1), original_commit())
+        try:
+            assert reconcile_unread_counts(db, chat_id) == 5
+        finally:
+            chat_service.UNREAD_RECONCILE_BATCH = original_batch
+            db.commit = original_commit
+        # Five consecutive participant rows: three batches of at most two
+        assert len(commits) == 3
+        assert counts(db, chat_id, members) == [0, 1, 1, 1, 1]
+
+
+def main():
+    print("=" * 50)
+    print("Unread Counter Test")
+    print("=" * 50)
+
+    for test in (
+        test_counters_follow_messages,
+        test_bot_messages,
+        test_mark_read_resets_one_member,
+        test_reconciliation_repairs_drift,
+        test_reconciliation_runs_in_batches,
+    ):
+        print(f"\n{test.__doc__}...")
+        test()
+        print("   ✅ passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Unread badge push test for Gemini Coop
+
+Sends /bot commands over an in-process WebSocket, with the model stubbed to
+answer or to fail, and checks the unread_update frames pushed for the user
+message and for the reply (no running server or API key needed).
+
+Usage:
+    python test_unread_updates.py
+    # or
+    python -m pytest test_unread_updates.py
+"""
+
+from fastapi.testclient import TestClient
+
+from shared.database import init_db, session_scope
+from services.auth.auth_service import create_access_token, create_user
+from services.auth.auth_service import get_user_by_username
+from services.chat.chat_service import create_chat
+from services.database.schemas import UserCreate
+from services.gemini.gemini_service import gemini_service
+from server.main import app
+
+USERNAME = "unread_update_user"
+
+
+def setup_chats():
+    """A user with two fresh chats; returns (token, chat_id, other_chat_id)"""
+    init_db()
+    with session_scope() as db:
+        user = get_user_by_username(db, USERNAME)
+        if not user:
+            user = create_user(
+                db,
+                UserCreate(
+                    username=USERNAME,
+                    email=f"{USERNAME}@example.com",
+                    password="testpassword123",
+                ),
+            )
+        chat = create_chat(db, user.id, "Badges", is_group=True)
+        other = create_chat(db, user.id, "Elsewhere", is_group=True)
+        return create_access_token(data={"sub": USERNAME}), chat.id, other.id
+
+
+def unread_updates_for_bot_command(stream) -> list:
+    """unread_update frames pushed for one /bot command and its reply"""
+    token, chat_id, other_chat_id = setup_chats()
+    original = gemini_service.generate_stream_response
+    gemini_service.generate_stream_response = lambda *args, **kwargs: stream()
+    try:
+        with TestClient(app) as client:
+            with client.websocket_connect(f"/ws?token={token}") as ws:
+                for chat in (chat_id, other_chat_id):
+                    ws.send_json({"type": "join", "chat_id": chat})
+                # A socket's frames are handled one at a time, so "done" is
+                # only processed after the reply and its update (if any). It
+                # goes to another chat so its badge never supersedes the
+                # reply's in the socket's send queue.
+                for chat, content in ((chat_id, "/bot hi"), (other_chat_id, "done")):
+                    ws.send_json(
+                        {"type": "message", "chat_id": chat, "content": content}
+                    )
+                updates = []
+                while True:
+                    frame = ws.receive_json()
+                    if frame.get("type") != "unread_update":
+                        continue
+                    if frame["chat_id"] == other_chat_id:
+                        return updates
+                    updates.append(frame)
+    finally:
+        gemini_service.generate_stream_response = original
+
+
+def test_reply_pushes_unread_update():
+    """The sender's badge counts the bot reply once it is stored"""
+
+    async def answer():
+        yield "Hello "
+        yield "there"
+
+    sent, replied = unread_updates_for_bot_command(answer)
+    assert (sent["unread_count"], sent["last_message_preview"]) == (0, "/bot hi")
+    assert (replied["unread_count"], replied["last_message_preview"]) == (
+        1,
+        "Hello there",
+    )
+
+
+def test_failed_reply_pushes_unread_update():
+    """A failed reply still moves the badge, to the stored error message"""
+
+    async def fail():
+        raise RuntimeError("model unavailable")
+        yield
+
+    sent, replied = unread_updates_for_bot_command(fail)
+    assert sent["unread_count"] == 0
+    assert replied["unread_count"] == 1
+    assert replied["last_message_preview"].startswith("I apologize")
+
+
+def main():
+    print("=" * 50)
+    print("Unread Badge Push Test")
+    print("=" * 50)
+
+    for test in (
+        test_reply_pushes_unread_update,
+        test_failed_reply_pushes_unread_update,
+    ):
+        print(f"\n{test.__doc__}...")
+        test()
+        print("   ✅ passed")
+
+
+if __name__ == "__main__":
+    main()
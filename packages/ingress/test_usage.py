@@ -0,0 +1,254 @@
+"""
+Bot usage accounting test for Gemini Coop
+
+Runs the /bot usage tracker (in-memory counters, rollup flushes, quotas)
+and the usage report queries against a temporary SQLite database, and
+checks the per-call usage GeminiService reports (no running server or API
+key needed).
+
+Usage:
+    python test_usage.py
+    # or
+    python -m pytest test_usage.py
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from sqlalchemy import select
+
+from conftest import run_test
+from services.chat.chat_service import create_chat
+from services.database.models import BotUsage, User
+from services.gemini.gemini_service import GeminiService
+from services.usage.usage_service import get_usage_totals
+from services.usage.usage_tracker import UsageTracker
+
+NOON = datetime(2026, 10, 19, 12, 30, tzinfo=timezone.utc)
+
+
+class Clock:
+    def __init__(self, moment=NOON):
+        self.now = moment.timestamp()
+
+    def __call__(self):
+        return self.now
+
+
+def make_db(session_factory):
+    """Two users in one chat; returns their ids"""
+    with session_factory() as db:
+        alice = User(username="alice", email="alice@example.com", hashed_password="x")
+        bob = User(username="bob", email="bob@example.com", hashed_password="x")
+        db.add_all([alice, bob])
+        db.commit()
+        chat_id = create_chat(db, alice.id, "Launch", is_group=True).id
+        return SimpleNamespace(alice=alice.id, bob=bob.id, chat=chat_id)
+
+
+def call(model="m-flash", prompt=100, output=20, cached=0, latency=500, error=False):
+    return {
+        "model": model,
+        "prompt_tokens": prompt,
+        "cached_tokens": cached,
+        "output_tokens": output,
+        "latency_ms": latency,
+        "error": error,
+    }
+
+
+def test_calls_roll_up_per_hour_user_chat_and_model(session_factory):
+    """Calls are summed in memory and upserted into hourly rollup rows"""
+    ids = make_db(session_factory)
+    clock = Clock()
+    tracker = UsageTracker(session_factory, clock=clock)
+    for _ in range(3):
+        tracker.record(ids.alice, ids.chat, call())
+    tracker.record(ids.alice, ids.chat, call(model="m-pro", error=True))
+    tracker.record(ids.bob, ids.chat, call(cached=80))
+    assert asyncio.run(tracker.flush()) == 3
+
+    # Same hour again: the existing row is incremented, not duplicated
+    tracker.record(ids.alice, ids.chat, call(latency=900))
+    clock.now += 3600
+    tracker.record(ids.alice, ids.chat, call())
+    assert asyncio.run(tracker.flush()) == 2
+
+    with session_factory() as db:
+        rows = db.execute(select(BotUsage).order_by(BotUsage.id)).scalars().all()
+        summary = [
+            (r.bucket.hour, r.user_id, r.model, r.requests, r.errors, r.prompt_tokens)
+            for r in rows
+        ]
+        assert summary == [
+            (12, ids.alice, "m-flash", 4, 0, 400),
+            (12, ids.alice, "m-pro", 1, 1, 100),
+            (12, ids.bob, "m-flash", 1, 0, 100),
+            (13, ids.alice, "m-flash", 1, 0, 100),
+        ]
+        assert rows[0].latency_ms == 3 * 500 + 900
+        assert rows[2].cached_tokens == 80
+    assert tracker.stats["flushes"] == 2 and tracker.stats["rows_flushed"] == 5
+
+
+def test_request_rate_limits(session_factory):
+    """Per-user and per-chat requests per minute, over a sliding window"""
+    ids = make_db(session_factory)
+    clock = Clock()
+    tracker = UsageTracker(
+        session_factory,
+        user_requests_per_minute=2,
+        chat_requests_per_minute=3,
+        clock=clock,
+    )
+    with session_factory() as db:
+        assert tracker.check(db, ids.alice, ids.chat) is None
+        clock.now += 10
+        assert tracker.check(db, ids.alice, ids.chat) is None
+        refused = tracker.check(db, ids.alice, ids.chat)
+        assert refused.retry_after == 50 and "per minute" in refused.message
+
+        # Bob has his own allowance, but the chat's is now used up
+        assert tracker.check(db, ids.bob, ids.chat) is None
+        refused = tracker.check(db, ids.bob, ids.chat)
+        assert refused.message.startswith("This chat")
+
+        clock.now += 51  # Alice's first request left the window
+        assert tracker.check(db, ids.alice, ids.chat) is None
+    assert tracker.stats["rejected"] == 2
+
+
+def test_daily_token_quota(session_factory):
+    """Daily tokens count stored and unflushed usage, and reset at midnight UTC"""
+    ids = make_db(session_factory)
+    clock = Clock()
+    tracker = UsageTracker(
+        session_factory,
+        user_requests_per_minute=0,
+        chat_requests_per_minute=0,
+        user_tokens_per_day=1000,
+        clock=clock,
+    )
+    for _ in range(6):
+        tracker.record(ids.alice, ids.chat, call(prompt=100, output=50))
+    asyncio.run(tracker.flush())
+    tracker.record(ids.alice, ids.chat, call(prompt=50, output=0))  # not flushed
+
+    with session_factory() as db:
+        # 6 * 150 stored + 50 pending = 950 of 1000
+        assert tracker.check(db, ids.alice, ids.chat) is None
+        tracker.record(ids.alice, ids.chat, call(prompt=40, output=10))
+        refused = tracker.check(db, ids.alice, ids.chat)
+        assert "daily /bot quota of 1,000 tokens" in refused.message
+        assert refused.retry_after == 11 * 3600 + 30 * 60
+        assert tracker.check(db, ids.bob, ids.chat) is None
+
+        clock.now += 12 * 3600
+        assert tracker.check(db, ids.alice, ids.chat) is None
+
+
+def test_usage_report_totals(session_factory):
+    """Totals overall and per user, chat and model, heaviest first"""
+    ids = make_db(session_factory)
+    tracker = UsageTracker(session_factory, clock=Clock())
+    tracker.record(ids.alice, ids.chat, call(prompt=1000, latency=400))
+    tracker.record(ids.alice, ids.chat, call(prompt=1000, latency=600))
+    tracker.record(ids.bob, ids.chat, call(model="m-pro", prompt=10, error=True))
+    asyncio.run(tracker.flush())
+
+    since = NOON - timedelta(hours=1)
+    with session_factory() as db:
+        (totals,) = get_usage_totals(db, since)
+        assert totals["requests"] == 3 and totals["errors"] == 1
+        assert totals["prompt_tokens"] == 2010 and totals["output_tokens"] == 60
+
+        by_user = get_usage_totals(db, since, "user")
+        assert [(g["name"], g["requests"]) for g in by_user] == [
+            ("alice", 2),
+            ("bob", 1),
+        ]
+        assert by_user[0]["avg_latency_ms"] == 500
+        (by_chat,) = get_usage_totals(db, since, "chat")
+        assert by_chat["key"] == ids.chat and by_chat["name"] == "Launch"
+        assert [g["key"] for g in get_usage_totals(db, since, "model")] == [
+            "m-flash",
+            "m-pro",
+        ]
+        assert get_usage_totals(db, NOON + timedelta(hours=1))[0]["requests"] == 0
+
+
+def test_failed_flush_keeps_counters(session_factory):
+    """Counters survive a failed flush and go out with the next one"""
+    ids = make_db(session_factory)
+
+    def unavailable():
+        raise RuntimeError("database unavailable")
+
+    broken = UsageTracker(unavailable)
+    broken.record(ids.alice, ids.chat, call())
+    assert asyncio.run(broken.flush()) == 0
+    assert broken.stats["flush_errors"] == 1 and broken.snapshot()["pending_rows"] == 1
+
+    broken.session_factory = session_factory
+    assert asyncio.run(broken.flush()) == 1
+
+
+def test_gemini_service_reports_call_usage():
+    """generate_stream_response fills in the model, tokens and latency"""
+
+    async def generate_content_stream(model, contents, config=None):
+        async def stream():
+            yield SimpleNamespace(text="Hi", usage_metadata=None)
+            yield SimpleNamespace(
+                text=" there",
+                usage_metadata=SimpleNamespace(
+                    prompt_token_count=42,
+                    cached_content_token_count=30,
+                    candidates_token_count=3,
+                ),
+            )
+
+        return stream()
+
+    client = SimpleNamespace(
+        aio=SimpleNamespace(
+            models=SimpleNamespace(generate_content_stream=generate_content_stream)
+        )
+    )
+    service = GeminiService(client=client, model_name="m-flash")
+
+    async def collect():
+        usage = {}
+        stream = service.generate_stream_response("hi", usage=usage)
+        text = "".join([chunk async for chunk in stream])
+        return text, usage
+
+    text, usage = asyncio.run(collect())
+    assert text == "Hi there"
+    assert usage["model"] == "m-flash" and usage["error"] is False
+    assert (usage["prompt_tokens"], usage["cached_tokens"]) == (42, 30)
+    assert usage["output_tokens"] == 3
+    assert usage["latency_ms"] >= usage["first_token_ms"] >= 0
+
+
+def main():
+    print("=" * 50)
+    print("Bot Usage Test")
+    print("=" * 50)
+
+    for test in (
+        test_calls_roll_up_per_hour_user_chat_and_model,
+        test_request_rate_limits,
+        test_daily_token_quota,
+        test_usage_report_totals,
+        test_failed_flush_keeps_counters,
+        test_gemini_service_reports_call_usage,
+    ):
+        print(f"\n{test.__doc__}...")
+        run_test(test)
+        print("   ✅ passed")
+
+
+if __name__ == "__main__":
+    main()
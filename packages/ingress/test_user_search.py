@@ -0,0 +1,119 @@
+"""
+User search test for Gemini Coop
+
+Uses a local SQLite file with the user search indexes (no running server
+needed).
+
+Usage:
+    python test_user_search.py
+    # or
+    python -m pytest test_user_search.py
+"""
+
+from sqlalchemy import text
+
+from conftest import run_test
+from services.auth.user_search import (
+    MAX_USER_SEARCH_LIMIT,
+    ensure_user_search_index,
+    search_users,
+)
+from services.database.models import User
+
+USERNAMES = [
+    "alice",
+    "Alicia_Keys",
+    "bob_malice",
+    "carol",
+    "dave_100",
+    "dave1x00",
+]
+
+
+def make_users(session_factory, names=USERNAMES):
+    """Add users, then build the search indexes over them"""
+    with session_factory() as db:
+        db.add_all(
+            User(
+                username=name,
+                email=f"{name.lower()}@example.com",
+                hashed_password="not-a-real-hash",
+            )
+            for name in names
+        )
+        db.commit()
+    with session_factory.begin() as db:
+        assert ensure_user_search_index(db.connection())
+        assert not ensure_user_search_index(db.connection())
+
+
+def usernames(db, query, exclude_user_id=0, limit=10):
+    return [u.username for u in search_users(db, query, exclude_user_id, limit)]
+
+
+def test_prefix_matches_come_first(session_factory):
+    """Prefix matches rank ahead of substring matches, case-insensitively"""
+    make_users(session_factory)
+    with session_factory() as db:
+        assert usernames(db, "ALI") == ["alice", "Alicia_Keys", "bob_malice"]
+        # Too short for a substring match
+        assert usernames(db, "li") == []
+
+
+def test_email_and_new_users_are_found(session_factory):
+    """Emails match too, and users added after the index is built are found"""
+    make_users(session_factory)
+    with session_factory() as db:
+        assert usernames(db, "carol@exa") == ["carol"]
+        db.add(User(username="zed", email="zed@example.com", hashed_password="x"))
+        db.commit()
+        assert usernames(db, "zed") == ["zed"]
+        assert usernames(db, "ed@example") == ["zed"]
+
+
+def test_wildcards_are_literal(session_factory):
+    """% and _ in the query match themselves, not any character"""
+    make_users(session_factory)
+    with session_factory() as db:
+        assert usernames(db, "dave_") == ["dave_100"]
+        assert usernames(db, "e_1") == ["dave_100"]
+        assert usernames(db, "%") == []
+
+
+def test_excludes_searcher_and_caps_limit(session_factory):
+    """The searcher is left out and the page size is capped"""
+    names = [f"user{i:03d}" for i in range(MAX_USER_SEARCH_LIMIT + 5)]
+    make_users(session_factory, names)
+    with session_factory() as db:
+        assert len(usernames(db, "user", limit=1000)) == MAX_USER_SEARCH_LIMIT
+        assert "user000" not in usernames(db, "user0", exclude_user_id=1)
+
+
+def test_substring_search_without_trigram_table(session_factory):
+    """Without the trigram table, substring matches fall back to a scan"""
+    make_users(session_factory)
+    with session_factory.begin() as db:
+        db.execute(text("DROP TABLE users_trgm"))
+    with session_factory() as db:
+        assert usernames(db, "alic") == ["alice", "Alicia_Keys", "bob_malice"]
+
+
+def main():
+    print("=" * 50)
+    print("User Search Test")
+    print("=" * 50)
+
+    for test in (
+        test_prefix_matches_come_first,
+        test_email_and_new_users_are_found,
+        test_wildcards_are_literal,
+        test_excludes_searcher_and_caps_limit,
+        test_substring_search_without_trigram_table,
+    ):
+        print(f"\n{test.__doc__}...")
+        run_test(test)
+        print("   ✅ passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+WebSocket database session test for Gemini Coop
+
+Opens 1,000 idle WebSocket connections in-process (no running server needed)
+and checks that none of them keeps a pooled database connection checked out.
+
+Usage:
+    python test_websocket_sessions.py
+    # or
+    python -m pytest test_websocket_sessions.py
+"""
+
+import asyncio
+import os
+import tempfile
+
+# Point the app at a throwaway SQLite file before anything imports the engine
+_db_dir = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_db_dir}/ws_sessions.db")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+from sqlalchemy import event
+
+from shared.database import engine, init_db, session_scope
+from services.auth.auth_service import create_access_token, create_user
+from services.auth.auth_service import get_user_by_username
+from services.chat.chat_service import create_chat
+from services.database.schemas import UserCreate
+from server.main import app
+
+IDLE_SOCKETS = 1000
+
+
+class PoolWatcher:
+    """Tracks current and peak pool checkouts through pool events"""
+
+    def __init__(self, engine):
+        self.checked_out = 0
+        self.peak = 0
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+
+    def _on_checkout(self, dbapi_conn, conn_record, conn_proxy):
+        self.checked_out += 1
+        self.peak = max(self.peak, self.checked_out)
+
+    def _on_checkin(self, dbapi_conn, conn_record):
+        self.checked_out -= 1
+
+
+async def open_socket(token: str):
+    """Drive the ASGI app directly and return the socket's queues"""
+    inbox: asyncio.Queue = asyncio.Queue()
+    outbox: asyncio.Queue = asyncio.Queue()
+    scope = {
+        "type": "websocket",
+        "asgi": {"version": "3.0"},
+        "scheme": "ws",
+        "path": "/ws",
+        "root_path": "",
+        "query_string": f"token={token}".encode(),
+        "headers": [],
+        "server": ("testserver", 80),
+        "client": ("testclient", 50000),
+        "subprotocols": [],
+    }
+    await inbox.put({"type": "websocket.connect"})
+    task = asyncio.create_task(app(scope, inbox.get, outbox.put))
+    accepted = await outbox.get()
+    assert accepted["type"] == "websocket.accept", accepted
+    return task, inbox, outbox
+
+
+def setup_user():
+    """Create a user with one chat and return (token, chat_id)"""
+    init_db()
+    with session_scope() as db:
+        user = get_user_by_username(db, "ws_session_user")
+        if not user:
+            user = create_user(
+                db,
+                UserCreate(
+                    username="ws_session_user",
+                    email="ws_session_user@example.com",
+                    password="testpassword123",
+                ),
+            )
+        chat = create_chat(db, user.id, "Session test chat", is_group=True)
+        token = create_access_token(data={"sub": user.username})
+        return token, chat.id
+
+
+async def run_idle_sockets():
+    token, chat_id = setup_user()
+    watcher = PoolWatcher(engine)
+
+    sockets = [await open_socket(token) for _ in range(IDLE_SOCKETS)]
+    print(f"   Opened {len(sockets)} sockets")
+
+    # Every socket sends one frame that needs the database, then goes idle
+    for _, inbox, _ in sockets:
+        await inbox.put(
+            {
+                "type": "websocket.receive",
+                "text": f'{{"type": "join", "chat_id": {chat_id}}}',
+            }
+        )
+    await asyncio.sleep(0.5)
+
+    idle_checked_out = engine.pool.checkedout()
+    print(f"   Pool checkouts while idle: {idle_checked_out}")
+    print(f"   Peak pool checkouts: {watcher.peak} (pool size {engine.pool.size()})")
+
+    for task, inbox, _ in sockets:
+        await inbox.put({"type": "websocket.disconnect", "code": 1000})
+    await asyncio.gather(*(task for task, _, _ in sockets))
+
+    return idle_checked_out, watcher.peak
+
+
+def test_idle_sockets_hold_no_connections():
+    """1,000 idle sockets must not keep pooled connections checked out"""
+    print(f"\nTesting {IDLE_SOCKETS} idle WebSocket connections...")
+    idle_checked_out, peak = asyncio.run(run_idle_sockets())
+    assert idle_checked_out == 0
+    assert peak <= engine.pool.size()
+
+
+def main():
+    print("=" * 50)
+    print("WebSocket Session Test")
+    print("=" * 50)
+
+    test_idle_sockets_hold_no_connections()
+    print("\n✅ Pool checkouts stayed bounded!")
+
+
+if __name__ == "__main__":
+    main()
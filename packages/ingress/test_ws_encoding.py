@@ -0,0 +1,215 @@
+"""
+WebSocket wire encoding test for Gemini Coop
+
+Checks encoding negotiation, round trips, the inbound size limit on
+DEFLATE frames, and that a mixed-encoding room encodes each broadcast once
+per encoding (no running server needed).
+
+Usage:
+    python test_ws_encoding.py
+    # or
+    python -m pytest test_ws_encoding.py
+"""
+
+import asyncio
+import json
+import zlib
+
+import msgpack
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from shared.database import init_db, session_scope
+from services.auth.auth_service import create_access_token, create_user
+from services.auth.auth_service import get_user_by_username
+from services.database.schemas import UserCreate
+from services.websocket import encoding
+from services.websocket.encoding import (
+    DEFLATE_DICTIONARY,
+    FrameTooLargeError,
+    OutboundFrame,
+    decode,
+    inflate,
+    negotiate,
+)
+from services.websocket.websocket_manager import ConnectionManager
+from server.main import app
+from test_broadcast import CHAT_ID, RecordingSocket, open_room, settle
+
+SAMPLE_EVENTS = [
+    {
+        "type": "message",
+        "message": {
+            "id": 42,
+            "chat_id": 7,
+            "user_id": 3,
+            "username": "alice",
+            "content": "Has anyone tried the new build?",
+            "is_bot": False,
+            "created_at": "2025-10-19T12:34:56.789012+00:00",
+        },
+    },
+    {"type": "typing", "chat_id": 7, "username": "alice"},
+    {
+        "type": "read_receipts_updated",
+        "chat_id": 7,
+        "read_receipts": {
+            "42": [{"user_id": 4, "username": "bob", "read_at": None}],
+        },
+    },
+]
+
+
+def test_negotiate():
+    """Query parameter wins, then known subprotocols, then JSON"""
+    assert negotiate("msgpack", []) == ("msgpack", None)
+    assert negotiate(None, ["chat", "gemini-coop.deflate"]) == (
+        "deflate",
+        "gemini-coop.deflate",
+    )
+    assert negotiate(None, ["gemini-coop.xml"]) == ("json", None)
+    assert negotiate("bogus", []) == ("json", None)
+
+
+def test_round_trip():
+    """Every encoding decodes back to the original event"""
+    for name in encoding.ENCODINGS:
+        for event in SAMPLE_EVENTS:
+            sent = encoding.encode(event, name)
+            assert decode({"type": "websocket.receive", **sent}, name) == event
+
+
+def deflate(data: bytes) -> bytes:
+    compressor = zlib.compressobj(
+        9, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=DEFLATE_DICTIONARY
+    )
+    return compressor.compress(data) + compressor.flush()
+
+
+def bomb(size: int) -> bytes:
+    """A DEFLATE frame of a JSON message that inflates to about `size` bytes"""
+    return deflate(b'{"type":"message","content":"' + b"x" * size + b'"}')
+
+
+def raises_too_large(call) -> bool:
+    try:
+        call()
+    except FrameTooLargeError:
+        return True
+    return False
+
+
+def test_oversized_frames_are_rejected():
+    """DEFLATE frames are inflated only up to the inbound size limit"""
+    frame = bomb(2000)
+    assert len(frame) < 100
+    assert len(inflate(frame, max_size=2100)) < 2100
+    assert raises_too_large(lambda: inflate(frame, max_size=1000))
+    # One byte over the limit
+    assert raises_too_large(lambda: inflate(frame, max_size=len(inflate(frame)) - 1))
+
+    big = bomb(encoding.WS_MAX_INBOUND_FRAME_BYTES)
+    assert len(big) < 10_000
+    receive = {"type": "websocket.receive", "bytes": big}
+    assert raises_too_large(lambda: decode(receive, encoding.DEFLATE))
+    limit = encoding.WS_MAX_INBOUND_FRAME_BYTES
+    text = {"type": "websocket.receive", "text": " " * (limit + 1)}
+    assert raises_too_large(lambda: decode(text, encoding.JSON))
+
+
+async def run_mixed_room_encodes_once_per_encoding():
+    manager = ConnectionManager()
+    sockets = [RecordingSocket() for _ in range(6)]
+    open_room(manager, sockets)
+    for i, socket in enumerate(sockets):
+        manager.websocket_encodings[socket.websocket] = encoding.ENCODINGS[i % 3]
+
+    calls = []
+    original = encoding.encode
+
+    def counting_encode(message, name):
+        calls.append(name)
+        return original(message, name)
+
+    encoding.encode = counting_encode
+    try:
+        await manager.broadcast_to_chat(SAMPLE_EVENTS[0], CHAT_ID)
+        await settle()
+        assert sorted(calls) == sorted(encoding.ENCODINGS)
+    finally:
+        encoding.encode = original
+
+
+def test_mixed_room_encodes_once_per_encoding():
+    """A broadcast is encoded once per encoding in use, not once per socket"""
+    asyncio.run(run_mixed_room_encodes_once_per_encoding())
+
+
+def encoding_user_token() -> str:
+    init_db()
+    with session_scope() as db:
+        if not get_user_by_username(db, "ws_encoding_user"):
+            create_user(
+                db,
+                UserCreate(
+                    username="ws_encoding_user",
+                    email="ws_encoding_user@example.com",
+                    password="testpassword123",
+                ),
+            )
+    return create_access_token(data={"sub": "ws_encoding_user"})
+
+
+def test_msgpack_endpoint():
+    """/ws speaks MessagePack both ways when negotiated"""
+    token = encoding_user_token()
+
+    with TestClient(app) as client:
+        with client.websocket_connect(
+            f"/ws?token={token}", subprotocols=["gemini-coop.msgpack"]
+        ) as ws:
+            assert ws.accepted_subprotocol == "gemini-coop.msgpack"
+            # Not a member of this chat: the error comes back as MessagePack
+            ws.send_bytes(msgpack.packb({"type": "join", "chat_id": 999999}))
+            assert msgpack.unpackb(ws.receive_bytes()) == {"error": "Not authorized"}
+            # Text JSON is still accepted from any client
+            ws.send_text(json.dumps({"type": "join", "chat_id": 999999}))
+            assert msgpack.unpackb(ws.receive_bytes()) == {"error": "Not authorized"}
+
+
+def test_oversized_frame_closes_socket():
+    """/ws closes with 1009 when a DEFLATE frame inflates past the limit"""
+    token = encoding_user_token()
+
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/ws?token={token}&encoding=deflate") as ws:
+            ws.send_bytes(bomb(encoding.WS_MAX_INBOUND_FRAME_BYTES))
+            try:
+                ws.receive_bytes()
+            except WebSocketDisconnect as e:
+                assert e.code == 1009
+            else:
+                raise AssertionError("expected the socket to close")
+
+
+def main():
+    print("=" * 50)
+    print("WebSocket Encoding Test")
+    print("=" * 50)
+
+    test_negotiate()
+    print("✅ Negotiation")
+    test_round_trip()
+    print("✅ Round trips")
+    test_oversized_frames_are_rejected()
+    print("✅ Oversized frames rejected")
+    test_mixed_room_encodes_once_per_encoding()
+    print("✅ One encode per encoding per broadcast")
+    test_msgpack_endpoint()
+    print("✅ MessagePack endpoint")
+    test_oversized_frame_closes_socket()
+    print("✅ Oversized frame closes the socket")
+
+
+if __name__ == "__main__":
+    main()
@@ -51,9 +51,12 @@ export default function ChatPage() {
   // Check if AI bot is present in this chat (any message from bot)
   const hasAIBot = messages.some((msg) => msg.is_bot);
 
-  // Detect if user is typing a bot command
-  const isBotCommand = newMessage.startsWith("/bot ");
-  const botCommandPreview = isBotCommand ? newMessage.slice(5).trim() : "";
+  // Detect if user is typing a bot command ("/bot ", "/bot! " or "/bot deep ")
+  const botCommandPrefix = newMessage.match(/^\/bot(?:!| deep)? /)?.[0];
+  const isBotCommand = botCommandPrefix !== undefined;
+  const botCommandPreview = botCommandPrefix
+    ? newMessage.slice(botCommandPrefix.length).trim()
+    : "";
 
   // Auto-scroll to bottom when new messages arrive
   const scrollToBottom = (behavior: ScrollBehavior = "smooth") => {
@@ -184,6 +187,25 @@ export default function ChatPage() {
             return [...prev, wsMessage.message!];
           });
         }
+      } else if (wsMessage.type === "bot_quota_exceeded" && wsMessage.error) {
+        // The /bot command was refused and not stored: replace our optimistic
+        // copy with a local notice from the assistant
+        if (wsMessage.chat_id === parseInt(chatId)) {
+          setMessages((prev) => [
+            ...prev.filter(
+              (m) => !(m.id < 0 && m.content === wsMessage.content),
+            ),
+            {
+              id: -Date.now(),
+              chat_id: parseInt(chatId),
+              user_id: null,
+              content: wsMessage.error!,
+              is_bot: true,
+              created_at: new Date().toISOString(),
+              username: "AI Assistant",
+            },
+          ]);
+        }
       } else if (
         wsMessage.type === "read_receipts_updated" &&
         wsMessage.read_receipts
@@ -9,8 +9,7 @@ import React, {
 } from "react";
 import { useAuth } from "./auth-context";
 import { useChats } from "./chat-context";
-import { chatAPI } from "@/lib/api-client";
-import { WSMessage } from "@/lib/types";
+import { Chat, WSMessage } from "@/lib/types";
 
 interface WebSocketContextType {
   isConnected: boolean;
@@ -108,19 +107,6 @@ export function WebSocketProvider({ children }: { children: React.ReactNode }) {
     };
   }, [isAuthenticated, token]);
 
-  const fetchAndUpdateSingleChat = async (chatId: number) => {
-    try {
-      // Fetch all chats to get the updated unread count for the specific chat
-      const allChats = await chatAPI.getChats();
-      const updatedChat = allChats.find((c) => c.id === chatId);
-      if (updatedChat) {
-        updateChat(chatId, updatedChat);
-      }
-    } catch (error) {
-      console.error("Failed to fetch single chat update:", error);
-    }
-  };
-
   const handleWebSocketMessage = (message: WSMessage) => {
     console.log("WebSocket message received:", message);
 
@@ -146,44 +132,42 @@ export function WebSocketProvider({ children }: { children: React.ReactNode }) {
         break;
 
       case "message":
-        // Update chat locally without full refresh to prevent flickering
-        if (message.message?.chat_id) {
-          // Check if user is currently viewing this chat
-          const isViewingChat =
-            window.location.pathname === `/chat/${message.message.chat_id}`;
-
-          // If not viewing, we need to fetch the updated chat to get the correct unread count
-          // If viewing, just update the last message without changing unread count
-          if (isViewingChat) {
-            // User is viewing this chat, don't increment unread count
-            updateChat(message.message.chat_id, {
-              last_message: message.message.content,
-              last_message_time: message.message.created_at,
-            });
-          } else {
-            // User is NOT viewing this chat, fetch updated data to get new unread count
-            fetchAndUpdateSingleChat(message.message.chat_id);
-          }
-        }
-
+        // Sidebar counters arrive separately as unread_update
         // Show notification if message has content
         if (message.message?.content && message.message?.username) {
           showNotification(message.message.username, message.message.content);
         }
         break;
 
-      case "read_receipts_updated":
-        // Fetch updated chat data to get new unread count without full refresh
-        // This is more efficient than refreshing all chats
+      case "unread_update":
+        // Server pushes the new badge counter and preview, no refetch needed
         if (message.chat_id) {
-          fetchAndUpdateSingleChat(message.chat_id);
+          // The open chat is marked read as messages arrive, so keep it at 0
+          const isViewingChat =
+            window.location.pathname === `/chat/${message.chat_id}`;
+          const updates: Partial<Chat> = {
+            unread_count: isViewingChat ? 0 : message.unread_count,
+          };
+          if (message.last_message_time) {
+            updates.last_message = message.last_message_preview;
+            updates.last_message_time = message.last_message_time;
+          }
+          updateChat(message.chat_id, updates);
         }
         break;
 
+      case "read_receipts_updated":
+        // Read receipts are handled by the chat page; badges come via unread_update
+        break;
+
       case "bot_stream":
         // Handle bot streaming (will be implemented with real-time chat)
         break;
 
+      case "bot_quota_exceeded":
+        // Shown by the chat page the command was sent from
+        break;
+
       case "typing":
         // Handle typing indicators (future feature)
         break;
@@ -8,6 +8,8 @@ import {
   Message,
   CreateChatRequest,
   InviteUserRequest,
+  BulkInviteRequest,
+  BulkInviteResult,
   APIError,
 } from "./types";
 
@@ -112,6 +114,17 @@ export const chatAPI = {
     return response.data;
   },
 
+  async inviteUsers(
+    chatId: number,
+    data: BulkInviteRequest,
+  ): Promise<BulkInviteResult> {
+    const response = await axiosInstance.post<BulkInviteResult>(
+      `/api/chats/${chatId}/invite/bulk`,
+      data,
+    );
+    return response.data;
+  },
+
   async getMessages(chatId: number, limit = 50): Promise<Message[]> {
     const response = await axiosInstance.get<Message[]>(
       `/api/chats/${chatId}/messages`,
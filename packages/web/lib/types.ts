@@ -50,6 +50,16 @@ export interface InviteUserRequest {
   username: string;
 }
 
+export interface BulkInviteRequest {
+  usernames: string[];
+}
+
+export interface BulkInviteResult {
+  added: string[];
+  already_members: string[];
+  not_found: string[];
+}
+
 // Message types
 export interface ReadReceipt {
   user_id: number;
@@ -79,7 +89,9 @@ export type WSMessageType =
   | "user_left"
   | "chat_created"
   | "chat_invite"
-  | "read_receipts_updated";
+  | "read_receipts_updated"
+  | "unread_update"
+  | "bot_quota_exceeded";
 
 export interface WSMessage {
   type: WSMessageType;
@@ -96,6 +108,11 @@ export interface WSMessage {
   chat?: Chat; // Chat data for invite/create notifications
   message?: Message; // Full message object for new messages
   read_receipts?: Record<number, ReadReceipt[]>; // Read receipts data for read_receipts_updated
+  unread_count?: number; // Badge counter for unread_update
+  last_message_preview?: string | null; // Latest message preview for unread_update
+  last_message_time?: string | null; // Latest message time for unread_update
+  error?: string; // Reason a /bot command was refused (bot_quota_exceeded)
+  retry_after?: number; // Seconds until it may be retried (bot_quota_exceeded)
 }
 
 // API Error type